@@ -1,16 +1,34 @@
 # agent.py
 # Agent Router menggunakan Ollama
 
-from ollama import Client
+import contextvars
 import json
-from config import OLLAMA_MODEL, OLLAMA_BASE_URL, OLLAMA_API_KEY, SYSTEM_PROMPT
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional, Tuple
+import config
+import history_budget
+import intent_router
+import job_queue
+import llm_client
+import llm_queue
+import logging_setup
+import response_cache
+import tool_result
+import tool_selection
+import tracing
+from config import OLLAMA_MODEL, SYSTEM_PROMPT
 from tools_definition import tools
 
-# Buat Ollama client dengan base URL dan API key dari config
-ollama_client = Client(
-    host=OLLAMA_BASE_URL,
-    headers={"Authorization": f"Bearer {OLLAMA_API_KEY}"} if OLLAMA_API_KEY else {}
-)
+logger = logging.getLogger(__name__)
+
+# Format hasil tool ringkas perlu dijelaskan ke LLM di system prompt
+if tool_result.TOOL_RESULT_FORMAT == "compact":
+    SYSTEM_PROMPT = f"{SYSTEM_PROMPT}\n- {tool_result.CATATAN_FORMAT}"
+
+# Ollama client bersama (pool koneksi, timeout, retry, keep_alive) dari llm_client.py
+ollama_client = llm_client.client
 from db_functions import (
     cari_siswa,
     get_siswa_by_kelas,
@@ -21,6 +39,7 @@ from db_functions import (
     get_rekap_absensi_bulanan,
     get_persentase_kehadiran,
     buat_surat_peringatan_alfa,
+    buat_surat_peringatan_alfa_batch,
     buat_laporan_alfa,
     get_attendance_trends,
     compare_class_attendance,
@@ -33,6 +52,9 @@ from db_functions import (
     get_statistik_waktu_absen,
     get_laporan_kepsek_range,
     get_laporan_guru_harian,
+    get_db_connection,
+    kelas_index,
+    siswa_index,
 )
 
 
@@ -49,6 +71,7 @@ available_functions = {
     "get_rekap_absensi_bulanan": get_rekap_absensi_bulanan,
     "get_persentase_kehadiran": get_persentase_kehadiran,
     "buat_surat_peringatan_alfa": buat_surat_peringatan_alfa,
+    "buat_surat_peringatan_alfa_batch": buat_surat_peringatan_alfa_batch,
     "buat_laporan_alfa": buat_laporan_alfa,
     "get_attendance_trends": get_attendance_trends,
     "compare_class_attendance": compare_class_attendance,
@@ -63,6 +86,154 @@ available_functions = {
     "get_laporan_guru_harian": get_laporan_guru_harian,
 }
 
+# Tool PDF → job background jika worker job_queue aktif (api.py); tanpa worker tetap sinkron
+for _nama in job_queue.JOB_HANDLERS:
+    available_functions[_nama] = job_queue.sebagai_job(_nama, available_functions[_nama])
+
+
+# ============================================
+# CACHE JAWABAN (pertanyaan berulang, invalidasi per scope data absensi)
+# ============================================
+jawaban_cache = response_cache.ResponseCache(
+    get_db_connection,
+    resolve_kelas=kelas_index.resolve,
+    resolve_siswa=siswa_index.resolve,
+    embed=(
+        (lambda teks: ollama_client.embed(response_cache.RESPONSE_CACHE_EMBED_MODEL, teks))
+        if response_cache.RESPONSE_CACHE_EMBED_MODEL else None
+    ),
+)
+
+
+# Riwayat chat: anggaran token + ringkasan bergulir untuk pesan lama
+konteks = history_budget.HistoryBudget(
+    summarize=history_budget.buat_summarizer(
+        ollama_client.chat,
+        getattr(config, "HISTORY_SUMMARY_MODEL", None) or OLLAMA_MODEL,
+        llm_queue.PRIORITAS_LATAR,
+    ),
+)
+
+# Pre-router: pertanyaan berpola tetap langsung ke tool tanpa LLM memilih tool
+router = intent_router.IntentRouter(kelas_index.resolve, siswa_index.resolve)
+
+# Hanya schema tool yang relevan yang dikirim ke LLM (prefill lebih pendek)
+pemilih_tool = tool_selection.ToolSelector(
+    tools,
+    embed=(
+        (lambda teks: ollama_client.embed(tool_selection.TOOL_SELECTION_EMBED_MODEL, teks))
+        if tool_selection.TOOL_SELECTION_EMBED_MODEL else None
+    ),
+)
+
+
+# ============================================
+# EKSEKUSI TOOL (paralel, urutan hasil tetap)
+# ============================================
+# Worker pool dibatasi agar tool call paralel tidak menghabiskan
+# connection pool MySQL (DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW).
+_tool_executor = ThreadPoolExecutor(
+    max_workers=getattr(config, "AGENT_TOOL_WORKERS", 4),
+    thread_name_prefix="agent-tool",
+)
+
+
+def _jalankan_tool(function_name: str, function_args: dict) -> str:
+    """Eksekusi satu tool call. Return konten JSON untuk pesan role 'tool'."""
+    t0 = time.perf_counter()
+    with tracing.span(f"tool.{function_name}", tool=function_name) as sp:
+        if function_name not in available_functions:
+            sp.fail("function tidak tersedia")
+            logger.warning("🔧 %s tidak tersedia", function_name)
+            return json.dumps({"error": f"Function {function_name} tidak tersedia"})
+
+        try:
+            result = available_functions[function_name](**function_args)
+            sp.set(execution_time_ms=round((time.perf_counter() - t0) * 1000, 3))
+            if isinstance(result, list):
+                sp.set(result_rows=len(result))
+
+            with tracing.span("tool.serialize", tool=function_name) as ser:
+                content = tool_result.encode(result, function_name)
+                ser.set(bytes=len(content))
+            logger.info(
+                "🔧 %s selesai: %.1f ms, %d byte",
+                function_name, (time.perf_counter() - t0) * 1000, len(content),
+            )
+            return content
+        except Exception as e:
+            sp.fail(str(e))
+            logger.warning("🔧 %s gagal: %s", function_name, e)
+            return json.dumps({"error": f"Error menjalankan {function_name}: {str(e)}"})
+
+
+def _jalankan_tool_calls(tool_calls: list) -> list:
+    """
+    Eksekusi semua tool call dari satu response LLM.
+    Lebih dari satu tool call dijalankan paralel di _tool_executor;
+    hasil dikembalikan sesuai urutan tool call aslinya.
+    """
+    calls = [(tc["function"]["name"], tc["function"]["arguments"] or {}) for tc in tool_calls]
+
+    if logger.isEnabledFor(logging.INFO):
+        for function_name, function_args in calls:
+            logger.info("🔧 Tool dipanggil: %s %s", function_name, json.dumps(function_args, ensure_ascii=False))
+
+    if len(calls) == 1:
+        results = [_jalankan_tool(*calls[0])]
+    else:
+        # copy_context → span tool di worker thread tetap masuk trace pertanyaan ini
+        futures = [
+            _tool_executor.submit(contextvars.copy_context().run, _jalankan_tool, name, args)
+            for name, args in calls
+        ]
+        results = [f.result() for f in futures]
+
+    # Isi lengkap hasil tool hanya untuk request yang disampel
+    if logging_setup.payload_disampel():
+        for (function_name, _), result_json in zip(calls, results):
+            logger.info("📊 Hasil %s: %s", function_name, result_json)
+
+    return results
+
+
+def _jalankan_rute(rute: intent_router.Rute) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Eksekusi tool hasil intent_router.
+    Return (jawaban_template, None) jika template bisa dipakai, selain itu
+    (None, konten pesan 'tool') untuk dirangkai LLM.
+    """
+    if rute.template is None or rute.tool not in available_functions:
+        return None, _jalankan_tool(rute.tool, rute.args)
+
+    t0 = time.perf_counter()
+    with tracing.span(f"tool.{rute.tool}", tool=rute.tool, intent=rute.intent) as sp:
+        try:
+            result = available_functions[rute.tool](**rute.args)
+            sp.set(execution_time_ms=round((time.perf_counter() - t0) * 1000, 3))
+            jawaban = rute.template(result)
+        except Exception as e:
+            sp.fail(str(e))
+            logger.warning("🔧 %s gagal: %s", rute.tool, e)
+            return None, json.dumps({"error": f"Error menjalankan {rute.tool}: {str(e)}"})
+        if jawaban is not None:
+            return jawaban, None
+        # Hasil di luar template (mis. error) → biarkan LLM yang menjelaskan
+        return None, tool_result.encode(result, rute.tool)
+
+
+def _catat_statistik_ollama(sp, chunk):
+    """Simpan jumlah token & durasi dari chunk terakhir Ollama (done=True) ke span"""
+    prompt_tokens = chunk.get("prompt_eval_count") or 0
+    eval_tokens = chunk.get("eval_count") or 0
+    sp.set(prompt_tokens=prompt_tokens, eval_tokens=eval_tokens)
+    for key in ("load_duration", "prompt_eval_duration", "eval_duration", "total_duration"):
+        nilai = chunk.get(key)
+        if nilai:
+            sp.set(**{f"{key}_ms": round(nilai / 1e6, 3)})
+    tracing.metrics.inc("agent_llm_tokens_total", prompt_tokens, jenis="prompt")
+    tracing.metrics.inc("agent_llm_tokens_total", eval_tokens, jenis="eval")
+
 
 def run_agent(user_message: str, model: str = None) -> str:
     """
@@ -74,117 +245,206 @@ def run_agent(user_message: str, model: str = None) -> str:
 
 def run_agent_with_history(user_message: str, chat_history: list = None, model: str = None) -> str:
     """
-    Jalankan agent untuk menjawab pertanyaan user.
-    
+    Jalankan agent untuk menjawab pertanyaan user dan kembalikan jawaban utuh.
+    Versi streaming (token per token): stream_agent_with_history().
+    """
+    return "".join(stream_agent_with_history(user_message, chat_history=chat_history, model=model))
+
+
+def stream_agent_with_history(
+    user_message: str,
+    chat_history: list = None,
+    model: str = None,
+    max_tool_rounds: int = None
+) -> Iterator[str]:
+    """
+    Jalankan agent dan yield potongan jawaban (token) begitu diterima dari Ollama.
+
     Args:
         user_message: Pesan terakhir dari user
         chat_history: Riwayat percakapan sebelumnya [{"role": ..., "content": ...}]
         model: Model Ollama yang digunakan
-    
+        max_tool_rounds: Batas putaran tool calling (default AGENT_MAX_TOOL_ROUNDS)
+
     Flow:
     1. User bertanya dalam bahasa natural
     2. LLM menganalisis dan memilih tool yang tepat (dengan konteks history)
     3. Tool dieksekusi → query ke MySQL
-    4. Hasil dikirim balik ke LLM
-    5. LLM merangkum jawaban dalam bahasa natural
-    6. LLM memberikan analisis 
+    4. Hasil dikirim balik ke LLM; LLM boleh memanggil tool lagi
+       (maks max_tool_rounds putaran)
+    5. LLM merangkum jawaban dalam bahasa natural → di-stream ke client
+    6. LLM memberikan analisis
     """
-    
+
     if model is None:
         model = OLLAMA_MODEL
-    
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
-
-    # Tambahkan riwayat percakapan sebelumnya (maks 20 pesan terakhir)
-    if chat_history:
-        # Batasi history agar tidak terlalu panjang
-        recent_history = chat_history[-20:]
-        for msg in recent_history:
-            role = msg.get("role", "")
-            content = msg.get("content", "")
-            if role in ("user", "assistant") and content:
-                messages.append({"role": role, "content": content})
-
-    # Tambahkan pesan user terbaru
-    messages.append({"role": "user", "content": user_message})
-
-    print(f"\n{'='*60}")
-    print(f"👤 User: {user_message}")
-    print(f"🤖 Model: {model}")
-    print(f"📜 History: {len(messages) - 2} pesan sebelumnya")
-    print(f"{'='*60}")
-
-    # ── Step 1: Kirim ke Ollama dengan tools ──
-    try:
-        response = ollama_client.chat(
-            model=model,
-            messages=messages,
-            tools=tools
+    if max_tool_rounds is None:
+        max_tool_rounds = getattr(config, "AGENT_MAX_TOOL_ROUNDS", 3)
+
+    t_mulai = time.perf_counter()
+    with tracing.trace("agent.run", model=model, history=len(chat_history or [])) as root:
+        with tracing.span("agent.prompt") as sp:
+            messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+
+            # Riwayat percakapan sebelumnya dalam anggaran token
+            # (pesan lama diringkas, hasil tool lama dibuang; lihat history_budget.py)
+            riwayat, info = konteks.susun(chat_history)
+            messages.extend(riwayat)
+            sp.set(history_tokens=info["tokens"], history_dipakai=info["pesan_dipakai"],
+                   history_asli=info["pesan_asli"], history_ringkasan=info["ringkasan"] or "-")
+
+            # Tambahkan pesan user terbaru
+            messages.append({"role": "user", "content": user_message})
+            sp.set(messages=len(messages), chars=sum(len(m["content"]) for m in messages))
+
+        with tracing.span("agent.tool_selection") as sp:
+            # Subset yang sama untuk semua putaran agar prefix prompt tetap bisa di-cache Ollama
+            tools_dipakai = pemilih_tool.pilih(user_message, chat_history)
+            sp.set(tools=len(tools_dipakai), chars=tool_selection.ukuran_prompt(tools_dipakai))
+
+        disampel = logging_setup.mulai_request()
+        logger.info(
+            "👤 %s | model=%s history=%d",
+            user_message if disampel else user_message[:100], model, len(messages) - 2,
         )
-    except Exception as e:
-        error_msg = f"❌ Gagal menghubungi Ollama: {str(e)}"
-        print(error_msg)
-        return error_msg
 
-    # ── Step 2: Cek apakah LLM ingin memanggil tool ──
-    if response["message"].get("tool_calls"):
+        # ── Cache tingkat 1: pertanyaan sama persis, data belum berubah → tanpa LLM ──
+        with tracing.span("response_cache.cari", tingkat=1) as sp:
+            tersimpan = jawaban_cache.cari(user_message, chat_history, model)
+            sp.set(hit=tersimpan is not None)
+        if tersimpan is not None:
+            root.set(cache="exact", putaran=0, tool_calls=0, answer_chars=len(tersimpan))
+            logger.info(
+                "💾 Jawaban dari cache (exact), %d karakter, %.0f ms",
+                len(tersimpan), (time.perf_counter() - t_mulai) * 1000,
+            )
+            yield tersimpan
+            return
 
-        # Tambahkan response LLM ke history
-        messages.append(response["message"])
+        answer_parts = []
+        jumlah_tool = 0
+        tool_calls_awal = []
+        semua_tool_calls = []
+        sumber_cache = None
+        gagal = False
+        langsung = None  # jawaban tanpa LLM (cache tingkat 2 / template intent)
+        putaran = -1
 
-        for tool_call in response["message"]["tool_calls"]:
-            function_name = tool_call["function"]["name"]
-            function_args = tool_call["function"]["arguments"]
+        # ── Intent router: pola dikenal → putaran 0 (pemilihan tool) tanpa LLM ──
+        rute = router.route(user_message)
+        if rute is not None:
+            putaran = 0
+            tool_calls_awal = [rute.tool_call()]
+            root.set(intent=rute.intent)
+            logger.info("🧭 Intent %s → %s %s", rute.intent, rute.tool, json.dumps(rute.args, ensure_ascii=False))
+            with tracing.span("response_cache.cari", tingkat=2) as sp:
+                langsung = jawaban_cache.cari_dengan_tool(user_message, chat_history, model, tool_calls_awal)
+                sp.set(hit=langsung is not None)
+            if langsung is not None:
+                sumber_cache = "semantik"
+            else:
+                langsung, content = _jalankan_rute(rute)
+                jumlah_tool += 1
+                semua_tool_calls.extend(tool_calls_awal)
+                if langsung is None:
+                    messages.append({"role": "assistant", "content": "", "tool_calls": tool_calls_awal})
+                    messages.append({"role": "tool", "content": content})
+            if langsung is not None:
+                answer_parts.append(langsung)
+                yield langsung
 
-            print(f"\n🔧 Tool dipanggil : {function_name}")
-            print(f"📝 Parameter      : {json.dumps(function_args, indent=2, ensure_ascii=False)}")
+        # Putaran terakhir (== max_tool_rounds) dikirim tanpa tools agar LLM
+        # wajib menjawab dengan teks.
+        for putaran in range(putaran + 1, max_tool_rounds + 1) if langsung is None else ():
+            pakai_tools = putaran < max_tool_rounds
+            content_parts = []
+            tool_calls = []
 
-            # ── Step 3: Eksekusi function ──
-            if function_name in available_functions:
+            # ── Step 1/5: Kirim ke Ollama (stream) ──
+            with tracing.span("ollama.chat", putaran=putaran, tools=pakai_tools, messages=len(messages)) as sp:
                 try:
-                    function_to_call = available_functions[function_name]
-                    result = function_to_call(**function_args)
+                    stream = ollama_client.chat(
+                        model=model,
+                        messages=messages,
+                        tools=tools_dipakai if pakai_tools else None,
+                        stream=True,
+                        # Putaran lanjutan didahulukan agar request yang sudah berjalan cepat selesai
+                        prioritas=llm_queue.PRIORITAS_LANJUTAN if putaran else llm_queue.PRIORITAS_BARU,
+                    )
+                    for chunk in stream:
+                        message = chunk["message"]
+                        if message.get("tool_calls"):
+                            tool_calls.extend(message["tool_calls"])
+                        if chunk.get("done"):
+                            _catat_statistik_ollama(sp, chunk)
+                        token = message.get("content") or ""
+                        if token:
+                            if not content_parts:
+                                sp.set(ttft_ms=round(sp.duration_ms, 3))
+                            content_parts.append(token)
+                            answer_parts.append(token)
+                            yield token
+                    sp.set(tool_calls=len(tool_calls))
+                except Exception as e:
+                    if putaran == 0:
+                        error_msg = f"❌ Gagal menghubungi Ollama: {str(e)}"
+                    else:
+                        error_msg = f"❌ Gagal mendapatkan response final: {str(e)}"
+                    sp.fail(str(e))
+                    logger.error(error_msg)
+                    gagal = True
+                    answer_parts.append(error_msg)
+                    yield error_msg
+                    break
 
-                    result_json = json.dumps(result, indent=2, default=str, ensure_ascii=False)
-                    print(f"📊 Hasil query    :")
-                    print(result_json)
+            # ── Step 2: Tidak ada tool call → jawaban sudah selesai di-stream ──
+            if not tool_calls:
+                break
 
-                    # ── Step 4: Kirim hasil ke LLM ──
-                    messages.append({
-                        "role": "tool",
-                        "content": result_json
-                    })
+            # ── Cache tingkat 2: tool call sama + pertanyaan mirip → lewati tool & LLM ──
+            if putaran == 0 and not content_parts:
+                tool_calls_awal = list(tool_calls)
+                with tracing.span("response_cache.cari", tingkat=2) as sp:
+                    tersimpan = jawaban_cache.cari_dengan_tool(user_message, chat_history, model, tool_calls)
+                    sp.set(hit=tersimpan is not None)
+                if tersimpan is not None:
+                    sumber_cache = "semantik"
+                    answer_parts.append(tersimpan)
+                    yield tersimpan
+                    break
+            semua_tool_calls.extend(tool_calls)
 
-                except Exception as e:
-                    error_msg = f"Error menjalankan {function_name}: {str(e)}"
-                    print(f"❌ {error_msg}")
-                    messages.append({
-                        "role": "tool",
-                        "content": json.dumps({"error": error_msg})
-                    })
-            else:
-                print(f"❌ Function '{function_name}' tidak ditemukan!")
+            # Tambahkan response LLM ke history
+            messages.append({
+                "role": "assistant",
+                "content": "".join(content_parts),
+                "tool_calls": tool_calls
+            })
+
+            # ── Step 3: Eksekusi semua function (paralel jika lebih dari satu) ──
+            results = _jalankan_tool_calls(tool_calls)
+            jumlah_tool += len(results)
+
+            # ── Step 4: Kirim hasil ke LLM (urutan sama dengan tool_calls) ──
+            for result_json in results:
                 messages.append({
                     "role": "tool",
-                    "content": json.dumps({"error": f"Function {function_name} tidak tersedia"})
+                    "content": result_json
                 })
 
-        # ── Step 5: Dapatkan jawaban final dari LLM ──
-        try:
-            final_response = ollama_client.chat(
-                model=model,
-                messages=messages
-            )
-            answer = final_response["message"]["content"]
-        except Exception as e:
-            answer = f"❌ Gagal mendapatkan response final: {str(e)}"
-
-    else:
-        # Jika tidak perlu tool, langsung ambil jawaban
-        answer = response["message"]["content"]
-
-    print(f"\n💬 Jawaban:")
-    print(answer)
-    print(f"{'='*60}\n")
-
-    return answer
\ No newline at end of file
+        jawaban_chars = sum(map(len, answer_parts))
+        root.set(putaran=putaran + 1, tool_calls=jumlah_tool, answer_chars=jawaban_chars, cache=sumber_cache or "miss")
+        if sumber_cache is None and langsung is None and not gagal:
+            with tracing.span("response_cache.simpan"):
+                jawaban_cache.simpan(
+                    user_message, chat_history, model,
+                    tool_calls_awal, semua_tool_calls, "".join(answer_parts),
+                )
+        logger.info(
+            "💬 Jawaban %d karakter, %d putaran, %d tool, %.0f ms%s%s",
+            jawaban_chars, putaran + 1, jumlah_tool, (time.perf_counter() - t_mulai) * 1000,
+            f" (cache {sumber_cache})" if sumber_cache else "",
+            f" (trace {root.trace.trace_id})" if root.trace is not None else "",
+        )
+        if disampel:
+            logger.info("💬 Jawaban: %s", "".join(answer_parts))
@@ -1,10 +1,14 @@
 from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
-from typing import Optional
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
 import asyncio
+import contextvars
 import os
 import logging
+import threading
 
 # Pydantic models dari package models/
 from models.requests import (
@@ -18,17 +22,64 @@ from models.requests import (
     StatistikWaktuRequest,
     LaporanKepsekRequest,
     LaporanGuruHarianRequest,
+    SuratPeringatanBatchRequest,
+    JobRequest,
+    CacheInvalidateRequest,
 )
 from models.responses import QueryResponse
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from models.websocket import WSIncomingMessage, WSMessageType, WSOutgoingMessage
+from session_store import id_valid, sessions
+import job_queue
+from job_queue import jobs
+from output_cache import OUTPUT_DIR, output_cache
+from tool_cache import tool_cache
+import tracing
+from logging_setup import setup_logging
+
+# Configure logging (QueueHandler, lihat logging_setup.py)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+async def _bersihkan_sesi():
+    """Hapus sesi chat yang kedaluwarsa, job lama, dan file output lama secara berkala"""
+    while True:
+        await asyncio.sleep(600)
+        try:
+            await asyncio.to_thread(sessions.bersihkan)
+            if jobs.aktif:
+                await asyncio.to_thread(jobs.bersihkan)
+            await asyncio.to_thread(output_cache.bersihkan)
+        except Exception as e:
+            logger.warning(f"Pembersihan sesi gagal: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Muat model Ollama di background agar pertanyaan pertama tidak menunggu load model
+    if BACKEND_READY:
+        llm_client.client.warm_up_background()
+    # Worker render PDF; notifikasi selesai diteruskan ke WebSocket pemilik job
+    if BACKEND_READY and job_queue.JOB_QUEUE_ENABLED:
+        loop = asyncio.get_running_loop()
+        jobs.on_selesai(
+            lambda job: asyncio.run_coroutine_threadsafe(_kirim_notifikasi_job(job), loop),
+            terhubung=lambda pemilik: pemilik in _ws_clients,
+        )
+        await asyncio.to_thread(jobs.start)
+    pembersih = asyncio.create_task(_bersihkan_sesi())
+    yield
+    pembersih.cancel()
+    await asyncio.to_thread(jobs.stop)
+    # Tutup pool async saat server berhenti
+    if BACKEND_READY and ASYNC_DB_READY:
+        await db_async.close_pool()
+
+
 app = FastAPI(
     title="Sistem Absensi Sekolah API",
     description="API untuk mengakses agent AI absensi",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS to allow React frontend
@@ -38,12 +89,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Vercel-AI-Data-Stream"],
+    expose_headers=["X-Vercel-AI-Data-Stream", "X-Session-Id"],
 )
 
 # Import your existing functions
 try:
-    from agent import run_agent, run_agent_with_history
+    from agent import jawaban_cache, konteks, pemilih_tool, router, run_agent, stream_agent_with_history
     from db_functions import (
         cari_siswa,
         get_absensi_by_siswa,
@@ -56,12 +107,121 @@ try:
         get_statistik_waktu_absen,
         get_laporan_kepsek_range,
         get_laporan_guru_harian,
+        buat_surat_peringatan_alfa_batch,
         get_daftar_kelas,
+        get_pool_stats,
+        invalidate_school_settings,
     )
+    import db_async
+    import llm_client
+    import llm_queue
+    from config import OLLAMA_MODEL
+    ASYNC_DB_READY = db_async.ASYNC_DB_AVAILABLE
     BACKEND_READY = True
 except ImportError as e:
     logger.warning(f"Backend modules not available: {e}")
     BACKEND_READY = False
+    ASYNC_DB_READY = False
+
+if BACKEND_READY and not ASYNC_DB_READY:
+    logger.info("aiomysql tidak tersedia, endpoint dashboard memakai thread pool")
+
+
+async def _run_db(async_func, sync_func, *args):
+    """
+    Jalankan query dashboard: langsung di event loop via aiomysql jika tersedia,
+    jika tidak fallback ke versi sync di thread pool.
+    """
+    if ASYNC_DB_READY:
+        return await async_func(*args)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(None, sync_func, *args)
+
+
+def _tolak_antrian(e: "llm_queue.QueueFullError") -> HTTPException:
+    """Antrian LLM penuh → 429 dengan Retry-After"""
+    return HTTPException(
+        status_code=429,
+        detail=f"{e} — server sedang sibuk, coba lagi dalam {e.retry_after} detik",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+class _StreamDenganIzin(StreamingResponse):
+    """
+    StreamingResponse yang selalu melepas izin antrian LLM saat response
+    berakhir — juga jika body iterator tidak pernah dimulai (client putus
+    sebelum byte pertama, error saat mengirim header).
+    """
+
+    def __init__(self, content, izin: "llm_queue.Izin", **kwargs):
+        super().__init__(content, **kwargs)
+        self.izin = izin
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.izin.lepas()
+
+
+async def _stream_agent(*args, izin: "llm_queue.Izin" = None, pemilik: Optional[str] = None):
+    """
+    Jalankan stream_agent_with_history di thread terpisah dan teruskan
+    tokennya ke event loop lewat asyncio.Queue (tanpa memblokir loop).
+    Jika client putus, thread berhenti di token berikutnya.
+    Thread diambil dari llm_queue.chat_executor (lane chat), bukan thread pool
+    default milik endpoint laporan. `izin` = hasil admit() request ini; dilepas
+    begitu stream selesai (pemanggil tetap wajib melepasnya juga, untuk kasus
+    stream tidak pernah dimulai). `pemilik` = penerima notifikasi job PDF yang
+    dibuat selama pertanyaan ini.
+    """
+    loop = asyncio.get_event_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    batal = threading.Event()
+    selesai = object()
+
+    def produce():
+        job_queue.pemilik.set(pemilik)
+        gen = stream_agent_with_history(*args)
+        try:
+            for token in gen:
+                if batal.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, token)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            gen.close()
+            loop.call_soon_threadsafe(queue.put_nowait, selesai)
+
+    try:
+        # copy_context: pemilik job hanya berlaku untuk pertanyaan ini, tidak menempel di thread pool
+        loop.run_in_executor(llm_queue.chat_executor, contextvars.copy_context().run, produce)
+        while True:
+            item = await queue.get()
+            if item is selesai:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        batal.set()
+        if izin is not None:
+            izin.lepas()
+
+
+async def _catat_sesi(gen, session_id: Optional[str], pertanyaan: str):
+    """Teruskan token dan simpan giliran ke sesi setelah jawaban selesai utuh"""
+    parts = []
+    async for token in gen:
+        parts.append(token)
+        yield token
+    jawaban = "".join(parts)
+    # Jawaban error tidak disimpan agar tidak ikut jadi konteks giliran berikutnya
+    if session_id and jawaban and not jawaban.startswith("❌"):
+        sessions.tambah(session_id, pertanyaan, jawaban)
+
 
 @app.get("/")
 def read_root():
@@ -80,6 +240,10 @@ async def chat_ai_sdk(request: Request):
     try:
         data = await request.json()
         messages = data.get("messages", [])
+        # AI SDK useChat mengirim "id" percakapan; client lain bisa memakai "session_id"
+        session_id = data.get("session_id") or data.get("id")
+        if session_id and not id_valid(session_id):
+            raise HTTPException(status_code=400, detail="session_id tidak valid")
 
         # Extract last user message (support both AI SDK v4 and v5 formats)
         last_message = ""
@@ -98,8 +262,15 @@ async def chat_ai_sdk(request: Request):
         if not last_message:
             raise HTTPException(status_code=400, detail="No user message found")
 
+        session = sessions.get(session_id) if session_id else None
+        if session is not None:
+            # Sesi server: riwayat dari store, client cukup mengirim pesan terbaru
+            chat_history = sessions.history(session_id)
+            messages = []
+        else:
+            chat_history = []
+
         # Build chat history from previous messages (exclude the last user message)
-        chat_history = []
         for msg in messages:
             role = msg.get("role", "")
             if role not in ("user", "assistant"):
@@ -116,25 +287,28 @@ async def chat_ai_sdk(request: Request):
                 chat_history.append({"role": role, "content": content})
         
         # Remove the last user message from history (it will be passed separately)
-        if chat_history and chat_history[-1]["role"] == "user":
+        if messages and chat_history and chat_history[-1]["role"] == "user":
             chat_history = chat_history[:-1]
 
-        logger.info(f"AI SDK chat request: {last_message[:100]}... (history: {len(chat_history)} msgs)")
+        if session_id and session is None:
+            # Sesi baru: isi dengan riwayat yang (masih) dikirim client
+            sessions.mulai(session_id, chat_history)
 
-        # Run agent with history in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None, run_agent_with_history, last_message, chat_history
-        )
+        logger.info(f"AI SDK chat request: {last_message[:100]}... (history: {len(chat_history)} msgs)")
 
-        # Return as plain text stream (for TextStreamChatTransport)
-        async def generate():
-            yield result
+        # Admission control: tolak cepat (429) jika antrian model sudah penuh
+        izin = llm_queue.gate(OLLAMA_MODEL).admit()
 
-        return StreamingResponse(
-            generate(),
+        # Stream token dari agent begitu diterima (for TextStreamChatTransport)
+        return _StreamDenganIzin(
+            _catat_sesi(_stream_agent(last_message, chat_history, izin=izin, pemilik=session_id), session_id, last_message),
+            izin=izin,
             media_type="text/plain",
+            headers={"X-Session-Id": session_id} if session_id else None,
         )
+    except llm_queue.QueueFullError as e:
+        logger.warning(f"AI SDK chat ditolak: {e}")
+        raise _tolak_antrian(e)
     except HTTPException:
         raise
     except Exception as e:
@@ -142,14 +316,20 @@ async def chat_ai_sdk(request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/chat", response_model=QueryResponse)
-def chat_endpoint(request: QueryRequest):
+async def chat_endpoint(request: QueryRequest):
     """
     Endpoint utama untuk mengirim pertanyaan ke AI Agent.
     """
     try:
-        # Panggil fungsi run_agent
-        jawaban = run_agent(request.query, request.model)
+        # Panggil fungsi run_agent di lane chat (lihat llm_queue.py)
+        with llm_queue.gate(request.model or OLLAMA_MODEL).tiket():
+            loop = asyncio.get_event_loop()
+            jawaban = await loop.run_in_executor(
+                llm_queue.chat_executor, run_agent, request.query, request.model
+            )
         return QueryResponse(answer=jawaban)
+    except llm_queue.QueueFullError as e:
+        raise _tolak_antrian(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -161,10 +341,8 @@ async def get_attendance_trends_api(request: AttendanceTrendsRequest):
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        # Run in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        result = await _run_db(
+            db_async.get_attendance_trends,
             get_attendance_trends,
             request.siswa_id,
             request.nama_siswa,
@@ -184,10 +362,8 @@ async def get_geolocation_analysis_api(request: GeolocationAnalysisRequest):
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        # Run in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        result = await _run_db(
+            db_async.get_geolocation_analysis,
             get_geolocation_analysis,
             request.kelas_id,
             request.nama_kelas,
@@ -205,10 +381,8 @@ async def compare_class_attendance_api(request: ClassComparisonRequest):
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        # Run in thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        result = await _run_db(
+            db_async.compare_class_attendance,
             compare_class_attendance,
             request.tingkat,
             request.jurusan
@@ -225,9 +399,8 @@ async def get_anomali_absensi_api(request: AnomaliAbsensiRequest):
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        result = await _run_db(
+            db_async.get_anomali_absensi,
             get_anomali_absensi,
             request.kelas_id,
             request.nama_kelas,
@@ -246,9 +419,8 @@ async def get_analisis_metode_api(request: AnalisisMetodeAbsenRequest):
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        result = await _run_db(
+            db_async.get_analisis_metode_absen,
             get_analisis_metode_absen,
             request.kelas_id,
             request.nama_kelas,
@@ -267,9 +439,8 @@ async def get_top_siswa_api(request: TopSiswaRequest):
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        result = await _run_db(
+            db_async.get_top_siswa_absensi,
             get_top_siswa_absensi,
             request.kelas_id,
             request.nama_kelas,
@@ -292,8 +463,7 @@ async def search_students_api(name: str):
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, cari_siswa, name)
+        result = await _run_db(db_async.cari_siswa, cari_siswa, name)
         return result
     except Exception as e:
         logger.error(f"Student search error: {e}")
@@ -306,9 +476,8 @@ async def get_student_attendance_api(student_id: int, start_date: str = None, en
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        result = await _run_db(
+            db_async.get_absensi_by_siswa,
             get_absensi_by_siswa,
             student_id,
             None,
@@ -327,9 +496,8 @@ async def get_statistik_waktu_api(request: StatistikWaktuRequest):
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        result = await _run_db(
+            db_async.get_statistik_waktu_absen,
             get_statistik_waktu_absen,
             request.kelas_id,
             request.nama_kelas,
@@ -350,9 +518,8 @@ async def get_laporan_kepsek_api(request: LaporanKepsekRequest):
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        result = await _run_db(
+            db_async.get_laporan_kepsek_range,
             get_laporan_kepsek_range,
             request.tanggal_mulai,
             request.tanggal_akhir,
@@ -372,9 +539,8 @@ async def get_laporan_guru_harian_api(request: LaporanGuruHarianRequest):
         raise HTTPException(status_code=503, detail="Backend services not available")
 
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None,
+        result = await _run_db(
+            db_async.get_laporan_guru_harian,
             get_laporan_guru_harian,
             request.kelas_id,
             request.nama_kelas,
@@ -385,20 +551,176 @@ async def get_laporan_guru_harian_api(request: LaporanGuruHarianRequest):
         logger.error(f"Laporan guru harian error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/surat/peringatan/batch")
+async def buat_surat_peringatan_batch_api(request: SuratPeringatanBatchRequest):
+    """Surat peringatan alfa untuk semua siswa yang memenuhi ambang (PDF gabungan / per siswa + manifest)"""
+    if not BACKEND_READY:
+        raise HTTPException(status_code=503, detail="Backend services not available")
+
+    if jobs.aktif:
+        job = jobs.kirim("buat_surat_peringatan_alfa_batch", request.model_dump())
+        return JSONResponse(_ringkas_job(job), status_code=202)
+
+    try:
+        # Tanpa worker job: query + render PDF (process pool) di thread terpisah
+        result = await asyncio.to_thread(buat_surat_peringatan_alfa_batch, **request.model_dump())
+    except Exception as e:
+        logger.error(f"Surat peringatan batch error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+    return result
+
+# ── Job background (render PDF) ──
+
+# client_id → (websocket, mode stream) untuk notifikasi job
+_ws_clients: Dict[str, Tuple[WebSocket, bool]] = {}
+
+
+def _ringkas_job(job: dict) -> dict:
+    """Job untuk response API: tanpa payload mentah, dengan link unduhan jika selesai"""
+    hasil = job.get("hasil") or {}
+    download = [
+        f"/download/{os.path.basename(hasil[key])}" for key in ("file", "manifest") if hasil.get(key)
+    ]
+    return {
+        "id": job["id"],
+        "jenis": job["jenis"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "hasil": job["hasil"],
+        "download": download,
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+    }
+
+
+async def _kirim_notifikasi_job(job: dict):
+    """Kirim status akhir job ke WebSocket pemiliknya (jika masih terhubung)"""
+    websocket, stream = _ws_clients.get(job["pemilik"], (None, False))
+    if websocket is None:
+        return
+    ringkas = _ringkas_job(job)
+    if job["status"] == job_queue.SELESAI:
+        pesan = "✅ PDF selesai dibuat: " + ", ".join(ringkas["download"] or ["(tanpa file)"])
+    else:
+        pesan = f"❌ Pembuatan PDF gagal: {job['error']}"
+    try:
+        if stream:
+            keluar = WSOutgoingMessage(type=WSMessageType.JOB, content=pesan, data=ringkas)
+            await websocket.send_text(keluar.model_dump_json())
+        else:
+            await websocket.send_text(pesan)
+    except Exception as e:
+        logger.warning(f"Notifikasi job {job['id']} gagal dikirim: {e}")
+
+
+@app.post("/jobs", status_code=202)
+def create_job_api(request: JobRequest):
+    """Antrikan render PDF (tool buat_laporan_alfa / buat_surat_peringatan_alfa[_batch])"""
+    try:
+        job = jobs.kirim(request.jenis, request.args, pemilik_job=request.pemilik)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _ringkas_job(job)
+
+
+@app.get("/jobs")
+def list_jobs_api(pemilik: Optional[str] = None, limit: int = 50):
+    """Job terbaru, opsional milik satu client_id / session_id"""
+    return {"jobs": [_ringkas_job(job) for job in jobs.daftar(pemilik, min(limit, 200))]}
+
+
+@app.get("/jobs/{job_id}")
+def get_job_api(job_id: str):
+    """Status job: antri / proses / selesai / gagal (+ link unduhan jika selesai)"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job tidak ditemukan")
+    return _ringkas_job(job)
+
+
+@app.get("/jobs/{job_id}/download")
+async def download_job_api(job_id: str, request: Request, tunggu: float = 60):
+    """
+    Unduh file hasil job; jika job belum selesai, request ditahan sampai selesai (maks `tunggu` detik).
+    Client bisa langsung meminta unduhan setelah menerima job_id tanpa polling /jobs/{id}.
+    Timeout → 202 berisi status job.
+    """
+    batas = asyncio.get_running_loop().time() + max(0.0, min(tunggu, 600))
+    while True:
+        job = await asyncio.to_thread(jobs.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job tidak ditemukan")
+        if job["status"] == job_queue.GAGAL:
+            error = job["error"] or (job.get("hasil") or {}).get("error")
+            raise HTTPException(status_code=409, detail=f"Job gagal: {error}")
+        if job["status"] == job_queue.SELESAI:
+            break
+        if asyncio.get_running_loop().time() >= batas:
+            return JSONResponse(_ringkas_job(job), status_code=202)
+        await asyncio.sleep(0.5)
+    hasil = job.get("hasil") or {}
+    path = hasil.get("file") or hasil.get("manifest")
+    if not path:
+        raise HTTPException(status_code=404, detail=hasil.get("pesan") or "Job tidak menghasilkan file")
+    return await asyncio.to_thread(download_file, os.path.basename(path), request)
+
+
 @app.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str):
+async def websocket_endpoint(websocket: WebSocket, client_id: str, stream: bool = False):
+    """
+    WebSocket chat. Default: satu pesan teks berisi jawaban utuh.
+    Dengan ?stream=true setiap token dikirim sebagai WSOutgoingMessage JSON
+    (is_final=false), ditutup pesan is_final=true berisi jawaban lengkap.
+    """
     await websocket.accept()
+    _ws_clients[client_id] = (websocket, stream)
     try:
         await websocket.send_text(f"Connected to EduAttendAI as {client_id}")
         while True:
             data = await websocket.receive_text()
-            
+
+            # Pesan JSON (WSIncomingMessage) boleh membawa session_id; teks biasa → sesi = client_id
+            pesan_masuk, session_id = data, client_id
+            if data.lstrip().startswith("{"):
+                try:
+                    masuk = WSIncomingMessage.model_validate_json(data)
+                    pesan_masuk, session_id = masuk.content, masuk.session_id or client_id
+                except ValueError:
+                    pass
+
             # Proses pesan menggunakan AI Agent
             if BACKEND_READY:
-                # Gunakan executor agar tidak memblokir event loop async
-                loop = asyncio.get_event_loop()
-                response = await loop.run_in_executor(None, run_agent, data)
-                await websocket.send_text(response)
+                try:
+                    izin = llm_queue.gate(OLLAMA_MODEL).admit()
+                except llm_queue.QueueFullError as e:
+                    pesan = f"Server sedang sibuk, coba lagi dalam {e.retry_after} detik."
+                    if stream:
+                        sibuk = WSOutgoingMessage(type=WSMessageType.ERROR, content=pesan, error="queue_full")
+                        await websocket.send_text(sibuk.model_dump_json())
+                    else:
+                        await websocket.send_text(pesan)
+                    continue
+
+                parts = []
+                try:
+                    history = sessions.history(session_id)
+                    agen = _stream_agent(pesan_masuk, history, izin=izin, pemilik=client_id)
+                    async for token in _catat_sesi(agen, session_id, pesan_masuk):
+                        parts.append(token)
+                        if stream:
+                            chunk = WSOutgoingMessage(type=WSMessageType.CHAT, content=token, is_final=False)
+                            await websocket.send_text(chunk.model_dump_json())
+                finally:
+                    izin.lepas()
+                response = "".join(parts)
+                if stream:
+                    final = WSOutgoingMessage(type=WSMessageType.CHAT, content=response, is_final=True)
+                    await websocket.send_text(final.model_dump_json())
+                else:
+                    await websocket.send_text(response)
             else:
                 await websocket.send_text("Maaf, layanan backend AI sedang tidak tersedia.")
                 
@@ -410,6 +732,9 @@ async def websocket_endpoint(websocket: WebSocket, client_id: str):
             await websocket.send_text(f"Error: {str(e)}")
         except:
             pass
+    finally:
+        if _ws_clients.get(client_id, (None,))[0] is websocket:
+            del _ws_clients[client_id]
 
 
 # ── Lookup endpoints ──
@@ -420,37 +745,142 @@ async def get_kelas_list_api():
     if not BACKEND_READY:
         raise HTTPException(status_code=503, detail="Backend services not available")
     try:
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(None, get_daftar_kelas)
+        result = await _run_db(db_async.get_daftar_kelas, get_daftar_kelas)
         return result
     except Exception as e:
         logger.error(f"Kelas list error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ── Sesi chat ──
+
+@app.get("/api/sessions/{session_id}")
+def get_session_api(session_id: str):
+    """Riwayat percakapan satu sesi"""
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Sesi tidak ditemukan")
+    return session
+
+
+@app.delete("/api/sessions/{session_id}")
+def delete_session_api(session_id: str):
+    """Hapus sesi (mulai percakapan baru)"""
+    if not sessions.hapus(session_id):
+        raise HTTPException(status_code=404, detail="Sesi tidak ditemukan")
+    return {"deleted": session_id}
+
+
+# ── Cache hasil query ──
+
+@app.get("/api/cache/stats")
+def get_cache_stats_api():
+    """Statistik cache hasil query (hit/miss, jumlah entry, eviction)"""
+    return tool_cache.stats()
+
+
+@app.post("/api/cache/invalidate")
+def invalidate_cache_api(request: CacheInvalidateRequest):
+    """Hapus entry cache, mis. setelah koreksi absensi tanggal tertentu"""
+    removed = tool_cache.invalidate(fungsi=request.fungsi, tanggal=request.tanggal)
+    if BACKEND_READY:
+        # Jawaban agent yang scope-nya mencakup tanggal tsb. ikut dibuang
+        removed += jawaban_cache.invalidate(tanggal=request.tanggal)
+        if request.fungsi in (None, "get_school_settings") and not request.tanggal:
+            invalidate_school_settings()
+    return {"removed": removed, **tool_cache.stats()}
+
+
+# ── Metrics (Prometheus) ──
+
+def _gauge(nama: str, stats: dict) -> list:
+    return [
+        f"{nama}_{key} {value}" for key, value in stats.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    ]
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_api():
+    """Durasi span agent (prompt, antrian & panggilan Ollama, tool, serialisasi), token, cache, pool DB, antrian LLM"""
+    baris = _gauge("tool_cache", tool_cache.stats())
+    baris += _gauge("session_store", sessions.stats())
+    baris += _gauge("output_cache", output_cache.stats())
+    if jobs.aktif:
+        baris += _gauge("job_queue", jobs.stats())
+    if BACKEND_READY:
+        baris += _gauge("db_pool", get_pool_stats())
+        baris += _gauge("response_cache", jawaban_cache.stats())
+        baris += _gauge("intent_router", router.stats())
+        baris += _gauge("tool_selection", pemilih_tool.stats())
+        baris += _gauge("history_summary", konteks.stats())
+        for model, stats in llm_queue.stats().items():
+            baris += [f'llm_queue_{key}{{model="{model}"}} {value}' for key, value in stats.items()]
+    return PlainTextResponse(
+        tracing.metrics.render() + "\n".join(baris) + "\n",
+        media_type="text/plain; version=0.0.4",
+    )
+
+
 # ── File download endpoint for generated PDFs ──
-OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
 
 @app.get("/files")
 def list_files():
-    """List available files in the output directory."""
-    if not os.path.exists(OUTPUT_DIR):
-        return {"files": []}
-    files = [f for f in os.listdir(OUTPUT_DIR) if os.path.isfile(os.path.join(OUTPUT_DIR, f))]
-    return {"files": files}
+    """List available files in the output directory (terbaru dulu, dari index output_cache)."""
+    return {"files": [f["nama"] for f in output_cache.daftar()]}
+
+_MEDIA_TYPE = {".pdf": "application/pdf", ".json": "application/json"}
+
+
+def _etag(st: os.stat_result) -> str:
+    # File hanya pernah diganti lewat os.replace → inode baru, jadi inode + ukuran menandai isi.
+    return f'"{st.st_ino:x}-{st.st_size:x}"'
+
+
+def _belum_berubah(st: os.stat_result, if_modified_since: str) -> bool:
+    """If-Modified-Since ≥ mtime file (output_cache.cari tidak mengubah mtime, hanya atime)"""
+    try:
+        sejak = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if sejak.tzinfo is None:
+        return False
+    return int(st.st_mtime) <= sejak.timestamp()
+
 
 @app.get("/download/{filename}")
-def download_file(filename: str):
-    """Download a generated file (PDF, etc.) from the output directory."""
+def download_file(filename: str, request: Request):
+    """
+    Download a generated file (PDF, etc.) from the output directory.
+    ETag + If-None-Match (atau Last-Modified + If-Modified-Since) → 304 tanpa isi;
+    header Range didukung FileResponse (resume / PDF viewer).
+    """
     # Sanitize: prevent path traversal
     safe_name = os.path.basename(filename)
     filepath = os.path.join(OUTPUT_DIR, safe_name)
-    if not os.path.exists(filepath):
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail=f"File '{safe_name}' not found")
+    etag = _etag(st)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since diabaikan jika ada If-None-Match (RFC 9110 §13.1.3)
+        if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+    elif _belum_berubah(st, request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
     return FileResponse(
         path=filepath,
         filename=safe_name,
-        media_type="application/octet-stream",
+        media_type=_MEDIA_TYPE.get(os.path.splitext(safe_name)[1].lower(), "application/octet-stream"),
+        headers=headers,
+        stat_result=st,
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,431 @@
+# benchmarks/bench_agent.py
+# Benchmark end-to-end agent (in-process, POST /api/chat, WebSocket) dengan Ollama palsu
+#
+# Latency dipecah per fase dari dalam proses server:
+#   LLM 1       : panggilan Ollama pertama (sampai tool call diterima)
+#   Tool        : eksekusi fungsi db_functions
+#   Serialisasi : json.dumps hasil tool (_jalankan_tool dikurangi waktu fungsi)
+#   LLM 2       : panggilan Ollama berikutnya (jawaban final di-stream)
+#   Overhead    : sisa waktu di dalam agent (print, susun pesan, dll.)
+# Waktu model konstan (diatur di fake_ollama.py), jadi perubahan angka di luar
+# LLM 1/LLM 2 adalah overhead server kita sendiri.
+# Intent router dimatikan secara default (--with-router untuk mengaktifkan);
+# request yang di-route dilaporkan terpisah, tidak masuk histogram fase LLM.
+#
+# Contoh:
+#   python benchmarks/bench_agent.py --database smk_bench_1
+#   python benchmarks/bench_agent.py --database smk_bench_1 --mode api,ws --concurrency 1,10,50,100,200
+#   python benchmarks/bench_agent.py --database smk_bench_1 --think-ms 0 --token-rate 0 --report agent.md
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from bench_db_functions import _persentil
+from fake_ollama import SKENARIO
+
+FASE = ("llm1", "tool", "serialisasi", "llm2", "overhead")
+
+
+def _log(pesan: str):
+    """Progress benchmark (selalu ke stdout asli)"""
+    print(pesan, file=sys.__stdout__, flush=True)
+
+
+def _ms(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000
+
+
+# ============================================
+# INSTRUMENTASI AGENT (per request, via thread-local)
+# ============================================
+# Satu request agent berjalan di satu thread (worker in-process atau thread
+# produce() milik api._stream_agent), dan fake_ollama hanya mengirim satu
+# tool call per putaran sehingga tool dieksekusi inline di thread yang sama.
+
+_lokal = threading.local()
+_catatan = []
+_catatan_lock = threading.Lock()
+
+
+def pasang_instrumentasi(agent):
+    """Bungkus stream_agent_with_history, ollama_client.chat, _jalankan_tool, router.route dan available_functions"""
+    asli_stream = agent.stream_agent_with_history
+    asli_chat = agent.ollama_client.chat
+    asli_tool = agent._jalankan_tool
+    asli_route = agent.router.route
+
+    def stream_terukur(*args, **kwargs):
+        rec = {
+            "llm1": 0.0, "llm2": 0.0, "tool": 0.0, "serialisasi": 0.0,
+            "llm_calls": 0, "tool_errors": 0, "routed": False,
+        }
+        _lokal.rec = rec
+        t0 = time.perf_counter()
+        try:
+            yield from asli_stream(*args, **kwargs)
+        finally:
+            rec["agent"] = _ms(t0)
+            rec["overhead"] = rec["agent"] - rec["llm1"] - rec["llm2"] - rec["tool"] - rec["serialisasi"]
+            _lokal.rec = None
+            with _catatan_lock:
+                _catatan.append(rec)
+
+    def chat_terukur(*args, **kwargs):
+        rec = getattr(_lokal, "rec", None)
+        t0 = time.perf_counter()
+        hasil = asli_chat(*args, **kwargs)
+
+        def catat():
+            if rec is not None:
+                rec["llm1" if rec["llm_calls"] == 0 else "llm2"] += _ms(t0)
+                rec["llm_calls"] += 1
+
+        if not kwargs.get("stream"):
+            catat()
+            return hasil
+
+        def iterasi():
+            try:
+                yield from hasil
+            finally:
+                catat()
+        return iterasi()
+
+    def tool_terukur(function_name, function_args):
+        rec = getattr(_lokal, "rec", None)
+        t0 = time.perf_counter()
+        hasil = asli_tool(function_name, function_args)
+        if rec is not None:
+            total = _ms(t0)
+            fungsi = rec.pop("_fungsi_ms", total)
+            rec["tool"] += fungsi
+            rec["serialisasi"] += total - fungsi
+            rec["tool_errors"] += '"error"' in hasil[:200]
+        return hasil
+
+    def route_terukur(*args, **kwargs):
+        rute = asli_route(*args, **kwargs)
+        rec = getattr(_lokal, "rec", None)
+        if rec is not None and rute is not None:
+            rec["routed"] = True
+        return rute
+
+    def bungkus_fungsi(func):
+        def fungsi_terukur(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                rec = getattr(_lokal, "rec", None)
+                if rec is not None:
+                    rec["_fungsi_ms"] = _ms(t0)
+        return fungsi_terukur
+
+    agent.stream_agent_with_history = stream_terukur
+    agent.ollama_client.chat = chat_terukur
+    agent._jalankan_tool = tool_terukur
+    agent.router.route = route_terukur
+    for name, func in list(agent.available_functions.items()):
+        agent.available_functions[name] = bungkus_fungsi(func)
+
+
+def ambil_catatan():
+    with _catatan_lock:
+        hasil = list(_catatan)
+        _catatan.clear()
+    return hasil
+
+
+# ============================================
+# CLIENT PER MODE
+# ============================================
+
+def _pertanyaan(i: int) -> str:
+    return SKENARIO[i % len(SKENARIO)][0]
+
+
+def _sampel(t0: float, t_token, jawaban: str):
+    return {
+        "e2e": _ms(t0),
+        "ttft": (t_token - t0) * 1000 if t_token else None,
+        "error": not jawaban or "❌" in jawaban,
+    }
+
+
+def jalankan_inprocess(agent, concurrency: int, jumlah: int):
+    def satu(i):
+        t0, t_token, parts = time.perf_counter(), None, []
+        try:
+            for token in agent.stream_agent_with_history(_pertanyaan(i)):
+                if t_token is None:
+                    t_token = time.perf_counter()
+                parts.append(token)
+        except Exception:
+            parts = []
+        return _sampel(t0, t_token, "".join(parts))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(satu, range(jumlah)))
+
+
+async def _jalankan_api(base_url: str, concurrency: int, jumlah: int):
+    import httpx
+
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        async def satu(i):
+            async with sem:
+                t0, t_token, parts = time.perf_counter(), None, []
+                body = {"messages": [{"role": "user", "content": _pertanyaan(i)}]}
+                try:
+                    async with client.stream("POST", "/api/chat", json=body) as resp:
+                        async for teks in resp.aiter_text():
+                            if teks and t_token is None:
+                                t_token = time.perf_counter()
+                            parts.append(teks)
+                        if resp.status_code != 200:
+                            parts = []
+                except Exception:
+                    parts = []
+                return _sampel(t0, t_token, "".join(parts))
+
+        return await asyncio.gather(*(satu(i) for i in range(jumlah)))
+
+
+async def _jalankan_ws(ws_url: str, concurrency: int, jumlah: int):
+    import websockets
+
+    antrian = asyncio.Queue()
+    for i in range(jumlah):
+        antrian.put_nowait(i)
+    sampel = []
+
+    async def koneksi(n):
+        async with websockets.connect(f"{ws_url}/ws/bench-{n}?stream=true", max_size=None) as ws:
+            await ws.recv()  # salam "Connected to ..."
+            while not antrian.empty():
+                i = antrian.get_nowait()
+                t0, t_token, jawaban = time.perf_counter(), None, ""
+                try:
+                    await ws.send(_pertanyaan(i))
+                    while True:
+                        pesan = json.loads(await ws.recv())
+                        if pesan.get("is_final"):
+                            jawaban = pesan.get("content", "")
+                            break
+                        if t_token is None:
+                            t_token = time.perf_counter()
+                except Exception:
+                    jawaban = ""
+                sampel.append(_sampel(t0, t_token, jawaban))
+
+    await asyncio.gather(*(koneksi(n) for n in range(min(concurrency, jumlah))))
+    return sampel
+
+
+# ============================================
+# SERVER (fake Ollama + api.py)
+# ============================================
+
+def _tunggu(url: str, timeout: float = 30):
+    import httpx
+
+    batas = time.monotonic() + timeout
+    while time.monotonic() < batas:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server tidak merespons: {url}")
+
+
+def mulai_fake_ollama(args):
+    cmd = [
+        sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_ollama.py"),
+        "--port", str(args.fake_port),
+        "--think-ms", str(args.think_ms),
+        "--token-rate", str(args.token_rate),
+        "--answer-tokens", str(args.answer_tokens),
+    ]
+    if args.tool_think_ms is not None:
+        cmd += ["--tool-think-ms", str(args.tool_think_ms)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+    _tunggu(f"http://127.0.0.1:{args.fake_port}/api/version")
+    return proc
+
+
+def mulai_api(port: int):
+    """Jalankan api.app (uvicorn) di thread yang sama prosesnya dengan instrumentasi"""
+    import uvicorn
+    import api
+
+    server = uvicorn.Server(uvicorn.Config(api.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="bench-api", daemon=True).start()
+    _tunggu(f"http://127.0.0.1:{port}/")
+    return server
+
+
+# ============================================
+# LAPORAN
+# ============================================
+
+def ringkas(mode: str, concurrency: int, sampel, catatan, durasi: float):
+    e2e = [s["e2e"] for s in sampel]
+    ttft = [s["ttft"] for s in sampel if s["ttft"] is not None]
+    routed = [c for c in catatan if c["routed"]]
+    jalur_llm = [c for c in catatan if not c["routed"]]
+    hasil = {
+        "mode": mode,
+        "concurrency": concurrency,
+        "n": len(sampel),
+        "errors": sum(s["error"] for s in sampel),
+        "tool_errors": sum(c["tool_errors"] for c in catatan),
+        "rps": len(sampel) / durasi if durasi else 0,
+        "e2e": [_persentil(e2e, p) for p in (50, 95, 99)],
+        "ttft": [_persentil(ttft, p) for p in (50, 95)],
+        "routed": len(routed),
+        "routed_agent": [_persentil([c["agent"] for c in routed], p) for p in (50, 95)],
+    }
+    for fase in FASE:
+        nilai = [c[fase] for c in jalur_llm]
+        hasil[fase] = [_persentil(nilai, p) for p in (50, 95)]
+    # Antrian + transport: selisih rata-rata waktu di client dan waktu di dalam agent
+    if catatan and e2e:
+        hasil["antrian"] = sum(e2e) / len(e2e) - sum(c["agent"] for c in catatan) / len(catatan)
+    else:
+        hasil["antrian"] = 0.0
+    return hasil
+
+
+def susun_laporan(semua, args) -> str:
+    baris = [
+        "# Benchmark agent end-to-end",
+        "",
+        f"Fake Ollama: think {args.think_ms:.0f} ms, {args.token_rate:g} token/s, "
+        f"{args.answer_tokens} token jawaban. Cache tool: {'ya' if args.with_cache else 'tidak'}, "
+        f"cache jawaban: {'ya' if args.with_response_cache else 'tidak'}. "
+        f"Intent router: {'ya' if args.with_router else 'tidak'}.",
+        "",
+        "Semua angka dalam ms (p50 / p95). Antrian = rata-rata e2e − rata-rata waktu di dalam agent.",
+        "Kolom fase hanya dari request jalur LLM; Routed = jumlah request intent router (waktu agent p50 / p95).",
+        "",
+        "| Mode | C | Req | Err | Req/s | E2E p50/p95/p99 | TTFT | LLM 1 | Tool | Serialisasi | LLM 2 | Overhead | Routed | Antrian |",
+        "|---|---|---|---|---|---|---|---|---|---|---|---|---|---|",
+    ]
+
+    def pp(v):
+        return " / ".join(f"{x:.1f}" if x < 10 else f"{x:.0f}" for x in v)
+
+    for h in semua:
+        err = f"{h['errors']}" + (f" (+{h['tool_errors']} tool)" if h["tool_errors"] else "")
+        baris.append(
+            f"| {h['mode']} | {h['concurrency']} | {h['n']} | {err} | {h['rps']:.1f} | {pp(h['e2e'])} | "
+            f"{pp(h['ttft'])} | {pp(h['llm1'])} | {pp(h['tool'])} | {pp(h['serialisasi'])} | "
+            f"{pp(h['llm2'])} | {pp(h['overhead'])} | "
+            f"{h['routed']}{' (' + pp(h['routed_agent']) + ')' if h['routed'] else ''} | {h['antrian']:.0f} |"
+        )
+    return "\n".join(baris) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent end-to-end dengan Ollama palsu")
+    parser.add_argument("--database", help="database dataset benchmark (default: database di config.py)")
+    parser.add_argument("--mode", default="inprocess,api,ws", help="daftar mode: inprocess, api, ws")
+    parser.add_argument("--concurrency", default="1,10,50,100,200", help="daftar level concurrency")
+    parser.add_argument("--requests", type=int, help="request per level (default: max(20, 2 × concurrency))")
+    parser.add_argument("--think-ms", type=float, default=300)
+    parser.add_argument("--tool-think-ms", type=float)
+    parser.add_argument("--token-rate", type=float, default=40)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--fake-port", type=int, default=11500)
+    parser.add_argument("--fake-url", help="pakai fake/real Ollama yang sudah berjalan (tidak men-spawn)")
+    parser.add_argument("--api-port", type=int, default=8100)
+    parser.add_argument("--with-cache", action="store_true", help="aktifkan tool_cache")
+    parser.add_argument("--with-response-cache", action="store_true",
+                        help="aktifkan response_cache (pertanyaan SKENARIO berulang → hampir semua hit)")
+    parser.add_argument("--with-router", action="store_true",
+                        help="aktifkan intent_router (request yang di-route dilaporkan terpisah)")
+    parser.add_argument("--verbose", action="store_true", help="tampilkan log agent (logging_setup)")
+    parser.add_argument("--report", help="simpan laporan markdown ke file ini")
+    args = parser.parse_args()
+
+    modes = [m.strip() for m in args.mode.split(",") if m.strip()]
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    proc = None
+    if args.fake_url:
+        base_ollama = args.fake_url
+    else:
+        proc = mulai_fake_ollama(args)
+        base_ollama = f"http://127.0.0.1:{args.fake_port}"
+
+    # Override config SEBELUM agent/api di-import
+    config.OLLAMA_BASE_URL = base_ollama
+    config.TOOL_CACHE_ENABLED = args.with_cache
+    config.RESPONSE_CACHE_ENABLED = args.with_response_cache
+    config.INTENT_ROUTER_ENABLED = args.with_router
+    if args.database:
+        config.DB_CONFIG_DICT = {**config.DB_CONFIG_DICT, "database": args.database}
+
+    import agent
+    pasang_instrumentasi(agent)
+    if args.verbose:
+        from logging_setup import setup_logging
+        setup_logging()
+
+    semua = []
+    try:
+        if {"api", "ws"} & set(modes):
+            mulai_api(args.api_port)
+        base_api = f"http://127.0.0.1:{args.api_port}"
+
+        for mode in modes:
+            for c in levels:
+                jumlah = args.requests or max(20, 2 * c)
+                ambil_catatan()
+                t0 = time.perf_counter()
+                if mode == "inprocess":
+                    sampel = jalankan_inprocess(agent, c, jumlah)
+                elif mode == "api":
+                    sampel = asyncio.run(_jalankan_api(base_api, c, jumlah))
+                elif mode == "ws":
+                    sampel = asyncio.run(_jalankan_ws(base_api.replace("http", "ws", 1), c, jumlah))
+                else:
+                    raise SystemExit(f"Mode tidak dikenal: {mode}")
+                hasil = ringkas(mode, c, sampel, ambil_catatan(), time.perf_counter() - t0)
+                semua.append(hasil)
+                _log(f"   {mode:<9} c={c:<4} n={hasil['n']:<4} err={hasil['errors']:<3} "
+                     f"e2e p50={hasil['e2e'][0]:.0f}ms p95={hasil['e2e'][1]:.0f}ms  "
+                     f"llm1={hasil['llm1'][0]:.0f} tool={hasil['tool'][0]:.0f} "
+                     f"ser={hasil['serialisasi'][0]:.1f} llm2={hasil['llm2'][0]:.0f} "
+                     f"routed={hasil['routed']} antrian={hasil['antrian']:.0f}")
+    finally:
+        if proc:
+            proc.terminate()
+
+    laporan = susun_laporan(semua, args)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(laporan)
+        _log(f"✅ Laporan disimpan: {args.report}")
+    else:
+        _log(laporan)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+# benchmarks/bench_db_functions.py
+# Benchmark latency (p50/p95/p99) setiap fungsi di agent.available_functions
+#
+# Contoh:
+#   python benchmarks/bench_db_functions.py --database smk_bench_1
+#   python benchmarks/bench_db_functions.py --database smk_bench_1 --database smk_bench_kab --report hasil.md
+#   python benchmarks/bench_db_functions.py --database smk_bench_kab --rekap --iterasi 50
+#
+# Dataset dibuat dengan benchmarks/generate_dataset.py. Cache hasil query
+# (tool_cache) dimatikan kecuali --with-cache, agar yang terukur adalah MySQL.
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import config
+
+
+def _persentil(data, p: float) -> float:
+    """Persentil nearest-rank"""
+    if not data:
+        return 0.0
+    urut = sorted(data)
+    k = max(0, math.ceil(p / 100 * len(urut)) - 1)
+    return urut[k]
+
+
+def _is_error(result) -> bool:
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list) and result and isinstance(result[0], dict):
+        return "error" in result[0]
+    return False
+
+
+# ============================================
+# SKENARIO PER FUNGSI
+# ============================================
+
+def _fixture(get_db_connection, rng: random.Random):
+    """Ambil contoh kelas, siswa, dan tanggal terakhir dari dataset"""
+    db = get_db_connection()
+    cursor = db.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT id, nama FROM kelas WHERE deleted_at IS NULL")
+        kelas = cursor.fetchall()
+        cursor.execute("SELECT id, nama FROM siswa WHERE deleted_at IS NULL ORDER BY RAND() LIMIT 500")
+        siswa = cursor.fetchall()
+        cursor.execute("SELECT MAX(tanggal) AS akhir FROM absensi")
+        akhir = cursor.fetchone()["akhir"] or date.today()
+        cursor.execute(
+            "SELECT (SELECT COUNT(*) FROM kelas) AS kelas, (SELECT COUNT(*) FROM siswa) AS siswa, "
+            "(SELECT COUNT(*) FROM absensi) AS absensi"
+        )
+        ukuran = cursor.fetchone()
+    finally:
+        cursor.close()
+        db.close()
+    return {"kelas": kelas, "siswa": siswa, "akhir": akhir, "ukuran": ukuran, "rng": rng}
+
+
+def _range(fx, hari: int):
+    akhir = fx["akhir"] - timedelta(days=fx["rng"].randrange(0, 30))
+    return {"tanggal_mulai": (akhir - timedelta(days=hari)).isoformat(), "tanggal_akhir": akhir.isoformat()}
+
+
+def _tanggal(fx):
+    return (fx["akhir"] - timedelta(days=fx["rng"].randrange(0, 60))).isoformat()
+
+
+def _kelas(fx):
+    return fx["rng"].choice(fx["kelas"])["id"]
+
+
+def _siswa(fx):
+    return fx["rng"].choice(fx["siswa"])["id"]
+
+
+def _bulan(fx):
+    tgl = fx["akhir"] - timedelta(days=fx["rng"].randrange(0, 90))
+    return {"bulan": tgl.month, "tahun": tgl.year}
+
+
+# (label, nama fungsi, pembuat argumen)
+SKENARIO = [
+    ("cari_siswa", "cari_siswa", lambda fx: {"nama": fx["rng"].choice(fx["siswa"])["nama"].split()[0]}),
+    ("get_siswa_by_kelas", "get_siswa_by_kelas", lambda fx: {"kelas_id": _kelas(fx)}),
+    ("get_absensi_by_siswa[30d]", "get_absensi_by_siswa", lambda fx: {"siswa_id": _siswa(fx), **_range(fx, 30)}),
+    ("get_absensi_by_kelas", "get_absensi_by_kelas", lambda fx: {"kelas_id": _kelas(fx), "tanggal": _tanggal(fx)}),
+    ("get_siswa_tidak_hadir", "get_siswa_tidak_hadir", lambda fx: {"tanggal": _tanggal(fx)}),
+    ("get_rekap_absensi", "get_rekap_absensi", lambda fx: {"siswa_id": _siswa(fx), **_bulan(fx)}),
+    ("get_rekap_absensi_bulanan", "get_rekap_absensi_bulanan", lambda fx: {"siswa_id": _siswa(fx), "tahun": fx["akhir"].year}),
+    ("get_persentase_kehadiran[kelas]", "get_persentase_kehadiran", lambda fx: {"kelas_id": _kelas(fx), **_bulan(fx)}),
+    ("buat_surat_peringatan_alfa", "buat_surat_peringatan_alfa", lambda fx: {"siswa_id": _siswa(fx)}),
+    ("buat_laporan_alfa", "buat_laporan_alfa", lambda fx: {"tanggal": _tanggal(fx)}),
+    ("get_attendance_trends[kelas]", "get_attendance_trends", lambda fx: {"kelas_id": _kelas(fx), "months": 6}),
+    ("get_attendance_trends[siswa]", "get_attendance_trends", lambda fx: {"siswa_id": _siswa(fx), "months": 6}),
+    ("compare_class_attendance", "compare_class_attendance", lambda fx: {}),
+    ("get_ringkasan_absensi_harian", "get_ringkasan_absensi_harian", lambda fx: {"kelas_id": _kelas(fx), "tanggal": _tanggal(fx)}),
+    ("get_ringkasan_absensi_range[30d]", "get_ringkasan_absensi_range", lambda fx: {"kelas_id": _kelas(fx), **_range(fx, 30)}),
+    ("get_rekap_absensi_kelas_range[30d]", "get_rekap_absensi_kelas_range", lambda fx: {"kelas_id": _kelas(fx), **_range(fx, 30)}),
+    ("get_rekap_absensi_kelas_range[365d]", "get_rekap_absensi_kelas_range", lambda fx: {"kelas_id": _kelas(fx), **_range(fx, 365)}),
+    ("get_top_siswa_absensi[30d]", "get_top_siswa_absensi", lambda fx: {"kelas_id": _kelas(fx), **_range(fx, 30)}),
+    ("get_analisis_metode_absen[30d]", "get_analisis_metode_absen", lambda fx: {"kelas_id": _kelas(fx), **_range(fx, 30)}),
+    ("get_anomali_absensi[30d]", "get_anomali_absensi", lambda fx: {"kelas_id": _kelas(fx), **_range(fx, 30)}),
+    ("get_statistik_waktu_absen[30d]", "get_statistik_waktu_absen", lambda fx: {"kelas_id": _kelas(fx), **_range(fx, 30)}),
+    ("get_laporan_kepsek_range[30d]", "get_laporan_kepsek_range", lambda fx: _range(fx, 30)),
+    ("get_laporan_kepsek_range[365d]", "get_laporan_kepsek_range", lambda fx: _range(fx, 365)),
+    ("get_laporan_guru_harian", "get_laporan_guru_harian", lambda fx: {"kelas_id": _kelas(fx), "tanggal": _tanggal(fx)}),
+]
+
+
+def run_dataset(database: str, iterasi: int, warmup: int, seed: int,
+                with_cache: bool, rekap: bool, skip_pdf: bool):
+    """Benchmark semua skenario terhadap satu database. Return dict hasil."""
+    # Override config SEBELUM db_functions/agent di-import (pool dibuat saat import)
+    config.DB_CONFIG_DICT = {**config.DB_CONFIG_DICT, "database": database}
+    config.TOOL_CACHE_ENABLED = with_cache
+    config.REKAP_ABSENSI_ENABLED = rekap
+
+    from agent import available_functions
+    import db_functions
+
+    if rekap:
+        db_functions.rekap.refresh()
+
+    rng = random.Random(seed)
+    fx = _fixture(db_functions.get_db_connection, rng)
+
+    hasil = {"database": database, "ukuran": fx["ukuran"], "rekap": rekap, "cache": with_cache, "fungsi": {}}
+    tercakup = set()
+
+    for label, nama, buat_args in SKENARIO:
+        tercakup.add(nama)
+        if skip_pdf and nama.startswith("buat_"):
+            continue
+        func = available_functions[nama]
+        waktu, errors = [], 0
+        for i in range(warmup + iterasi):
+            args = buat_args(fx)
+            t0 = time.perf_counter()
+            try:
+                result = func(**args)
+                gagal = _is_error(result)
+            except Exception:
+                gagal = True
+            ms = (time.perf_counter() - t0) * 1000
+            if i >= warmup:
+                waktu.append(ms)
+                errors += gagal
+        hasil["fungsi"][label] = {
+            "n": len(waktu),
+            "errors": errors,
+            "p50": _persentil(waktu, 50),
+            "p95": _persentil(waktu, 95),
+            "p99": _persentil(waktu, 99),
+            "max": max(waktu),
+        }
+        print(f"   {label:<40} p50={hasil['fungsi'][label]['p50']:8.1f}ms  "
+              f"p95={hasil['fungsi'][label]['p95']:8.1f}ms  p99={hasil['fungsi'][label]['p99']:8.1f}ms")
+
+    tidak_tercakup = sorted(set(available_functions) - tercakup)
+    if tidak_tercakup:
+        print(f"⚠️  Belum ada skenario untuk: {', '.join(tidak_tercakup)}")
+    return hasil
+
+
+# ============================================
+# LAPORAN
+# ============================================
+
+def susun_laporan(semua, slo_ms: float) -> str:
+    baris = ["# Benchmark db_functions", ""]
+    baris.append("| Dataset | Kelas | Siswa | Baris absensi | Agregat | Cache |")
+    baris.append("|---|---|---|---|---|---|")
+    for h in semua:
+        u = h["ukuran"]
+        baris.append(
+            f"| {h['database']} | {u['kelas']:,} | {u['siswa']:,} | {u['absensi']:,} | "
+            f"{'ya' if h['rekap'] else 'tidak'} | {'ya' if h['cache'] else 'tidak'} |"
+        )
+
+    baris += ["", f"Latency dalam ms (p50 / p95 / p99). ⚠️ = p95 melebihi {slo_ms:.0f} ms.", ""]
+    baris.append("| Fungsi | " + " | ".join(h["database"] for h in semua) + " |")
+    baris.append("|---|" + "---|" * len(semua))
+
+    labels = [label for label, _, _ in SKENARIO if any(label in h["fungsi"] for h in semua)]
+    for label in labels:
+        kolom = []
+        for h in semua:
+            r = h["fungsi"].get(label)
+            if not r:
+                kolom.append("-")
+                continue
+            tanda = " ⚠️" if r["p95"] > slo_ms else ""
+            err = f" ({r['errors']} err)" if r["errors"] else ""
+            kolom.append(f"{r['p50']:.1f} / {r['p95']:.1f} / {r['p99']:.1f}{tanda}{err}")
+        baris.append(f"| {label} | " + " | ".join(kolom) + " |")
+    return "\n".join(baris) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fungsi db_functions")
+    parser.add_argument("--database", action="append", required=True,
+                        help="database dataset (boleh diulang untuk membandingkan ukuran)")
+    parser.add_argument("--iterasi", type=int, default=30, help="jumlah pemanggilan terukur per fungsi")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--slo-ms", type=float, default=1000, help="batas p95 yang dianggap lambat")
+    parser.add_argument("--with-cache", action="store_true", help="aktifkan tool_cache")
+    parser.add_argument("--rekap", action="store_true", help="baca dari tabel agregat (rekap_absensi)")
+    parser.add_argument("--skip-pdf", action="store_true", help="lewati fungsi buat_* yang menulis PDF")
+    parser.add_argument("--report", help="simpan laporan markdown ke file ini")
+    parser.add_argument("--json", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if len(args.database) == 1:
+        print(f"⏱️  Benchmark database '{args.database[0]}'")
+        semua = [run_dataset(
+            args.database[0], args.iterasi, args.warmup, args.seed,
+            args.with_cache, args.rekap, args.skip_pdf
+        )]
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(semua[0], f, default=str)
+            return
+    else:
+        # Pool MySQL terikat ke satu database per proses → satu subprocess per dataset
+        semua = []
+        for database in args.database:
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+                path = tmp.name
+            cmd = [
+                sys.executable, os.path.abspath(__file__),
+                "--database", database,
+                "--iterasi", str(args.iterasi), "--warmup", str(args.warmup),
+                "--seed", str(args.seed), "--json", path,
+            ]
+            cmd += [flag for flag, aktif in (
+                ("--with-cache", args.with_cache), ("--rekap", args.rekap), ("--skip-pdf", args.skip_pdf)
+            ) if aktif]
+            subprocess.run(cmd, check=True)
+            with open(path, encoding="utf-8") as f:
+                semua.append(json.load(f))
+            os.unlink(path)
+
+    laporan = susun_laporan(semua, args.slo_ms)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(laporan)
+        print(f"✅ Laporan disimpan: {args.report}")
+    else:
+        print(laporan)
+
+
+if __name__ == "__main__":
+    main()
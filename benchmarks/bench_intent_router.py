@@ -0,0 +1,70 @@
+# benchmarks/bench_intent_router.py
+# Cek offline intent_router.py: pertanyaan berlabel → tool + argumen yang diharapkan
+#
+# Tanpa DB/Ollama: nama kelas/siswa di-resolve dari kamus kecil di bawah.
+# Harapan None = pertanyaan harus diserahkan ke LLM (tidak di-route).
+# Exit code 1 jika ada yang meleset, jadi bisa dipakai sebagai regression check.
+#
+# Contoh:
+#   python benchmarks/bench_intent_router.py
+
+import os
+import sys
+import time
+from datetime import date
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from intent_router import IntentRouter
+
+HARI_INI = date(2026, 2, 9)
+KELAS = {"x rpl 1": 1, "xi tkj 2": 2}
+SISWA = {"budi santoso": 10, "juni": 7}
+
+# (pertanyaan, (tool, argumen yang harus ada; nilai None = tidak boleh ada) / None)
+DATASET = [
+    ("Siapa saja yang tidak hadir hari ini?", ("get_siswa_tidak_hadir", {"tanggal": "2026-02-09"})),
+    ("Siapa yang alfa hari ini di X RPL 1?", ("get_siswa_tidak_hadir", {"tanggal": "2026-02-09", "status": "Alfa", "kelas_id": 1})),
+    ("Siapa yang bolos hari ini di XI TKJ 2", ("get_siswa_tidak_hadir", {"status": "Alfa", "kelas_id": 2})),
+    ("Siapa yang izin di kelas X RPL 1 kemarin?", ("get_siswa_tidak_hadir", {"tanggal": "2026-02-08", "status": "Izin", "kelas_id": 1})),
+    ("Siapa yang sakit di sekolah hari ini?", ("get_siswa_tidak_hadir", {"status": "Sakit"})),
+    ("Siapa yang alfa hari ini di XII MM 3?", None),
+    ("Siapa yang tidak hadir 5 hari terakhir?", None),
+    ("Siapa yang izin bulan ini?", None),
+    ("Siapa yang alfa di kelas XII MM 3?", None),
+    ("Cari siswa bernama Budi", ("cari_siswa", {"nama": "budi"})),
+    ("Cari siswa budi di kelas X RPL 1", ("cari_siswa", {"nama": "budi"})),
+    ("Rekap absensi siswa Budi Santoso bulan ini", ("get_rekap_absensi", {"siswa_id": 10, "bulan": 2, "tahun": 2026})),
+    ("Persentase kehadiran siswa Juni", ("get_persentase_kehadiran", {"siswa_id": 7, "bulan": None})),
+    ("Persentase kehadiran siswa Juni bulan Januari 2026", ("get_persentase_kehadiran", {"siswa_id": 7, "bulan": 1, "tahun": 2026})),
+    ("Ringkasan absensi kelas X RPL 1 hari ini", ("get_ringkasan_absensi_harian", {"kelas_id": 1, "tanggal": "2026-02-09"})),
+    ("Bandingkan kehadiran semua kelas", None),
+]
+
+
+def _cocok(rute, harapan) -> bool:
+    if harapan is None or rute is None:
+        return harapan is None and rute is None
+    tool, args = harapan
+    return rute.tool == tool and all(rute.args.get(k) == v for k, v in args.items())
+
+
+def main():
+    router = IntentRouter(KELAS.get, SISWA.get, enabled=True)
+    meleset = []
+    t0 = time.perf_counter()
+    for pertanyaan, harapan in DATASET:
+        rute = router.route(pertanyaan, HARI_INI)
+        if not _cocok(rute, harapan):
+            meleset.append((pertanyaan, harapan, rute and (rute.tool, rute.args)))
+    durasi = (time.perf_counter() - t0) * 1000 / len(DATASET)
+
+    print(f"{len(DATASET) - len(meleset)}/{len(DATASET)} benar, {durasi:.3f} ms per pertanyaan")
+    for pertanyaan, harapan, hasil in meleset:
+        print(f"- \"{pertanyaan}\" → harapan {harapan}, hasil {hasil}")
+    sys.exit(1 if meleset else 0)
+
+
+if __name__ == "__main__":
+    main()
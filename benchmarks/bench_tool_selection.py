@@ -0,0 +1,237 @@
+# benchmarks/bench_tool_selection.py
+# Bandingkan subset tool (tool_selection.py) dengan seluruh tool
+#
+# Mode offline (default, tanpa Ollama):
+#   recall — tool yang benar ikut terpilih dalam subset
+#   ukuran schema tool (karakter JSON & estimasi token) subset vs seluruh tool
+# Mode --ollama (model sungguhan):
+#   akurasi — tool yang dipanggil model sama dengan tool yang diharapkan
+#   prompt_eval_count & prompt_eval_duration (prefill) subset vs seluruh tool
+#   Varian full/subset dijalankan bergantian per pertanyaan sehingga prefix
+#   cache Ollama dari varian lain tertimpa (jalankan dengan OLLAMA_NUM_PARALLEL=1).
+#
+# Contoh:
+#   python benchmarks/bench_tool_selection.py
+#   python benchmarks/bench_tool_selection.py --top-k 4,6,8
+#   python benchmarks/bench_tool_selection.py --ollama http://localhost:11434 --model qwen3:8b --report tools.md
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import config
+from tool_result import estimasi_token
+from tool_selection import ToolSelector, ukuran_prompt
+from tools_definition import tools
+
+# (pertanyaan, tool yang diharapkan)
+DATASET = [
+    ("Cari siswa bernama Budi", "cari_siswa"),
+    ("NIS siswa atas nama Siti Aminah berapa?", "cari_siswa"),
+    ("Tampilkan daftar siswa kelas X RPL 1", "get_siswa_by_kelas"),
+    ("Siapa saja anggota kelas XI TKJ 2?", "get_siswa_by_kelas"),
+    ("Tampilkan absensi siswa ID 10 dari tanggal 2026-02-01 sampai 2026-02-09", "get_absensi_by_siswa"),
+    ("Riwayat absen Andi minggu ini", "get_absensi_by_siswa"),
+    ("Absensi kelas XII RPL 1 tanggal 2026-02-03", "get_absensi_by_kelas"),
+    ("Siapa saja yang tidak hadir hari ini?", "get_siswa_tidak_hadir"),
+    ("Siapa saja yang alfa hari ini?", "get_siswa_tidak_hadir"),
+    ("Tampilkan rekap absensi siswa ID 5 bulan Februari 2026", "get_rekap_absensi"),
+    ("Berapa total hadir dan alfa Rina bulan ini?", "get_rekap_absensi"),
+    ("Rekap absensi Dewi per bulan tahun 2026", "get_rekap_absensi_bulanan"),
+    ("Berapa persentase kehadiran kelas ID 3?", "get_persentase_kehadiran"),
+    ("Tingkat kehadiran seluruh sekolah bulan Januari", "get_persentase_kehadiran"),
+    ("Buatkan surat peringatan alfa untuk siswa Joko", "buat_surat_peringatan_alfa"),
+    ("Buat surat peringatan untuk semua siswa kelas X RPL 1 yang alfa 3 kali bulan ini", "buat_surat_peringatan_alfa_batch"),
+    ("Cetak laporan PDF siswa alfa hari ini", "buat_laporan_alfa"),
+    ("Bagaimana tren kehadiran kelas X RPL 1 enam bulan terakhir?", "get_attendance_trends"),
+    ("Perkembangan kehadiran siswa Budi beberapa bulan ini", "get_attendance_trends"),
+    ("Bandingkan kehadiran semua kelas", "compare_class_attendance"),
+    ("Perbandingan kehadiran antar kelas jurusan RPL", "compare_class_attendance"),
+    ("Ringkasan absensi kelas X TKJ 1 hari ini", "get_ringkasan_absensi_harian"),
+    ("Ringkasan absensi per hari kelas XI RPL 2 untuk grafik bulan ini", "get_ringkasan_absensi_range"),
+    ("Rekap absensi kelas XII TKJ 1 per siswa bulan Februari", "get_rekap_absensi_kelas_range"),
+    ("Bagaimana kehadiran kelas XI TKJ 2 minggu ini?", "get_rekap_absensi_kelas_range"),
+    ("Siapa top 5 siswa paling rajin absen di kelas 11B?", "get_top_siswa_absensi"),
+    ("Siswa dengan alfa terbanyak bulan ini", "get_top_siswa_absensi"),
+    ("Analisis metode absen kelas 10A bulan ini", "get_analisis_metode_absen"),
+    ("Cek anomali absensi di kelas 12C", "get_anomali_absensi"),
+    ("Ada yang titip absen? cek koordinat yang sama minggu ini", "get_anomali_absensi"),
+    ("Siswa mana yang absen di luar sekolah?", "get_anomali_absensi"),
+    ("Jam berapa siswa biasanya absen dan siapa yang sering telat?", "get_statistik_waktu_absen"),
+    ("Laporan mingguan untuk kepala sekolah", "get_laporan_kepsek_range"),
+    ("Laporan harian wali kelas X RPL 1 hari ini", "get_laporan_guru_harian"),
+    ("Siswa mana yang belum absen hari ini di kelas saya? saya guru wali kelas XI TKJ 1", "get_laporan_guru_harian"),
+]
+
+
+def _ms(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000
+
+
+# ============================================
+# OFFLINE: recall & ukuran schema
+# ============================================
+
+def evaluasi_offline(selector: ToolSelector):
+    full_chars = ukuran_prompt(tools)
+    full_token = estimasi_token(str(tools))
+    baris, benar, meleset = [], 0, []
+    for pertanyaan, harapan in DATASET:
+        t0 = time.perf_counter()
+        subset = selector.pilih(pertanyaan)
+        durasi = _ms(t0)
+        nama = [t["function"]["name"] for t in subset]
+        if harapan in nama:
+            benar += 1
+        else:
+            meleset.append((pertanyaan, harapan, nama))
+        baris.append({
+            "jumlah": len(subset), "chars": ukuran_prompt(subset),
+            "token": estimasi_token(str(subset)), "ms": durasi,
+        })
+    return {
+        "top_k": selector.top_k,
+        "recall": benar / len(DATASET) * 100,
+        "tools_rata": statistics.mean(b["jumlah"] for b in baris),
+        "chars_rata": statistics.mean(b["chars"] for b in baris),
+        "token_rata": statistics.mean(b["token"] for b in baris),
+        "full_chars": full_chars,
+        "full_token": full_token,
+        "seleksi_ms": statistics.mean(b["ms"] for b in baris),
+        "fallback": selector.fallback_total,
+        "meleset": meleset,
+    }
+
+
+# ============================================
+# OLLAMA: akurasi pemilihan tool & prefill
+# ============================================
+
+def _panggil(client, model, pertanyaan, daftar_tool):
+    res = client.chat(
+        model=model,
+        messages=[
+            {"role": "system", "content": config.SYSTEM_PROMPT},
+            {"role": "user", "content": pertanyaan},
+        ],
+        tools=daftar_tool,
+        stream=False,
+        keep_alive="30m",
+    )
+    dipanggil = [tc["function"]["name"] for tc in (res["message"].get("tool_calls") or [])]
+    return {
+        "tool": dipanggil[0] if dipanggil else None,
+        "prompt_tokens": res.get("prompt_eval_count") or 0,
+        "prefill_ms": (res.get("prompt_eval_duration") or 0) / 1e6,
+        "total_ms": (res.get("total_duration") or 0) / 1e6,
+    }
+
+
+def evaluasi_ollama(selector: ToolSelector, url: str, model: str):
+    from ollama import Client
+
+    client = Client(host=url)
+    client.generate(model=model, prompt="", keep_alive="30m")  # muat model dulu
+
+    hasil = {"full": [], "subset": []}
+    for i, (pertanyaan, harapan) in enumerate(DATASET, 1):
+        varian = [("full", tools), ("subset", selector.pilih(pertanyaan))]
+        if i % 2 == 0:
+            varian.reverse()
+        for label, daftar_tool in varian:
+            r = _panggil(client, model, pertanyaan, daftar_tool)
+            r["benar"] = r["tool"] == harapan
+            hasil[label].append(r)
+        print(f"  [{i}/{len(DATASET)}] {pertanyaan[:50]:<50} "
+              f"full={hasil['full'][-1]['tool']} subset={hasil['subset'][-1]['tool']}", flush=True)
+
+    ringkas = {}
+    for label, rows in hasil.items():
+        ringkas[label] = {
+            "akurasi": sum(r["benar"] for r in rows) / len(rows) * 100,
+            "prompt_tokens": statistics.mean(r["prompt_tokens"] for r in rows),
+            "prefill_ms": statistics.mean(r["prefill_ms"] for r in rows),
+            "prefill_p95": sorted(r["prefill_ms"] for r in rows)[int(0.95 * (len(rows) - 1))],
+            "total_ms": statistics.mean(r["total_ms"] for r in rows),
+        }
+    return ringkas
+
+
+# ============================================
+# LAPORAN
+# ============================================
+
+def susun_laporan(offline: list, online: dict = None, model: str = None) -> str:
+    baris = [
+        "# Benchmark seleksi tool",
+        "",
+        f"{len(DATASET)} pertanyaan berlabel, {len(tools)} tool di tools_definition.py.",
+        "",
+        "## Offline (recall & ukuran schema)",
+        "",
+        "| top-K | recall | tool rata² | schema (char) | schema (token≈) | vs full | seleksi (ms) | fallback |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for o in offline:
+        baris.append(
+            f"| {o['top_k']} | {o['recall']:.0f}% | {o['tools_rata']:.1f} | {o['chars_rata']:.0f} "
+            f"| {o['token_rata']:.0f} | {o['token_rata'] / o['full_token'] * 100:.0f}% "
+            f"| {o['seleksi_ms']:.2f} | {o['fallback']} |"
+        )
+    baris.append(f"| full | 100% | {len(tools)} | {offline[0]['full_chars']} | {offline[0]['full_token']} | 100% | - | - |")
+
+    for o in offline:
+        if o["meleset"]:
+            baris += ["", f"Meleset (top-K {o['top_k']}):"]
+            for pertanyaan, harapan, nama in o["meleset"]:
+                baris.append(f"- \"{pertanyaan}\" → butuh `{harapan}`, terpilih: {', '.join(nama)}")
+
+    if online:
+        baris += [
+            "",
+            f"## Ollama ({model}, top-K {offline[-1]['top_k']})",
+            "",
+            "| varian | akurasi tool | prompt token | prefill rata² (ms) | prefill p95 (ms) | total rata² (ms) |",
+            "|---|---|---|---|---|---|",
+        ]
+        for label in ("full", "subset"):
+            r = online[label]
+            baris.append(
+                f"| {label} | {r['akurasi']:.0f}% | {r['prompt_tokens']:.0f} | {r['prefill_ms']:.0f} "
+                f"| {r['prefill_p95']:.0f} | {r['total_ms']:.0f} |"
+            )
+    return "\n".join(baris) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark seleksi subset tool vs seluruh tool")
+    parser.add_argument("--top-k", default="6", help="daftar top-K, mis. 4,6,8 (Ollama memakai yang terakhir)")
+    parser.add_argument("--ollama", help="URL Ollama untuk mengukur akurasi & prefill, mis. http://localhost:11434")
+    parser.add_argument("--model", default=config.OLLAMA_MODEL)
+    parser.add_argument("--report", help="simpan laporan markdown ke file ini")
+    args = parser.parse_args()
+
+    offline = []
+    for k in [int(x) for x in args.top_k.split(",")]:
+        offline.append(evaluasi_offline(ToolSelector(tools, top_k=k, enabled=True)))
+
+    online = None
+    if args.ollama:
+        print(f"🤖 Mengukur di Ollama {args.ollama} ({args.model})...")
+        online = evaluasi_ollama(ToolSelector(tools, top_k=offline[-1]["top_k"], enabled=True), args.ollama, args.model)
+
+    laporan = susun_laporan(offline, online, args.model)
+    print(laporan)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(laporan)
+        print(f"📄 Laporan disimpan: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
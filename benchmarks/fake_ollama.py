@@ -0,0 +1,180 @@
+# benchmarks/fake_ollama.py
+# Server Ollama palsu untuk load test agent tanpa GPU/model
+#
+# Meniru POST /api/chat milik Ollama (NDJSON stream maupun non-stream):
+# - Pesan terakhir dari user + tools dikirim → balas satu tool call sesuai SKENARIO
+# - Pesan terakhir hasil tool (atau tanpa tools) → stream jawaban teks
+# Waktu "berpikir" sebelum token pertama dan kecepatan token bisa diatur,
+# sehingga waktu model konstan dan overhead server kita bisa diukur terpisah.
+#
+# Contoh:
+#   python benchmarks/fake_ollama.py --port 11500 --think-ms 300 --token-rate 40 --answer-tokens 120
+#   (lalu set OLLAMA_BASE_URL = "http://127.0.0.1:11500", atau pakai bench_agent.py)
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def _range(hari: int):
+    akhir = date.today()
+    return {"tanggal_mulai": (akhir - timedelta(days=hari)).isoformat(), "tanggal_akhir": akhir.isoformat()}
+
+
+# (pertanyaan, tool, argumen). bench_agent.py mengirim pertanyaan ini secara bergiliran;
+# ID kelas/siswa = 1 selalu ada di dataset dari generate_dataset.py.
+SKENARIO = [
+    ("Siapa saja yang tidak hadir hari ini?", "get_siswa_tidak_hadir", lambda: {"tanggal": date.today().isoformat()}),
+    ("Ringkasan absensi kelas 1 bulan ini", "get_ringkasan_absensi_range", lambda: {"kelas_id": 1, **_range(30)}),
+    ("Bandingkan kehadiran semua kelas", "compare_class_attendance", lambda: {}),
+    ("Tren kehadiran kelas 1 enam bulan terakhir", "get_attendance_trends", lambda: {"kelas_id": 1, "months": 6}),
+    ("Laporan kepala sekolah sebulan terakhir", "get_laporan_kepsek_range", lambda: _range(30)),
+    ("Rekap absensi siswa 1 bulan ini", "get_rekap_absensi", lambda: {"siswa_id": 1, "bulan": date.today().month, "tahun": date.today().year}),
+    ("Cari siswa bernama budi", "cari_siswa", lambda: {"nama": "budi"}),
+    ("Laporan harian wali kelas 1", "get_laporan_guru_harian", lambda: {"kelas_id": 1, "tanggal": date.today().isoformat()}),
+]
+
+KATA_JAWABAN = (
+    "Berdasarkan data absensi yang tersedia, tingkat kehadiran siswa cukup baik "
+    "namun masih ada beberapa siswa dengan jumlah alfa yang perlu diperhatikan oleh wali kelas"
+).split()
+
+
+def _sekarang() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def create_app(think_ms: float = 300, token_rate: float = 40, answer_tokens: int = 120,
+               tool_think_ms: float = None) -> FastAPI:
+    """
+    Buat app FastAPI Ollama palsu.
+
+    - think_ms      : jeda sebelum token pertama jawaban (prefill)
+    - token_rate    : token per detik saat streaming jawaban
+    - answer_tokens : panjang jawaban final (token)
+    - tool_think_ms : jeda sebelum tool call (default = think_ms)
+    """
+    app = FastAPI(title="Fake Ollama")
+    skenario = {q: (name, args) for q, name, args in SKENARIO}
+    tool_think = think_ms if tool_think_ms is None else tool_think_ms
+    jeda_token = 1 / token_rate if token_rate > 0 else 0
+    stats = {"requests": 0, "tool_calls": 0, "answers": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def _pilih_tool(messages):
+        pertanyaan = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        if pertanyaan in skenario:
+            return skenario[pertanyaan]
+        # Pertanyaan di luar SKENARIO → dipetakan deterministik ke salah satu skenario
+        _, name, args = SKENARIO[sum(map(ord, pertanyaan)) % len(SKENARIO)]
+        return name, args
+
+    def _chunk(model, message, done=False, **extra):
+        data = {"model": model, "created_at": _sekarang(), "message": message, "done": done}
+        data.update(extra)
+        return json.dumps(data) + "\n"
+
+    async def _tool_call(model, messages):
+        name, args = _pilih_tool(messages)
+        await asyncio.sleep(tool_think / 1000)
+        stats["tool_calls"] += 1
+        yield _chunk(model, {
+            "role": "assistant", "content": "",
+            "tool_calls": [{"function": {"name": name, "arguments": args()}}],
+        })
+        yield _chunk(model, {"role": "assistant", "content": ""}, done=True, done_reason="stop")
+
+    async def _jawaban(model):
+        mulai = time.perf_counter_ns()
+        await asyncio.sleep(think_ms / 1000)
+        stats["answers"] += 1
+        for i in range(answer_tokens):
+            kata = KATA_JAWABAN[i % len(KATA_JAWABAN)]
+            yield _chunk(model, {"role": "assistant", "content": kata if i == 0 else " " + kata})
+            if jeda_token:
+                await asyncio.sleep(jeda_token)
+        yield _chunk(
+            model, {"role": "assistant", "content": ""}, done=True, done_reason="stop",
+            total_duration=time.perf_counter_ns() - mulai, eval_count=answer_tokens,
+        )
+
+    async def _hitung(gen):
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            async for line in gen:
+                yield line
+        finally:
+            stats["in_flight"] -= 1
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake")
+        messages = body.get("messages", [])
+        perlu_tool = bool(body.get("tools")) and messages and messages[-1].get("role") == "user"
+        gen = _hitung(_tool_call(model, messages) if perlu_tool else _jawaban(model))
+
+        if body.get("stream", True):
+            return StreamingResponse(gen, media_type="application/x-ndjson")
+
+        # Non-stream: gabungkan semua chunk jadi satu response
+        content, tool_calls, akhir = [], [], {}
+        async for line in gen:
+            akhir = json.loads(line)
+            content.append(akhir["message"].get("content", ""))
+            tool_calls.extend(akhir["message"].get("tool_calls", []))
+        akhir["message"] = {"role": "assistant", "content": "".join(content)}
+        if tool_calls:
+            akhir["message"]["tool_calls"] = tool_calls
+        return JSONResponse(akhir)
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        # Dipakai llm_client.warm_up() (prompt kosong = hanya memuat model)
+        body = await request.json()
+        await asyncio.sleep(think_ms / 1000 if body.get("prompt") else 0)
+        return JSONResponse({
+            "model": body.get("model", "fake"), "created_at": _sekarang(),
+            "response": "", "done": True, "done_reason": "load",
+        })
+
+    @app.get("/api/tags")
+    def tags():
+        return {"models": [{"name": "fake", "model": "fake", "modified_at": _sekarang(), "size": 0}]}
+
+    @app.get("/api/version")
+    def version():
+        return {"version": "0.0.0-fake"}
+
+    @app.get("/_stats")
+    def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server Ollama palsu untuk benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--think-ms", type=float, default=300, help="jeda sebelum token pertama (ms)")
+    parser.add_argument("--tool-think-ms", type=float, help="jeda sebelum tool call (default = --think-ms)")
+    parser.add_argument("--token-rate", type=float, default=40, help="token per detik (0 = tanpa jeda)")
+    parser.add_argument("--answer-tokens", type=int, default=120, help="panjang jawaban final (token)")
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(args.think_ms, args.token_rate, args.answer_tokens, args.tool_think_ms)
+    print(f"🧪 Fake Ollama di http://{args.host}:{args.port} "
+          f"(think={args.think_ms}ms, {args.token_rate} tok/s, {args.answer_tokens} token)")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
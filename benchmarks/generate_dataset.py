@@ -0,0 +1,339 @@
+# benchmarks/generate_dataset.py
+# Generator dataset sintetis (skema struktursmksmartsis.sql) untuk benchmark
+#
+# Contoh:
+#   python benchmarks/generate_dataset.py --database smk_bench_1 --preset sekolah --create-schema
+#   python benchmarks/generate_dataset.py --database smk_bench_kab --preset kabupaten --create-schema
+#   python benchmarks/generate_dataset.py --database smk_bench_x --kelas 60 --siswa-per-kelas 32 --tahun 2
+#
+# Database target WAJIB berbeda dari database di config.py — isinya dihapus.
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, time as dtime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import mysql.connector
+
+from config import DB_CONFIG_DICT
+
+
+# Ukuran dataset: satu sekolah → satu kabupaten
+PRESETS = {
+    "kecil":     {"kelas": 9,   "siswa_per_kelas": 30, "tahun": 1},
+    "sekolah":   {"kelas": 30,  "siswa_per_kelas": 36, "tahun": 1},
+    "sekolah3":  {"kelas": 30,  "siswa_per_kelas": 36, "tahun": 3},
+    "kecamatan": {"kelas": 150, "siswa_per_kelas": 36, "tahun": 3},
+    "kabupaten": {"kelas": 600, "siswa_per_kelas": 36, "tahun": 3},
+}
+
+JURUSAN = ["RPL", "TKJ", "AKL", "OTKP", "BDP", "TBSM", "MM", "DKV"]
+TINGKAT = {10: "X", 11: "XI", 12: "XII"}
+
+NAMA_DEPAN = [
+    "Ahmad", "Budi", "Citra", "Dewi", "Eko", "Fajar", "Gita", "Hendra", "Indah", "Joko",
+    "Kurnia", "Lestari", "Muhammad", "Nur", "Putri", "Rizky", "Siti", "Teguh", "Utami", "Wahyu",
+    "Yusuf", "Zahra", "Agus", "Bayu", "Dian", "Fitri", "Galih", "Hana", "Irfan", "Kartika",
+    "Larasati", "Mega", "Nanda", "Oktavia", "Pratama", "Rahma", "Sari", "Tri", "Wulan", "Yoga",
+]
+NAMA_BELAKANG = [
+    "Saputra", "Wijaya", "Pratama", "Lestari", "Santoso", "Hidayat", "Kusuma", "Rahman",
+    "Setiawan", "Nugroho", "Permata", "Ramadhan", "Wibowo", "Maharani", "Firmansyah",
+    "Anggraini", "Syahputra", "Utomo", "Handayani", "Purnomo", "Fauzi", "Susanti",
+]
+
+# Koordinat sekolah (titik pusat GPS)
+SEKOLAH_LAT = -6.200000
+SEKOLAH_LNG = 106.816666
+
+STATUS = ["Hadir", "Izin", "Sakit", "Alfa"]
+METODE = ["qr", "gps", "manual"]
+BOBOT_METODE = [0.55, 0.35, 0.10]
+
+SETTINGS = {
+    "nama_sekolah": "SMK Benchmark Nusantara",
+    "alamat": "Jl. Pendidikan No. 1, Jakarta",
+    "telepon": "021-5550000",
+    "email": "info@smk-benchmark.sch.id",
+    "kepala_sekolah": "Drs. Kepala Sekolah, M.Pd",
+    "kode_sekolah": "SMKBN",
+}
+
+
+# ============================================
+# SKEMA
+# ============================================
+
+def _statements(path: str):
+    """Pecah file .sql menjadi statement (abaikan komentar)"""
+    with open(path, encoding="utf-8") as f:
+        buffer = []
+        for line in f:
+            if line.startswith("--") or not line.strip():
+                continue
+            buffer.append(line)
+            if line.rstrip().endswith(";"):
+                yield "".join(buffer)
+                buffer = []
+
+
+def create_schema(cursor, with_migrations: bool = True):
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for stmt in _statements(os.path.join(BASE_DIR, "struktursmksmartsis.sql")):
+        cursor.execute(stmt)
+    if with_migrations:
+        folder = os.path.join(BASE_DIR, "migrations")
+        for nama in sorted(os.listdir(folder)):
+            if nama.endswith(".sql"):
+                for stmt in _statements(os.path.join(folder, nama)):
+                    cursor.execute(stmt)
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+
+def kosongkan(cursor):
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for tabel in ("absensi", "penempatan_kelas", "siswa", "kelas", "tahun_ajaran", "settings"):
+        cursor.execute(f"TRUNCATE TABLE `{tabel}`")
+    # Tabel agregat (migrations/001) ikut dikosongkan agar di-rebuild dari data baru
+    cursor.execute("SHOW TABLES LIKE 'rekap\\_absensi\\_%'")
+    for (tabel,) in cursor.fetchall():
+        cursor.execute(f"TRUNCATE TABLE `{tabel}`")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+
+# ============================================
+# DATA
+# ============================================
+
+def _hari_sekolah(mulai: date, akhir: date, rng: random.Random):
+    """Senin-Jumat, dikurangi libur semester & beberapa tanggal merah acak"""
+    hari = []
+    tgl = mulai
+    while tgl <= akhir:
+        libur_semester = (
+            (tgl.month == 12 and tgl.day > 20)
+            or (tgl.month == 6 and tgl.day > 20)
+            or (tgl.month == 7 and tgl.day < 15)
+        )
+        if tgl.weekday() < 5 and not libur_semester:
+            hari.append(tgl)
+        tgl += timedelta(days=1)
+    tanggal_merah = set(rng.sample(hari, k=min(len(hari) // 40, len(hari))))
+    return [t for t in hari if t not in tanggal_merah]
+
+
+def _profil_siswa(rng: random.Random):
+    """Bobot status per siswa: sebagian kecil siswa sering alfa / sakit"""
+    if rng.random() < 0.05:
+        return [0.70, 0.05, 0.07, 0.18]
+    if rng.random() < 0.15:
+        return [0.85, 0.04, 0.05, 0.06]
+    return [0.94, 0.02, 0.025, 0.015]
+
+
+def _waktu_absen(rng: random.Random, rajin: bool) -> dtime:
+    """Mayoritas datang 06:30-07:10, ekor telat sampai ~08:30"""
+    menit = rng.gauss(6 * 60 + 50, 12 if rajin else 25)
+    if rng.random() < (0.03 if rajin else 0.12):
+        menit += rng.expovariate(1 / 30)
+    menit = max(6 * 60, min(9 * 60, menit))
+    return dtime(int(menit // 60), int(menit % 60), rng.randrange(60))
+
+
+def _gps(rng: random.Random):
+    """Koordinat sekitar sekolah; sesekali jauh (anomali jarak)"""
+    jauh = rng.random() < 0.01
+    sebaran = 0.02 if jauh else 0.0004
+    lat = SEKOLAH_LAT + rng.gauss(0, sebaran)
+    lng = SEKOLAH_LNG + rng.gauss(0, sebaran)
+    jarak = int(((lat - SEKOLAH_LAT) ** 2 + (lng - SEKOLAH_LNG) ** 2) ** 0.5 * 111_000)
+    return round(lat, 8), round(lng, 8), jarak
+
+
+def generate(cursor, db, kelas_count: int, siswa_per_kelas: int, tahun: int,
+             seed: int = 42, batch: int = 5000, verbose: bool = True):
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    akhir = date.today()
+    mulai = akhir - timedelta(days=365 * tahun)
+
+    # ── Tahun ajaran ──
+    tahun_ajaran_id = None
+    for i in range(tahun):
+        th = mulai.year + i
+        cursor.execute(
+            "INSERT INTO tahun_ajaran (tahun, status, biaya_spp_default, hari_jatuh_tempo_spp, created_at, updated_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [f"{th}/{th + 1}", "aktif" if i == tahun - 1 else "tidak aktif", 250000, 10, now, now]
+        )
+        tahun_ajaran_id = cursor.lastrowid
+
+    # ── Settings ──
+    cursor.executemany(
+        "INSERT INTO settings (`key`, `value`, created_at, updated_at) VALUES (%s, %s, %s, %s)",
+        [(k, v, now, now) for k, v in SETTINGS.items()]
+    )
+
+    # ── Kelas ──
+    kelas_rows = []
+    rombel = {}
+    for i in range(kelas_count):
+        tingkat = 10 + i % 3
+        jurusan = JURUSAN[(i // 3) % len(JURUSAN)]
+        rombel[(tingkat, jurusan)] = rombel.get((tingkat, jurusan), 0) + 1
+        nama = f"{TINGKAT[tingkat]} {jurusan} {rombel[(tingkat, jurusan)]}"
+        wali = f"{rng.choice(NAMA_DEPAN)} {rng.choice(NAMA_BELAKANG)}, S.Pd"
+        kelas_rows.append((nama, tingkat, jurusan, wali, tahun_ajaran_id, now, now))
+    cursor.executemany(
+        "INSERT INTO kelas (nama, tingkat, jurusan, wali_kelas, tahun_ajaran_id, created_at, updated_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        kelas_rows
+    )
+    cursor.execute("SELECT id FROM kelas ORDER BY id")
+    kelas_ids = [r[0] for r in cursor.fetchall()]
+
+    # ── Siswa + penempatan ──
+    siswa_rows = []
+    n = 0
+    for kelas_id in kelas_ids:
+        for _ in range(siswa_per_kelas):
+            n += 1
+            nama = f"{rng.choice(NAMA_DEPAN)} {rng.choice(NAMA_DEPAN)} {rng.choice(NAMA_BELAKANG)}"
+            siswa_rows.append((
+                nama, f"{20000000 + n}", f"siswa{n}@bench.sch.id", "aktif",
+                f"Orang Tua {nama.split()[-1]}", f"0812{n:08d}", f"0813{n:08d}", now, now
+            ))
+    for i in range(0, len(siswa_rows), batch):
+        cursor.executemany(
+            "INSERT INTO siswa (nama, nis, email, status, nama_orang_tua, whatsapp_siswa, whatsapp_orang_tua, created_at, updated_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            siswa_rows[i:i + batch]
+        )
+    cursor.execute("SELECT id FROM siswa ORDER BY id")
+    siswa_ids = [r[0] for r in cursor.fetchall()]
+
+    anggota = {}
+    penempatan = []
+    for idx, siswa_id in enumerate(siswa_ids):
+        kelas_id = kelas_ids[idx // siswa_per_kelas]
+        anggota.setdefault(kelas_id, []).append(siswa_id)
+        penempatan.append((siswa_id, kelas_id, tahun_ajaran_id, "aktif", mulai, now, now))
+    for i in range(0, len(penempatan), batch):
+        cursor.executemany(
+            "INSERT INTO penempatan_kelas (siswa_id, kelas_id, tahun_ajaran_id, status, tanggal_mulai, created_at, updated_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            penempatan[i:i + batch]
+        )
+    db.commit()
+
+    # ── Absensi ──
+    profil = {sid: _profil_siswa(rng) for sid in siswa_ids}
+    hari = _hari_sekolah(mulai, akhir, rng)
+    sql = (
+        "INSERT INTO absensi (siswa_id, kelas_id, tanggal, status, metode, waktu_absen, "
+        "latitude, longitude, jarak_meter, created_at, updated_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+    )
+    rows = []
+    total = 0
+    t0 = time.perf_counter()
+    for tgl in hari:
+        for kelas_id, siswa_kelas in anggota.items():
+            # Sesekali satu kelompok siswa absen dari koordinat identik (titip absen)
+            titip = _gps(rng) if rng.random() < 0.002 else None
+            for siswa_id in siswa_kelas:
+                bobot = profil[siswa_id]
+                status = rng.choices(STATUS, weights=bobot)[0]
+                metode = rng.choices(METODE, weights=BOBOT_METODE)[0]
+                waktu = lat = lng = jarak = None
+                if status == "Hadir":
+                    waktu = _waktu_absen(rng, rajin=bobot[0] > 0.9)
+                    if metode != "manual" and rng.random() > 0.01:  # 1% GPS gagal terekam
+                        lat, lng, jarak = titip if titip and rng.random() < 0.3 else _gps(rng)
+                else:
+                    metode = "manual"
+                stamp = datetime.combine(tgl, waktu or dtime(7, 30))
+                rows.append((siswa_id, kelas_id, tgl, status, metode, waktu, lat, lng, jarak, stamp, stamp))
+
+                if len(rows) >= batch:
+                    cursor.executemany(sql, rows)
+                    db.commit()
+                    total += len(rows)
+                    rows = []
+                    if verbose and total % (batch * 20) == 0:
+                        laju = total / (time.perf_counter() - t0)
+                        print(f"   … {total:,} baris absensi ({laju:,.0f} baris/detik)")
+    if rows:
+        cursor.executemany(sql, rows)
+        db.commit()
+        total += len(rows)
+
+    return {
+        "kelas": len(kelas_ids),
+        "siswa": len(siswa_ids),
+        "hari_sekolah": len(hari),
+        "absensi": total,
+        "tanggal_mulai": mulai.isoformat(),
+        "tanggal_akhir": akhir.isoformat(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generator dataset sintetis absensi")
+    parser.add_argument("--database", required=True, help="nama database target (akan dikosongkan)")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="ukuran dataset siap pakai")
+    parser.add_argument("--kelas", type=int, help="jumlah kelas")
+    parser.add_argument("--siswa-per-kelas", type=int, help="jumlah siswa per kelas")
+    parser.add_argument("--tahun", type=int, help="lama riwayat absensi (tahun)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch", type=int, default=5000, help="baris per INSERT batch")
+    parser.add_argument("--create-schema", action="store_true", help="buat database + tabel dari struktursmksmartsis.sql")
+    parser.add_argument("--no-migrations", action="store_true", help="jangan jalankan migrations/*.sql saat --create-schema")
+    args = parser.parse_args()
+
+    if args.database == DB_CONFIG_DICT.get("database"):
+        parser.error("Database target sama dengan database di config.py — gunakan database terpisah")
+
+    ukuran = dict(PRESETS[args.preset or "sekolah"])
+    for key in ("kelas", "siswa_per_kelas", "tahun"):
+        if getattr(args, key) is not None:
+            ukuran[key] = getattr(args, key)
+
+    server_config = {k: v for k, v in DB_CONFIG_DICT.items() if k != "database"}
+    db = mysql.connector.connect(**server_config)
+    cursor = db.cursor()
+    try:
+        if args.create_schema:
+            cursor.execute(
+                f"CREATE DATABASE IF NOT EXISTS `{args.database}` "
+                "CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci"
+            )
+        cursor.execute(f"USE `{args.database}`")
+        if args.create_schema:
+            create_schema(cursor, with_migrations=not args.no_migrations)
+        kosongkan(cursor)
+        db.commit()
+
+        print(f"🏫 Generate dataset '{args.database}': {ukuran}")
+        t0 = time.perf_counter()
+        hasil = generate(
+            cursor, db,
+            kelas_count=ukuran["kelas"],
+            siswa_per_kelas=ukuran["siswa_per_kelas"],
+            tahun=ukuran["tahun"],
+            seed=args.seed,
+            batch=args.batch,
+        )
+        print(f"✅ Selesai dalam {time.perf_counter() - t0:.1f} detik: {hasil}")
+    finally:
+        cursor.close()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
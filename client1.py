@@ -5,8 +5,8 @@ import threading
 import webbrowser
 import tempfile
 from datetime import datetime
-from urllib.request import urlretrieve
-from urllib.error import URLError
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError, URLError
 from urllib.parse import quote
 import shutil
 
@@ -26,6 +26,37 @@ BASE_URL = f"http://{SERVER_HOST}:{SERVER_PORT}"
 # Local output directory (same machine as server)
 LOCAL_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
 
+# Download cache (server remote): file + ETag; re-download only when server returns 200 (not 304)
+DOWNLOAD_CACHE_DIR = os.path.join(tempfile.gettempdir(), "smartsis_downloads")
+
+
+def download_with_cache(url: str, filename: str) -> str:
+    """Download url into DOWNLOAD_CACHE_DIR using If-None-Match; return the cached file path."""
+    os.makedirs(DOWNLOAD_CACHE_DIR, exist_ok=True)
+    path = os.path.join(DOWNLOAD_CACHE_DIR, os.path.basename(filename))
+    etag_path = path + ".etag"
+    request = Request(url)
+    if os.path.exists(path) and os.path.exists(etag_path):
+        with open(etag_path, encoding="utf-8") as f:
+            request.add_header("If-None-Match", f.read().strip())
+    try:
+        with urlopen(request, timeout=60) as response:
+            tmp_path = path + ".part"
+            with open(tmp_path, "wb") as f:
+                shutil.copyfileobj(response, f)
+            os.replace(tmp_path, path)
+            etag = response.headers.get("ETag")
+    except HTTPError as e:
+        if e.code != 304:
+            raise
+        return path  # not modified: cached copy is current
+    if etag:
+        with open(etag_path, "w", encoding="utf-8") as f:
+            f.write(etag)
+    elif os.path.exists(etag_path):
+        os.remove(etag_path)
+    return path
+
 # ── Color palette ──
 BG_DARK = "#1e1e2e"       # main background
 SIDEBAR_BG = "#181825"     # sidebar / header
@@ -604,7 +635,7 @@ class ChatApp:
         url = f"{BASE_URL}/download/{encoded_name}"
 
         try:
-            urlretrieve(url, save_path)
+            shutil.copy2(download_with_cache(url, filename), save_path)
             self.display_system_message(f"File saved: {os.path.basename(save_path)}")
             if messagebox.askyesno("File Downloaded", f"File saved to:\n{save_path}\n\nOpen now?"):
                 os.startfile(save_path)
@@ -11,6 +11,54 @@ DB_CONFIG = {
     "password": "password_anda",
     "database": "smksmartsis"
 }
+DB_CONFIG_DICT = DB_CONFIG  # dipakai oleh db_functions.py
+
+# Connection pool (db_pool.py)
+DB_POOL_SIZE = 5             # koneksi idle yang dipertahankan
+DB_POOL_MAX_OVERFLOW = 10    # koneksi tambahan sementara saat ramai
+DB_POOL_TIMEOUT = 30         # detik menunggu koneksi kosong sebelum error
+DB_POOL_RECYCLE = 1800       # detik; koneksi idle lebih lama dari ini dibuat ulang
+DB_POOL_MAX_LIFETIME = 3600  # detik; umur maksimum satu koneksi
+DB_POOL_PRE_PING = True      # ping koneksi saat diambil dari pool
+
+# Async pool untuk endpoint dashboard di api.py (db_async.py, butuh aiomysql)
+ASYNC_DB_ENABLED = True      # False = pakai versi sync lewat thread pool
+ASYNC_DB_POOL_MIN = 1
+ASYNC_DB_POOL_MAX = 20
+
+# Cache hasil query read-only (tool_cache.py)
+TOOL_CACHE_ENABLED = True
+TOOL_CACHE_MAX_ENTRIES = 1024   # LRU; entry terlama dibuang jika penuh
+TOOL_CACHE_TTL_HARI_INI = 60    # detik; rentang yang mencakup hari ini / tanpa tanggal
+TOOL_CACHE_TTL_HISTORIS = 3600  # detik; rentang masa lalu (koreksi absensi lama terlihat setelah ini; None = sampai di-invalidate)
+
+# Index nama siswa/kelas in-memory (name_index.py)
+NAME_INDEX_ENABLED = True
+NAME_INDEX_REFRESH = 300          # detik; index dimuat ulang di background
+NAME_INDEX_FUZZY_THRESHOLD = 0.8  # kemiripan minimum (0-1) untuk nama yang typo
+
+# Tabel agregat absensi (rekap_absensi.py)
+# Aktifkan setelah menjalankan migrations/001_rekap_absensi.sql
+# Hard delete / edit yang memindahkan tanggal atau siswa baru rapi setelah
+# `python rekap_absensi.py --rebuild` (jadwalkan mis. tiap malam)
+REKAP_ABSENSI_ENABLED = False
+REKAP_ABSENSI_REFRESH = 60        # detik; refresh inkremental di background
+
+# Format hasil tool yang dikirim ke LLM (tool_result.py)
+TOOL_RESULT_FORMAT = "compact"   # "compact" = tabel ringkas; "json" = json.dumps(indent=2) lama
+TOOL_RESULT_MAX_ROWS = 50        # baris per tabel; sisanya diringkas jadi hitungan
+TOOL_RESULT_UKUR_TOKEN = True    # catat estimasi token json vs compact per tool di /metrics (hanya request yang disampel LOG_PAYLOAD_SAMPLE)
+
+# Tracing per fase agent (tracing.py) + endpoint /metrics di api.py
+TRACING_ENABLED = True
+TRACE_FILE = "logs/agent_traces.jsonl"  # satu baris JSON per span; None = tidak ditulis
+TRACE_OTLP_ENDPOINT = None              # mis. "http://localhost:4318" (collector OpenTelemetry)
+TRACE_SERVICE_NAME = "smartsis-agent"
+
+# Logging (logging_setup.py) — ditulis lewat queue oleh satu thread terpisah
+LOG_LEVEL = "INFO"          # DEBUG / INFO / WARNING / ERROR
+LOG_FILE = None             # mis. "logs/smartsis.log" (rotasi 10 MB × 5); None = hanya stderr
+LOG_PAYLOAD_SAMPLE = 10     # isi lengkap hasil tool & jawaban di-log untuk 1 dari N request (0 = tidak pernah)
 
 # ============================================
 # OLLAMA CONFIG
@@ -25,6 +73,84 @@ DB_CONFIG = {
 
 OLLAMA_MODEL = "qwen3:8b"
 OLLAMA_BASE_URL = "http://localhost:11434"
+OLLAMA_API_KEY = None              # isi jika Ollama berada di belakang proxy ber-token
+
+# Client Ollama (llm_client.py)
+OLLAMA_KEEP_ALIVE = "30m"          # lama model tetap dimuat setelah request terakhir; -1 = selamanya
+OLLAMA_TIMEOUT_CONNECT = 5         # detik
+OLLAMA_TIMEOUT_READ = 120          # detik menunggu data berikutnya (termasuk prefill prompt)
+OLLAMA_POOL_MAX_CONNECTIONS = 20
+OLLAMA_POOL_MAX_KEEPALIVE = 10
+OLLAMA_MAX_RETRIES = 2             # retry untuk error koneksi / 5xx (stream: sebelum token pertama)
+OLLAMA_RETRY_BACKOFF = 0.5         # detik; dikali 2 setiap percobaan + jitter
+OLLAMA_WARMUP = True               # muat model di background saat api.py start
+OLLAMA_WARMUP_MODELS = None        # daftar model yang di-warm-up; None = [OLLAMA_MODEL]
+
+# Antrian LLM (llm_queue.py) — satu Ollama lokal melambat jika dipaksa paralel
+LLM_MAX_CONCURRENT = 2              # panggilan Ollama bersamaan per model (samakan dengan OLLAMA_NUM_PARALLEL)
+LLM_MAX_CONCURRENT_PER_MODEL = {}   # override per model, mis. {"qwen3:4b": 4}
+LLM_MAX_QUEUE = 32                  # chat yang boleh menunggu; lebih dari ini → HTTP 429
+LLM_QUEUE_TIMEOUT = 120             # detik maksimum menunggu slot
+LLM_CHAT_WORKERS = 34               # thread khusus chat (≥ LLM_MAX_CONCURRENT + LLM_MAX_QUEUE)
+
+# Cache jawaban agent (response_cache.py) — dibuang otomatis jika data absensi di scope-nya berubah
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_MAX_ENTRIES = 500
+RESPONSE_CACHE_TTL = 600            # detik; batas umur jawaban walau data tidak berubah
+RESPONSE_CACHE_EMBED_MODEL = None   # mis. "nomic-embed-text"; None = kemiripan kata (Jaccard)
+RESPONSE_CACHE_MIN_COSINE = 0.9     # kemiripan embedding minimum untuk pertanyaan "sama"
+RESPONSE_CACHE_MIN_JACCARD = 0.6    # kemiripan kata minimum jika tanpa embedding
+
+# Intent router (intent_router.py) — pertanyaan berpola tetap langsung ke tool tanpa LLM
+INTENT_ROUTER_ENABLED = True
+INTENT_ROUTER_TEMPLATE = True       # True = jawaban dari template (tanpa LLM); False = LLM merangkai hasil tool
+INTENT_ROUTER_DEFAULT_HARI = 30     # rentang default (hari) untuk tool yang wajib tanggal_mulai/akhir
+
+# Seleksi tool (tool_selection.py) — hanya schema tool relevan yang dikirim ke LLM
+TOOL_SELECTION_ENABLED = True
+TOOL_SELECTION_TOP_K = 6            # tool maksimum per pertanyaan (ukur: benchmarks/bench_tool_selection.py)
+TOOL_SELECTION_MIN_SKOR = 1.0       # skor tertinggi di bawah ini → kirim seluruh tool
+TOOL_SELECTION_SELALU = ["cari_siswa"]  # tool yang selalu ikut
+TOOL_SELECTION_EMBED_MODEL = None   # mis. "nomic-embed-text"; None = skor kata kunci
+
+# Riwayat chat (history_budget.py) — pesan lama diringkas agar prompt tidak terus membesar
+HISTORY_MAX_TOKENS = 1500           # anggaran token (perkiraan) untuk ringkasan + pesan terbaru
+HISTORY_MAX_TOKEN_PESAN = 300       # pesan lama yang lebih panjang dipotong
+HISTORY_MAX_PESAN = 20              # pesan terbaru maksimum yang dikirim apa adanya
+HISTORY_SUMMARY_ENABLED = True      # ringkas pesan lama dengan LLM di background; False = ekstraktif saja
+HISTORY_SUMMARY_MODEL = None        # model untuk meringkas; None = OLLAMA_MODEL
+HISTORY_SUMMARY_CACHE = 256         # ringkasan yang disimpan (per prefix percakapan)
+
+# Sesi chat di server (session_store.py) — client cukup mengirim pesan baru + session_id
+SESSION_MAX = 1000                  # sesi in-memory maksimum (LRU)
+SESSION_TTL = 8 * 3600              # detik sejak aktivitas terakhir sebelum sesi dihapus
+SESSION_MAX_PESAN = 100             # pesan maksimum per sesi
+SESSION_DIR = None                  # mis. "data/sessions" untuk menyimpan sesi ke disk; None = memori saja
+
+# Settings sekolah (kop surat PDF) di-cache per proses
+SETTINGS_CACHE_TTL = 60             # detik tanpa query; setelahnya hanya versi settings yang dicek
+
+# Surat peringatan massal (pdf_generator.generate_surat_peringatan_batch)
+PDF_BATCH_WORKERS = None            # proses render paralel untuk mode per-siswa; None = jumlah CPU
+PDF_BATCH_MIN_PARALEL = 20          # di bawah jumlah surat ini dirender di proses yang sama
+
+# Job background render PDF (job_queue.py) — tool PDF langsung mengembalikan job_id
+JOB_QUEUE_ENABLED = True            # False = PDF dirender langsung di dalam tool call
+JOB_DB_PATH = "data/jobs.sqlite3"   # antrian job (SQLite)
+JOB_WORKERS = 2                     # worker process render PDF
+JOB_MAX_ATTEMPTS = 2                # percobaan maksimum per job
+JOB_TIMEOUT = 600                   # detik; job "proses" lebih lama dari ini diambil ulang (worker mati)
+JOB_POLL_INTERVAL = 2.0             # detik; worker idle memeriksa antrian
+JOB_RETENSI = 7 * 24 * 3600         # detik; job selesai/gagal yang lebih lama dihapus
+
+# Cache file PDF di output/ (output_cache.py) — input yang sama tidak dirender ulang
+OUTPUT_CACHE_ENABLED = True         # False = selalu render ulang (file tetap dicatat & dibersihkan)
+OUTPUT_MAX_BYTES = 500 * 1024 * 1024  # total ukuran folder output; file terlama dipakai dibuang dulu
+OUTPUT_MAX_AGE = 30 * 24 * 3600     # detik sejak terakhir dipakai sebelum file dibuang
+
+# Agent
+AGENT_TOOL_WORKERS = 4       # maks tool call yang dijalankan paralel per pertanyaan
+AGENT_MAX_TOOL_ROUNDS = 3    # maks putaran tool calling sebelum LLM wajib menjawab
 
 # ============================================
 # SYSTEM PROMPT
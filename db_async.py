@@ -0,0 +1,776 @@
+# db_async.py
+# Varian asyncio dari query db_functions untuk endpoint dashboard di api.py
+#
+# Memakai aiomysql dengan pool sendiri, sehingga handler FastAPI bisa
+# langsung `await` tanpa menghabiskan thread di executor.
+# Versi sync (db_functions.py) tetap dipakai oleh agent.py dan CLI.
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Optional, List, Dict, Any
+
+import config
+from config import DB_CONFIG_DICT
+from db_functions import (
+    _susun_attendance_trends,
+    _susun_geolocation_analysis,
+    _susun_perbandingan_kelas,
+    _susun_laporan_kepsek,
+    _susun_laporan_guru_harian,
+    siswa_index,
+    kelas_index,
+    rekap,
+)
+import rekap_absensi
+from tool_cache import cached_tool
+
+try:
+    import aiomysql
+except ImportError:  # aiomysql opsional; api.py fallback ke thread pool
+    aiomysql = None
+
+
+ASYNC_DB_AVAILABLE = aiomysql is not None and getattr(config, "ASYNC_DB_ENABLED", True)
+
+_pool = None
+_pool_lock: Optional[asyncio.Lock] = None
+
+
+# ============================================
+# POOL
+# ============================================
+
+async def get_pool():
+    """Buat (sekali) dan kembalikan pool aiomysql"""
+    global _pool, _pool_lock
+    if _pool is not None:
+        return _pool
+    if aiomysql is None:
+        raise RuntimeError("aiomysql belum terinstall (pip install aiomysql)")
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+
+    async with _pool_lock:
+        if _pool is None:
+            cfg = DB_CONFIG_DICT
+            _pool = await aiomysql.create_pool(
+                host=cfg.get("host", "localhost"),
+                port=int(cfg.get("port", 3306)),
+                user=cfg.get("user"),
+                password=cfg.get("password", ""),
+                db=cfg.get("database"),
+                charset=cfg.get("charset", "utf8mb4"),
+                minsize=getattr(config, "ASYNC_DB_POOL_MIN", 1),
+                maxsize=getattr(config, "ASYNC_DB_POOL_MAX", 20),
+                pool_recycle=getattr(config, "DB_POOL_RECYCLE", 1800),
+                # autocommit agar setiap query membaca snapshot terbaru
+                autocommit=True,
+            )
+    return _pool
+
+
+async def close_pool():
+    """Tutup pool aiomysql (dipanggil saat shutdown FastAPI)"""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+
+@asynccontextmanager
+async def db_cursor():
+    """Context manager cursor dict dari pool aiomysql"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            yield cursor
+
+
+async def _fetchall(cursor, query: str, params=None) -> List[Dict[str, Any]]:
+    await cursor.execute(query, params or [])
+    return list(await cursor.fetchall())
+
+
+async def _fetchone(cursor, query: str, params=None) -> Optional[Dict[str, Any]]:
+    await cursor.execute(query, params or [])
+    return await cursor.fetchone()
+
+
+async def _resolve_siswa_id(cursor, nama_siswa: str) -> Optional[int]:
+    """Cari siswa_id berdasarkan nama (index dulu, fallback LIKE search). Return ID jika ditemukan tepat 1."""
+    siswa_id = siswa_index.resolve(nama_siswa)
+    if siswa_id is not None:
+        return siswa_id
+    rows = await _fetchall(
+        cursor,
+        "SELECT id FROM siswa WHERE nama LIKE %s AND deleted_at IS NULL LIMIT 2",
+        [f"%{nama_siswa}%"]
+    )
+    if len(rows) == 1:
+        return rows[0]["id"]
+    return None
+
+
+async def _resolve_kelas_id(cursor, nama_kelas: str) -> Optional[int]:
+    """Cari kelas_id berdasarkan nama (index dulu, fallback LIKE search). Return ID jika ditemukan tepat 1."""
+    kelas_id = kelas_index.resolve(nama_kelas)
+    if kelas_id is not None:
+        return kelas_id
+    rows = await _fetchall(
+        cursor,
+        "SELECT id FROM kelas WHERE nama LIKE %s AND deleted_at IS NULL LIMIT 2",
+        [f"%{nama_kelas}%"]
+    )
+    if len(rows) == 1:
+        return rows[0]["id"]
+    return None
+
+
+def _error_siswa(nama_siswa: str) -> Dict[str, str]:
+    return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
+
+
+def _error_kelas(nama_kelas: str) -> Dict[str, str]:
+    return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
+
+
+_ERROR_KELAS_WAJIB = {"error": "Harus menyertakan kelas_id atau nama_kelas"}
+_ERROR_RANGE_WAJIB = {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
+
+
+# ============================================
+# LOOKUP
+# ============================================
+
+@cached_tool
+async def get_daftar_kelas() -> List[Dict[str, Any]]:
+    """Ambil daftar semua kelas aktif (id, nama, tingkat, jurusan, wali_kelas)"""
+    async with db_cursor() as cursor:
+        return await _fetchall(cursor, """
+            SELECT k.id, k.nama, k.tingkat, k.jurusan, k.wali_kelas
+            FROM kelas k
+            WHERE k.deleted_at IS NULL
+            ORDER BY k.tingkat ASC, k.nama ASC
+        """)
+
+
+@cached_tool
+async def cari_siswa(nama: str) -> List[Dict[str, Any]]:
+    """Cari siswa berdasarkan nama (pencarian parsial, toleran typo lewat index)"""
+    hasil = siswa_index.search(nama, limit=10)
+    if hasil is not None:
+        return hasil
+    async with db_cursor() as cursor:
+        return await _fetchall(cursor, """
+            SELECT s.id, s.nama, s.nis, s.status,
+                   k.nama AS kelas
+            FROM siswa s
+            LEFT JOIN penempatan_kelas pk ON pk.siswa_id = s.id AND pk.status = 'aktif'
+            LEFT JOIN kelas k ON pk.kelas_id = k.id
+            WHERE s.nama LIKE %s AND s.deleted_at IS NULL
+            ORDER BY s.nama
+            LIMIT 10
+        """, [f"%{nama}%"])
+
+
+@cached_tool
+async def get_absensi_by_siswa(
+    siswa_id: Optional[int] = None,
+    nama_siswa: Optional[str] = None,
+    tanggal_mulai: Optional[str] = None,
+    tanggal_akhir: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Ambil data absensi berdasarkan siswa (bisa pakai ID atau nama)"""
+    async with db_cursor() as cursor:
+        if not siswa_id and nama_siswa:
+            siswa_id = await _resolve_siswa_id(cursor, nama_siswa)
+            if not siswa_id:
+                return [_error_siswa(nama_siswa)]
+
+        if not siswa_id:
+            return [{"error": "Harus menyertakan siswa_id atau nama_siswa"}]
+
+        query = """
+            SELECT
+                s.nama AS nama_siswa,
+                s.nis,
+                k.nama AS kelas,
+                a.tanggal,
+                a.status
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            JOIN kelas k ON a.kelas_id = k.id
+            WHERE a.siswa_id = %s
+        """
+        params = [siswa_id]
+
+        if tanggal_mulai and tanggal_akhir:
+            query += " AND a.tanggal BETWEEN %s AND %s"
+            params.extend([tanggal_mulai, tanggal_akhir])
+
+        query += " ORDER BY a.tanggal DESC LIMIT 50"
+        return await _fetchall(cursor, query, params)
+
+
+# ============================================
+# ANALISIS & DASHBOARD
+# ============================================
+
+@cached_tool
+async def get_attendance_trends(
+    siswa_id: Optional[int] = None,
+    nama_siswa: Optional[str] = None,
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    months: int = 6
+) -> Dict[str, Any]:
+    """Tren kehadiran per bulan untuk siswa atau kelas (versi async)"""
+    async with db_cursor() as cursor:
+        if not siswa_id and nama_siswa:
+            siswa_id = await _resolve_siswa_id(cursor, nama_siswa)
+            if not siswa_id:
+                return _error_siswa(nama_siswa)
+
+        if not kelas_id and nama_kelas:
+            kelas_id = await _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return _error_kelas(nama_kelas)
+
+        if siswa_id:
+            kolom, nilai = "a.siswa_id", siswa_id
+        elif kelas_id:
+            kolom, nilai = "a.kelas_id", kelas_id
+        else:
+            return {"error": "Harus menyertakan siswa_id/nama_siswa atau kelas_id/nama_kelas"}
+
+        if rekap.siap():
+            monthly_data = await _fetchall(cursor, *rekap_absensi.sql_trends(siswa_id, kelas_id, months))
+        else:
+            monthly_data = await _fetchall(cursor, f"""
+                SELECT
+                    YEAR(a.tanggal) AS tahun,
+                    MONTH(a.tanggal) AS bulan,
+                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                    COUNT(*) AS total_hari,
+                    ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
+                FROM absensi a
+                WHERE {kolom} = %s
+                GROUP BY YEAR(a.tanggal), MONTH(a.tanggal)
+                ORDER BY tahun DESC, bulan DESC
+                LIMIT %s
+            """, [nilai, months])
+
+    return _susun_attendance_trends(monthly_data, months)
+
+
+@cached_tool
+async def get_geolocation_analysis(
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    tanggal: Optional[str] = None
+) -> Dict[str, Any]:
+    """Analisis geolokasi absensi (versi async)"""
+    async with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = await _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return _error_kelas(nama_kelas)
+
+        query = """
+            SELECT
+                a.id,
+                s.nama AS nama_siswa,
+                s.nis,
+                k.nama AS kelas,
+                a.tanggal,
+                a.latitude,
+                a.longitude,
+                a.status
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            JOIN kelas k ON a.kelas_id = k.id
+            WHERE a.latitude IS NOT NULL AND a.longitude IS NOT NULL
+        """
+        params = []
+
+        if kelas_id:
+            query += " AND a.kelas_id = %s"
+            params.append(kelas_id)
+
+        if tanggal:
+            query += " AND a.tanggal = %s"
+            params.append(tanggal)
+
+        query += " ORDER BY a.tanggal DESC, k.nama, s.nama LIMIT 100"
+        records = await _fetchall(cursor, query, params)
+
+    return _susun_geolocation_analysis(records)
+
+
+@cached_tool
+async def compare_class_attendance(
+    tingkat: Optional[int] = None,
+    jurusan: Optional[str] = None
+) -> Dict[str, Any]:
+    """Perbandingan kehadiran antar kelas (versi async)"""
+    query = """
+        SELECT
+            k.id AS kelas_id,
+            k.nama AS kelas,
+            COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+            COUNT(*) AS total_hari,
+            ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
+        FROM absensi a
+        JOIN kelas k ON a.kelas_id = k.id
+        WHERE 1=1
+    """
+    params = []
+
+    if tingkat:
+        query += " AND k.tingkat = %s"
+        params.append(tingkat)
+
+    if jurusan:
+        query += " AND k.jurusan = %s"
+        params.append(jurusan)
+
+    query += """
+        GROUP BY k.id, k.nama
+        HAVING total_hari > 0
+        ORDER BY persen_hadir DESC
+    """
+
+    if rekap.siap():
+        query, params = rekap_absensi.sql_perbandingan_kelas(tingkat, jurusan)
+
+    async with db_cursor() as cursor:
+        class_stats = await _fetchall(cursor, query, params)
+
+    return _susun_perbandingan_kelas(class_stats, tingkat, jurusan)
+
+
+@cached_tool
+async def get_top_siswa_absensi(
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    tanggal_mulai: str = "",
+    tanggal_akhir: str = "",
+    status: str = "Alfa",
+    limit: int = 10
+) -> Dict[str, Any]:
+    """Top siswa dengan jumlah status tertentu pada rentang tanggal (versi async)"""
+    async with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = await _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return _error_kelas(nama_kelas)
+
+        if not tanggal_mulai or not tanggal_akhir:
+            return dict(_ERROR_RANGE_WAJIB)
+
+        where_clauses = ["a.tanggal BETWEEN %s AND %s", "a.status = %s"]
+        params = [tanggal_mulai, tanggal_akhir, status]
+
+        if kelas_id:
+            where_clauses.append("a.kelas_id = %s")
+            params.append(kelas_id)
+
+        params.append(limit)
+
+        rows = await _fetchall(cursor, f"""
+            SELECT
+                s.id AS siswa_id,
+                s.nama AS nama_siswa,
+                s.nis,
+                k.nama AS kelas,
+                COUNT(*) AS total
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            LEFT JOIN kelas k ON a.kelas_id = k.id
+            WHERE {' AND '.join(where_clauses)}
+            GROUP BY s.id, s.nama, s.nis, k.nama
+            HAVING total > 0
+            ORDER BY total DESC, s.nama ASC
+            LIMIT %s
+        """, params)
+
+    return {
+        "kelas_id": kelas_id,
+        "tanggal_mulai": tanggal_mulai,
+        "tanggal_akhir": tanggal_akhir,
+        "status": status,
+        "limit": limit,
+        "data": rows
+    }
+
+
+@cached_tool
+async def get_analisis_metode_absen(
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    tanggal_mulai: str = "",
+    tanggal_akhir: str = ""
+) -> Dict[str, Any]:
+    """Analisis metode absen per kelas pada rentang tanggal (versi async)"""
+    async with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = await _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return _error_kelas(nama_kelas)
+
+        if not kelas_id:
+            return dict(_ERROR_KELAS_WAJIB)
+
+        if not tanggal_mulai or not tanggal_akhir:
+            return dict(_ERROR_RANGE_WAJIB)
+
+        rows = await _fetchall(cursor, """
+            SELECT
+                a.metode,
+                COUNT(*) AS total,
+                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
+                COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
+                COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
+                ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
+            FROM absensi a
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+            GROUP BY a.metode
+            ORDER BY total DESC, a.metode ASC
+        """, [kelas_id, tanggal_mulai, tanggal_akhir])
+
+    return {
+        "kelas_id": kelas_id,
+        "tanggal_mulai": tanggal_mulai,
+        "tanggal_akhir": tanggal_akhir,
+        "data": rows
+    }
+
+
+@cached_tool
+async def get_anomali_absensi(
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    tanggal_mulai: str = "",
+    tanggal_akhir: str = "",
+    max_jarak_meter: int = 200,
+    min_siswa_sama_koordinat: int = 4,
+    limit: int = 100
+) -> Dict[str, Any]:
+    """Deteksi anomali absensi / geolokasi (versi async)"""
+    async with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = await _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return _error_kelas(nama_kelas)
+
+        if not kelas_id:
+            return dict(_ERROR_KELAS_WAJIB)
+
+        if not tanggal_mulai or not tanggal_akhir:
+            return dict(_ERROR_RANGE_WAJIB)
+
+        # 1) Jarak terlalu jauh
+        far_distance = await _fetchall(cursor, """
+            SELECT
+                a.id,
+                a.tanggal,
+                s.nama AS nama_siswa,
+                s.nis,
+                a.status,
+                a.metode,
+                a.waktu_absen,
+                a.jarak_meter,
+                a.latitude,
+                a.longitude
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.jarak_meter IS NOT NULL
+              AND a.jarak_meter > %s
+            ORDER BY a.jarak_meter DESC, a.tanggal DESC
+            LIMIT %s
+        """, [kelas_id, tanggal_mulai, tanggal_akhir, max_jarak_meter, limit])
+
+        # 2) Metode non-manual tapi koordinat kosong
+        missing_geolocation = await _fetchall(cursor, """
+            SELECT
+                a.id,
+                a.tanggal,
+                s.nama AS nama_siswa,
+                s.nis,
+                a.status,
+                a.metode,
+                a.waktu_absen,
+                a.latitude,
+                a.longitude
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.metode <> 'manual'
+              AND (a.latitude IS NULL OR a.longitude IS NULL)
+            ORDER BY a.tanggal DESC, s.nama ASC
+            LIMIT %s
+        """, [kelas_id, tanggal_mulai, tanggal_akhir, limit])
+
+        # 3) Banyak siswa dengan koordinat identik di tanggal yang sama
+        groups = await _fetchall(cursor, """
+            SELECT
+                a.tanggal,
+                a.latitude,
+                a.longitude,
+                COUNT(*) AS jumlah_siswa
+            FROM absensi a
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.latitude IS NOT NULL
+              AND a.longitude IS NOT NULL
+            GROUP BY a.tanggal, a.latitude, a.longitude
+            HAVING jumlah_siswa >= %s
+            ORDER BY jumlah_siswa DESC, a.tanggal DESC
+            LIMIT 20
+        """, [kelas_id, tanggal_mulai, tanggal_akhir, min_siswa_sama_koordinat])
+
+        suspicious_shared_coordinates = []
+        for g in groups:
+            siswa_list = await _fetchall(cursor, """
+                SELECT
+                    s.nama AS nama_siswa,
+                    s.nis,
+                    a.status,
+                    a.metode,
+                    a.waktu_absen
+                FROM absensi a
+                JOIN siswa s ON a.siswa_id = s.id
+                WHERE a.kelas_id = %s
+                  AND a.tanggal = %s
+                  AND a.latitude = %s
+                  AND a.longitude = %s
+                ORDER BY s.nama ASC
+                LIMIT 15
+            """, [kelas_id, g["tanggal"], g["latitude"], g["longitude"]])
+            suspicious_shared_coordinates.append({
+                "tanggal": g["tanggal"],
+                "latitude": g["latitude"],
+                "longitude": g["longitude"],
+                "jumlah_siswa": g["jumlah_siswa"],
+                "sampel_siswa": siswa_list
+            })
+
+    return {
+        "kelas_id": kelas_id,
+        "tanggal_mulai": tanggal_mulai,
+        "tanggal_akhir": tanggal_akhir,
+        "max_jarak_meter": max_jarak_meter,
+        "min_siswa_sama_koordinat": min_siswa_sama_koordinat,
+        "far_distance": far_distance,
+        "missing_geolocation": missing_geolocation,
+        "suspicious_shared_coordinates": suspicious_shared_coordinates
+    }
+
+
+@cached_tool
+async def get_statistik_waktu_absen(
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    tanggal_mulai: str = "",
+    tanggal_akhir: str = "",
+    jam_telat: str = "07:15:00",
+    limit: int = 10
+) -> Dict[str, Any]:
+    """Statistik waktu_absen per kelas pada rentang tanggal (versi async)"""
+    async with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = await _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return _error_kelas(nama_kelas)
+
+        if not kelas_id:
+            return dict(_ERROR_KELAS_WAJIB)
+
+        if not tanggal_mulai or not tanggal_akhir:
+            return dict(_ERROR_RANGE_WAJIB)
+
+        distribusi_per_jam = await _fetchall(cursor, """
+            SELECT
+                HOUR(a.waktu_absen) AS jam,
+                COUNT(*) AS total
+            FROM absensi a
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.waktu_absen IS NOT NULL
+            GROUP BY HOUR(a.waktu_absen)
+            ORDER BY jam ASC
+        """, [kelas_id, tanggal_mulai, tanggal_akhir])
+
+        total_telat_row = await _fetchone(cursor, """
+            SELECT
+                COUNT(*) AS total_telat
+            FROM absensi a
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.status = 'Hadir'
+              AND a.waktu_absen IS NOT NULL
+              AND a.waktu_absen > %s
+        """, [kelas_id, tanggal_mulai, tanggal_akhir, jam_telat]) or {"total_telat": 0}
+
+        top_telat = await _fetchall(cursor, """
+            SELECT
+                s.id AS siswa_id,
+                s.nama AS nama_siswa,
+                s.nis,
+                COUNT(*) AS total_telat,
+                MAX(a.waktu_absen) AS telat_terparah
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.status = 'Hadir'
+              AND a.waktu_absen IS NOT NULL
+              AND a.waktu_absen > %s
+            GROUP BY s.id, s.nama, s.nis
+            ORDER BY total_telat DESC, telat_terparah DESC
+            LIMIT %s
+        """, [kelas_id, tanggal_mulai, tanggal_akhir, jam_telat, limit])
+
+    return {
+        "kelas_id": kelas_id,
+        "tanggal_mulai": tanggal_mulai,
+        "tanggal_akhir": tanggal_akhir,
+        "jam_telat": jam_telat,
+        "distribusi_per_jam": distribusi_per_jam,
+        "total_telat": total_telat_row["total_telat"],
+        "top_telat": top_telat
+    }
+
+
+# ============================================
+# LAPORAN STRUCTURED: KEPSEK & GURU
+# ============================================
+
+@cached_tool
+async def get_laporan_kepsek_range(
+    tanggal_mulai: str = "",
+    tanggal_akhir: str = "",
+    tingkat: Optional[int] = None,
+    jurusan: Optional[str] = None,
+    threshold_kehadiran: float = 85.0
+) -> Dict[str, Any]:
+    """Laporan ringkasan range lintas kelas untuk kepala sekolah (versi async)"""
+    if not tanggal_mulai or not tanggal_akhir:
+        return dict(_ERROR_RANGE_WAJIB)
+
+    filter_sql = ""
+    filter_params: list = []
+    if tingkat:
+        filter_sql += " AND k.tingkat = %s"
+        filter_params.append(tingkat)
+    if jurusan:
+        filter_sql += " AND k.jurusan = %s"
+        filter_params.append(jurusan)
+
+    agregat = rekap.siap() and rekap_absensi.sql_ranking_kelas(tanggal_mulai, tanggal_akhir, tingkat, jurusan)
+    if agregat:
+        async with db_cursor() as cursor:
+            ranking_kelas = await _fetchall(cursor, *agregat)
+            hari_row = await _fetchone(cursor, *rekap_absensi.sql_hari_tercatat(tanggal_mulai, tanggal_akhir))
+            siswa_unik = rekap_absensi.sql_siswa_unik(tanggal_mulai, tanggal_akhir, tingkat, jurusan)
+            siswa_row = await _fetchone(cursor, *siswa_unik) if siswa_unik else None
+        return _susun_laporan_kepsek(
+            ranking_kelas,
+            hari_row["hari"] if hari_row else 0,
+            siswa_row["jml"] if siswa_row else 0,
+            tanggal_mulai, tanggal_akhir, tingkat, jurusan, threshold_kehadiran
+        )
+
+    async with db_cursor() as cursor:
+        ranking_kelas = await _fetchall(cursor, f"""
+            SELECT
+                k.id   AS kelas_id,
+                k.nama AS kelas,
+                COUNT(*) AS total_record,
+                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                COUNT(CASE WHEN a.status = 'Izin'  THEN 1 END) AS izin,
+                COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
+                COUNT(CASE WHEN a.status = 'Alfa'  THEN 1 END) AS alfa,
+                ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 2) AS persen_hadir
+            FROM absensi a
+            JOIN kelas k ON a.kelas_id = k.id
+            WHERE a.tanggal BETWEEN %s AND %s{filter_sql}
+            GROUP BY k.id, k.nama
+            HAVING total_record > 0
+            ORDER BY persen_hadir DESC
+        """, [tanggal_mulai, tanggal_akhir, *filter_params])
+
+        hari_row = await _fetchone(
+            cursor,
+            "SELECT COUNT(DISTINCT tanggal) AS hari FROM absensi WHERE tanggal BETWEEN %s AND %s",
+            [tanggal_mulai, tanggal_akhir]
+        )
+        total_hari_tercatat = hari_row["hari"] if hari_row else 0
+
+        siswa_row = await _fetchone(
+            cursor,
+            "SELECT COUNT(DISTINCT siswa_id) AS jml FROM absensi a JOIN kelas k ON a.kelas_id = k.id "
+            f"WHERE a.tanggal BETWEEN %s AND %s{filter_sql}",
+            [tanggal_mulai, tanggal_akhir, *filter_params]
+        )
+        total_siswa = siswa_row["jml"] if siswa_row else 0
+
+    return _susun_laporan_kepsek(
+        ranking_kelas, total_hari_tercatat, total_siswa,
+        tanggal_mulai, tanggal_akhir, tingkat, jurusan, threshold_kehadiran
+    )
+
+
+@cached_tool
+async def get_laporan_guru_harian(
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    tanggal: Optional[str] = None
+) -> Dict[str, Any]:
+    """Laporan absensi harian detail per kelas untuk guru/wali kelas (versi async)"""
+    async with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = await _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return _error_kelas(nama_kelas)
+
+        if not kelas_id:
+            return dict(_ERROR_KELAS_WAJIB)
+
+        if not tanggal:
+            tanggal = date.today().isoformat()
+
+        kelas_row = await _fetchone(cursor, "SELECT nama FROM kelas WHERE id = %s LIMIT 1", [kelas_id])
+        kelas_nama = kelas_row["nama"] if kelas_row else None
+
+        siswa_aktif = await _fetchall(cursor, """
+            SELECT s.id AS siswa_id, s.nama, s.nis
+            FROM penempatan_kelas pk
+            JOIN siswa s ON pk.siswa_id = s.id
+            WHERE pk.kelas_id = %s AND pk.status = 'aktif'
+                  AND s.deleted_at IS NULL
+            ORDER BY s.nama
+        """, [kelas_id])
+
+        records = await _fetchall(cursor, """
+            SELECT
+                a.siswa_id,
+                s.nis,
+                s.nama,
+                a.status,
+                a.metode,
+                a.waktu_absen
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            WHERE a.kelas_id = %s AND a.tanggal = %s
+            ORDER BY s.nama
+        """, [kelas_id, tanggal])
+
+    return _susun_laporan_guru_harian(kelas_id, kelas_nama, tanggal, siswa_aktif, records)
@@ -1,19 +1,126 @@
 # db_functions.py
 # Fungsi-fungsi SQL query untuk mengambil data absensi
 
-import mysql.connector
+import config
+import threading
+import time
+from contextlib import contextmanager
 from datetime import date
 from typing import Optional, List, Dict, Any
 from config import DB_CONFIG_DICT
+from db_pool import ConnectionPool
+from tool_cache import cached_tool, tool_cache
+from name_index import NameIndex
+import rekap_absensi
+
+
+# ============================================
+# CONNECTION POOL
+# ============================================
+_pool = ConnectionPool(
+    DB_CONFIG_DICT,
+    pool_size=getattr(config, "DB_POOL_SIZE", 5),
+    max_overflow=getattr(config, "DB_POOL_MAX_OVERFLOW", 10),
+    timeout=getattr(config, "DB_POOL_TIMEOUT", 30),
+    recycle=getattr(config, "DB_POOL_RECYCLE", 1800),
+    max_lifetime=getattr(config, "DB_POOL_MAX_LIFETIME", 3600),
+    pre_ping=getattr(config, "DB_POOL_PRE_PING", True),
+)
 
 
 def get_db_connection():
-    """Buat koneksi baru ke database"""
-    return mysql.connector.connect(**DB_CONFIG_DICT)
+    """Ambil koneksi dari pool. Panggil db.close() untuk mengembalikannya ke pool."""
+    return _pool.connect()
+
+
+@contextmanager
+def db_cursor(dictionary: bool = True):
+    """
+    Context manager cursor + koneksi dari pool.
+    Cursor ditutup dan koneksi dikembalikan ke pool walaupun terjadi
+    return lebih awal atau exception di dalam blok `with`.
+    """
+    db = get_db_connection()
+    try:
+        cursor = db.cursor(dictionary=dictionary)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+    finally:
+        db.close()
+
+
+def get_pool_stats() -> Dict[str, int]:
+    """Statistik connection pool (idle, checked_out, overflow, dll)"""
+    return _pool.stats()
+
+
+# ============================================
+# TABEL AGREGAT ABSENSI (rekap_absensi.py)
+# ============================================
+def _invalidate_cache_rekap(tanggal_list: Optional[List[date]]):
+    """Buang cache laporan historis yang datanya baru dikoreksi"""
+    if tanggal_list is None:
+        tool_cache.invalidate()
+        return
+    today = date.today()
+    for tgl in tanggal_list:
+        # Entry yang mencakup hari ini sudah ber-TTL pendek
+        if tgl < today:
+            tool_cache.invalidate(tanggal=tgl)
+
+
+rekap = rekap_absensi.RekapAbsensi(
+    get_db_connection,
+    refresh_interval=getattr(config, "REKAP_ABSENSI_REFRESH", 60),
+    enabled=getattr(config, "REKAP_ABSENSI_ENABLED", False),
+    on_refresh=_invalidate_cache_rekap,
+)
+
+
+# ============================================
+# INDEX NAMA (siswa & kelas)
+# ============================================
+def _load_index_siswa() -> List[Dict[str, Any]]:
+    """Semua siswa aktif + kelas aktifnya (kolom sama dengan cari_siswa)"""
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT s.id, s.nama, s.nis, s.status,
+                   k.nama AS kelas
+            FROM siswa s
+            LEFT JOIN penempatan_kelas pk ON pk.siswa_id = s.id AND pk.status = 'aktif'
+            LEFT JOIN kelas k ON pk.kelas_id = k.id
+            WHERE s.deleted_at IS NULL
+        """)
+        return cursor.fetchall()
+
+
+def _load_index_kelas() -> List[Dict[str, Any]]:
+    with db_cursor() as cursor:
+        cursor.execute("SELECT id, nama FROM kelas WHERE deleted_at IS NULL")
+        return cursor.fetchall()
+
+
+siswa_index = NameIndex(
+    _load_index_siswa,
+    refresh_interval=getattr(config, "NAME_INDEX_REFRESH", 300),
+    fuzzy_threshold=getattr(config, "NAME_INDEX_FUZZY_THRESHOLD", 0.8),
+    enabled=getattr(config, "NAME_INDEX_ENABLED", True),
+)
+kelas_index = NameIndex(
+    _load_index_kelas,
+    refresh_interval=getattr(config, "NAME_INDEX_REFRESH", 300),
+    fuzzy_threshold=getattr(config, "NAME_INDEX_FUZZY_THRESHOLD", 0.8),
+    enabled=getattr(config, "NAME_INDEX_ENABLED", True),
+)
 
 
 def _resolve_siswa_id(cursor, nama_siswa: str) -> Optional[int]:
-    """Cari siswa_id berdasarkan nama (LIKE search). Return ID jika ditemukan tepat 1."""
+    """Cari siswa_id berdasarkan nama (index dulu, fallback LIKE search). Return ID jika ditemukan tepat 1."""
+    siswa_id = siswa_index.resolve(nama_siswa)
+    if siswa_id is not None:
+        return siswa_id
     cursor.execute(
         "SELECT id FROM siswa WHERE nama LIKE %s AND deleted_at IS NULL LIMIT 2",
         [f"%{nama_siswa}%"]
@@ -25,7 +132,10 @@ def _resolve_siswa_id(cursor, nama_siswa: str) -> Optional[int]:
 
 
 def _resolve_kelas_id(cursor, nama_kelas: str) -> Optional[int]:
-    """Cari kelas_id berdasarkan nama (LIKE search). Return ID jika ditemukan tepat 1."""
+    """Cari kelas_id berdasarkan nama (index dulu, fallback LIKE search). Return ID jika ditemukan tepat 1."""
+    kelas_id = kelas_index.resolve(nama_kelas)
+    if kelas_id is not None:
+        return kelas_id
     cursor.execute(
         "SELECT id FROM kelas WHERE nama LIKE %s AND deleted_at IS NULL LIMIT 2",
         [f"%{nama_kelas}%"]
@@ -36,83 +146,75 @@ def _resolve_kelas_id(cursor, nama_kelas: str) -> Optional[int]:
     return None
 
 
+@cached_tool
 def get_daftar_kelas() -> List[Dict[str, Any]]:
     """Ambil daftar semua kelas aktif (id, nama, tingkat, jurusan, wali_kelas)"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
-    cursor.execute("""
-        SELECT k.id, k.nama, k.tingkat, k.jurusan, k.wali_kelas
-        FROM kelas k
-        WHERE k.deleted_at IS NULL
-        ORDER BY k.tingkat ASC, k.nama ASC
-    """)
-    result = cursor.fetchall()
-    cursor.close()
-    db.close()
-    return result
-
-
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT k.id, k.nama, k.tingkat, k.jurusan, k.wali_kelas
+            FROM kelas k
+            WHERE k.deleted_at IS NULL
+            ORDER BY k.tingkat ASC, k.nama ASC
+        """)
+        result = cursor.fetchall()
+        return result
+
+
+@cached_tool
 def cari_siswa(nama: str) -> List[Dict[str, Any]]:
-    """Cari siswa berdasarkan nama (pencarian parsial)"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
-
-    query = """
-        SELECT s.id, s.nama, s.nis, s.status,
-               k.nama AS kelas
-        FROM siswa s
-        LEFT JOIN penempatan_kelas pk ON pk.siswa_id = s.id AND pk.status = 'aktif'
-        LEFT JOIN kelas k ON pk.kelas_id = k.id
-        WHERE s.nama LIKE %s AND s.deleted_at IS NULL
-        ORDER BY s.nama
-        LIMIT 10
-    """
-    cursor.execute(query, [f"%{nama}%"])
-    result = cursor.fetchall()
+    """Cari siswa berdasarkan nama (pencarian parsial, toleran typo lewat index)"""
+    hasil = siswa_index.search(nama, limit=10)
+    if hasil is not None:
+        return hasil
+    with db_cursor() as cursor:
+        query = """
+            SELECT s.id, s.nama, s.nis, s.status,
+                   k.nama AS kelas
+            FROM siswa s
+            LEFT JOIN penempatan_kelas pk ON pk.siswa_id = s.id AND pk.status = 'aktif'
+            LEFT JOIN kelas k ON pk.kelas_id = k.id
+            WHERE s.nama LIKE %s AND s.deleted_at IS NULL
+            ORDER BY s.nama
+            LIMIT 10
+        """
+        cursor.execute(query, [f"%{nama}%"])
+        result = cursor.fetchall()
 
-    cursor.close()
-    db.close()
-    return result
+        return result
 
 
+@cached_tool
 def get_siswa_by_kelas(
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """Ambil daftar siswa dalam satu kelas (bisa pakai ID atau nama kelas)"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return [{"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}]
 
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
         if not kelas_id:
-            cursor.close()
-            db.close()
-            return [{"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}]
+            return [{"error": "Harus menyertakan kelas_id atau nama_kelas"}]
 
-    if not kelas_id:
-        cursor.close()
-        db.close()
-        return [{"error": "Harus menyertakan kelas_id atau nama_kelas"}]
-
-    query = """
-        SELECT s.id, s.nama, s.nis, s.status,
-               k.nama AS kelas
-        FROM penempatan_kelas pk
-        JOIN siswa s ON pk.siswa_id = s.id
-        JOIN kelas k ON pk.kelas_id = k.id
-        WHERE pk.kelas_id = %s AND pk.status = 'aktif'
-              AND s.deleted_at IS NULL
-        ORDER BY s.nama
-    """
-    cursor.execute(query, [kelas_id])
-    result = cursor.fetchall()
+        query = """
+            SELECT s.id, s.nama, s.nis, s.status,
+                   k.nama AS kelas
+            FROM penempatan_kelas pk
+            JOIN siswa s ON pk.siswa_id = s.id
+            JOIN kelas k ON pk.kelas_id = k.id
+            WHERE pk.kelas_id = %s AND pk.status = 'aktif'
+                  AND s.deleted_at IS NULL
+            ORDER BY s.nama
+        """
+        cursor.execute(query, [kelas_id])
+        result = cursor.fetchall()
 
-    cursor.close()
-    db.close()
-    return result
+        return result
 
 
+@cached_tool
 def get_absensi_by_siswa(
     siswa_id: Optional[int] = None,
     nama_siswa: Optional[str] = None,
@@ -120,277 +222,146 @@ def get_absensi_by_siswa(
     tanggal_akhir: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """Ambil data absensi berdasarkan siswa (bisa pakai ID atau nama)"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not siswa_id and nama_siswa:
+            siswa_id = _resolve_siswa_id(cursor, nama_siswa)
+            if not siswa_id:
+                return [{"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}]
 
-    if not siswa_id and nama_siswa:
-        siswa_id = _resolve_siswa_id(cursor, nama_siswa)
         if not siswa_id:
-            cursor.close()
-            db.close()
-            return [{"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}]
+            return [{"error": "Harus menyertakan siswa_id atau nama_siswa"}]
 
-    if not siswa_id:
-        cursor.close()
-        db.close()
-        return [{"error": "Harus menyertakan siswa_id atau nama_siswa"}]
-
-    query = """
-        SELECT 
-            s.nama AS nama_siswa,
-            s.nis,
-            k.nama AS kelas,
-            a.tanggal,
-            a.status
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        JOIN kelas k ON a.kelas_id = k.id
-        WHERE a.siswa_id = %s
-    """
-    params = [siswa_id]
+        query = """
+            SELECT 
+                s.nama AS nama_siswa,
+                s.nis,
+                k.nama AS kelas,
+                a.tanggal,
+                a.status
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            JOIN kelas k ON a.kelas_id = k.id
+            WHERE a.siswa_id = %s
+        """
+        params = [siswa_id]
 
-    if tanggal_mulai and tanggal_akhir:
-        query += " AND a.tanggal BETWEEN %s AND %s"
-        params.extend([tanggal_mulai, tanggal_akhir])
+        if tanggal_mulai and tanggal_akhir:
+            query += " AND a.tanggal BETWEEN %s AND %s"
+            params.extend([tanggal_mulai, tanggal_akhir])
 
-    query += " ORDER BY a.tanggal DESC LIMIT 50"
-    cursor.execute(query, params)
-    result = cursor.fetchall()
+        query += " ORDER BY a.tanggal DESC LIMIT 50"
+        cursor.execute(query, params)
+        result = cursor.fetchall()
 
-    cursor.close()
-    db.close()
-    return result
+        return result
 
 
+@cached_tool
 def get_absensi_by_kelas(
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None,
     tanggal: str = ""
 ) -> List[Dict[str, Any]]:
     """Ambil data absensi seluruh siswa dalam satu kelas (bisa pakai ID atau nama kelas)"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return [{"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}]
 
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
         if not kelas_id:
-            cursor.close()
-            db.close()
-            return [{"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}]
+            return [{"error": "Harus menyertakan kelas_id atau nama_kelas"}]
 
-    if not kelas_id:
-        cursor.close()
-        db.close()
-        return [{"error": "Harus menyertakan kelas_id atau nama_kelas"}]
-
-    if not tanggal:
-        tanggal = date.today().isoformat()
-
-    query = """
-        SELECT 
-            s.nama AS nama_siswa,
-            s.nis,
-            a.status
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        WHERE a.kelas_id = %s AND a.tanggal = %s
-        ORDER BY s.nama
-    """
-    cursor.execute(query, [kelas_id, tanggal])
-    result = cursor.fetchall()
+        if not tanggal:
+            tanggal = date.today().isoformat()
+
+        query = """
+            SELECT 
+                s.nama AS nama_siswa,
+                s.nis,
+                a.status
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            WHERE a.kelas_id = %s AND a.tanggal = %s
+            ORDER BY s.nama
+        """
+        cursor.execute(query, [kelas_id, tanggal])
+        result = cursor.fetchall()
 
-    cursor.close()
-    db.close()
-    return result
+        return result
 
 
+@cached_tool
 def get_siswa_tidak_hadir(
     tanggal: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None
 ) -> List[Dict[str, Any]]:
-    """Ambil daftar siswa yang tidak hadir"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
-
-    if not tanggal:
-        tanggal = date.today().isoformat()
-
-    query = """
-        SELECT 
-            s.nama AS nama_siswa,
-            s.nis,
-            k.nama AS kelas,
-            a.status
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        JOIN kelas k ON a.kelas_id = k.id
-        WHERE a.tanggal = %s AND a.status != 'Hadir'
-    """
-    params = [tanggal]
-
-    if status:
-        query += " AND a.status = %s"
-        params.append(status)
+    """Ambil daftar siswa yang tidak hadir (opsional hanya satu kelas, bisa pakai ID atau nama kelas)"""
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return [{"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}]
 
-    query += " ORDER BY k.nama, s.nama"
-    cursor.execute(query, params)
-    result = cursor.fetchall()
+        if not tanggal:
+            tanggal = date.today().isoformat()
 
-    cursor.close()
-    db.close()
-    return result
-
-
-def get_rekap_absensi(
-    siswa_id: Optional[int] = None,
-    nama_siswa: Optional[str] = None,
-    bulan: Optional[int] = None,
-    tahun: Optional[int] = None
-) -> Optional[Dict[str, Any]]:
-    """Hitung rekap absensi siswa (bisa pakai ID atau nama)"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
-
-    if not siswa_id and nama_siswa:
-        siswa_id = _resolve_siswa_id(cursor, nama_siswa)
-        if not siswa_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
-
-    if not siswa_id:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan siswa_id atau nama_siswa"}
-
-    query = """
-        SELECT 
-            s.nama AS nama_siswa,
-            s.nis,
-            COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS total_hadir,
-            COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS total_sakit,
-            COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS total_izin,
-            COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS total_alfa,
-            COUNT(*) AS total_hari
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        WHERE a.siswa_id = %s
-    """
-    params = [siswa_id]
-
-    if bulan:
-        query += " AND MONTH(a.tanggal) = %s"
-        params.append(bulan)
-    if tahun:
-        query += " AND YEAR(a.tanggal) = %s"
-        params.append(tahun)
-
-    query += " GROUP BY s.id, s.nama, s.nis"
-    cursor.execute(query, params)
-    result = cursor.fetchone()
-
-    cursor.close()
-    db.close()
-    return result
-
-
-def get_rekap_absensi_bulanan(
-    nama_siswa: Optional[str] = None,
-    siswa_id: Optional[int] = None,
-    tahun: Optional[int] = None
-) -> Dict[str, Any]:
-    """Rekap absensi siswa per bulan, diurutkan berdasarkan bulan"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
-
-    if not siswa_id and nama_siswa:
-        siswa_id = _resolve_siswa_id(cursor, nama_siswa)
-        if not siswa_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
-
-    if not siswa_id:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan siswa_id atau nama_siswa"}
-
-    # Ambil info siswa
-    cursor.execute("""
-        SELECT s.nama, s.nis, k.nama AS kelas
-        FROM siswa s
-        LEFT JOIN penempatan_kelas pk ON pk.siswa_id = s.id AND pk.status = 'aktif'
-        LEFT JOIN kelas k ON pk.kelas_id = k.id
-        WHERE s.id = %s
-    """, [siswa_id])
-    info_siswa = cursor.fetchone()
-
-    # Rekap per bulan
-    query = """
-        SELECT
-            YEAR(a.tanggal) AS tahun,
-            MONTH(a.tanggal) AS bulan,
-            COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
-            COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
-            COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
-            COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
-            COUNT(*) AS total_hari,
-            ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
-        FROM absensi a
-        WHERE a.siswa_id = %s
-    """
-    params = [siswa_id]
+        query = """
+            SELECT 
+                s.nama AS nama_siswa,
+                s.nis,
+                k.nama AS kelas,
+                a.status
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            JOIN kelas k ON a.kelas_id = k.id
+            WHERE a.tanggal = %s AND a.status != 'Hadir'
+        """
+        params = [tanggal]
 
-    if tahun:
-        query += " AND YEAR(a.tanggal) = %s"
-        params.append(tahun)
+        if status:
+            query += " AND a.status = %s"
+            params.append(status)
 
-    query += " GROUP BY YEAR(a.tanggal), MONTH(a.tanggal) ORDER BY tahun, bulan"
-    cursor.execute(query, params)
-    rekap_bulanan = cursor.fetchall()
+        if kelas_id:
+            query += " AND a.kelas_id = %s"
+            params.append(kelas_id)
 
-    cursor.close()
-    db.close()
+        query += " ORDER BY k.nama, s.nama"
+        cursor.execute(query, params)
+        result = cursor.fetchall()
 
-    return {
-        "siswa": info_siswa,
-        "rekap_per_bulan": rekap_bulanan
-    }
+        return result
 
 
-def get_persentase_kehadiran(
+@cached_tool
+def get_rekap_absensi(
     siswa_id: Optional[int] = None,
     nama_siswa: Optional[str] = None,
-    kelas_id: Optional[int] = None,
-    nama_kelas: Optional[str] = None,
     bulan: Optional[int] = None,
     tahun: Optional[int] = None
 ) -> Optional[Dict[str, Any]]:
-    """Hitung persentase kehadiran siswa atau kelas"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    """Hitung rekap absensi siswa (bisa pakai ID atau nama)"""
+    with db_cursor() as cursor:
+        if not siswa_id and nama_siswa:
+            siswa_id = _resolve_siswa_id(cursor, nama_siswa)
+            if not siswa_id:
+                return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
 
-    if not siswa_id and nama_siswa:
-        siswa_id = _resolve_siswa_id(cursor, nama_siswa)
         if not siswa_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
+            return {"error": "Harus menyertakan siswa_id atau nama_siswa"}
 
-    if not kelas_id and not siswa_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
-        if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
-
-    if siswa_id:
         query = """
             SELECT 
                 s.nama AS nama_siswa,
-                ROUND(
-                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 2
-                ) AS persentase_kehadiran
+                s.nis,
+                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS total_hadir,
+                COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS total_sakit,
+                COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS total_izin,
+                COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS total_alfa,
+                COUNT(*) AS total_hari
             FROM absensi a
             JOIN siswa s ON a.siswa_id = s.id
             WHERE a.siswa_id = %s
@@ -404,81 +375,208 @@ def get_persentase_kehadiran(
             query += " AND YEAR(a.tanggal) = %s"
             params.append(tahun)
 
+        query += " GROUP BY s.id, s.nama, s.nis"
         cursor.execute(query, params)
         result = cursor.fetchone()
 
-    elif kelas_id:
-        query = """
-            SELECT 
-                k.nama AS kelas,
-                ROUND(
-                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 2
-                ) AS persentase_kehadiran
-            FROM absensi a
-            JOIN kelas k ON a.kelas_id = k.id
-            WHERE a.kelas_id = %s
-        """
-        params = [kelas_id]
+        return result
 
-        if bulan:
-            query += " AND MONTH(a.tanggal) = %s"
-            params.append(bulan)
-        if tahun:
-            query += " AND YEAR(a.tanggal) = %s"
-            params.append(tahun)
 
-        cursor.execute(query, params)
-        result = cursor.fetchone()
+@cached_tool
+def get_rekap_absensi_bulanan(
+    nama_siswa: Optional[str] = None,
+    siswa_id: Optional[int] = None,
+    tahun: Optional[int] = None
+) -> Dict[str, Any]:
+    """Rekap absensi siswa per bulan, diurutkan berdasarkan bulan"""
+    with db_cursor() as cursor:
+        if not siswa_id and nama_siswa:
+            siswa_id = _resolve_siswa_id(cursor, nama_siswa)
+            if not siswa_id:
+                return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
 
-    else:
-        # Seluruh sekolah — persentase kehadiran global
+        if not siswa_id:
+            return {"error": "Harus menyertakan siswa_id atau nama_siswa"}
+
+        # Ambil info siswa
+        cursor.execute("""
+            SELECT s.nama, s.nis, k.nama AS kelas
+            FROM siswa s
+            LEFT JOIN penempatan_kelas pk ON pk.siswa_id = s.id AND pk.status = 'aktif'
+            LEFT JOIN kelas k ON pk.kelas_id = k.id
+            WHERE s.id = %s
+        """, [siswa_id])
+        info_siswa = cursor.fetchone()
+
+        # Rekap per bulan
         query = """
-            SELECT 
-                'Seluruh Sekolah' AS scope,
-                COUNT(DISTINCT a.siswa_id) AS total_siswa,
-                COUNT(*) AS total_record,
-                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS total_hadir,
-                COUNT(CASE WHEN a.status = 'Izin' THEN 1 END) AS total_izin,
-                COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS total_sakit,
-                COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END) AS total_alfa,
-                ROUND(
-                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 2
-                ) AS persentase_kehadiran
+            SELECT
+                YEAR(a.tanggal) AS tahun,
+                MONTH(a.tanggal) AS bulan,
+                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
+                COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
+                COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
+                COUNT(*) AS total_hari,
+                ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
             FROM absensi a
-            WHERE 1=1
+            WHERE a.siswa_id = %s
         """
-        params = []
+        params = [siswa_id]
 
-        if bulan:
-            query += " AND MONTH(a.tanggal) = %s"
-            params.append(bulan)
         if tahun:
             query += " AND YEAR(a.tanggal) = %s"
             params.append(tahun)
 
+        query += " GROUP BY YEAR(a.tanggal), MONTH(a.tanggal) ORDER BY tahun, bulan"
         cursor.execute(query, params)
-        result = cursor.fetchone()
+        rekap_bulanan = cursor.fetchall()
 
-    cursor.close()
-    db.close()
-    return result
+        return {
+            "siswa": info_siswa,
+            "rekap_per_bulan": rekap_bulanan
+        }
+
+
+@cached_tool
+def get_persentase_kehadiran(
+    siswa_id: Optional[int] = None,
+    nama_siswa: Optional[str] = None,
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    bulan: Optional[int] = None,
+    tahun: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
+    """Hitung persentase kehadiran siswa atau kelas"""
+    with db_cursor() as cursor:
+        if not siswa_id and nama_siswa:
+            siswa_id = _resolve_siswa_id(cursor, nama_siswa)
+            if not siswa_id:
+                return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
+
+        if not kelas_id and not siswa_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
+
+        if siswa_id:
+            query = """
+                SELECT 
+                    s.nama AS nama_siswa,
+                    ROUND(
+                        COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 2
+                    ) AS persentase_kehadiran
+                FROM absensi a
+                JOIN siswa s ON a.siswa_id = s.id
+                WHERE a.siswa_id = %s
+            """
+            params = [siswa_id]
+
+            if bulan:
+                query += " AND MONTH(a.tanggal) = %s"
+                params.append(bulan)
+            if tahun:
+                query += " AND YEAR(a.tanggal) = %s"
+                params.append(tahun)
+
+            cursor.execute(query, params)
+            result = cursor.fetchone()
+
+        elif kelas_id:
+            query = """
+                SELECT 
+                    k.nama AS kelas,
+                    ROUND(
+                        COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 2
+                    ) AS persentase_kehadiran
+                FROM absensi a
+                JOIN kelas k ON a.kelas_id = k.id
+                WHERE a.kelas_id = %s
+            """
+            params = [kelas_id]
+
+            if bulan:
+                query += " AND MONTH(a.tanggal) = %s"
+                params.append(bulan)
+            if tahun:
+                query += " AND YEAR(a.tanggal) = %s"
+                params.append(tahun)
+
+            cursor.execute(query, params)
+            result = cursor.fetchone()
+
+        else:
+            # Seluruh sekolah — persentase kehadiran global
+            query = """
+                SELECT 
+                    'Seluruh Sekolah' AS scope,
+                    COUNT(DISTINCT a.siswa_id) AS total_siswa,
+                    COUNT(*) AS total_record,
+                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS total_hadir,
+                    COUNT(CASE WHEN a.status = 'Izin' THEN 1 END) AS total_izin,
+                    COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS total_sakit,
+                    COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END) AS total_alfa,
+                    ROUND(
+                        COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 2
+                    ) AS persentase_kehadiran
+                FROM absensi a
+                WHERE 1=1
+            """
+            params = []
+
+            if bulan:
+                query += " AND MONTH(a.tanggal) = %s"
+                params.append(bulan)
+            if tahun:
+                query += " AND YEAR(a.tanggal) = %s"
+                params.append(tahun)
+
+            cursor.execute(query, params)
+            result = cursor.fetchone()
+
+        return result
+
+
+# Settings sekolah jarang berubah; dipakai di setiap PDF (kop, kepala sekolah)
+SETTINGS_CACHE_TTL = getattr(config, "SETTINGS_CACHE_TTL", 60)
+
+_settings_cache: Dict[str, Any] = {"versi": None, "data": None, "dicek": 0.0}
+_settings_lock = threading.Lock()
+
+
+def _versi_settings(cursor) -> tuple:
+    """Versi isi tabel settings (berubah jika baris ditambah/dihapus/di-update lewat aplikasi)"""
+    cursor.execute("SELECT COUNT(*) AS jumlah, MAX(id) AS id_max, MAX(updated_at) AS terakhir FROM settings")
+    row = cursor.fetchone()
+    return (row["jumlah"], row["id_max"], row["terakhir"])
 
 
 def get_school_settings() -> Dict[str, str]:
-    """Ambil info sekolah dari tabel settings"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    """
+    Ambil info sekolah dari tabel settings.
+    Di-cache per proses: dalam SETTINGS_CACHE_TTL detik tanpa query sama sekali;
+    setelahnya hanya versi settings yang dicek dan isinya dimuat ulang jika berubah.
+    """
+    with _settings_lock:
+        data, versi_lama = _settings_cache["data"], _settings_cache["versi"]
+        if data is not None and time.monotonic() - _settings_cache["dicek"] < SETTINGS_CACHE_TTL:
+            return dict(data)
 
-    cursor.execute("SELECT `key`, `value` FROM settings")
-    rows = cursor.fetchall()
+    with db_cursor() as cursor:
+        versi = _versi_settings(cursor)
+        if data is None or versi != versi_lama:
+            cursor.execute("SELECT `key`, `value` FROM settings")
+            data = {row["key"]: row["value"] or "" for row in cursor.fetchall()}
+
+    with _settings_lock:
+        _settings_cache.update(versi=versi, data=data, dicek=time.monotonic())
+    return dict(data)
 
-    cursor.close()
-    db.close()
 
-    settings = {}
-    for row in rows:
-        settings[row["key"]] = row["value"] or ""
-    return settings
+def invalidate_school_settings():
+    """Paksa settings dimuat ulang pada pemanggilan berikutnya (mis. setelah edit langsung di DB)"""
+    with _settings_lock:
+        _settings_cache.update(versi=None, data=None, dicek=0.0)
 
 
 def get_data_alfa_siswa(
@@ -486,97 +584,83 @@ def get_data_alfa_siswa(
     siswa_id: Optional[int] = None
 ) -> Dict[str, Any]:
     """Ambil data lengkap siswa yang alfa: info siswa, daftar tanggal alfa, dan rekap kehadiran"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not siswa_id and nama_siswa:
+            siswa_id = _resolve_siswa_id(cursor, nama_siswa)
+            if not siswa_id:
+                return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
 
-    if not siswa_id and nama_siswa:
-        siswa_id = _resolve_siswa_id(cursor, nama_siswa)
         if not siswa_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
-
-    if not siswa_id:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan siswa_id atau nama_siswa"}
-
-    # Info siswa + kelas
-    cursor.execute("""
-        SELECT s.nama, s.nis, s.nama_orang_tua, s.whatsapp_orang_tua,
-               k.nama AS kelas
-        FROM siswa s
-        LEFT JOIN penempatan_kelas pk ON pk.siswa_id = s.id AND pk.status = 'aktif'
-        LEFT JOIN kelas k ON pk.kelas_id = k.id
-        WHERE s.id = %s
-    """, [siswa_id])
-    info = cursor.fetchone()
-
-    # Daftar tanggal alfa
-    cursor.execute("""
-        SELECT a.tanggal
-        FROM absensi a
-        WHERE a.siswa_id = %s AND a.status = 'Alfa'
-        ORDER BY a.tanggal
-    """, [siswa_id])
-    daftar_alfa = [row["tanggal"] for row in cursor.fetchall()]
-
-    # Rekap kehadiran total
-    cursor.execute("""
-        SELECT
-            COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS total_hadir,
-            COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS total_sakit,
-            COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS total_izin,
-            COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS total_alfa,
-            COUNT(*) AS total_hari
-        FROM absensi a
-        WHERE a.siswa_id = %s
-    """, [siswa_id])
-    rekap = cursor.fetchone()
-
-    cursor.close()
-    db.close()
-
-    persen = 0.0
-    if rekap and rekap["total_hari"] > 0:
-        persen = round(rekap["total_hadir"] * 100.0 / rekap["total_hari"], 1)
+            return {"error": "Harus menyertakan siswa_id atau nama_siswa"}
+
+        # Info siswa + kelas
+        cursor.execute("""
+            SELECT s.nama, s.nis, s.nama_orang_tua, s.whatsapp_orang_tua,
+                   k.nama AS kelas
+            FROM siswa s
+            LEFT JOIN penempatan_kelas pk ON pk.siswa_id = s.id AND pk.status = 'aktif'
+            LEFT JOIN kelas k ON pk.kelas_id = k.id
+            WHERE s.id = %s
+        """, [siswa_id])
+        info = cursor.fetchone()
+
+        # Daftar tanggal alfa
+        cursor.execute("""
+            SELECT a.tanggal
+            FROM absensi a
+            WHERE a.siswa_id = %s AND a.status = 'Alfa'
+            ORDER BY a.tanggal
+        """, [siswa_id])
+        daftar_alfa = [row["tanggal"] for row in cursor.fetchall()]
 
-    return {
-        "siswa": info,
-        "daftar_tanggal_alfa": daftar_alfa,
-        "rekap": rekap,
-        "persentase_kehadiran": persen
-    }
+        # Rekap kehadiran total
+        cursor.execute("""
+            SELECT
+                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS total_hadir,
+                COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS total_sakit,
+                COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS total_izin,
+                COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS total_alfa,
+                COUNT(*) AS total_hari
+            FROM absensi a
+            WHERE a.siswa_id = %s
+        """, [siswa_id])
+        rekap = cursor.fetchone()
+
+        persen = 0.0
+        if rekap and rekap["total_hari"] > 0:
+            persen = round(rekap["total_hadir"] * 100.0 / rekap["total_hari"], 1)
+
+        return {
+            "siswa": info,
+            "daftar_tanggal_alfa": daftar_alfa,
+            "rekap": rekap,
+            "persentase_kehadiran": persen
+        }
 
 
 def get_data_alfa_harian(
     tanggal: Optional[str] = None
 ) -> Dict[str, Any]:
     """Ambil daftar semua siswa yang alfa pada tanggal tertentu"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
-
-    if not tanggal:
-        tanggal = date.today().isoformat()
-
-    cursor.execute("""
-        SELECT s.nama AS nama_siswa, s.nis, k.nama AS kelas
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        JOIN kelas k ON a.kelas_id = k.id
-        WHERE a.tanggal = %s AND a.status = 'Alfa'
-        ORDER BY k.nama, s.nama
-    """, [tanggal])
-    daftar = cursor.fetchall()
+    with db_cursor() as cursor:
+        if not tanggal:
+            tanggal = date.today().isoformat()
 
-    cursor.close()
-    db.close()
+        cursor.execute("""
+            SELECT s.nama AS nama_siswa, s.nis, k.nama AS kelas
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            JOIN kelas k ON a.kelas_id = k.id
+            WHERE a.tanggal = %s AND a.status = 'Alfa'
+            ORDER BY k.nama, s.nama
+        """, [tanggal])
+        daftar = cursor.fetchall()
 
-    return {
-        "tanggal": tanggal,
-        "total": len(daftar),
-        "daftar_siswa": daftar
-    }
+        return {
+            "tanggal": tanggal,
+            "total": len(daftar),
+            "daftar_siswa": daftar
+        }
 
 
 def buat_surat_peringatan_alfa(
@@ -604,72 +688,137 @@ def buat_surat_peringatan_alfa(
     }
 
 
-def get_attendance_trends(
-    siswa_id: Optional[int] = None,
-    nama_siswa: Optional[str] = None,
+def get_data_alfa_batch(
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None,
-    months: int = 6
+    tingkat: Optional[int] = None,
+    tanggal_mulai: Optional[str] = None,
+    tanggal_akhir: Optional[str] = None,
+    min_alfa: int = 3
 ) -> Dict[str, Any]:
-    """Analyze attendance trends for a student or class over multiple months to identify patterns and improvements/deteriorations"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    """
+    Data surat peringatan untuk semua siswa dengan alfa >= min_alfa pada rentang tanggal.
+    Dua query berbasis himpunan (bukan 3 query per siswa seperti get_data_alfa_siswa):
+    rekap + info siswa sekaligus, lalu semua tanggal alfa siswa yang lolos.
+    """
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
+
+        # Default: awal bulan ini s.d. hari ini (surat akhir bulan)
+        if not tanggal_akhir:
+            tanggal_akhir = date.today().isoformat()
+        if not tanggal_mulai:
+            tanggal_mulai = date.fromisoformat(tanggal_akhir).replace(day=1).isoformat()
+
+        where_clauses = ["a.tanggal BETWEEN %s AND %s"]
+        params = [tanggal_mulai, tanggal_akhir]
+        if kelas_id:
+            where_clauses.append("a.kelas_id = %s")
+            params.append(kelas_id)
+        if tingkat:
+            where_clauses.append("k.tingkat = %s")
+            params.append(tingkat)
+        params.append(min_alfa)
+
+        # Info siswa + rekap periode untuk siswa yang memenuhi ambang alfa
+        cursor.execute(f"""
+            SELECT
+                s.id AS siswa_id, s.nama, s.nis, s.nama_orang_tua, s.whatsapp_orang_tua,
+                MAX(k.nama) AS kelas,
+                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS total_hadir,
+                COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS total_sakit,
+                COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS total_izin,
+                COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS total_alfa,
+                COUNT(*) AS total_hari
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            LEFT JOIN kelas k ON a.kelas_id = k.id
+            WHERE {' AND '.join(where_clauses)}
+            GROUP BY s.id, s.nama, s.nis, s.nama_orang_tua, s.whatsapp_orang_tua
+            HAVING total_alfa >= %s
+            ORDER BY kelas, s.nama
+        """, params)
+        rows = cursor.fetchall()
+
+        # Semua tanggal alfa siswa tersebut dalam satu query
+        tanggal_alfa: Dict[int, List[Any]] = {row["siswa_id"]: [] for row in rows}
+        if rows:
+            placeholder = ", ".join(["%s"] * len(rows))
+            cursor.execute(f"""
+                SELECT a.siswa_id, a.tanggal
+                FROM absensi a
+                WHERE a.status = 'Alfa' AND a.tanggal BETWEEN %s AND %s
+                  AND a.siswa_id IN ({placeholder})
+                ORDER BY a.siswa_id, a.tanggal
+            """, [tanggal_mulai, tanggal_akhir, *tanggal_alfa])
+            for row in cursor.fetchall():
+                tanggal_alfa[row["siswa_id"]].append(row["tanggal"])
+
+        daftar = []
+        for row in rows:
+            rekap = {k: row[k] for k in ("total_hadir", "total_sakit", "total_izin", "total_alfa", "total_hari")}
+            persen = round(rekap["total_hadir"] * 100.0 / rekap["total_hari"], 1) if rekap["total_hari"] else 0.0
+            daftar.append({
+                "siswa": {k: row[k] for k in ("siswa_id", "nama", "nis", "nama_orang_tua", "whatsapp_orang_tua", "kelas")},
+                "daftar_tanggal_alfa": tanggal_alfa[row["siswa_id"]],
+                "rekap": rekap,
+                "persentase_kehadiran": persen,
+                "periode": (tanggal_mulai, tanggal_akhir),
+            })
 
-    # Resolve student ID if name provided
-    if not siswa_id and nama_siswa:
-        siswa_id = _resolve_siswa_id(cursor, nama_siswa)
-        if not siswa_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
+        return {
+            "kelas_id": kelas_id,
+            "tingkat": tingkat,
+            "tanggal_mulai": tanggal_mulai,
+            "tanggal_akhir": tanggal_akhir,
+            "min_alfa": min_alfa,
+            "daftar": daftar
+        }
 
-    # Resolve class ID if name provided
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
-        if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
 
-    # Build query based on whether we're analyzing student or class
-    if siswa_id:
-        query = """
-            SELECT
-                YEAR(a.tanggal) AS tahun,
-                MONTH(a.tanggal) AS bulan,
-                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
-                COUNT(*) AS total_hari,
-                ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
-            FROM absensi a
-            WHERE a.siswa_id = %s
-            GROUP BY YEAR(a.tanggal), MONTH(a.tanggal)
-            ORDER BY tahun DESC, bulan DESC
-            LIMIT %s
-        """
-        params = [siswa_id, months]
-    elif kelas_id:
-        query = """
-            SELECT
-                YEAR(a.tanggal) AS tahun,
-                MONTH(a.tanggal) AS bulan,
-                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
-                COUNT(*) AS total_hari,
-                ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
-            FROM absensi a
-            WHERE a.kelas_id = %s
-            GROUP BY YEAR(a.tanggal), MONTH(a.tanggal)
-            ORDER BY tahun DESC, bulan DESC
-            LIMIT %s
-        """
-        params = [kelas_id, months]
-    else:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan siswa_id/nama_siswa atau kelas_id/nama_kelas"}
+def buat_surat_peringatan_alfa_batch(
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    tingkat: Optional[int] = None,
+    tanggal_mulai: Optional[str] = None,
+    tanggal_akhir: Optional[str] = None,
+    min_alfa: int = 3,
+    gabung: bool = True
+) -> Dict[str, Any]:
+    """Buat surat peringatan PDF untuk semua siswa yang alfa >= min_alfa (satu PDF gabungan atau per siswa) + manifest"""
+    from pdf_generator import generate_surat_peringatan_batch
+
+    data = get_data_alfa_batch(
+        kelas_id=kelas_id, nama_kelas=nama_kelas, tingkat=tingkat,
+        tanggal_mulai=tanggal_mulai, tanggal_akhir=tanggal_akhir, min_alfa=min_alfa,
+    )
+    if "error" in data:
+        return data
+
+    periode = f"{data['tanggal_mulai']} s.d. {data['tanggal_akhir']}"
+    if not data["daftar"]:
+        return {"pesan": f"Tidak ada siswa dengan alfa >= {min_alfa} hari pada {periode}. Surat tidak dibuat."}
 
-    cursor.execute(query, params)
-    monthly_data = cursor.fetchall()
+    school_info = get_school_settings()
+    hasil = generate_surat_peringatan_batch(data["daftar"], school_info, gabung=gabung)
+    return {
+        "pesan": f"{len(data['daftar'])} surat peringatan berhasil dibuat ({periode})",
+        "file": hasil["file"],
+        "manifest": hasil["manifest"],
+        "jumlah_surat": len(data["daftar"]),
+        "jumlah_file": len(hasil["files"]),
+        "daftar_siswa": [
+            {"nama": d["siswa"]["nama"], "kelas": d["siswa"]["kelas"], "total_alfa": d["rekap"]["total_alfa"]}
+            for d in data["daftar"]
+        ],
+    }
 
+
+def _susun_attendance_trends(monthly_data: List[Dict[str, Any]], months: int) -> Dict[str, Any]:
+    """Tandai tren tiap bulan (dipakai versi sync & async get_attendance_trends)"""
     # Calculate trends (improvement/deterioration)
     for i in range(len(monthly_data) - 1):
         current_percentage = monthly_data[i]["persen_hadir"]
@@ -685,64 +834,79 @@ def get_attendance_trends(
     if monthly_data:
         monthly_data[-1]["trend"] = "terbaru"
 
-    cursor.close()
-    db.close()
-
     return {
         "periode_analisis": f"{months} bulan terakhir",
         "data": monthly_data
     }
 
 
-def get_geolocation_analysis(
+@cached_tool
+def get_attendance_trends(
+    siswa_id: Optional[int] = None,
+    nama_siswa: Optional[str] = None,
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None,
-    tanggal: Optional[str] = None
+    months: int = 6
 ) -> Dict[str, Any]:
-    """Analyze geolocation data for attendance validation and detect anomalies in student locations"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
-
-    # Resolve class ID if name provided
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
-        if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
-
-    # Base query for geolocation analysis
-    query = """
-        SELECT
-            a.id,
-            s.nama AS nama_siswa,
-            s.nis,
-            k.nama AS kelas,
-            a.tanggal,
-            a.latitude,
-            a.longitude,
-            a.status
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        JOIN kelas k ON a.kelas_id = k.id
-        WHERE a.latitude IS NOT NULL AND a.longitude IS NOT NULL
-    """
-    params = []
+    """Analyze attendance trends for a student or class over multiple months to identify patterns and improvements/deteriorations"""
+    with db_cursor() as cursor:
+        # Resolve student ID if name provided
+        if not siswa_id and nama_siswa:
+            siswa_id = _resolve_siswa_id(cursor, nama_siswa)
+            if not siswa_id:
+                return {"error": f"Siswa dengan nama '{nama_siswa}' tidak ditemukan atau ada lebih dari satu hasil. Gunakan fungsi cari_siswa untuk mencari dulu."}
+
+        # Resolve class ID if name provided
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
+
+        # Build query based on whether we're analyzing student or class
+        if siswa_id:
+            query = """
+                SELECT
+                    YEAR(a.tanggal) AS tahun,
+                    MONTH(a.tanggal) AS bulan,
+                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                    COUNT(*) AS total_hari,
+                    ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
+                FROM absensi a
+                WHERE a.siswa_id = %s
+                GROUP BY YEAR(a.tanggal), MONTH(a.tanggal)
+                ORDER BY tahun DESC, bulan DESC
+                LIMIT %s
+            """
+            params = [siswa_id, months]
+        elif kelas_id:
+            query = """
+                SELECT
+                    YEAR(a.tanggal) AS tahun,
+                    MONTH(a.tanggal) AS bulan,
+                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                    COUNT(*) AS total_hari,
+                    ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
+                FROM absensi a
+                WHERE a.kelas_id = %s
+                GROUP BY YEAR(a.tanggal), MONTH(a.tanggal)
+                ORDER BY tahun DESC, bulan DESC
+                LIMIT %s
+            """
+            params = [kelas_id, months]
+        else:
+            return {"error": "Harus menyertakan siswa_id/nama_siswa atau kelas_id/nama_kelas"}
 
-    # Add filters
-    if kelas_id:
-        query += " AND a.kelas_id = %s"
-        params.append(kelas_id)
+        if rekap.siap():
+            query, params = rekap_absensi.sql_trends(siswa_id, kelas_id, months)
 
-    if tanggal:
-        query += " AND a.tanggal = %s"
-        params.append(tanggal)
+        cursor.execute(query, params)
+        monthly_data = cursor.fetchall()
 
-    query += " ORDER BY a.tanggal DESC, k.nama, s.nama LIMIT 100"
+        return _susun_attendance_trends(monthly_data, months)
 
-    cursor.execute(query, params)
-    records = cursor.fetchall()
 
+def _susun_geolocation_analysis(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Statistik koordinat & deteksi lokasi mencurigakan dari record absensi"""
     # Statistics
     total_records = len(records)
     valid_coordinates = len([r for r in records if r["latitude"] and r["longitude"]])
@@ -767,9 +931,6 @@ def get_geolocation_analysis(
                 "tanggal": group[0]["tanggal"]
             })
 
-    cursor.close()
-    db.close()
-
     return {
         "total_records": total_records,
         "valid_coordinates": valid_coordinates,
@@ -779,46 +940,61 @@ def get_geolocation_analysis(
     }
 
 
-def compare_class_attendance(
-    tingkat: Optional[int] = None,
-    jurusan: Optional[str] = None
+@cached_tool
+def get_geolocation_analysis(
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    tanggal: Optional[str] = None
 ) -> Dict[str, Any]:
-    """Compare attendance rates between different classes to identify patterns and performance differences"""
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
-
-    # Query to get class attendance statistics
-    query = """
-        SELECT
-            k.id AS kelas_id,
-            k.nama AS kelas,
-            COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
-            COUNT(*) AS total_hari,
-            ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
-        FROM absensi a
-        JOIN kelas k ON a.kelas_id = k.id
-        WHERE 1=1
-    """
-    params = []
+    """Analyze geolocation data for attendance validation and detect anomalies in student locations"""
+    with db_cursor() as cursor:
+        # Resolve class ID if name provided
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
+
+        # Base query for geolocation analysis
+        query = """
+            SELECT
+                a.id,
+                s.nama AS nama_siswa,
+                s.nis,
+                k.nama AS kelas,
+                a.tanggal,
+                a.latitude,
+                a.longitude,
+                a.status
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            JOIN kelas k ON a.kelas_id = k.id
+            WHERE a.latitude IS NOT NULL AND a.longitude IS NOT NULL
+        """
+        params = []
 
-    # Add filters
-    if tingkat:
-        query += " AND k.tingkat = %s"
-        params.append(tingkat)
+        # Add filters
+        if kelas_id:
+            query += " AND a.kelas_id = %s"
+            params.append(kelas_id)
 
-    if jurusan:
-        query += " AND k.jurusan = %s"
-        params.append(jurusan)
+        if tanggal:
+            query += " AND a.tanggal = %s"
+            params.append(tanggal)
 
-    query += """
-        GROUP BY k.id, k.nama
-        HAVING total_hari > 0
-        ORDER BY persen_hadir DESC
-    """
+        query += " ORDER BY a.tanggal DESC, k.nama, s.nama LIMIT 100"
 
-    cursor.execute(query, params)
-    class_stats = cursor.fetchall()
+        cursor.execute(query, params)
+        records = cursor.fetchall()
+
+        return _susun_geolocation_analysis(records)
 
+
+def _susun_perbandingan_kelas(
+    class_stats: List[Dict[str, Any]],
+    tingkat: Optional[int],
+    jurusan: Optional[str]
+) -> Dict[str, Any]:
+    """Ringkasan perbandingan kelas (rata-rata, terbaik, terendah)"""
     # Calculate overall statistics
     if class_stats:
         avg_attendance = round(sum(c["persen_hadir"] for c in class_stats) / len(class_stats), 1)
@@ -829,9 +1005,6 @@ def compare_class_attendance(
         best_class = None
         worst_class = None
 
-    cursor.close()
-    db.close()
-
     return {
         "filter_tingkat": tingkat,
         "filter_jurusan": jurusan,
@@ -843,6 +1016,52 @@ def compare_class_attendance(
     }
 
 
+@cached_tool
+def compare_class_attendance(
+    tingkat: Optional[int] = None,
+    jurusan: Optional[str] = None
+) -> Dict[str, Any]:
+    """Compare attendance rates between different classes to identify patterns and performance differences"""
+    with db_cursor() as cursor:
+        agregat = rekap.siap() and rekap_absensi.sql_perbandingan_kelas(tingkat, jurusan)
+        if agregat:
+            cursor.execute(*agregat)
+        else:
+            # Query to get class attendance statistics
+            query = """
+                SELECT
+                    k.id AS kelas_id,
+                    k.nama AS kelas,
+                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                    COUNT(*) AS total_hari,
+                    ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
+                FROM absensi a
+                JOIN kelas k ON a.kelas_id = k.id
+                WHERE 1=1
+            """
+            params = []
+
+            # Add filters
+            if tingkat:
+                query += " AND k.tingkat = %s"
+                params.append(tingkat)
+
+            if jurusan:
+                query += " AND k.jurusan = %s"
+                params.append(jurusan)
+
+            query += """
+                GROUP BY k.id, k.nama
+                HAVING total_hari > 0
+                ORDER BY persen_hadir DESC
+            """
+
+            cursor.execute(query, params)
+        class_stats = cursor.fetchall()
+
+        return _susun_perbandingan_kelas(class_stats, tingkat, jurusan)
+
+
 def buat_laporan_alfa(
     tanggal: Optional[str] = None
 ) -> Dict[str, Any]:
@@ -861,6 +1080,7 @@ def buat_laporan_alfa(
 # Tambahan Kategori A (Absensi Lanjutan)
 # ==========================
 
+@cached_tool
 def get_ringkasan_absensi_harian(
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None,
@@ -870,63 +1090,56 @@ def get_ringkasan_absensi_harian(
     Ringkasan absensi 1 kelas pada 1 tanggal: total Hadir/Izin/Sakit/Alfa + persentase hadir.
     Cocok untuk dashboard harian wali kelas.
     """
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
 
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
         if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
-
-    if not kelas_id:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
-
-    if not tanggal:
-        tanggal = date.today().isoformat()
-
-    query = """
-        SELECT
-            k.nama AS kelas,
-            a.tanggal,
-            COUNT(*) AS total_record,
-            COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
-            COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
-            COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
-            COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
-            ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
-        FROM absensi a
-        JOIN kelas k ON a.kelas_id = k.id
-        WHERE a.kelas_id = %s AND a.tanggal = %s
-        GROUP BY k.nama, a.tanggal
-    """
-    cursor.execute(query, [kelas_id, tanggal])
-    summary = cursor.fetchone()
-
-    # Jika tidak ada record, tetap kembalikan struktur yang konsisten
-    if not summary:
-        cursor.execute("SELECT nama FROM kelas WHERE id = %s LIMIT 1", [kelas_id])
-        row = cursor.fetchone()
-        kelas_nama = row["nama"] if row else None
-        summary = {
-            "kelas": kelas_nama,
-            "tanggal": tanggal,
-            "total_record": 0,
-            "hadir": 0,
-            "izin": 0,
-            "sakit": 0,
-            "alfa": 0,
-            "persen_hadir": 0
-        }
-
-    cursor.close()
-    db.close()
-    return summary
+            return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
 
+        if not tanggal:
+            tanggal = date.today().isoformat()
 
+        query = """
+            SELECT
+                k.nama AS kelas,
+                a.tanggal,
+                COUNT(*) AS total_record,
+                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
+                COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
+                COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
+                ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
+            FROM absensi a
+            JOIN kelas k ON a.kelas_id = k.id
+            WHERE a.kelas_id = %s AND a.tanggal = %s
+            GROUP BY k.nama, a.tanggal
+        """
+        cursor.execute(query, [kelas_id, tanggal])
+        summary = cursor.fetchone()
+
+        # Jika tidak ada record, tetap kembalikan struktur yang konsisten
+        if not summary:
+            cursor.execute("SELECT nama FROM kelas WHERE id = %s LIMIT 1", [kelas_id])
+            row = cursor.fetchone()
+            kelas_nama = row["nama"] if row else None
+            summary = {
+                "kelas": kelas_nama,
+                "tanggal": tanggal,
+                "total_record": 0,
+                "hadir": 0,
+                "izin": 0,
+                "sakit": 0,
+                "alfa": 0,
+                "persen_hadir": 0
+            }
+
+        return summary
+
+
+@cached_tool
 def get_ringkasan_absensi_range(
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None,
@@ -937,54 +1150,49 @@ def get_ringkasan_absensi_range(
     Ringkasan absensi per hari untuk 1 kelas pada rentang tanggal (untuk grafik/tren).
     Return: list per tanggal: total/hadir/izin/sakit/alfa/persen_hadir
     """
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
 
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
         if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
-
-    if not kelas_id:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
+            return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
 
-    if not tanggal_mulai or not tanggal_akhir:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
-
-    query = """
-        SELECT
-            a.tanggal,
-            COUNT(*) AS total_record,
-            COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
-            COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
-            COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
-            COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
-            ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
-        FROM absensi a
-        WHERE a.kelas_id = %s
-          AND a.tanggal BETWEEN %s AND %s
-        GROUP BY a.tanggal
-        ORDER BY a.tanggal ASC
-    """
-    cursor.execute(query, [kelas_id, tanggal_mulai, tanggal_akhir])
-    rows = cursor.fetchall()
+        if not tanggal_mulai or not tanggal_akhir:
+            return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
 
-    cursor.close()
-    db.close()
-    return {
-        "kelas_id": kelas_id,
-        "tanggal_mulai": tanggal_mulai,
-        "tanggal_akhir": tanggal_akhir,
-        "data": rows
-    }
+        agregat = rekap.siap() and rekap_absensi.sql_ringkasan_range(kelas_id, tanggal_mulai, tanggal_akhir)
+        if agregat:
+            cursor.execute(*agregat)
+        else:
+            query = """
+                SELECT
+                    a.tanggal,
+                    COUNT(*) AS total_record,
+                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                    COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
+                    COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
+                    COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
+                    ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
+                FROM absensi a
+                WHERE a.kelas_id = %s
+                  AND a.tanggal BETWEEN %s AND %s
+                GROUP BY a.tanggal
+                ORDER BY a.tanggal ASC
+            """
+            cursor.execute(query, [kelas_id, tanggal_mulai, tanggal_akhir])
+        rows = cursor.fetchall()
+
+        return {
+            "kelas_id": kelas_id,
+            "tanggal_mulai": tanggal_mulai,
+            "tanggal_akhir": tanggal_akhir,
+            "data": rows
+        }
 
 
+@cached_tool
 def get_rekap_absensi_kelas_range(
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None,
@@ -995,57 +1203,52 @@ def get_rekap_absensi_kelas_range(
     Rekap absensi per siswa untuk 1 kelas pada rentang tanggal.
     Output: list siswa + total Hadir/Izin/Sakit/Alfa + total_record.
     """
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
 
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
         if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
-
-    if not kelas_id:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
-
-    if not tanggal_mulai or not tanggal_akhir:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
+            return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
 
-    query = """
-        SELECT
-            s.id AS siswa_id,
-            s.nama AS nama_siswa,
-            s.nis,
-            COUNT(*) AS total_record,
-            COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
-            COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
-            COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
-            COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
-            ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        WHERE a.kelas_id = %s
-          AND a.tanggal BETWEEN %s AND %s
-        GROUP BY s.id, s.nama, s.nis
-        ORDER BY alfa DESC, izin DESC, sakit DESC, s.nama ASC
-    """
-    cursor.execute(query, [kelas_id, tanggal_mulai, tanggal_akhir])
-    rows = cursor.fetchall()
+        if not tanggal_mulai or not tanggal_akhir:
+            return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
 
-    cursor.close()
-    db.close()
-    return {
-        "kelas_id": kelas_id,
-        "tanggal_mulai": tanggal_mulai,
-        "tanggal_akhir": tanggal_akhir,
-        "data": rows
-    }
+        agregat = rekap.siap() and rekap_absensi.sql_rekap_kelas_range(kelas_id, tanggal_mulai, tanggal_akhir)
+        if agregat:
+            cursor.execute(*agregat)
+        else:
+            query = """
+                SELECT
+                    s.id AS siswa_id,
+                    s.nama AS nama_siswa,
+                    s.nis,
+                    COUNT(*) AS total_record,
+                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                    COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
+                    COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
+                    COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
+                    ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
+                FROM absensi a
+                JOIN siswa s ON a.siswa_id = s.id
+                WHERE a.kelas_id = %s
+                  AND a.tanggal BETWEEN %s AND %s
+                GROUP BY s.id, s.nama, s.nis
+                ORDER BY alfa DESC, izin DESC, sakit DESC, s.nama ASC
+            """
+            cursor.execute(query, [kelas_id, tanggal_mulai, tanggal_akhir])
+        rows = cursor.fetchall()
+
+        return {
+            "kelas_id": kelas_id,
+            "tanggal_mulai": tanggal_mulai,
+            "tanggal_akhir": tanggal_akhir,
+            "data": rows
+        }
 
 
+@cached_tool
 def get_top_siswa_absensi(
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None,
@@ -1058,62 +1261,55 @@ def get_top_siswa_absensi(
     Ambil top siswa dengan jumlah status tertentu (default: Alfa) pada rentang tanggal.
     Cocok untuk 'top offender' atau monitoring kasus.
     """
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
 
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
-        if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
+        if not tanggal_mulai or not tanggal_akhir:
+            return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
 
-    if not tanggal_mulai or not tanggal_akhir:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
+        # Build query — jika kelas_id ada, filter per kelas; jika tidak, seluruh sekolah
+        where_clauses = ["a.tanggal BETWEEN %s AND %s", "a.status = %s"]
+        params = [tanggal_mulai, tanggal_akhir, status]
 
-    # Build query — jika kelas_id ada, filter per kelas; jika tidak, seluruh sekolah
-    where_clauses = ["a.tanggal BETWEEN %s AND %s", "a.status = %s"]
-    params = [tanggal_mulai, tanggal_akhir, status]
-
-    if kelas_id:
-        where_clauses.append("a.kelas_id = %s")
-        params.append(kelas_id)
-
-    params.append(limit)
-
-    query = f"""
-        SELECT
-            s.id AS siswa_id,
-            s.nama AS nama_siswa,
-            s.nis,
-            k.nama AS kelas,
-            COUNT(*) AS total
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        LEFT JOIN kelas k ON a.kelas_id = k.id
-        WHERE {' AND '.join(where_clauses)}
-        GROUP BY s.id, s.nama, s.nis, k.nama
-        HAVING total > 0
-        ORDER BY total DESC, s.nama ASC
-        LIMIT %s
-    """
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
+        if kelas_id:
+            where_clauses.append("a.kelas_id = %s")
+            params.append(kelas_id)
 
-    cursor.close()
-    db.close()
-    return {
-        "kelas_id": kelas_id,
-        "tanggal_mulai": tanggal_mulai,
-        "tanggal_akhir": tanggal_akhir,
-        "status": status,
-        "limit": limit,
-        "data": rows
-    }
+        params.append(limit)
+
+        query = f"""
+            SELECT
+                s.id AS siswa_id,
+                s.nama AS nama_siswa,
+                s.nis,
+                k.nama AS kelas,
+                COUNT(*) AS total
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            LEFT JOIN kelas k ON a.kelas_id = k.id
+            WHERE {' AND '.join(where_clauses)}
+            GROUP BY s.id, s.nama, s.nis, k.nama
+            HAVING total > 0
+            ORDER BY total DESC, s.nama ASC
+            LIMIT %s
+        """
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+
+        return {
+            "kelas_id": kelas_id,
+            "tanggal_mulai": tanggal_mulai,
+            "tanggal_akhir": tanggal_akhir,
+            "status": status,
+            "limit": limit,
+            "data": rows
+        }
 
 
+@cached_tool
 def get_analisis_metode_absen(
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None,
@@ -1124,54 +1320,45 @@ def get_analisis_metode_absen(
     Analisis metode absen (field: metode) untuk satu kelas pada rentang tanggal.
     Output: ringkasan per metode + breakdown status per metode.
     """
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
 
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
         if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
-
-    if not kelas_id:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
+            return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
 
-    if not tanggal_mulai or not tanggal_akhir:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
+        if not tanggal_mulai or not tanggal_akhir:
+            return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
 
-    query = """
-        SELECT
-            a.metode,
-            COUNT(*) AS total,
-            COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
-            COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
-            COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
-            COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
-            ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
-        FROM absensi a
-        WHERE a.kelas_id = %s
-          AND a.tanggal BETWEEN %s AND %s
-        GROUP BY a.metode
-        ORDER BY total DESC, a.metode ASC
-    """
-    cursor.execute(query, [kelas_id, tanggal_mulai, tanggal_akhir])
-    rows = cursor.fetchall()
+        query = """
+            SELECT
+                a.metode,
+                COUNT(*) AS total,
+                COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                COUNT(CASE WHEN a.status = 'Izin' THEN 1 END)  AS izin,
+                COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
+                COUNT(CASE WHEN a.status = 'Alfa' THEN 1 END)  AS alfa,
+                ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 1) AS persen_hadir
+            FROM absensi a
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+            GROUP BY a.metode
+            ORDER BY total DESC, a.metode ASC
+        """
+        cursor.execute(query, [kelas_id, tanggal_mulai, tanggal_akhir])
+        rows = cursor.fetchall()
 
-    cursor.close()
-    db.close()
-    return {
-        "kelas_id": kelas_id,
-        "tanggal_mulai": tanggal_mulai,
-        "tanggal_akhir": tanggal_akhir,
-        "data": rows
-    }
+        return {
+            "kelas_id": kelas_id,
+            "tanggal_mulai": tanggal_mulai,
+            "tanggal_akhir": tanggal_akhir,
+            "data": rows
+        }
 
 
+@cached_tool
 def get_anomali_absensi(
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None,
@@ -1187,138 +1374,128 @@ def get_anomali_absensi(
     2) metode != 'manual' tapi latitude/longitude null
     3) banyak siswa share koordinat yang sama pada tanggal yang sama (indikasi 'titip absen')
     """
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
 
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
         if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
+            return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
 
-    if not kelas_id:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
+        if not tanggal_mulai or not tanggal_akhir:
+            return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
 
-    if not tanggal_mulai or not tanggal_akhir:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
+        # 1) Jarak terlalu jauh
+        far_query = """
+            SELECT
+                a.id,
+                a.tanggal,
+                s.nama AS nama_siswa,
+                s.nis,
+                a.status,
+                a.metode,
+                a.waktu_absen,
+                a.jarak_meter,
+                a.latitude,
+                a.longitude
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.jarak_meter IS NOT NULL
+              AND a.jarak_meter > %s
+            ORDER BY a.jarak_meter DESC, a.tanggal DESC
+            LIMIT %s
+        """
+        cursor.execute(far_query, [kelas_id, tanggal_mulai, tanggal_akhir, max_jarak_meter, limit])
+        far_distance = cursor.fetchall()
 
-    # 1) Jarak terlalu jauh
-    far_query = """
-        SELECT
-            a.id,
-            a.tanggal,
-            s.nama AS nama_siswa,
-            s.nis,
-            a.status,
-            a.metode,
-            a.waktu_absen,
-            a.jarak_meter,
-            a.latitude,
-            a.longitude
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        WHERE a.kelas_id = %s
-          AND a.tanggal BETWEEN %s AND %s
-          AND a.jarak_meter IS NOT NULL
-          AND a.jarak_meter > %s
-        ORDER BY a.jarak_meter DESC, a.tanggal DESC
-        LIMIT %s
-    """
-    cursor.execute(far_query, [kelas_id, tanggal_mulai, tanggal_akhir, max_jarak_meter, limit])
-    far_distance = cursor.fetchall()
-
-    # 2) Metode non-manual tapi koordinat kosong
-    missing_geo_query = """
-        SELECT
-            a.id,
-            a.tanggal,
-            s.nama AS nama_siswa,
-            s.nis,
-            a.status,
-            a.metode,
-            a.waktu_absen,
-            a.latitude,
-            a.longitude
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        WHERE a.kelas_id = %s
-          AND a.tanggal BETWEEN %s AND %s
-          AND a.metode <> 'manual'
-          AND (a.latitude IS NULL OR a.longitude IS NULL)
-        ORDER BY a.tanggal DESC, s.nama ASC
-        LIMIT %s
-    """
-    cursor.execute(missing_geo_query, [kelas_id, tanggal_mulai, tanggal_akhir, limit])
-    missing_geolocation = cursor.fetchall()
-
-    # 3) Banyak siswa dengan koordinat identik di tanggal yang sama
-    group_query = """
-        SELECT
-            a.tanggal,
-            a.latitude,
-            a.longitude,
-            COUNT(*) AS jumlah_siswa
-        FROM absensi a
-        WHERE a.kelas_id = %s
-          AND a.tanggal BETWEEN %s AND %s
-          AND a.latitude IS NOT NULL
-          AND a.longitude IS NOT NULL
-        GROUP BY a.tanggal, a.latitude, a.longitude
-        HAVING jumlah_siswa >= %s
-        ORDER BY jumlah_siswa DESC, a.tanggal DESC
-        LIMIT 20
-    """
-    cursor.execute(group_query, [kelas_id, tanggal_mulai, tanggal_akhir, min_siswa_sama_koordinat])
-    groups = cursor.fetchall()
-
-    suspicious_shared_coordinates = []
-    detail_query = """
-        SELECT
-            s.nama AS nama_siswa,
-            s.nis,
-            a.status,
-            a.metode,
-            a.waktu_absen
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        WHERE a.kelas_id = %s
-          AND a.tanggal = %s
-          AND a.latitude = %s
-          AND a.longitude = %s
-        ORDER BY s.nama ASC
-        LIMIT 15
-    """
-    for g in groups:
-        cursor.execute(detail_query, [kelas_id, g["tanggal"], g["latitude"], g["longitude"]])
-        siswa_list = cursor.fetchall()
-        suspicious_shared_coordinates.append({
-            "tanggal": g["tanggal"],
-            "latitude": g["latitude"],
-            "longitude": g["longitude"],
-            "jumlah_siswa": g["jumlah_siswa"],
-            "sampel_siswa": siswa_list
-        })
+        # 2) Metode non-manual tapi koordinat kosong
+        missing_geo_query = """
+            SELECT
+                a.id,
+                a.tanggal,
+                s.nama AS nama_siswa,
+                s.nis,
+                a.status,
+                a.metode,
+                a.waktu_absen,
+                a.latitude,
+                a.longitude
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.metode <> 'manual'
+              AND (a.latitude IS NULL OR a.longitude IS NULL)
+            ORDER BY a.tanggal DESC, s.nama ASC
+            LIMIT %s
+        """
+        cursor.execute(missing_geo_query, [kelas_id, tanggal_mulai, tanggal_akhir, limit])
+        missing_geolocation = cursor.fetchall()
 
-    cursor.close()
-    db.close()
+        # 3) Banyak siswa dengan koordinat identik di tanggal yang sama
+        group_query = """
+            SELECT
+                a.tanggal,
+                a.latitude,
+                a.longitude,
+                COUNT(*) AS jumlah_siswa
+            FROM absensi a
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.latitude IS NOT NULL
+              AND a.longitude IS NOT NULL
+            GROUP BY a.tanggal, a.latitude, a.longitude
+            HAVING jumlah_siswa >= %s
+            ORDER BY jumlah_siswa DESC, a.tanggal DESC
+            LIMIT 20
+        """
+        cursor.execute(group_query, [kelas_id, tanggal_mulai, tanggal_akhir, min_siswa_sama_koordinat])
+        groups = cursor.fetchall()
 
-    return {
-        "kelas_id": kelas_id,
-        "tanggal_mulai": tanggal_mulai,
-        "tanggal_akhir": tanggal_akhir,
-        "max_jarak_meter": max_jarak_meter,
-        "min_siswa_sama_koordinat": min_siswa_sama_koordinat,
-        "far_distance": far_distance,
-        "missing_geolocation": missing_geolocation,
-        "suspicious_shared_coordinates": suspicious_shared_coordinates
-    }
+        suspicious_shared_coordinates = []
+        detail_query = """
+            SELECT
+                s.nama AS nama_siswa,
+                s.nis,
+                a.status,
+                a.metode,
+                a.waktu_absen
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            WHERE a.kelas_id = %s
+              AND a.tanggal = %s
+              AND a.latitude = %s
+              AND a.longitude = %s
+            ORDER BY s.nama ASC
+            LIMIT 15
+        """
+        for g in groups:
+            cursor.execute(detail_query, [kelas_id, g["tanggal"], g["latitude"], g["longitude"]])
+            siswa_list = cursor.fetchall()
+            suspicious_shared_coordinates.append({
+                "tanggal": g["tanggal"],
+                "latitude": g["latitude"],
+                "longitude": g["longitude"],
+                "jumlah_siswa": g["jumlah_siswa"],
+                "sampel_siswa": siswa_list
+            })
+
+        return {
+            "kelas_id": kelas_id,
+            "tanggal_mulai": tanggal_mulai,
+            "tanggal_akhir": tanggal_akhir,
+            "max_jarak_meter": max_jarak_meter,
+            "min_siswa_sama_koordinat": min_siswa_sama_koordinat,
+            "far_distance": far_distance,
+            "missing_geolocation": missing_geolocation,
+            "suspicious_shared_coordinates": suspicious_shared_coordinates
+        }
 
 
+@cached_tool
 def get_statistik_waktu_absen(
     kelas_id: Optional[int] = None,
     nama_kelas: Optional[str] = None,
@@ -1333,147 +1510,97 @@ def get_statistik_waktu_absen(
     - total telat (waktu_absen > jam_telat) khusus status Hadir
     - top siswa telat
     """
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
 
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
         if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
+            return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
 
-    if not kelas_id:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
+        if not tanggal_mulai or not tanggal_akhir:
+            return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
 
-    if not tanggal_mulai or not tanggal_akhir:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
+        # Distribusi per jam
+        dist_query = """
+            SELECT
+                HOUR(a.waktu_absen) AS jam,
+                COUNT(*) AS total
+            FROM absensi a
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.waktu_absen IS NOT NULL
+            GROUP BY HOUR(a.waktu_absen)
+            ORDER BY jam ASC
+        """
+        cursor.execute(dist_query, [kelas_id, tanggal_mulai, tanggal_akhir])
+        distribusi_per_jam = cursor.fetchall()
 
-    # Distribusi per jam
-    dist_query = """
-        SELECT
-            HOUR(a.waktu_absen) AS jam,
-            COUNT(*) AS total
-        FROM absensi a
-        WHERE a.kelas_id = %s
-          AND a.tanggal BETWEEN %s AND %s
-          AND a.waktu_absen IS NOT NULL
-        GROUP BY HOUR(a.waktu_absen)
-        ORDER BY jam ASC
-    """
-    cursor.execute(dist_query, [kelas_id, tanggal_mulai, tanggal_akhir])
-    distribusi_per_jam = cursor.fetchall()
-
-    # Total telat (khusus Hadir)
-    telat_query = """
-        SELECT
-            COUNT(*) AS total_telat
-        FROM absensi a
-        WHERE a.kelas_id = %s
-          AND a.tanggal BETWEEN %s AND %s
-          AND a.status = 'Hadir'
-          AND a.waktu_absen IS NOT NULL
-          AND a.waktu_absen > %s
-    """
-    cursor.execute(telat_query, [kelas_id, tanggal_mulai, tanggal_akhir, jam_telat])
-    total_telat_row = cursor.fetchone() or {"total_telat": 0}
-
-    # Top siswa telat
-    top_telat_query = """
-        SELECT
-            s.id AS siswa_id,
-            s.nama AS nama_siswa,
-            s.nis,
-            COUNT(*) AS total_telat,
-            MAX(a.waktu_absen) AS telat_terparah
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        WHERE a.kelas_id = %s
-          AND a.tanggal BETWEEN %s AND %s
-          AND a.status = 'Hadir'
-          AND a.waktu_absen IS NOT NULL
-          AND a.waktu_absen > %s
-        GROUP BY s.id, s.nama, s.nis
-        ORDER BY total_telat DESC, telat_terparah DESC
-        LIMIT %s
-    """
-    cursor.execute(top_telat_query, [kelas_id, tanggal_mulai, tanggal_akhir, jam_telat, limit])
-    top_telat = cursor.fetchall()
+        # Total telat (khusus Hadir)
+        telat_query = """
+            SELECT
+                COUNT(*) AS total_telat
+            FROM absensi a
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.status = 'Hadir'
+              AND a.waktu_absen IS NOT NULL
+              AND a.waktu_absen > %s
+        """
+        cursor.execute(telat_query, [kelas_id, tanggal_mulai, tanggal_akhir, jam_telat])
+        total_telat_row = cursor.fetchone() or {"total_telat": 0}
 
-    cursor.close()
-    db.close()
+        # Top siswa telat
+        top_telat_query = """
+            SELECT
+                s.id AS siswa_id,
+                s.nama AS nama_siswa,
+                s.nis,
+                COUNT(*) AS total_telat,
+                MAX(a.waktu_absen) AS telat_terparah
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            WHERE a.kelas_id = %s
+              AND a.tanggal BETWEEN %s AND %s
+              AND a.status = 'Hadir'
+              AND a.waktu_absen IS NOT NULL
+              AND a.waktu_absen > %s
+            GROUP BY s.id, s.nama, s.nis
+            ORDER BY total_telat DESC, telat_terparah DESC
+            LIMIT %s
+        """
+        cursor.execute(top_telat_query, [kelas_id, tanggal_mulai, tanggal_akhir, jam_telat, limit])
+        top_telat = cursor.fetchall()
 
-    return {
-        "kelas_id": kelas_id,
-        "tanggal_mulai": tanggal_mulai,
-        "tanggal_akhir": tanggal_akhir,
-        "jam_telat": jam_telat,
-        "distribusi_per_jam": distribusi_per_jam,
-        "total_telat": total_telat_row["total_telat"],
-        "top_telat": top_telat
-    }
+        return {
+            "kelas_id": kelas_id,
+            "tanggal_mulai": tanggal_mulai,
+            "tanggal_akhir": tanggal_akhir,
+            "jam_telat": jam_telat,
+            "distribusi_per_jam": distribusi_per_jam,
+            "total_telat": total_telat_row["total_telat"],
+            "top_telat": top_telat
+        }
 
 
 # ==========================
 # Laporan Structured: Kepsek & Guru
 # ==========================
 
-def get_laporan_kepsek_range(
-    tanggal_mulai: str = "",
-    tanggal_akhir: str = "",
-    tingkat: Optional[int] = None,
-    jurusan: Optional[str] = None,
-    threshold_kehadiran: float = 85.0
+def _susun_laporan_kepsek(
+    ranking_kelas: List[Dict[str, Any]],
+    total_hari_tercatat: int,
+    total_siswa: int,
+    tanggal_mulai: str,
+    tanggal_akhir: str,
+    tingkat: Optional[int],
+    jurusan: Optional[str],
+    threshold_kehadiran: float
 ) -> Dict[str, Any]:
-    """
-    Laporan ringkasan range untuk kepala sekolah: lintas kelas, ranking,
-    alerts otomatis (LOW_ATTENDANCE_CLASS, HIGH_ALFA_CLASS).
-    Output sesuai format structured 'kepsek_ringkasan_range'.
-    """
+    """Susun summary + alerts laporan kepsek dari hasil ranking per kelas"""
     from datetime import datetime
 
-    if not tanggal_mulai or not tanggal_akhir:
-        return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
-
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
-
-    # ── 1) Ranking per kelas ──
-    ranking_query = """
-        SELECT
-            k.id   AS kelas_id,
-            k.nama AS kelas,
-            COUNT(*) AS total_record,
-            COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
-            COUNT(CASE WHEN a.status = 'Izin'  THEN 1 END) AS izin,
-            COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
-            COUNT(CASE WHEN a.status = 'Alfa'  THEN 1 END) AS alfa,
-            ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 2) AS persen_hadir
-        FROM absensi a
-        JOIN kelas k ON a.kelas_id = k.id
-        WHERE a.tanggal BETWEEN %s AND %s
-    """
-    params: list = [tanggal_mulai, tanggal_akhir]
-
-    if tingkat:
-        ranking_query += " AND k.tingkat = %s"
-        params.append(tingkat)
-    if jurusan:
-        ranking_query += " AND k.jurusan = %s"
-        params.append(jurusan)
-
-    ranking_query += """
-        GROUP BY k.id, k.nama
-        HAVING total_record > 0
-        ORDER BY persen_hadir DESC
-    """
-    cursor.execute(ranking_query, params)
-    ranking_kelas = cursor.fetchall()
-
     # ── 2) Summary aggregat ──
     total_kelas = len(ranking_kelas)
     total_record = sum(r["total_record"] for r in ranking_kelas)
@@ -1483,27 +1610,6 @@ def get_laporan_kepsek_range(
     total_alfa  = sum(r["alfa"]  for r in ranking_kelas)
     rata_rata   = round(total_hadir * 100.0 / total_record, 2) if total_record else 0
 
-    # Jumlah hari unik yang ter-record
-    cursor.execute(
-        "SELECT COUNT(DISTINCT tanggal) AS hari FROM absensi WHERE tanggal BETWEEN %s AND %s",
-        [tanggal_mulai, tanggal_akhir]
-    )
-    hari_row = cursor.fetchone()
-    total_hari_tercatat = hari_row["hari"] if hari_row else 0
-
-    # Jumlah siswa unik
-    siswa_params: list = [tanggal_mulai, tanggal_akhir]
-    siswa_query = "SELECT COUNT(DISTINCT siswa_id) AS jml FROM absensi a JOIN kelas k ON a.kelas_id = k.id WHERE a.tanggal BETWEEN %s AND %s"
-    if tingkat:
-        siswa_query += " AND k.tingkat = %s"
-        siswa_params.append(tingkat)
-    if jurusan:
-        siswa_query += " AND k.jurusan = %s"
-        siswa_params.append(jurusan)
-    cursor.execute(siswa_query, siswa_params)
-    siswa_row = cursor.fetchone()
-    total_siswa = siswa_row["jml"] if siswa_row else 0
-
     # ── 3) Alerts otomatis ──
     alerts = []
     for r in ranking_kelas:
@@ -1524,9 +1630,6 @@ def get_laporan_kepsek_range(
                 "value": int(r["alfa"])
             })
 
-    cursor.close()
-    db.close()
-
     return {
         "report_type": "kepsek_ringkasan_range",
         "scope": {
@@ -1554,70 +1657,99 @@ def get_laporan_kepsek_range(
     }
 
 
-def get_laporan_guru_harian(
-    kelas_id: Optional[int] = None,
-    nama_kelas: Optional[str] = None,
-    tanggal: Optional[str] = None
+@cached_tool
+def get_laporan_kepsek_range(
+    tanggal_mulai: str = "",
+    tanggal_akhir: str = "",
+    tingkat: Optional[int] = None,
+    jurusan: Optional[str] = None,
+    threshold_kehadiran: float = 85.0
 ) -> Dict[str, Any]:
     """
-    Laporan absensi harian detail untuk guru/wali kelas:
-    daftar setiap siswa beserta status, metode, waktu_absen, dan
-    deteksi siswa yang belum punya record absensi di tanggal tersebut.
-    Output sesuai format structured 'guru_absensi_harian_detail'.
+    Laporan ringkasan range untuk kepala sekolah: lintas kelas, ranking,
+    alerts otomatis (LOW_ATTENDANCE_CLASS, HIGH_ALFA_CLASS).
+    Output sesuai format structured 'kepsek_ringkasan_range'.
     """
-    from datetime import datetime
+    if not tanggal_mulai or not tanggal_akhir:
+        return {"error": "Harus menyertakan tanggal_mulai dan tanggal_akhir (format YYYY-MM-DD)"}
 
-    db = get_db_connection()
-    cursor = db.cursor(dictionary=True)
+    with db_cursor() as cursor:
+        # ── 1) Ranking per kelas ──
+        agregat = rekap.siap() and rekap_absensi.sql_ranking_kelas(tanggal_mulai, tanggal_akhir, tingkat, jurusan)
+        if agregat:
+            cursor.execute(*agregat)
+        else:
+            ranking_query = """
+                SELECT
+                    k.id   AS kelas_id,
+                    k.nama AS kelas,
+                    COUNT(*) AS total_record,
+                    COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) AS hadir,
+                    COUNT(CASE WHEN a.status = 'Izin'  THEN 1 END) AS izin,
+                    COUNT(CASE WHEN a.status = 'Sakit' THEN 1 END) AS sakit,
+                    COUNT(CASE WHEN a.status = 'Alfa'  THEN 1 END) AS alfa,
+                    ROUND(COUNT(CASE WHEN a.status = 'Hadir' THEN 1 END) * 100.0 / COUNT(*), 2) AS persen_hadir
+                FROM absensi a
+                JOIN kelas k ON a.kelas_id = k.id
+                WHERE a.tanggal BETWEEN %s AND %s
+            """
+            params: list = [tanggal_mulai, tanggal_akhir]
+
+            if tingkat:
+                ranking_query += " AND k.tingkat = %s"
+                params.append(tingkat)
+            if jurusan:
+                ranking_query += " AND k.jurusan = %s"
+                params.append(jurusan)
+
+            ranking_query += """
+                GROUP BY k.id, k.nama
+                HAVING total_record > 0
+                ORDER BY persen_hadir DESC
+            """
+            cursor.execute(ranking_query, params)
+        ranking_kelas = cursor.fetchall()
+
+        # Jumlah hari unik yang ter-record
+        if agregat:
+            cursor.execute(*rekap_absensi.sql_hari_tercatat(tanggal_mulai, tanggal_akhir))
+        else:
+            cursor.execute(
+                "SELECT COUNT(DISTINCT tanggal) AS hari FROM absensi WHERE tanggal BETWEEN %s AND %s",
+                [tanggal_mulai, tanggal_akhir]
+            )
+        hari_row = cursor.fetchone()
+        total_hari_tercatat = hari_row["hari"] if hari_row else 0
+
+        # Jumlah siswa unik
+        siswa_params: list = [tanggal_mulai, tanggal_akhir]
+        siswa_query = "SELECT COUNT(DISTINCT siswa_id) AS jml FROM absensi a JOIN kelas k ON a.kelas_id = k.id WHERE a.tanggal BETWEEN %s AND %s"
+        if tingkat:
+            siswa_query += " AND k.tingkat = %s"
+            siswa_params.append(tingkat)
+        if jurusan:
+            siswa_query += " AND k.jurusan = %s"
+            siswa_params.append(jurusan)
+        agregat = agregat and rekap_absensi.sql_siswa_unik(tanggal_mulai, tanggal_akhir, tingkat, jurusan)
+        cursor.execute(*(agregat or (siswa_query, siswa_params)))
+        siswa_row = cursor.fetchone()
+        total_siswa = siswa_row["jml"] if siswa_row else 0
+
+    return _susun_laporan_kepsek(
+        ranking_kelas, total_hari_tercatat, total_siswa,
+        tanggal_mulai, tanggal_akhir, tingkat, jurusan, threshold_kehadiran
+    )
 
-    # Resolve kelas
-    if not kelas_id and nama_kelas:
-        kelas_id = _resolve_kelas_id(cursor, nama_kelas)
-        if not kelas_id:
-            cursor.close()
-            db.close()
-            return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
 
-    if not kelas_id:
-        cursor.close()
-        db.close()
-        return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
-
-    if not tanggal:
-        tanggal = date.today().isoformat()
-
-    # Ambil nama kelas
-    cursor.execute("SELECT nama FROM kelas WHERE id = %s LIMIT 1", [kelas_id])
-    kelas_row = cursor.fetchone()
-    kelas_nama = kelas_row["nama"] if kelas_row else None
-
-    # ── 1) Daftar siswa aktif di kelas ──
-    cursor.execute("""
-        SELECT s.id AS siswa_id, s.nama, s.nis
-        FROM penempatan_kelas pk
-        JOIN siswa s ON pk.siswa_id = s.id
-        WHERE pk.kelas_id = %s AND pk.status = 'aktif'
-              AND s.deleted_at IS NULL
-        ORDER BY s.nama
-    """, [kelas_id])
-    siswa_aktif = cursor.fetchall()
-    siswa_id_set = {s["siswa_id"] for s in siswa_aktif}
-
-    # ── 2) Record absensi yang sudah ada ──
-    cursor.execute("""
-        SELECT
-            a.siswa_id,
-            s.nis,
-            s.nama,
-            a.status,
-            a.metode,
-            a.waktu_absen
-        FROM absensi a
-        JOIN siswa s ON a.siswa_id = s.id
-        WHERE a.kelas_id = %s AND a.tanggal = %s
-        ORDER BY s.nama
-    """, [kelas_id, tanggal])
-    records = cursor.fetchall()
+def _susun_laporan_guru_harian(
+    kelas_id: int,
+    kelas_nama: Optional[str],
+    tanggal: str,
+    siswa_aktif: List[Dict[str, Any]],
+    records: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Gabungkan daftar siswa aktif + record absensi menjadi laporan guru harian"""
+    from datetime import datetime
 
     # Build students list & track recorded IDs
     students = []
@@ -1658,9 +1790,6 @@ def get_laporan_guru_harian(
     total_siswa = len(siswa_aktif)
     persen_hadir = round(counts["Hadir"] * 100.0 / total_siswa, 2) if total_siswa else 0
 
-    cursor.close()
-    db.close()
-
     return {
         "report_type": "guru_absensi_harian_detail",
         "scope": {
@@ -1677,3 +1806,63 @@ def get_laporan_guru_harian(
         "missing_records": missing_records,
         "generated_at": datetime.now().isoformat()
     }
+
+
+@cached_tool
+def get_laporan_guru_harian(
+    kelas_id: Optional[int] = None,
+    nama_kelas: Optional[str] = None,
+    tanggal: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Laporan absensi harian detail untuk guru/wali kelas:
+    daftar setiap siswa beserta status, metode, waktu_absen, dan
+    deteksi siswa yang belum punya record absensi di tanggal tersebut.
+    Output sesuai format structured 'guru_absensi_harian_detail'.
+    """
+    with db_cursor() as cursor:
+        # Resolve kelas
+        if not kelas_id and nama_kelas:
+            kelas_id = _resolve_kelas_id(cursor, nama_kelas)
+            if not kelas_id:
+                return {"error": f"Kelas dengan nama '{nama_kelas}' tidak ditemukan atau ada lebih dari satu hasil. Coba gunakan nama kelas yang lebih spesifik."}
+
+        if not kelas_id:
+            return {"error": "Harus menyertakan kelas_id atau nama_kelas"}
+
+        if not tanggal:
+            tanggal = date.today().isoformat()
+
+        # Ambil nama kelas
+        cursor.execute("SELECT nama FROM kelas WHERE id = %s LIMIT 1", [kelas_id])
+        kelas_row = cursor.fetchone()
+        kelas_nama = kelas_row["nama"] if kelas_row else None
+
+        # ── 1) Daftar siswa aktif di kelas ──
+        cursor.execute("""
+            SELECT s.id AS siswa_id, s.nama, s.nis
+            FROM penempatan_kelas pk
+            JOIN siswa s ON pk.siswa_id = s.id
+            WHERE pk.kelas_id = %s AND pk.status = 'aktif'
+                  AND s.deleted_at IS NULL
+            ORDER BY s.nama
+        """, [kelas_id])
+        siswa_aktif = cursor.fetchall()
+
+        # ── 2) Record absensi yang sudah ada ──
+        cursor.execute("""
+            SELECT
+                a.siswa_id,
+                s.nis,
+                s.nama,
+                a.status,
+                a.metode,
+                a.waktu_absen
+            FROM absensi a
+            JOIN siswa s ON a.siswa_id = s.id
+            WHERE a.kelas_id = %s AND a.tanggal = %s
+            ORDER BY s.nama
+        """, [kelas_id, tanggal])
+        records = cursor.fetchall()
+
+    return _susun_laporan_guru_harian(kelas_id, kelas_nama, tanggal, siswa_aktif, records)
@@ -0,0 +1,210 @@
+# db_pool.py
+# Connection pool MySQL untuk db_functions (thread-safe)
+
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import mysql.connector
+
+import tracing
+
+
+class PoolTimeoutError(Exception):
+    """Dilempar jika tidak ada koneksi yang tersedia sampai batas waktu habis"""
+
+
+class PooledConnection:
+    """
+    Proxy koneksi MySQL milik pool.
+    Semua atribut diteruskan ke koneksi asli, kecuali close() yang
+    mengembalikan koneksi ke pool (bukan menutup socket).
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw, overflow: bool = False):
+        self._pool = pool
+        self._raw = raw
+        self._overflow = overflow
+        self._returned = False
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        """Cursor koneksi asli; di dalam trace agent waktu SQL & jumlah baris ikut dicatat"""
+        return tracing.trace_cursor(self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        """Kembalikan koneksi ke pool. Aman dipanggil lebih dari sekali."""
+        if self._returned:
+            return
+        self._returned = True
+        self._pool._release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Pool koneksi MySQL dengan:
+    - pool_size     : jumlah koneksi yang dipertahankan (idle) di pool
+    - max_overflow  : koneksi tambahan sementara saat pool habis (ditutup saat dikembalikan)
+    - timeout       : lama menunggu (detik) jika pool + overflow penuh
+    - recycle       : koneksi idle lebih lama dari ini (detik) dibuang & dibuat ulang
+    - max_lifetime  : umur maksimum koneksi (detik) sejak dibuat
+    - pre_ping      : ping koneksi saat checkout, ganti jika sudah putus
+    """
+
+    def __init__(
+        self,
+        db_config: Dict[str, Any],
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        timeout: float = 30.0,
+        recycle: Optional[float] = 1800,
+        max_lifetime: Optional[float] = 3600,
+        pre_ping: bool = True,
+    ):
+        self._db_config = dict(db_config)
+        self.pool_size = max(1, pool_size)
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self.recycle = recycle
+        self.max_lifetime = max_lifetime
+        self.pre_ping = pre_ping
+
+        self._idle = deque()
+        self._cond = threading.Condition()
+        self._checked_out = 0
+        self._overflow = 0
+        self._created = 0
+
+    # ── Internal ──
+
+    def _connect(self):
+        self._created += 1
+        return mysql.connector.connect(**self._db_config)
+
+    def _is_expired(self, conn: PooledConnection, now: float) -> bool:
+        if self.max_lifetime and now - conn.created_at > self.max_lifetime:
+            return True
+        if self.recycle and now - conn.last_used > self.recycle:
+            return True
+        return False
+
+    def _is_alive(self, conn: PooledConnection) -> bool:
+        try:
+            conn._raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _discard(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    # ── Public API ──
+
+    def connect(self) -> PooledConnection:
+        """Ambil koneksi dari pool (checkout). Kembalikan dengan conn.close()."""
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            candidate = None
+            overflow = False
+            with self._cond:
+                while True:
+                    # 1) Ambil koneksi idle terbaru (LIFO)
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        self._checked_out += 1
+                        break
+
+                    # 2) Boleh buat koneksi baru selama di bawah pool_size + max_overflow
+                    if self._checked_out < self.pool_size + self.max_overflow:
+                        overflow = self._checked_out >= self.pool_size
+                        self._checked_out += 1
+                        if overflow:
+                            self._overflow += 1
+                        break
+
+                    # 3) Tunggu sampai ada koneksi yang dikembalikan
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Pool koneksi penuh ({self.pool_size}+{self.max_overflow}), "
+                            f"menunggu lebih dari {self.timeout} detik"
+                        )
+                    self._cond.wait(remaining)
+
+            # Validasi & handshake dilakukan di luar lock agar tidak memblokir thread lain
+            if candidate is not None:
+                now = time.monotonic()
+                if self._is_expired(candidate, now) or (self.pre_ping and not self._is_alive(candidate)):
+                    self._discard(candidate._raw)
+                    with self._cond:
+                        self._checked_out -= 1
+                        self._cond.notify()
+                    continue
+                candidate._returned = False
+                candidate.last_used = now
+                return candidate
+
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._checked_out -= 1
+                    if overflow:
+                        self._overflow -= 1
+                    self._cond.notify()
+                raise
+            return PooledConnection(self, raw, overflow=overflow)
+
+    def _release(self, conn: PooledConnection):
+        # Akhiri transaksi baca yang terbuka agar snapshot InnoDB (REPEATABLE READ)
+        # tidak terbawa ke pemakai berikutnya dan data baru tetap terlihat.
+        keep = not conn._overflow
+        try:
+            conn._raw.rollback()
+        except Exception:
+            keep = False
+
+        with self._cond:
+            self._checked_out -= 1
+            if conn._overflow:
+                self._overflow -= 1
+            if keep and len(self._idle) < self.pool_size and not self._is_expired(conn, time.monotonic()):
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._discard(conn._raw)
+            self._cond.notify()
+
+    def dispose(self):
+        """Tutup semua koneksi idle (mis. saat shutdown atau ganti konfigurasi)."""
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop()._raw)
+
+    def stats(self) -> Dict[str, int]:
+        """Statistik pool untuk monitoring"""
+        with self._cond:
+            return {
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "overflow": self._overflow,
+                "total_created": self._created,
+            }
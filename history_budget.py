@@ -0,0 +1,245 @@
+# history_budget.py
+# Riwayat chat dengan anggaran token + ringkasan bergulir
+#
+# Client (/api/chat, AI SDK) mengirim ulang seluruh percakapan di setiap
+# request. Tanpa batas, prompt makin panjang (dan prefill makin lambat) di
+# setiap giliran. HistoryBudget:
+#   - membuang pesan tool / tool call lama dan memotong pesan yang terlalu besar
+#   - menyimpan pesan terbaru apa adanya selama muat dalam HISTORY_MAX_TOKENS
+#   - pesan yang lebih lama diganti satu ringkasan. Ringkasan di-cache per
+#     prefix percakapan, sehingga giliran berikutnya hanya meringkas pesan yang
+#     baru tergeser (inkremental). Ringkasan LLM dibuat di background; selama
+#     belum siap dipakai ringkasan ekstraktif (daftar pertanyaan sebelumnya).
+
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+import tracing
+from tool_result import estimasi_token
+
+logger = logging.getLogger(__name__)
+
+HISTORY_MAX_TOKENS = getattr(config, "HISTORY_MAX_TOKENS", 1500)
+HISTORY_MAX_TOKEN_PESAN = getattr(config, "HISTORY_MAX_TOKEN_PESAN", 300)
+HISTORY_MAX_PESAN = getattr(config, "HISTORY_MAX_PESAN", 20)
+HISTORY_SUMMARY_ENABLED = getattr(config, "HISTORY_SUMMARY_ENABLED", True)
+HISTORY_SUMMARY_CACHE = getattr(config, "HISTORY_SUMMARY_CACHE", 256)
+
+PROMPT_RINGKASAN = (
+    "Ringkas percakapan antara guru dan asisten absensi berikut dalam maksimal 5 poin singkat. "
+    "Pertahankan nama siswa, nama kelas, tanggal/periode, dan angka penting. "
+    "Jika ada ringkasan sebelumnya, gabungkan menjadi satu ringkasan baru."
+)
+
+
+def _potong(teks: str, max_token: int) -> str:
+    """Potong teks yang melebihi max_token (perkiraan) dan beri penanda"""
+    if estimasi_token(teks) <= max_token:
+        return teks
+    # ~4 karakter per token untuk teks campuran Indonesia + angka
+    return teks[: max_token * 4].rstrip() + " …[dipotong]"
+
+
+def _bersihkan(chat_history: Optional[list]) -> List[Dict[str, str]]:
+    """Hanya pesan user/assistant bertipe teks; hasil tool & tool call lama dibuang"""
+    hasil = []
+    for msg in chat_history or []:
+        role = msg.get("role", "")
+        content = msg.get("content", "")
+        if role in ("user", "assistant") and content and not msg.get("tool_calls"):
+            hasil.append({"role": role, "content": content})
+    return hasil
+
+
+def _hash_prefix(messages: List[Dict[str, str]]) -> List[str]:
+    """hashes[i] = identitas messages[:i] (hash berantai, O(n))"""
+    hashes = [""]
+    for msg in messages:
+        h = hashlib.sha1(f"{hashes[-1]}|{msg['role']}:{msg['content']}".encode("utf-8"))
+        hashes.append(h.hexdigest())
+    return hashes
+
+
+def _batasi_ringkasan(ringkasan: str, max_token: int) -> str:
+    """Ringkasan maksimal max_token: baris terlama dibuang dulu, sisa satu baris dipotong"""
+    baris = ringkasan.split("\n")
+    while len(baris) > 1 and estimasi_token("\n".join(baris)) > max_token:
+        baris.pop(0)
+    return _potong("\n".join(baris), max_token)
+
+
+def ringkasan_ekstraktif(messages: List[Dict[str, str]], sebelumnya: Optional[str] = None) -> str:
+    """Ringkasan tanpa LLM: pertanyaan-pertanyaan user sebelumnya"""
+    baris = [sebelumnya] if sebelumnya else []
+    pertanyaan = [m["content"] for m in messages if m["role"] == "user"]
+    baris += [f"- Guru bertanya: {_potong(q, 40)}" for q in pertanyaan[-8:]]
+    return "\n".join(baris)
+
+
+class HistoryBudget:
+    """
+    Penyusun riwayat chat untuk prompt.
+
+    - summarize     : (ringkasan_sebelumnya, pesan_baru) → ringkasan baru (mis. panggilan LLM);
+                      None = hanya ringkasan ekstraktif
+    - max_tokens    : anggaran token untuk ringkasan + pesan terbaru
+    - max_token_pesan : pesan lama yang lebih besar dari ini dipotong
+    """
+
+    def __init__(
+        self,
+        summarize: Optional[Callable[[Optional[str], List[Dict[str, str]]], str]] = None,
+        max_tokens: int = HISTORY_MAX_TOKENS,
+        max_token_pesan: int = HISTORY_MAX_TOKEN_PESAN,
+        max_pesan: int = HISTORY_MAX_PESAN,
+        max_entries: int = HISTORY_SUMMARY_CACHE,
+    ):
+        self._summarize = summarize if HISTORY_SUMMARY_ENABLED else None
+        self.max_tokens = max_tokens
+        self.max_token_pesan = max_token_pesan
+        self.max_pesan = max_pesan
+        self.max_entries = max_entries
+        # Bagian anggaran yang disisihkan untuk ringkasan saat riwayat tidak muat seluruhnya
+        self.max_token_ringkasan = max(1, max_tokens // 3)
+        # hash prefix percakapan → ringkasan pesan-pesan di prefix tersebut
+        self._ringkasan: "OrderedDict[str, str]" = OrderedDict()
+        self._proses = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+        self.hits = 0
+        self.misses = 0
+        self.diringkas_total = 0
+
+    # ── Cache ringkasan ──
+
+    def _ambil(self, hashes: List[str], sampai: int) -> Tuple[int, Optional[str]]:
+        """Ringkasan tersimpan untuk prefix terpanjang messages[:j], j <= sampai"""
+        with self._lock:
+            for j in range(sampai, 0, -1):
+                ringkasan = self._ringkasan.get(hashes[j])
+                if ringkasan is not None:
+                    self._ringkasan.move_to_end(hashes[j])
+                    return j, ringkasan
+        return 0, None
+
+    def _simpan(self, key: str, ringkasan: str):
+        with self._lock:
+            self._ringkasan[key] = ringkasan
+            self._ringkasan.move_to_end(key)
+            while len(self._ringkasan) > self.max_entries:
+                self._ringkasan.popitem(last=False)
+
+    def _ringkas_background(self, key: str, sebelumnya: Optional[str], pesan: List[Dict[str, str]]):
+        with self._lock:
+            if key in self._proses:
+                return
+            self._proses.add(key)
+
+        def kerja():
+            try:
+                self._simpan(key, self._summarize(sebelumnya, pesan))
+                self.diringkas_total += 1
+            except Exception as e:
+                logger.warning("Ringkasan riwayat gagal: %s", e)
+            finally:
+                with self._lock:
+                    self._proses.discard(key)
+
+        self._executor.submit(kerja)
+
+    # ── Penyusunan ──
+
+    def susun(self, chat_history: Optional[list]) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Return (pesan untuk prompt, info). Pesan diawali satu pesan system berisi
+        ringkasan jika ada bagian riwayat yang tergeser.
+        """
+        messages = _bersihkan(chat_history)
+        info = {"pesan_asli": len(messages), "pesan_dipakai": 0, "ringkasan": None, "tokens": 0}
+        if not messages:
+            return [], info
+
+        # Pesan terbaru apa adanya (dipotong jika besar) selama masih muat anggaran
+        terbaru, tokens = self._pilih_terbaru(messages, self.max_tokens)
+        if len(terbaru) < len(messages):
+            # Ada yang tergeser → sisihkan anggaran ringkasan dulu, baru pilih pesan terbaru,
+            # sehingga setiap pesan yang tidak muat masuk ke bagian yang diringkas
+            terbaru, tokens = self._pilih_terbaru(messages, self.max_tokens - self.max_token_ringkasan)
+        tergeser = len(messages) - len(terbaru)
+        info.update(pesan_dipakai=len(terbaru), tokens=tokens)
+        if tergeser == 0:
+            return terbaru, info
+
+        # Bagian yang tergeser → ringkasan (cache per prefix, inkremental)
+        hashes = _hash_prefix(messages)
+        j, sebelumnya = self._ambil(hashes, tergeser)
+        if j == tergeser:
+            self.hits += 1
+            ringkasan, info["ringkasan"] = sebelumnya, "cache"
+        else:
+            self.misses += 1
+            baru = messages[j:tergeser]
+            ringkasan, info["ringkasan"] = ringkasan_ekstraktif(baru, sebelumnya), "ekstraktif"
+            if self._summarize is not None:
+                self._ringkas_background(hashes[tergeser], sebelumnya, baru)
+
+        judul = "Ringkasan percakapan sebelumnya:\n"
+        ringkasan = _batasi_ringkasan(ringkasan, max(1, self.max_token_ringkasan - estimasi_token(judul)))
+        pesan_ringkasan = {"role": "system", "content": judul + ringkasan}
+        info["tokens"] = tokens + estimasi_token(pesan_ringkasan["content"])
+        return [pesan_ringkasan] + terbaru, info
+
+    def _pilih_terbaru(self, messages: List[Dict[str, str]], anggaran: int) -> Tuple[List[Dict[str, str]], int]:
+        """Pesan terbaru (maks max_pesan, dipotong per pesan) yang muat dalam anggaran; minimal satu"""
+        terbaru, tokens = [], 0
+        for msg in reversed(messages[-self.max_pesan:]):
+            content = _potong(msg["content"], self.max_token_pesan)
+            n = estimasi_token(content)
+            if terbaru and tokens + n > anggaran:
+                break
+            terbaru.append({"role": msg["role"], "content": content})
+            tokens += n
+        terbaru.reverse()
+        return terbaru, tokens
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._ringkasan),
+                "hits": self.hits,
+                "misses": self.misses,
+                "diringkas_total": self.diringkas_total,
+                "sedang_diringkas": len(self._proses),
+            }
+
+
+def buat_summarizer(chat: Callable, model: str, prioritas: int) -> Callable:
+    """summarize() berbasis LLM: chat = llm_client.client.chat"""
+
+    def summarize(sebelumnya: Optional[str], pesan: List[Dict[str, str]]) -> str:
+        percakapan = "\n".join(
+            f"{'Guru' if m['role'] == 'user' else 'Asisten'}: {_potong(m['content'], 150)}" for m in pesan
+        )
+        if sebelumnya:
+            percakapan = f"Ringkasan sebelumnya:\n{sebelumnya}\n\nPercakapan lanjutan:\n{percakapan}"
+        with tracing.trace("history.summarize", model=model, pesan=len(pesan)):
+            res = chat(
+                model=model,
+                messages=[
+                    {"role": "system", "content": PROMPT_RINGKASAN},
+                    {"role": "user", "content": percakapan},
+                ],
+                stream=False,
+                options={"num_predict": 200},
+                prioritas=prioritas,
+            )
+        # Model "thinking" (mis. qwen3) bisa menyertakan blok <think>
+        return re.sub(r"<think>.*?</think>", "", res["message"]["content"], flags=re.S).strip()
+
+    return summarize
@@ -0,0 +1,456 @@
+# index_advisor.py
+# Analisis index tabel absensi: ekstrak semua query SELECT dari db_functions.py,
+# jalankan EXPLAIN, laporkan full scan / filesort, dan buat migration index.
+#
+# Pemakaian:
+#   python index_advisor.py                       # laporan EXPLAIN + rekomendasi
+#   python index_advisor.py --emit                # tulis migrations/NNN_absensi_indexes.sql
+#   python index_advisor.py --benchmark           # + waktu eksekusi tiap query
+#   python index_advisor.py --benchmark --apply   # benchmark sebelum/sesudah index dipasang
+#   python index_advisor.py --report laporan.md   # simpan laporan ke file
+
+import argparse
+import ast
+import os
+import re
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import mysql.connector
+
+from config import DB_CONFIG_DICT
+import rekap_absensi
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_FILES = ["db_functions.py"]
+MIGRATIONS_DIR = os.path.join(BASE_DIR, "migrations")
+
+# Kolom kesetaraan utama yang menjadi awalan index absensi
+_KOLOM_UTAMA = ["kelas_id", "siswa_id"]
+# Kolom murah di belakang index: disaring lewat index condition pushdown
+# dan membuat query agregat menjadi index-only (covering)
+_KOLOM_COVERING = ["status", "kelas_id"]
+
+
+# ============================================
+# EKSTRAKSI QUERY
+# ============================================
+
+class _QueryCollector(ast.NodeVisitor):
+    """
+    Kumpulkan SQL dari setiap cursor.execute(...) sesuai urutan source.
+    Query yang disusun bertahap (query = "..."; query += " AND ...") digabung
+    menjadi versi dengan semua filter opsional aktif.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.fungsi = "<module>"
+        self.fragments: Dict[str, List[str]] = {}
+        self.queries: List[Dict[str, Any]] = []
+
+    @staticmethod
+    def _teks(node) -> Optional[str]:
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        if isinstance(node, ast.JoinedStr):
+            # Bagian {…} f-string diganti kosong (biasanya filter opsional)
+            return "".join(
+                v.value for v in node.values
+                if isinstance(v, ast.Constant) and isinstance(v.value, str)
+            )
+        return None
+
+    def visit_FunctionDef(self, node):
+        fungsi_lama, fragments_lama = self.fungsi, self.fragments
+        self.fungsi, self.fragments = node.name, {}
+        self.generic_visit(node)
+        self.fungsi, self.fragments = fungsi_lama, fragments_lama
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Assign(self, node):
+        teks = self._teks(node.value)
+        if teks is not None:
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self.fragments[target.id] = [teks]
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        teks = self._teks(node.value) if node.value else None
+        if teks is not None and isinstance(node.target, ast.Name):
+            self.fragments[node.target.id] = [teks]
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        teks = self._teks(node.value)
+        if teks is not None and isinstance(node.target, ast.Name) and node.target.id in self.fragments:
+            self.fragments[node.target.id].append(teks)
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr == "execute" and node.args:
+            arg = node.args[0]
+            sql = self._teks(arg)
+            if sql is None and isinstance(arg, ast.Name) and arg.id in self.fragments:
+                sql = "".join(self.fragments[arg.id])
+            if sql:
+                self.queries.append({
+                    "sumber": f"{self.filename}:{node.lineno} {self.fungsi}",
+                    "sql": sql,
+                })
+        self.generic_visit(node)
+
+
+def _normalisasi_sql(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def extract_queries(files: List[str] = SOURCE_FILES) -> List[Dict[str, Any]]:
+    """Semua query SELECT unik dari file sumber + query tabel agregat rekap_absensi"""
+    hasil, sudah = [], set()
+
+    for nama in files:
+        path = os.path.join(BASE_DIR, nama)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=nama)
+        collector = _QueryCollector(nama)
+        collector.visit(tree)
+        for q in collector.queries:
+            key = _normalisasi_sql(q["sql"])
+            if key.upper().startswith("SELECT") and key not in sudah:
+                sudah.add(key)
+                hasil.append(q)
+
+    # Query laporan yang dibangun dinamis oleh rekap_absensi (REKAP_ABSENSI_ENABLED)
+    contoh = [
+        ("sql_ringkasan_range", (1, "2025-01-10", "2025-03-20")),
+        ("sql_rekap_kelas_range", (1, "2025-01-10", "2025-03-20")),
+        ("sql_ranking_kelas", ("2025-01-10", "2025-03-20", 10, "RPL")),
+        ("sql_siswa_unik", ("2025-01-10", "2025-03-20", 10, "RPL")),
+        ("sql_perbandingan_kelas", (10, "RPL")),
+        ("sql_trends", (1, None, 6)),
+    ]
+    for nama, args in contoh:
+        sql, _ = getattr(rekap_absensi, nama)(*args)
+        hasil.append({"sumber": f"rekap_absensi.py {nama}", "sql": sql})
+
+    return hasil
+
+
+# ============================================
+# PARAMETER CONTOH UNTUK EXPLAIN
+# ============================================
+
+_RE_KOLOM = re.compile(
+    r"([\w`.]+)\s*(?:=|<=|>=|<>|!=|<|>|LIKE|BETWEEN|IN\s*\()\s*$", re.IGNORECASE
+)
+
+
+def _nilai_contoh(sebelum: str, kolom_terakhir: str, mulai: date, akhir: date):
+    """Tebak nilai contoh untuk satu placeholder %s dari teks SQL sebelumnya"""
+    ekor = sebelum[-60:]
+    if re.search(r"LIMIT\s*$", ekor, re.IGNORECASE):
+        return 10, kolom_terakhir
+    if re.search(r"LIKE\s*$", ekor, re.IGNORECASE):
+        return "%a%", kolom_terakhir
+    if re.search(r"BETWEEN\s+%s\s+AND\s*$", ekor, re.IGNORECASE):
+        kolom = kolom_terakhir
+        posisi = "akhir"
+    else:
+        m = _RE_KOLOM.search(ekor)
+        kolom = m.group(1).split(".")[-1].strip("`").lower() if m else ""
+        posisi = "mulai" if re.search(r"BETWEEN\s*$", ekor, re.IGNORECASE) else "akhir"
+
+    if "tanggal" in kolom or "periode" in kolom:
+        return (mulai if posisi == "mulai" else akhir), kolom
+    if "waktu" in kolom or "jam" in kolom:
+        return "07:15:00", kolom
+    if kolom == "status":
+        return "Alfa", kolom
+    if kolom == "metode":
+        return "manual", kolom
+    if kolom == "jurusan":
+        return "RPL", kolom
+    if kolom in ("latitude", "longitude"):
+        return -6.2, kolom
+    if kolom == "nama":
+        return "%a%", kolom
+    if kolom == "key":
+        return "nama_sekolah", kolom
+    return 1, kolom
+
+
+def build_params(sql: str, mulai: date, akhir: date) -> list:
+    params, kolom = [], ""
+    bagian = sql.split("%s")
+    for i in range(len(bagian) - 1):
+        sebelum = "%s".join(bagian[:i + 1])
+        nilai, kolom = _nilai_contoh(sebelum, kolom, mulai, akhir)
+        params.append(nilai)
+    return params
+
+
+# ============================================
+# EXPLAIN & REKOMENDASI
+# ============================================
+
+def _klausa_where(sql: str) -> str:
+    teks = _normalisasi_sql(sql)
+    bagian = re.split(r"\bWHERE\b", teks, maxsplit=1, flags=re.IGNORECASE)
+    if len(bagian) < 2:
+        return ""
+    return re.split(r"\b(?:GROUP BY|ORDER BY|HAVING|LIMIT)\b", bagian[1], flags=re.IGNORECASE)[0]
+
+
+def rekomendasi_index(sql: str) -> Optional[Tuple[Tuple[str, ...], int]]:
+    """
+    Index komposit absensi untuk satu query: (kolom, jumlah kolom kunci).
+    Urutan: kolom kesetaraan utama (kelas_id/siswa_id) → tanggal → kolom covering.
+    Alias absensi diasumsikan 'a' atau tanpa alias.
+    """
+    where = _klausa_where(sql)
+    kolom = [
+        k for k in _KOLOM_UTAMA
+        if re.search(rf"(?<![\w.])(?:a\.)?{k}\s*(?:=|IN\s*\()", where, re.IGNORECASE)
+    ][:1]
+    if re.search(r"(?<![\w.])(?:a\.)?tanggal\s*(?:=|BETWEEN|>=|<=|<|>|IN\s*\()", where, re.IGNORECASE):
+        kolom.append("tanggal")
+    if not kolom:
+        return None
+
+    n_kunci = len(kolom)
+    teks = _normalisasi_sql(sql)
+    for extra in _KOLOM_COVERING:
+        if extra not in kolom and re.search(rf"(?<![\w])(?:a\.)?{extra}\b", teks, re.IGNORECASE):
+            kolom.append(extra)
+    return tuple(kolom), n_kunci
+
+
+def explain(cursor, sql: str, params: list) -> List[Dict[str, Any]]:
+    cursor.execute("EXPLAIN " + sql, params)
+    return cursor.fetchall()
+
+
+def masalah_explain(rows: List[Dict[str, Any]]) -> List[str]:
+    """Daftar masalah dari output EXPLAIN (full scan, filesort, temporary)"""
+    masalah = []
+    for r in rows:
+        tabel = r.get("table") or "?"
+        extra = r.get("Extra") or ""
+        if r.get("type") == "ALL":
+            masalah.append(f"full scan `{tabel}` (~{r.get('rows')} baris)")
+        if "Using filesort" in extra:
+            masalah.append(f"filesort `{tabel}`")
+        if "Using temporary" in extra:
+            masalah.append(f"temporary table `{tabel}`")
+    return masalah
+
+
+def perlu_index(rows: List[Dict[str, Any]]) -> bool:
+    """
+    True jika akses ke absensi belum optimal: full scan, tanpa index, atau
+    hanya memakai index kelas_id lalu menyaring tanggal/status baris per baris.
+    """
+    for r in rows:
+        if r.get("table") not in ("a", "absensi"):
+            continue
+        extra = r.get("Extra") or ""
+        if r.get("type") == "ALL" or not r.get("key"):
+            return True
+        if r.get("key") == "absensi_kelas_id_foreign" and "Using where" in extra:
+            return True
+        if "Using filesort" in extra or "Using temporary" in extra:
+            return True
+    return False
+
+
+_RE_TABEL_ABSENSI = re.compile(r"\b(?:FROM|JOIN)\s+`?absensi`?\b", re.IGNORECASE)
+
+
+def index_absensi_saat_ini(cursor) -> List[Tuple[str, ...]]:
+    cursor.execute("SHOW INDEX FROM absensi")
+    per_index: Dict[str, List[Tuple[int, str]]] = {}
+    for r in cursor.fetchall():
+        per_index.setdefault(r["Key_name"], []).append((r["Seq_in_index"], r["Column_name"]))
+    return [tuple(c for _, c in sorted(cols)) for cols in per_index.values()]
+
+
+def ringkas_rekomendasi(kandidat: Dict[Tuple[Tuple[str, ...], int], List[str]],
+                        existing: List[Tuple[str, ...]]) -> Dict[Tuple[str, ...], List[str]]:
+    """
+    Gabungkan rekomendasi per query menjadi sesedikit mungkin index:
+    - lewati jika kolom kunci sudah menjadi awalan index yang ada
+    - rekomendasi yang merupakan awalan rekomendasi lain digabung ke yang lebih panjang
+    """
+    hasil: Dict[Tuple[str, ...], List[str]] = {}
+    for (kolom, n_kunci), sumber in sorted(kandidat.items(), key=lambda x: -len(x[0][0])):
+        kunci = kolom[:n_kunci]
+        if any(idx[:len(kunci)] == kunci for idx in existing):
+            continue
+        induk = next((k for k in hasil if k[:len(kolom)] == kolom), None)
+        if induk:
+            hasil[induk].extend(sumber)
+        else:
+            hasil[kolom] = list(sumber)
+    return hasil
+
+
+def nama_index(kolom: Tuple[str, ...]) -> str:
+    return "absensi_" + "_".join(kolom) + "_index"
+
+
+def tulis_migration(rekomendasi: Dict[Tuple[str, ...], List[str]], path: Optional[str] = None) -> str:
+    """Tulis file migration ALTER TABLE absensi ADD INDEX ... dan return path-nya"""
+    if path is None:
+        os.makedirs(MIGRATIONS_DIR, exist_ok=True)
+        nomor = [int(f[:3]) for f in os.listdir(MIGRATIONS_DIR) if f[:3].isdigit()]
+        path = os.path.join(MIGRATIONS_DIR, f"{max(nomor, default=0) + 1:03d}_absensi_indexes.sql")
+
+    baris = [
+        f"-- {os.path.basename(path)}",
+        "-- Index komposit absensi hasil index_advisor.py",
+        "",
+    ]
+    for kolom, sumber in rekomendasi.items():
+        baris.append(f"-- Dipakai oleh: {', '.join(sorted(set(sumber)))}")
+        kolom_sql = ", ".join(f"`{k}` ASC" for k in kolom)
+        baris.append(f"ALTER TABLE `absensi` ADD INDEX `{nama_index(kolom)}`({kolom_sql}) USING BTREE;")
+        baris.append("")
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(baris))
+    return path
+
+
+def benchmark(cursor, sql: str, params: list, ulang: int) -> float:
+    """Median waktu eksekusi (ms)"""
+    waktu = []
+    for _ in range(ulang):
+        t0 = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        waktu.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(waktu)
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def _rentang_contoh(cursor) -> Tuple[date, date]:
+    """30 hari terakhir dari data absensi yang ada"""
+    cursor.execute("SELECT MAX(tanggal) AS akhir FROM absensi")
+    row = cursor.fetchone()
+    akhir = row["akhir"] if row and row["akhir"] else date.today()
+    return akhir - timedelta(days=30), akhir
+
+
+def analisa(cursor, queries, mulai, akhir, ulang: int = 0) -> List[Dict[str, Any]]:
+    hasil = []
+    for q in queries:
+        params = build_params(q["sql"], mulai, akhir)
+        item = {**q, "params": params}
+        try:
+            rows = explain(cursor, q["sql"], params)
+            item["explain"] = rows
+            item["masalah"] = masalah_explain(rows)
+            if ulang:
+                item["ms"] = benchmark(cursor, q["sql"], params, ulang)
+        except mysql.connector.Error as e:
+            item["error"] = str(e)
+        hasil.append(item)
+    return hasil
+
+
+def _ringkas_plan(rows) -> str:
+    return "; ".join(f"{r.get('table')}:{r.get('type')}/{r.get('key') or '-'}" for r in rows or [])
+
+
+def susun_laporan(sebelum, sesudah, rekomendasi, migration_path) -> str:
+    baris = ["# Laporan Index Advisor — tabel absensi", ""]
+    baris.append(f"Total query dianalisis: {len(sebelum)}")
+    baris.append("")
+    baris.append("| Sumber | Masalah | Plan sebelum | ms sebelum | Plan sesudah | ms sesudah |")
+    baris.append("|---|---|---|---|---|---|")
+
+    for i, item in enumerate(sebelum):
+        if "error" in item:
+            baris.append(f"| {item['sumber']} | ERROR: {item['error']} | | | | |")
+            continue
+        after = sesudah[i] if sesudah else {}
+        ms_before = f"{item['ms']:.2f}" if "ms" in item else "-"
+        ms_after = f"{after['ms']:.2f}" if "ms" in after else "-"
+        baris.append(
+            f"| {item['sumber']} | {', '.join(item['masalah']) or 'OK'} | "
+            f"{_ringkas_plan(item['explain'])} | {ms_before} | "
+            f"{_ringkas_plan(after.get('explain'))} | {ms_after} |"
+        )
+
+    baris += ["", "## Rekomendasi index", ""]
+    if not rekomendasi:
+        baris.append("Tidak ada index baru yang direkomendasikan.")
+    for kolom, sumber in rekomendasi.items():
+        baris.append(f"- `{nama_index(kolom)}` ({', '.join(kolom)}) — {len(set(sumber))} query")
+    if migration_path:
+        baris += ["", f"Migration: `{os.path.relpath(migration_path, BASE_DIR)}`"]
+    return "\n".join(baris) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index advisor untuk query absensi")
+    parser.add_argument("--emit", action="store_true", help="tulis file migration index")
+    parser.add_argument("--benchmark", action="store_true", help="ukur waktu eksekusi tiap query")
+    parser.add_argument("--apply", action="store_true", help="pasang index lalu benchmark ulang")
+    parser.add_argument("--ulang", type=int, default=5, help="jumlah eksekusi per query untuk benchmark")
+    parser.add_argument("--report", help="simpan laporan markdown ke file ini")
+    args = parser.parse_args()
+
+    ulang = args.ulang if (args.benchmark or args.apply) else 0
+    db = mysql.connector.connect(**DB_CONFIG_DICT)
+    cursor = db.cursor(dictionary=True, buffered=True)
+    try:
+        mulai, akhir = _rentang_contoh(cursor)
+        queries = extract_queries()
+        sebelum = analisa(cursor, queries, mulai, akhir, ulang)
+
+        kandidat: Dict[Tuple[Tuple[str, ...], int], List[str]] = {}
+        for item in sebelum:
+            if "explain" not in item or not _RE_TABEL_ABSENSI.search(item["sql"]):
+                continue
+            if not perlu_index(item["explain"]):
+                continue
+            rekom = rekomendasi_index(item["sql"])
+            if rekom:
+                kandidat.setdefault(rekom, []).append(item["sumber"].split()[-1])
+        rekomendasi = ringkas_rekomendasi(kandidat, index_absensi_saat_ini(cursor))
+
+        migration_path = tulis_migration(rekomendasi) if (args.emit or args.apply) and rekomendasi else None
+
+        sesudah = None
+        if args.apply and rekomendasi:
+            for kolom in rekomendasi:
+                kolom_sql = ", ".join(f"`{k}`" for k in kolom)
+                cursor.execute(f"ALTER TABLE `absensi` ADD INDEX `{nama_index(kolom)}`({kolom_sql})")
+            cursor.execute("ANALYZE TABLE absensi")
+            sesudah = analisa(cursor, queries, mulai, akhir, ulang)
+
+        laporan = susun_laporan(sebelum, sesudah, rekomendasi, migration_path)
+    finally:
+        cursor.close()
+        db.close()
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(laporan)
+        print(f"✅ Laporan disimpan: {args.report}")
+    else:
+        print(laporan)
+
+
+if __name__ == "__main__":
+    main()
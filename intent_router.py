@@ -0,0 +1,410 @@
+# intent_router.py
+# Pre-router berbasis aturan: pertanyaan umum langsung dipetakan ke tool
+#
+# Sebagian besar pertanyaan guru punya pola tetap ("siapa yang alfa hari ini",
+# "rekap absensi siswa X bulan ini", ...). Pola seperti ini tidak perlu LLM untuk
+# memilih tool: tanggal, kelas dan siswa diambil dengan regex + index nama,
+# tool dipanggil langsung, lalu
+#   - jawaban dibuat dari template (tanpa LLM sama sekali), atau
+#   - hasil tool diserahkan ke LLM hanya untuk merangkai jawaban (1 panggilan).
+# Pertanyaan yang tidak cocok / entitasnya tidak jelas → None, agent memakai LLM
+# seperti biasa.
+
+import re
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Optional
+
+import config
+
+INTENT_ROUTER_ENABLED = getattr(config, "INTENT_ROUTER_ENABLED", True)
+INTENT_ROUTER_TEMPLATE = getattr(config, "INTENT_ROUTER_TEMPLATE", True)
+INTENT_ROUTER_DEFAULT_HARI = getattr(config, "INTENT_ROUTER_DEFAULT_HARI", 30)
+
+BULAN = {
+    "januari": 1, "februari": 2, "pebruari": 2, "maret": 3, "april": 4, "mei": 5, "juni": 6,
+    "juli": 7, "agustus": 8, "september": 9, "oktober": 10, "november": 11, "nopember": 11,
+    "desember": 12,
+}
+NAMA_BULAN = {v: k.capitalize() for k, v in BULAN.items() if k not in ("pebruari", "nopember")}
+
+_POLA_BULAN = "|".join(BULAN)
+_ISO = r"\d{4}-\d{2}-\d{2}"
+
+# Kata yang mengakhiri nama kelas/siswa di dalam kalimat
+_KATA_HENTI = (
+    r"bulan|hari|tanggal|tgl|dari|sampai|hingga|minggu|pekan|selama|pada|periode|tahun|"
+    r"yang|di|dan|untuk|sejak|ini|kemarin|terakhir|\d+\s+hari\s+terakhir"
+)
+
+# "di <X>" yang bukan nama kelas
+_BUKAN_KELAS = {"sekolah", "sini", "sana"}
+
+STATUS = {"alfa": "Alfa", "alpa": "Alfa", "bolos": "Alfa", "izin": "Izin", "ijin": "Izin", "sakit": "Sakit"}
+
+
+def normalisasi(teks: str) -> str:
+    """Lowercase + buang tanda baca kecuali '-' (dipakai tanggal ISO)"""
+    return " ".join(re.sub(r"[^\w\s-]", " ", teks.casefold()).split())
+
+
+# ============================================
+# EKSTRAKSI TANGGAL
+# ============================================
+
+def _akhir_bulan(tahun: int, bulan: int) -> date:
+    awal_berikut = date(tahun + bulan // 12, bulan % 12 + 1, 1)
+    return awal_berikut - timedelta(days=1)
+
+
+def tanggal_tunggal(teks: str, hari_ini: date) -> Optional[date]:
+    """'hari ini', 'kemarin', '2026-02-09', '9 februari 2026'"""
+    m = re.search(_ISO, teks)
+    if m:
+        return date.fromisoformat(m.group())
+    m = re.search(rf"\b(\d{{1,2}})\s+({_POLA_BULAN})(?:\s+(\d{{4}}))?\b", teks)
+    if m:
+        return date(int(m.group(3) or hari_ini.year), BULAN[m.group(2)], int(m.group(1)))
+    if "kemarin" in teks:
+        return hari_ini - timedelta(days=1)
+    if "hari ini" in teks:
+        return hari_ini
+    return None
+
+
+def bulan_tahun(teks: str, hari_ini: date) -> Optional[tuple]:
+    """
+    (bulan, tahun) dari 'bulan ini', 'bulan lalu', 'bulan februari', 'februari 2026'.
+    Nama bulan saja tidak dihitung: bisa jadi nama siswa (Juni, Mei, April).
+    """
+    if "bulan ini" in teks:
+        return hari_ini.month, hari_ini.year
+    if "bulan lalu" in teks:
+        kemarin = hari_ini.replace(day=1) - timedelta(days=1)
+        return kemarin.month, kemarin.year
+    m = re.search(rf"\b(?:bulan|\d{{1,2}})\s+({_POLA_BULAN})(?:\s+(\d{{4}}))?\b", teks)
+    if m:
+        return BULAN[m.group(1)], int(m.group(2) or hari_ini.year)
+    m = re.search(rf"\b({_POLA_BULAN})\s+(\d{{4}})\b", teks)
+    if m:
+        return BULAN[m.group(1)], int(m.group(2))
+    return None
+
+
+def rentang(teks: str, hari_ini: date) -> Optional[tuple]:
+    """(mulai, akhir) dari 'dari X sampai Y', 'N hari terakhir', 'minggu ini', bulan, atau satu tanggal"""
+    tanggal = re.findall(_ISO, teks)
+    if len(tanggal) >= 2:
+        return date.fromisoformat(tanggal[0]), date.fromisoformat(tanggal[1])
+    m = re.search(r"\b(\d+)\s+hari\s+terakhir", teks)
+    if m:
+        return hari_ini - timedelta(days=int(m.group(1)) - 1), hari_ini
+    if re.search(r"\b(minggu|pekan) ini\b", teks):
+        return hari_ini - timedelta(days=hari_ini.weekday()), hari_ini
+    tgl = tanggal_tunggal(teks, hari_ini)
+    if tgl:
+        return tgl, tgl
+    bt = bulan_tahun(teks, hari_ini)
+    if bt:
+        bulan, tahun = bt
+        return date(tahun, bulan, 1), min(_akhir_bulan(tahun, bulan), hari_ini)
+    return None
+
+
+def _label_bulan(bt: Optional[tuple]) -> str:
+    return f"bulan {NAMA_BULAN[bt[0]]} {bt[1]}" if bt else "seluruh periode"
+
+
+# ============================================
+# TEMPLATE JAWABAN
+# ============================================
+
+def _error(result) -> bool:
+    return isinstance(result, dict) and "error" in result
+
+
+def _template_tidak_hadir(args: Dict[str, Any]) -> Callable:
+    label = (args.get("status") or "tidak hadir").lower()
+
+    def render(result) -> Optional[str]:
+        if not isinstance(result, list) or (result and "error" in result[0]):
+            return None
+        if not result:
+            tempat = " di kelas tersebut" if args.get("kelas_id") else ""
+            return f"Tidak ada siswa{tempat} yang {label} pada tanggal {args['tanggal']}."
+        subjek = f"siswa kelas {result[0]['kelas']}" if args.get("kelas_id") else "siswa"
+        baris = [f"Ada {len(result)} {subjek} yang {label} pada tanggal {args['tanggal']}:"]
+        for row in result[:50]:
+            baris.append(f"- {row['nama_siswa']} ({row['kelas']}) — {row['status']}")
+        if len(result) > 50:
+            baris.append(f"- ... dan {len(result) - 50} siswa lainnya")
+        return "\n".join(baris)
+
+    return render
+
+
+def _template_rekap(bt: Optional[tuple]) -> Callable:
+    def render(result) -> Optional[str]:
+        if _error(result):
+            return None
+        if not result:
+            return f"Data absensi siswa untuk {_label_bulan(bt)} tidak ditemukan."
+        return (
+            f"Rekap absensi {result['nama_siswa']} (NIS {result['nis']}) {_label_bulan(bt)}:\n"
+            f"- Hadir: {result['total_hadir']}\n- Sakit: {result['total_sakit']}\n"
+            f"- Izin: {result['total_izin']}\n- Alfa: {result['total_alfa']}\n"
+            f"Total {result['total_hari']} hari tercatat."
+        )
+
+    return render
+
+
+def _template_persentase(bt: Optional[tuple]) -> Callable:
+    def render(result) -> Optional[str]:
+        if _error(result):
+            return None
+        if not result or result.get("persentase_kehadiran") is None:
+            return f"Data absensi untuk {_label_bulan(bt)} tidak ditemukan."
+        if result.get("nama_siswa"):
+            subjek = result["nama_siswa"]
+        elif result.get("kelas"):
+            subjek = f"kelas {result['kelas']}"
+        else:
+            subjek = "seluruh sekolah"
+        teks = f"Persentase kehadiran {subjek} {_label_bulan(bt)}: {result['persentase_kehadiran']}%."
+        if "total_record" in result:
+            teks += (
+                f"\n- Hadir: {result['total_hadir']}\n- Izin: {result['total_izin']}\n"
+                f"- Sakit: {result['total_sakit']}\n- Alfa: {result['total_alfa']}\n"
+                f"Dari {result['total_record']} catatan absensi {result['total_siswa']} siswa."
+            )
+        return teks
+
+    return render
+
+
+def _template_ringkasan_harian(result) -> Optional[str]:
+    if _error(result):
+        return None
+    if not result.get("total_record"):
+        return f"Belum ada data absensi kelas {result.get('kelas')} pada tanggal {result.get('tanggal')}."
+    return (
+        f"Ringkasan absensi kelas {result['kelas']} tanggal {result['tanggal']}:\n"
+        f"- Hadir: {result['hadir']}\n- Izin: {result['izin']}\n"
+        f"- Sakit: {result['sakit']}\n- Alfa: {result['alfa']}\n"
+        f"Kehadiran {result['persen_hadir']}% dari {result['total_record']} siswa tercatat."
+    )
+
+
+def _template_cari_siswa(nama: str) -> Callable:
+    def render(result) -> Optional[str]:
+        if not isinstance(result, list):
+            return None
+        if not result:
+            return f"Siswa dengan nama '{nama}' tidak ditemukan."
+        baris = [f"Ditemukan {len(result)} siswa dengan nama '{nama}':"]
+        for row in result:
+            kelas = f", kelas {row['kelas']}" if row.get("kelas") else ""
+            baris.append(f"- {row['nama']} (NIS {row.get('nis')}{kelas})")
+        return "\n".join(baris)
+
+    return render
+
+
+# ============================================
+# ROUTER
+# ============================================
+
+class Rute:
+    """Hasil routing: tool + argumen, dan template jawaban (None = LLM yang merangkai)"""
+
+    __slots__ = ("intent", "tool", "args", "template")
+
+    def __init__(self, intent: str, tool: str, args: Dict[str, Any], template: Optional[Callable] = None):
+        self.intent = intent
+        self.tool = tool
+        self.args = args
+        self.template = template if INTENT_ROUTER_TEMPLATE else None
+
+    def tool_call(self) -> Dict[str, Any]:
+        """Bentuk tool call seperti yang dikirim Ollama (untuk history pesan & response_cache)"""
+        return {"function": {"name": self.tool, "arguments": self.args}}
+
+
+class IntentRouter:
+    """
+    Pencocok pola pertanyaan → Rute.
+
+    - resolve_kelas : nama kelas → id (kelas_index.resolve)
+    - resolve_siswa : nama siswa → id (siswa_index.resolve)
+    Nama yang tidak bisa di-resolve ke tepat satu ID → tidak di-route (LLM yang menangani).
+    """
+
+    def __init__(
+        self,
+        resolve_kelas: Callable[[str], Optional[int]],
+        resolve_siswa: Callable[[str], Optional[int]],
+        enabled: bool = INTENT_ROUTER_ENABLED,
+    ):
+        self._resolve_kelas = resolve_kelas
+        self._resolve_siswa = resolve_siswa
+        self.enabled = enabled
+        self.routed: Dict[str, int] = {}
+        self.tidak_cocok = 0
+
+    # ── Entitas ──
+
+    def _kelas(self, teks: str) -> Optional[Dict[str, Any]]:
+        """{'kelas_id': n} dari 'kelas id 3' atau nama kelas yang ter-resolve; {} jika tidak disebut"""
+        m = re.search(r"\bkelas\s+id\s*(\d+)\b", teks)
+        if m:
+            return {"kelas_id": int(m.group(1))}
+        m = re.search(rf"\bkelas\s+(.+?)(?=\s+(?:{_KATA_HENTI})\b|$)", teks)
+        if not m:
+            return {}
+        kelas_id = self._resolve_kelas(m.group(1))
+        return {"kelas_id": kelas_id} if kelas_id else None
+
+    def _kelas_di(self, teks: str) -> Optional[Dict[str, Any]]:
+        """Seperti _kelas, ditambah kelas yang disebut tanpa kata 'kelas' ('... di X RPL 1')"""
+        kelas = self._kelas(teks)
+        if kelas != {}:
+            return kelas
+        for m in re.finditer(rf"\bdi\s+(.+?)(?=\s+(?:{_KATA_HENTI})\b|$)", teks):
+            sebutan = m.group(1)
+            if sebutan in _BUKAN_KELAS or re.match(rf"(?:{_KATA_HENTI})\b", sebutan):
+                continue  # "di sekolah", "di hari senin", ...
+            kelas_id = self._resolve_kelas(sebutan)
+            return {"kelas_id": kelas_id} if kelas_id else None
+        return {}
+
+    def _siswa(self, teks: str) -> Optional[Dict[str, Any]]:
+        """{'siswa_id': n} dari 'siswa id 5' atau nama siswa yang ter-resolve; {} jika tidak disebut"""
+        m = re.search(r"\bsiswa\s+id\s*(\d+)\b", teks)
+        if m:
+            return {"siswa_id": int(m.group(1))}
+        m = re.search(
+            rf"\bsiswa\s+(?:bernama\s+|atas nama\s+)?(.+?)(?=\s+(?:{_KATA_HENTI})\b|$)", teks
+        )
+        if not m:
+            return {}
+        siswa_id = self._resolve_siswa(m.group(1))
+        return {"siswa_id": siswa_id} if siswa_id else None
+
+    @staticmethod
+    def _rentang_args(teks: str, hari_ini: date) -> Dict[str, str]:
+        mulai_akhir = rentang(teks, hari_ini) or (
+            hari_ini - timedelta(days=INTENT_ROUTER_DEFAULT_HARI - 1), hari_ini
+        )
+        return {"tanggal_mulai": mulai_akhir[0].isoformat(), "tanggal_akhir": mulai_akhir[1].isoformat()}
+
+    @staticmethod
+    def _bulan_args(bt: Optional[tuple]) -> Dict[str, int]:
+        return {"bulan": bt[0], "tahun": bt[1]} if bt else {}
+
+    # ── Aturan (urutan = prioritas) ──
+
+    def _cocokkan(self, teks: str, hari_ini: date) -> Optional[Rute]:
+        status = next((STATUS[k] for k in STATUS if re.search(rf"\b{k}\b", teks)), None)
+
+        m = re.search(
+            rf"\bcari(?:kan)?\s+siswa\s+(?:bernama\s+|dengan nama\s+|atas nama\s+)?(.+?)(?=\s+(?:{_KATA_HENTI})\b|$)",
+            teks,
+        )
+        if m:
+            nama = m.group(1)
+            # Ada syarat lain setelah nama ("... di kelas X RPL 1") → LLM yang merangkai hasil cari_siswa
+            template = _template_cari_siswa(nama) if m.end() == len(teks) else None
+            return Rute("cari_siswa", "cari_siswa", {"nama": nama}, template)
+
+        if "anomali" in teks:
+            kelas = self._kelas(teks)
+            if kelas is None:
+                return None
+            return Rute("anomali", "get_anomali_absensi", {**kelas, **self._rentang_args(teks, hari_ini)})
+
+        if re.search(r"\bmetode\s+absen", teks):
+            kelas = self._kelas(teks)
+            if kelas is None:
+                return None
+            return Rute("metode_absen", "get_analisis_metode_absen", {**kelas, **self._rentang_args(teks, hari_ini)})
+
+        m = re.search(r"\btop\s+(\d+)|\b(\d+)\s+siswa\s+paling|\bpaling\s+(rajin|sering)", teks)
+        if m:
+            kelas = self._kelas(teks)
+            if kelas is None:
+                return None
+            limit = int(m.group(1) or m.group(2) or 10)
+            status_top = "Hadir" if re.search(r"\b(rajin|hadir)\b", teks) else (status or "Alfa")
+            args = {**kelas, **self._rentang_args(teks, hari_ini), "status": status_top, "limit": limit}
+            return Rute("top_siswa", "get_top_siswa_absensi", args)
+
+        if re.search(r"\b(persentase|persen|tingkat)\s+kehadiran\b", teks):
+            bt = bulan_tahun(teks, hari_ini)
+            siswa = self._siswa(teks)
+            kelas = self._kelas(teks) if not siswa else {}
+            if siswa is None or kelas is None:
+                return None
+            args = {**siswa, **kelas, **self._bulan_args(bt)}
+            return Rute("persentase", "get_persentase_kehadiran", args, _template_persentase(bt))
+
+        if "rekap" in teks and re.search(r"\bsiswa\b", teks):
+            siswa = self._siswa(teks)
+            if not siswa:
+                return None
+            bt = bulan_tahun(teks, hari_ini)
+            return Rute("rekap_siswa", "get_rekap_absensi", {**siswa, **self._bulan_args(bt)}, _template_rekap(bt))
+
+        if re.search(r"\b(ringkasan|rekap)\b", teks) and re.search(r"\bkelas\b", teks):
+            tgl = tanggal_tunggal(teks, hari_ini)
+            kelas = self._kelas(teks)
+            if not kelas or tgl is None:
+                return None
+            args = {**kelas, "tanggal": tgl.isoformat()}
+            return Rute("ringkasan_kelas_harian", "get_ringkasan_absensi_harian", args, _template_ringkasan_harian)
+
+        if re.search(r"\babsensi\s+siswa\b", teks):
+            siswa = self._siswa(teks)
+            if not siswa:
+                return None
+            args = dict(siswa)
+            mulai_akhir = rentang(teks, hari_ini)
+            if mulai_akhir:
+                args.update(tanggal_mulai=mulai_akhir[0].isoformat(), tanggal_akhir=mulai_akhir[1].isoformat())
+            return Rute("absensi_siswa", "get_absensi_by_siswa", args)
+
+        if re.search(r"\b(siapa|daftar)\b", teks) and (status or re.search(r"\btidak\s+(hadir|masuk)\b", teks)):
+            mulai_akhir = rentang(teks, hari_ini)
+            if mulai_akhir and mulai_akhir[0] != mulai_akhir[1]:
+                return None  # rentang beberapa hari: get_siswa_tidak_hadir hanya per tanggal → LLM
+            kelas = self._kelas_di(teks)
+            if kelas is None:
+                return None  # kelas disebut tapi tidak ter-resolve → LLM
+            tgl = tanggal_tunggal(teks, hari_ini) or hari_ini
+            args = {"tanggal": tgl.isoformat(), **kelas}
+            if status:
+                args["status"] = status
+            return Rute("tidak_hadir", "get_siswa_tidak_hadir", args, _template_tidak_hadir(args))
+
+        return None
+
+    def route(self, pertanyaan: str, hari_ini: Optional[date] = None) -> Optional[Rute]:
+        """Return Rute jika pertanyaan cocok dengan pola yang dikenal, selain itu None"""
+        if not self.enabled:
+            return None
+        try:
+            rute = self._cocokkan(normalisasi(pertanyaan), hari_ini or date.today())
+        except ValueError:
+            rute = None  # tanggal tidak valid (mis. 31 februari) → biarkan LLM
+        if rute is None:
+            self.tidak_cocok += 1
+        else:
+            self.routed[rute.intent] = self.routed.get(rute.intent, 0) + 1
+        return rute
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "routed": sum(self.routed.values()),
+            "tidak_cocok": self.tidak_cocok,
+            **{f"routed_{k}": v for k, v in self.routed.items()},
+        }
@@ -0,0 +1,409 @@
+# job_queue.py
+# Antrian job background (render PDF) berbasis SQLite + worker process
+#
+# Tool PDF (buat_laporan_alfa, buat_surat_peringatan_alfa[_batch]) sebelumnya
+# dirender di dalam tool call agent: thread executor tertahan dan jawaban LLM
+# menunggu PDF selesai. Dengan JobQueue, tool call hanya mencatat job lalu
+# langsung mengembalikan job_id; worker process mengambil job dari tabel
+# SQLite, menjalankan fungsinya, dan menyimpan hasilnya.
+#
+# Pola tabel mengikuti tabel `jobs` Laravel di aplikasi utama (queue, payload,
+# attempts, reserved_at). Job yang di-reserve lebih lama dari JOB_TIMEOUT
+# (worker mati) diambil ulang sampai JOB_MAX_ATTEMPTS.
+# Status job: GET /jobs/{id}; notifikasi selesai dikirim lewat WebSocket.
+
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUE_ENABLED = getattr(config, "JOB_QUEUE_ENABLED", True)
+JOB_DB_PATH = getattr(config, "JOB_DB_PATH", "data/jobs.sqlite3")
+JOB_WORKERS = getattr(config, "JOB_WORKERS", 2)
+JOB_MAX_ATTEMPTS = getattr(config, "JOB_MAX_ATTEMPTS", 2)
+JOB_TIMEOUT = getattr(config, "JOB_TIMEOUT", 600)
+JOB_POLL_INTERVAL = getattr(config, "JOB_POLL_INTERVAL", 2.0)
+JOB_RETENSI = getattr(config, "JOB_RETENSI", 7 * 24 * 3600)
+
+# jenis job → "modul:fungsi" (diimpor di worker process)
+JOB_HANDLERS = {
+    "buat_laporan_alfa": "db_functions:buat_laporan_alfa",
+    "buat_surat_peringatan_alfa": "db_functions:buat_surat_peringatan_alfa",
+    "buat_surat_peringatan_alfa_batch": "db_functions:buat_surat_peringatan_alfa_batch",
+}
+
+ANTRI, PROSES, SELESAI, GAGAL = "antri", "proses", "selesai", "gagal"
+
+# Pemilik job yang dibuat dari request ini (client_id WebSocket / session_id)
+pemilik: ContextVar[Optional[str]] = ContextVar("job_pemilik", default=None)
+
+_SKEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    queue       TEXT NOT NULL,
+    jenis       TEXT NOT NULL,
+    payload     TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    pemilik     TEXT,
+    hasil       TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    reserved_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_pemilik ON jobs (pemilik);
+"""
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    # WAL: pembaca (GET /jobs/{id}) tidak terblokir worker yang sedang menulis
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _baris_ke_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["hasil"] = json.loads(job["hasil"]) if job["hasil"] else None
+    return job
+
+
+# ============================================
+# WORKER PROCESS
+# ============================================
+
+def _ambil_job(conn: sqlite3.Connection, max_attempts: int, timeout: float) -> Optional[sqlite3.Row]:
+    """Reserve satu job secara atomik (BEGIN IMMEDIATE = satu penulis)"""
+    sekarang = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Worker mati di tengah job: reserve kedaluwarsa → gagal jika jatah percobaan habis
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = 'timeout: worker berhenti', finished_at = ? "
+            "WHERE status = ? AND reserved_at < ? AND attempts >= ?",
+            [GAGAL, sekarang, PROSES, sekarang - timeout, max_attempts],
+        )
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = ? OR (status = ? AND reserved_at < ?) "
+            "ORDER BY created_at LIMIT 1",
+            [ANTRI, PROSES, sekarang - timeout],
+        ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = ?, reserved_at = ?, attempts = attempts + 1 WHERE id = ?",
+                [PROSES, sekarang, row["id"]],
+            )
+        conn.execute("COMMIT")
+        return row
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _jalankan_job(conn: sqlite3.Connection, row: sqlite3.Row, handlers: Dict[str, str], max_attempts: int):
+    jenis = row["jenis"]
+    t0 = time.perf_counter()
+    try:
+        modul, nama = handlers[jenis].split(":")
+        fungsi = getattr(importlib.import_module(modul), nama)
+        hasil = fungsi(**json.loads(row["payload"]))
+    except Exception as e:
+        percobaan = row["attempts"] + 1
+        status = GAGAL if percobaan >= max_attempts else ANTRI
+        logger.warning("Job %s (%s) gagal, percobaan %d: %s", row["id"], jenis, percobaan, e)
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, reserved_at = NULL, finished_at = ? WHERE id = ?",
+            [status, str(e), time.time() if status == GAGAL else None, row["id"]],
+        )
+        return status
+
+    # Tool mengembalikan {"error": ...} untuk input yang tidak valid → tidak di-retry
+    status = GAGAL if isinstance(hasil, dict) and "error" in hasil else SELESAI
+    conn.execute(
+        "UPDATE jobs SET status = ?, hasil = ?, error = ?, finished_at = ? WHERE id = ?",
+        [
+            status, json.dumps(hasil, ensure_ascii=False, default=str),
+            hasil.get("error") if status == GAGAL else None, time.time(), row["id"],
+        ],
+    )
+    logger.info("📦 Job %s (%s) %s dalam %.0f ms", row["id"], jenis, status, (time.perf_counter() - t0) * 1000)
+    return status
+
+
+def _worker(db_path: str, handlers: Dict[str, str], max_attempts: int, timeout: float, poll: float, sinyal, stop, notifikasi):
+    """Loop worker process: ambil job, jalankan, kirim job_id ke proses utama"""
+    logging.basicConfig(level=getattr(config, "LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)-7s %(name)s [job-worker] %(message)s")
+    induk = multiprocessing.parent_process()
+    conn = _connect(db_path)
+    while not stop.is_set() and (induk is None or induk.is_alive()):
+        try:
+            row = _ambil_job(conn, max_attempts, timeout)
+        except sqlite3.OperationalError as e:  # database terkunci lama
+            logger.warning("Gagal mengambil job: %s", e)
+            row = None
+        if row is None:
+            sinyal.acquire(timeout=poll)
+            continue
+        status = _jalankan_job(conn, row, handlers, max_attempts)
+        if status != ANTRI:
+            notifikasi.put(row["id"])
+    conn.close()
+
+
+# ============================================
+# JOB QUEUE (proses utama)
+# ============================================
+
+class JobQueue:
+    """
+    Antrian job di SQLite.
+
+    - db_path      : file SQLite (dibuat otomatis)
+    - handlers     : jenis job → "modul:fungsi" yang dijalankan worker
+    - workers      : jumlah worker process yang dijalankan start()
+    - max_attempts : percobaan maksimum per job (exception / worker mati)
+    - timeout      : detik; job "proses" lebih lama dari ini dianggap yatim
+    """
+
+    def __init__(
+        self,
+        db_path: str = JOB_DB_PATH,
+        workers: int = JOB_WORKERS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        timeout: float = JOB_TIMEOUT,
+        poll: float = JOB_POLL_INTERVAL,
+        handlers: Optional[Dict[str, str]] = None,
+    ):
+        self.db_path = db_path
+        self.handlers = dict(JOB_HANDLERS if handlers is None else handlers)
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.poll = poll
+        self._siap = False
+        self._lock = threading.Lock()
+        self._proses: List[multiprocessing.Process] = []
+        self._callbacks: List[Callable[[Dict[str, Any]], None]] = []
+        self._terhubung: Callable[[Optional[str]], bool] = lambda pemilik_job: False
+        self._listener: Optional[threading.Thread] = None
+        # spawn: aman dari server multi-thread dan sama di Windows/Linux
+        self._ctx = multiprocessing.get_context("spawn")
+        self._sinyal = None
+        self._stop = None
+        self._notifikasi = None
+        self.dikirim_total = 0
+        self.selesai_total = 0
+        self.gagal_total = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        with self._lock:
+            if not self._siap:
+                folder = os.path.dirname(self.db_path)
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+                conn = _connect(self.db_path)
+                conn.executescript(_SKEMA)
+                conn.close()
+                self._siap = True
+        return _connect(self.db_path)
+
+    # ── Worker ──
+
+    @property
+    def aktif(self) -> bool:
+        """True jika ada worker yang hidup (job akan diproses)"""
+        return any(p.is_alive() for p in self._proses)
+
+    def start(self):
+        """Jalankan worker process + thread penerus notifikasi (idempotent)"""
+        if self._proses:
+            return
+        self._conn().close()
+        self._sinyal = self._ctx.Semaphore(0)
+        self._stop = self._ctx.Event()
+        self._notifikasi = self._ctx.Queue()
+        for i in range(self.workers):
+            # daemon=False: job batch surat memakai process pool sendiri
+            p = self._ctx.Process(
+                target=_worker, name=f"job-worker-{i}", daemon=False,
+                args=(self.db_path, self.handlers, self.max_attempts, self.timeout, self.poll, self._sinyal, self._stop, self._notifikasi),
+            )
+            p.start()
+            self._proses.append(p)
+        self._listener = threading.Thread(target=self._teruskan_notifikasi, name="job-notifikasi", daemon=True)
+        self._listener.start()
+        logger.info("📦 Job queue aktif: %d worker, db %s", self.workers, self.db_path)
+
+    def stop(self, tunggu: float = 10.0):
+        """Hentikan worker (job yang sedang berjalan diselesaikan dulu, maks `tunggu` detik)"""
+        if not self._proses:
+            return
+        self._stop.set()
+        for _ in self._proses:
+            self._sinyal.release()
+        for p in self._proses:
+            p.join(tunggu)
+            if p.is_alive():
+                p.terminate()  # job-nya diambil ulang setelah JOB_TIMEOUT
+        self._notifikasi.put(None)
+        self._proses = []
+
+    def on_selesai(
+        self,
+        callback: Callable[[Dict[str, Any]], None],
+        terhubung: Optional[Callable[[Optional[str]], bool]] = None,
+    ):
+        """
+        Daftarkan callback(job) yang dipanggil saat job selesai/gagal (dari thread notifikasi).
+        terhubung(pemilik) → True jika notifikasi callback benar-benar sampai ke pemilik itu
+        (mis. WebSocket-nya masih terbuka); dipakai sebagai_job untuk memilih pesan tool.
+        """
+        self._callbacks.append(callback)
+        if terhubung is not None:
+            self._terhubung = terhubung
+
+    def bisa_notifikasi(self, pemilik_job: Optional[str]) -> bool:
+        return bool(pemilik_job) and self._terhubung(pemilik_job)
+
+    def _teruskan_notifikasi(self):
+        while True:
+            try:
+                job_id = self._notifikasi.get(timeout=self.poll)
+            except queue.Empty:
+                continue
+            if job_id is None:
+                return
+            job = self.get(job_id)
+            if job is None:
+                continue
+            if job["status"] == SELESAI:
+                self.selesai_total += 1
+            else:
+                self.gagal_total += 1
+            for callback in self._callbacks:
+                try:
+                    callback(job)
+                except Exception as e:
+                    logger.warning("Callback job %s gagal: %s", job_id, e)
+
+    # ── Akses ──
+
+    def kirim(self, jenis: str, args: Dict[str, Any], pemilik_job: Optional[str] = None, queue_name: str = "pdf") -> Dict[str, Any]:
+        """Catat job baru. Return job (status 'antri')."""
+        if jenis not in self.handlers:
+            raise ValueError(f"Jenis job tidak dikenal: {jenis}")
+        job_id = uuid.uuid4().hex
+        conn = self._conn()
+        try:
+            conn.execute(
+                "INSERT INTO jobs (id, queue, jenis, payload, status, pemilik, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [job_id, queue_name, jenis, json.dumps(args, ensure_ascii=False, default=str), ANTRI,
+                 pemilik_job or pemilik.get(), time.time()],
+            )
+        finally:
+            conn.close()
+        self.dikirim_total += 1
+        if self._sinyal is not None:
+            self._sinyal.release()  # bangunkan satu worker
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", [job_id]).fetchone()
+        finally:
+            conn.close()
+        return _baris_ke_job(row) if row else None
+
+    def daftar(self, pemilik_job: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Job terbaru (opsional milik satu client/sesi)"""
+        conn = self._conn()
+        try:
+            if pemilik_job:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE pemilik = ? ORDER BY created_at DESC LIMIT ?", [pemilik_job, limit]
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", [limit]).fetchall()
+        finally:
+            conn.close()
+        return [_baris_ke_job(r) for r in rows]
+
+    def bersihkan(self, retensi: float = JOB_RETENSI) -> int:
+        """Hapus job selesai/gagal yang lebih tua dari retensi. Return jumlah yang dihapus."""
+        conn = self._conn()
+        try:
+            cur = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                [SELESAI, GAGAL, time.time() - retensi],
+            )
+            return cur.rowcount
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        try:
+            per_status = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        finally:
+            conn.close()
+        return {
+            "workers": sum(p.is_alive() for p in self._proses),
+            "antri": per_status.get(ANTRI, 0),
+            "proses": per_status.get(PROSES, 0),
+            "selesai": per_status.get(SELESAI, 0),
+            "gagal": per_status.get(GAGAL, 0),
+            "dikirim_total": self.dikirim_total,
+            "selesai_total": self.selesai_total,
+            "gagal_total": self.gagal_total,
+        }
+
+
+def sebagai_job(jenis: str, fungsi: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+    """
+    Bungkus tool PDF: jika worker aktif, catat job dan langsung kembalikan job_id + link
+    /jobs/{id}/download (notifikasi hanya dijanjikan jika pemilik punya WebSocket terhubung);
+    jika tidak (mis. main.py tanpa api.py), jalankan fungsi seperti biasa.
+    """
+
+    def tool(**kwargs) -> Dict[str, Any]:
+        if not JOB_QUEUE_ENABLED or not jobs.aktif:
+            return fungsi(**kwargs)
+        job = jobs.kirim(jenis, kwargs)
+        unduh = f"/jobs/{job['id']}/download"
+        if jobs.bisa_notifikasi(job["pemilik"]):
+            pesan = "PDF sedang dibuat di background. Link unduhan akan dikirim setelah selesai."
+        else:
+            # Tanpa WebSocket (POST /chat, /api/chat): link langsung di jawaban; /download menunggu job selesai
+            pesan = f"PDF sedang dibuat di background. Unduh lewat {unduh} (otomatis menunggu sampai selesai)."
+        return {
+            "pesan": pesan,
+            "job_id": job["id"],
+            "status": job["status"],
+            "cek_status": f"/jobs/{job['id']}",
+            "download": unduh,
+        }
+
+    tool.__name__ = fungsi.__name__
+    tool.__doc__ = fungsi.__doc__
+    return tool
+
+
+jobs = JobQueue()
@@ -0,0 +1,159 @@
+# llm_client.py
+# Client Ollama terkelola: connection pool, timeout, retry dengan backoff,
+# kebijakan keep_alive, dan warm-up model saat startup
+#
+# Tanpa keep_alive Ollama membongkar model setelah 5 menit idle, sehingga
+# pertanyaan pertama setelah jeda menunggu model dimuat ulang (beberapa detik).
+# warm_up() memuat model di background saat server start, dan setiap request
+# memperpanjang keep_alive model tersebut.
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+from ollama import Client, ResponseError
+
+import config
+import llm_queue
+import tracing
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_BASE_URL = getattr(config, "OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_API_KEY = getattr(config, "OLLAMA_API_KEY", None)
+OLLAMA_KEEP_ALIVE = getattr(config, "OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_TIMEOUT_CONNECT = getattr(config, "OLLAMA_TIMEOUT_CONNECT", 5)
+OLLAMA_TIMEOUT_READ = getattr(config, "OLLAMA_TIMEOUT_READ", 120)
+OLLAMA_POOL_MAX_CONNECTIONS = getattr(config, "OLLAMA_POOL_MAX_CONNECTIONS", 20)
+OLLAMA_POOL_MAX_KEEPALIVE = getattr(config, "OLLAMA_POOL_MAX_KEEPALIVE", 10)
+OLLAMA_MAX_RETRIES = getattr(config, "OLLAMA_MAX_RETRIES", 2)
+OLLAMA_RETRY_BACKOFF = getattr(config, "OLLAMA_RETRY_BACKOFF", 0.5)
+OLLAMA_WARMUP = getattr(config, "OLLAMA_WARMUP", True)
+OLLAMA_WARMUP_MODELS = getattr(config, "OLLAMA_WARMUP_MODELS", None) or [config.OLLAMA_MODEL]
+
+# Status HTTP dari Ollama yang layak dicoba ulang (server sibuk / sedang restart)
+_STATUS_RETRY = {429, 500, 502, 503, 504}
+_ERROR_RETRY = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.RemoteProtocolError)
+
+
+def _boleh_retry(e: Exception) -> bool:
+    if isinstance(e, ResponseError):
+        return e.status_code in _STATUS_RETRY
+    return isinstance(e, _ERROR_RETRY)
+
+
+class LLMClient:
+    """
+    Pembungkus ollama.Client dengan:
+    - pool koneksi httpx bersama (keep-alive TCP) dan timeout connect/read
+    - retry terbatas dengan exponential backoff + jitter untuk error sementara
+      (untuk stream: hanya jika gagal sebelum chunk pertama diterima)
+    - keep_alive default di setiap request agar model tetap dimuat
+    - slot per model dari llm_queue (concurrency terbatas, putaran lanjutan didahulukan)
+    """
+
+    def __init__(
+        self,
+        host: str = OLLAMA_BASE_URL,
+        api_key: Optional[str] = OLLAMA_API_KEY,
+        keep_alive=OLLAMA_KEEP_ALIVE,
+        max_retries: int = OLLAMA_MAX_RETRIES,
+        backoff: float = OLLAMA_RETRY_BACKOFF,
+    ):
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.warm: Dict[str, Dict[str, Any]] = {}
+        self._client = Client(
+            host=host,
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            timeout=httpx.Timeout(
+                connect=OLLAMA_TIMEOUT_CONNECT, read=OLLAMA_TIMEOUT_READ,
+                write=OLLAMA_TIMEOUT_CONNECT, pool=OLLAMA_TIMEOUT_CONNECT,
+            ),
+            limits=httpx.Limits(
+                max_connections=OLLAMA_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_POOL_MAX_KEEPALIVE,
+            ),
+        )
+
+    def _tunggu(self, percobaan: int, e: Exception):
+        jeda = self.backoff * (2 ** percobaan) * (0.5 + random.random())
+        logger.warning("Ollama gagal (%s), coba lagi dalam %.1f detik", e, jeda)
+        tracing.current_span().add(retries=1)
+        time.sleep(jeda)
+
+    def _dengan_retry(self, fungsi, **kwargs):
+        for percobaan in range(self.max_retries + 1):
+            try:
+                return fungsi(**kwargs)
+            except Exception as e:
+                if percobaan >= self.max_retries or not _boleh_retry(e):
+                    raise
+                self._tunggu(percobaan, e)
+
+    def _stream_dengan_retry(self, prioritas: int, **kwargs) -> Iterator[Any]:
+        # Slot dipegang sampai stream habis dibaca (atau generator ditutup)
+        with llm_queue.gate(kwargs.get("model")).slot(prioritas):
+            for percobaan in range(self.max_retries + 1):
+                try:
+                    stream = self._client.chat(**kwargs)
+                    pertama = next(stream, None)
+                    break
+                except Exception as e:
+                    if percobaan >= self.max_retries or not _boleh_retry(e):
+                        raise
+                    self._tunggu(percobaan, e)
+            if pertama is not None:
+                yield pertama
+                yield from stream
+
+    def chat(self, prioritas: int = llm_queue.PRIORITAS_BARU, **kwargs):
+        """
+        Sama dengan ollama.Client.chat, plus keep_alive default, retry, dan
+        antrian per model (llm_queue) dengan prioritas yang diberikan.
+        """
+        kwargs.setdefault("keep_alive", self.keep_alive)
+        if kwargs.get("stream"):
+            return self._stream_dengan_retry(prioritas, **kwargs)
+        with llm_queue.gate(kwargs.get("model")).slot(prioritas):
+            return self._dengan_retry(self._client.chat, **kwargs)
+
+    def generate(self, **kwargs):
+        kwargs.setdefault("keep_alive", self.keep_alive)
+        return self._dengan_retry(self._client.generate, **kwargs)
+
+    def embed(self, model: str, teks: str) -> List[float]:
+        """Vektor embedding satu teks (mis. nomic-embed-text) untuk response_cache"""
+        hasil = self._dengan_retry(self._client.embed, model=model, input=teks, keep_alive=self.keep_alive)
+        return list(hasil["embeddings"][0])
+
+    # ── Warm-up ──
+
+    def warm_up(self, models: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Muat model ke memori Ollama (generate dengan prompt kosong).
+        Return {model: {"ok": bool, "ms": durasi, "error": ...}}.
+        """
+        for model in models or OLLAMA_WARMUP_MODELS:
+            t0 = time.perf_counter()
+            try:
+                self.generate(model=model, prompt="")
+                self.warm[model] = {"ok": True, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+                logger.info("🔥 Model %s siap (%.0f ms)", model, self.warm[model]["ms"])
+            except Exception as e:
+                self.warm[model] = {"ok": False, "ms": None, "error": str(e)}
+                logger.warning("🔥 Warm-up model %s gagal: %s", model, e)
+        return self.warm
+
+    def warm_up_background(self, models: Optional[List[str]] = None):
+        """Warm-up tanpa memblokir startup server"""
+        if not OLLAMA_WARMUP:
+            return
+        threading.Thread(target=self.warm_up, args=(models,), name="ollama-warmup", daemon=True).start()
+
+
+client = LLMClient()
@@ -0,0 +1,191 @@
+# llm_queue.py
+# Admission control dan antrian berprioritas untuk panggilan LLM (Ollama)
+#
+# Satu Ollama lokal melambat drastis jika dipaksa melayani banyak chat sekaligus.
+# Per model:
+#   - max_concurrent : panggilan Ollama yang boleh berjalan bersamaan
+#   - max_queue      : request chat yang boleh menunggu; lebih dari ini langsung
+#                      ditolak (QueueFullError → HTTP 429 di api.py)
+# Slot dibagikan berdasarkan prioritas: putaran lanjutan (setelah tool) didahulukan
+# dari pertanyaan baru, agar request yang sudah berjalan cepat selesai.
+# Chat berjalan di chat_executor sendiri sehingga endpoint laporan /api/* yang
+# memakai thread pool default tidak pernah mengantre di belakang chat.
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict
+
+import config
+import tracing
+
+LLM_MAX_CONCURRENT = getattr(config, "LLM_MAX_CONCURRENT", 2)
+LLM_MAX_CONCURRENT_PER_MODEL = getattr(config, "LLM_MAX_CONCURRENT_PER_MODEL", {})
+LLM_MAX_QUEUE = getattr(config, "LLM_MAX_QUEUE", 32)
+LLM_QUEUE_TIMEOUT = getattr(config, "LLM_QUEUE_TIMEOUT", 120)
+
+PRIORITAS_LANJUTAN = 0  # putaran ke-2 dst. dari request yang sudah berjalan
+PRIORITAS_BARU = 1      # panggilan pertama untuk pertanyaan baru
+PRIORITAS_LATAR = 2     # pekerjaan background (mis. ringkasan riwayat chat)
+
+
+class QueueFullError(Exception):
+    """Antrian model penuh; request ditolak tanpa menunggu"""
+
+    def __init__(self, model: str, retry_after: int):
+        super().__init__(f"Antrian LLM untuk model {model} penuh")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class QueueTimeoutError(Exception):
+    """Menunggu slot LLM lebih lama dari LLM_QUEUE_TIMEOUT"""
+
+
+class Izin:
+    """
+    Satu request chat yang sudah di-admit(). lepas() idempoten: boleh dipanggil
+    dari beberapa jalur (akhir stream, akhir response, disconnect) tanpa
+    melepas slot antrian dua kali.
+    """
+
+    def __init__(self, gate: "LLMGate"):
+        self._gate = gate
+        self._t0 = time.monotonic()
+        self._lock = threading.Lock()
+        self._dilepas = False
+
+    def lepas(self):
+        with self._lock:
+            if self._dilepas:
+                return
+            self._dilepas = True
+        self._gate.selesai(time.monotonic() - self._t0)
+
+
+class LLMGate:
+    """Batas concurrency + antrian berprioritas untuk satu model"""
+
+    def __init__(self, model: str, max_concurrent: int, max_queue: int, timeout: float):
+        self.model = model
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._aktif = 0
+        self._diterima = 0
+        self.admitted_total = 0
+        self.rejected_total = 0
+        self.timeouts_total = 0
+        self._durasi_rata = 5.0  # detik per request (EWMA), untuk Retry-After
+
+    # ── Admission (per request chat) ──
+
+    def admit(self) -> Izin:
+        """Terima request chat baru atau lempar QueueFullError jika sudah jenuh"""
+        with self._cond:
+            if self._diterima >= self.max_concurrent + self.max_queue:
+                self.rejected_total += 1
+                antre = self._diterima - self.max_concurrent + 1
+                retry_after = max(1, round(self._durasi_rata * antre / self.max_concurrent))
+                raise QueueFullError(self.model, retry_after)
+            self._diterima += 1
+            self.admitted_total += 1
+        return Izin(self)
+
+    def selesai(self, durasi: float = None):
+        with self._cond:
+            self._diterima -= 1
+            if durasi is not None:
+                self._durasi_rata = 0.9 * self._durasi_rata + 0.1 * durasi
+
+    @contextmanager
+    def tiket(self):
+        """admit() + selesai() sebagai context manager (untuk endpoint non-stream)"""
+        izin = self.admit()
+        try:
+            yield
+        finally:
+            izin.lepas()
+
+    # ── Slot (per panggilan Ollama) ──
+
+    @contextmanager
+    def slot(self, prioritas: int = PRIORITAS_BARU):
+        """Tunggu giliran memanggil Ollama; slot dilepas saat blok selesai"""
+        with tracing.span("llm.antrian", model=self.model, prioritas=prioritas) as sp:
+            entry = [prioritas, next(self._seq), True]
+            batas = time.monotonic() + self.timeout
+            with self._cond:
+                heapq.heappush(self._heap, entry)
+                sp.set(posisi=len(self._heap) - 1)
+                while not (self._aktif < self.max_concurrent and self._heap[0] is entry):
+                    sisa = batas - time.monotonic()
+                    if sisa <= 0:
+                        self._heap.remove(entry)
+                        heapq.heapify(self._heap)
+                        self.timeouts_total += 1
+                        self._cond.notify_all()
+                        raise QueueTimeoutError(
+                            f"Menunggu slot LLM {self.model} lebih dari {self.timeout} detik"
+                        )
+                    self._cond.wait(sisa)
+                heapq.heappop(self._heap)
+                self._aktif += 1
+                # Entry berikutnya mungkin juga bisa jalan (slot > 1)
+                self._cond.notify_all()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._aktif -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "active": self._aktif,
+                "waiting": len(self._heap),
+                "admitted": self._diterima,
+                "admitted_total": self.admitted_total,
+                "rejected_total": self.rejected_total,
+                "timeouts_total": self.timeouts_total,
+            }
+
+
+_gates: Dict[str, LLMGate] = {}
+_gates_lock = threading.Lock()
+
+
+def gate(model: str) -> LLMGate:
+    """LLMGate untuk model (dibuat saat pertama dipakai)"""
+    g = _gates.get(model)
+    if g is None:
+        with _gates_lock:
+            g = _gates.get(model)
+            if g is None:
+                g = _gates[model] = LLMGate(
+                    model,
+                    LLM_MAX_CONCURRENT_PER_MODEL.get(model, LLM_MAX_CONCURRENT),
+                    LLM_MAX_QUEUE,
+                    LLM_QUEUE_TIMEOUT,
+                )
+    return g
+
+
+def stats() -> Dict[str, Dict[str, Any]]:
+    return {model: g.stats() for model, g in list(_gates.items())}
+
+
+# Thread pool khusus chat (lane terpisah dari thread pool default milik laporan)
+chat_executor = ThreadPoolExecutor(
+    max_workers=getattr(config, "LLM_CHAT_WORKERS", LLM_MAX_CONCURRENT + LLM_MAX_QUEUE),
+    thread_name_prefix="chat",
+)
@@ -0,0 +1,69 @@
+# logging_setup.py
+# Konfigurasi logging aplikasi: handler berbasis queue + sampling payload
+#
+# Semua logger menulis ke QueueHandler (cepat, tidak menunggu I/O); satu
+# thread QueueListener yang menulis ke stderr / file log. Isi lengkap hasil
+# tool dan jawaban hanya di-log untuk 1 dari LOG_PAYLOAD_SAMPLE request;
+# ukuran dan waktu selalu di-log.
+
+import atexit
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+from contextvars import ContextVar
+
+import config
+
+LOG_LEVEL = getattr(config, "LOG_LEVEL", "INFO")
+LOG_FILE = getattr(config, "LOG_FILE", None)
+LOG_PAYLOAD_SAMPLE = getattr(config, "LOG_PAYLOAD_SAMPLE", 10)  # 0 = tidak pernah, 1 = selalu
+
+FORMAT = "%(asctime)s %(levelname)-7s %(name)s [%(threadName)s] %(message)s"
+
+_listener = None
+_urutan_request = itertools.count()
+_payload_disampel: ContextVar[bool] = ContextVar("payload_disampel", default=False)
+
+
+def setup_logging(level: str = None):
+    """Pasang QueueHandler di root logger (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(FORMAT)
+    handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        folder = os.path.dirname(LOG_FILE)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        handlers.append(logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8"
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level or LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def mulai_request() -> bool:
+    """
+    Tentukan apakah payload request ini di-log lengkap (1 dari LOG_PAYLOAD_SAMPLE).
+    Keputusan disimpan di context sehingga berlaku juga untuk tool call di worker thread.
+    """
+    disampel = LOG_PAYLOAD_SAMPLE > 0 and next(_urutan_request) % LOG_PAYLOAD_SAMPLE == 0
+    _payload_disampel.set(disampel)
+    return disampel
+
+
+def payload_disampel() -> bool:
+    return _payload_disampel.get()
@@ -1,11 +1,15 @@
 # main.py
 # Entry point - Contoh penggunaan agent
 
-from agent import run_agent
+from agent import stream_agent_with_history
+from llm_client import client as llm
 from config import OLLAMA_MODEL
+from logging_setup import setup_logging
 
 
 def main():
+    setup_logging()
+    llm.warm_up_background()
     print("=" * 60)
     print("🏫 SISTEM ABSENSI SEKOLAH - AI AGENT")
     print(f"🤖 Model: {OLLAMA_MODEL}")
@@ -47,7 +51,11 @@ def main():
                 user_input = contoh_pertanyaan[idx]
                 print(f"   → {user_input}")
 
-        run_agent(user_input)
+        # Agent tidak lagi mencetak jawaban; tampilkan token begitu diterima
+        print("🤖 AI: ", end="", flush=True)
+        for token in stream_agent_with_history(user_input):
+            print(token, end="", flush=True)
+        print("\n")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+-- 001_rekap_absensi.sql
+-- Tabel agregat absensi yang dipelihara oleh rekap_absensi.py
+--
+-- Jalankan sekali:
+--   mysql -u root -p smksmartsis < migrations/001_rekap_absensi.sql
+-- lalu isi awal:
+--   python rekap_absensi.py --rebuild
+-- dan aktifkan REKAP_ABSENSI_ENABLED = True di config.py
+
+SET NAMES utf8mb4;
+
+-- ----------------------------
+-- Rekap per kelas per tanggal
+-- ----------------------------
+CREATE TABLE IF NOT EXISTS `rekap_absensi_kelas_harian`  (
+  `kelas_id` bigint UNSIGNED NOT NULL,
+  `tanggal` date NOT NULL,
+  `total` int UNSIGNED NOT NULL DEFAULT 0,
+  `hadir` int UNSIGNED NOT NULL DEFAULT 0,
+  `izin` int UNSIGNED NOT NULL DEFAULT 0,
+  `sakit` int UNSIGNED NOT NULL DEFAULT 0,
+  `alfa` int UNSIGNED NOT NULL DEFAULT 0,
+  PRIMARY KEY (`kelas_id`, `tanggal`) USING BTREE,
+  INDEX `rekap_absensi_kelas_harian_tanggal_index`(`tanggal` ASC) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Rekap per siswa per bulan (periode = tanggal 1 bulan tsb)
+-- kelas_id ikut disimpan agar rekap per kelas tetap benar saat siswa pindah kelas
+-- ----------------------------
+CREATE TABLE IF NOT EXISTS `rekap_absensi_siswa_bulanan`  (
+  `siswa_id` bigint UNSIGNED NOT NULL,
+  `periode` date NOT NULL,
+  `kelas_id` bigint UNSIGNED NOT NULL,
+  `total` int UNSIGNED NOT NULL DEFAULT 0,
+  `hadir` int UNSIGNED NOT NULL DEFAULT 0,
+  `izin` int UNSIGNED NOT NULL DEFAULT 0,
+  `sakit` int UNSIGNED NOT NULL DEFAULT 0,
+  `alfa` int UNSIGNED NOT NULL DEFAULT 0,
+  PRIMARY KEY (`siswa_id`, `periode`, `kelas_id`) USING BTREE,
+  INDEX `rekap_absensi_siswa_bulanan_kelas_periode_index`(`kelas_id` ASC, `periode` ASC) USING BTREE,
+  INDEX `rekap_absensi_siswa_bulanan_periode_index`(`periode` ASC) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
+
+-- ----------------------------
+-- Watermark refresh inkremental (satu baris, id = 1)
+-- ----------------------------
+CREATE TABLE IF NOT EXISTS `rekap_absensi_state`  (
+  `id` tinyint UNSIGNED NOT NULL,
+  `watermark` timestamp NULL DEFAULT NULL,
+  `rebuilt_at` timestamp NULL DEFAULT NULL,
+  `refreshed_at` timestamp NULL DEFAULT NULL,
+  PRIMARY KEY (`id`) USING BTREE
+) ENGINE = InnoDB CHARACTER SET = utf8mb4 COLLATE = utf8mb4_unicode_ci ROW_FORMAT = Dynamic;
+
+-- Refresh inkremental membaca baris absensi dengan updated_at >= watermark
+ALTER TABLE `absensi` ADD INDEX `absensi_updated_at_index`(`updated_at` ASC) USING BTREE;
@@ -0,0 +1,8 @@
+-- 002_absensi_indexes.sql
+-- Index komposit absensi hasil index_advisor.py
+
+-- Dipakai oleh: get_absensi_by_kelas, get_analisis_metode_absen, get_anomali_absensi, get_geolocation_analysis, get_laporan_guru_harian, get_rekap_absensi_kelas_range, get_ringkasan_absensi_harian, get_ringkasan_absensi_range, get_statistik_waktu_absen, sql_rekap_kelas_range
+ALTER TABLE `absensi` ADD INDEX `absensi_kelas_id_tanggal_status_index`(`kelas_id` ASC, `tanggal` ASC, `status` ASC) USING BTREE;
+
+-- Dipakai oleh: get_data_alfa_harian, get_laporan_kepsek_range, get_siswa_tidak_hadir, sql_siswa_unik
+ALTER TABLE `absensi` ADD INDEX `absensi_tanggal_status_kelas_id_index`(`tanggal` ASC, `status` ASC, `kelas_id` ASC) USING BTREE;
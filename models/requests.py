@@ -114,6 +114,36 @@ class LaporanGuruHarianRequest(BaseModel):
     tanggal: Optional[str] = None
 
 
+# ── Surat Peringatan Batch ────────────────────────────
+
+class SuratPeringatanBatchRequest(BaseModel):
+    """Request untuk surat peringatan alfa massal (per kelas/tingkat/periode)"""
+    kelas_id: Optional[int] = None
+    nama_kelas: Optional[str] = None
+    tingkat: Optional[int] = None
+    tanggal_mulai: Optional[str] = None
+    tanggal_akhir: Optional[str] = None
+    min_alfa: int = Field(3, ge=1)
+    gabung: bool = True
+
+
+# ── Job Background ────────────────────────────────────
+
+class JobRequest(BaseModel):
+    """Request untuk membuat job background (render PDF)"""
+    jenis: str  # nama tool PDF, mis. "buat_laporan_alfa"
+    args: dict = Field(default_factory=dict)
+    pemilik: Optional[str] = None  # client_id WebSocket yang menerima notifikasi
+
+
+# ── Cache ─────────────────────────────────────────────
+
+class CacheInvalidateRequest(BaseModel):
+    """Request untuk menghapus entry cache hasil query (tanpa filter = semua)"""
+    fungsi: Optional[str] = None
+    tanggal: Optional[str] = None
+
+
 # ── Pagination ────────────────────────────────────────
 
 class PaginationRequest(BaseModel):
@@ -15,6 +15,7 @@ class WSMessageType(str, Enum):
     SYSTEM = "system"
     TOOL_CALL = "tool_call"
     TOOL_RESULT = "tool_result"
+    JOB = "job"  # notifikasi job background (PDF) selesai/gagal
 
 
 class WSIncomingMessage(BaseModel):
@@ -0,0 +1,196 @@
+# name_index.py
+# Index nama in-memory (trigram) untuk resolve nama siswa/kelas tanpa query LIKE
+#
+# Index dimuat dari MySQL lewat fungsi loader dan di-refresh berkala di
+# background thread. Selama index belum siap, lookup mengembalikan None
+# sehingga pemanggil fallback ke query SQL seperti biasa.
+
+import difflib
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+
+def normalize_nama(nama: str) -> str:
+    """Lowercase, hapus aksen dan spasi berlebih (meniru collation *_unicode_ci)"""
+    nama = unicodedata.normalize("NFKD", str(nama))
+    nama = "".join(c for c in nama if not unicodedata.combining(c))
+    return " ".join(nama.casefold().split())
+
+
+def _trigrams(teks: str) -> set:
+    """Trigram per token dengan padding, mis. 'budi' → {' bu', 'bud', 'udi', 'di '}"""
+    hasil = set()
+    for token in teks.split():
+        padded = f" {token} "
+        hasil.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return hasil
+
+
+class _Snapshot:
+    """Isi index yang immutable; diganti utuh setiap refresh"""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.norm = [normalize_nama(r["nama"]) for r in rows]
+        self.postings = defaultdict(set)
+        for pos, teks in enumerate(self.norm):
+            for tri in _trigrams(teks):
+                self.postings[tri].add(pos)
+        self.loaded_at = time.monotonic()
+
+
+class NameIndex:
+    """
+    Index nama untuk satu tabel (siswa atau kelas).
+
+    - loader           : fungsi tanpa argumen → list dict (wajib ada key 'id' dan 'nama')
+    - refresh_interval : detik sebelum index dianggap basi dan dimuat ulang
+    - fuzzy_threshold  : rasio kemiripan minimum (0-1) untuk toleransi typo
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], List[Dict[str, Any]]],
+        refresh_interval: float = 300,
+        fuzzy_threshold: float = 0.8,
+        enabled: bool = True,
+    ):
+        self._loader = loader
+        self.refresh_interval = refresh_interval
+        self.fuzzy_threshold = fuzzy_threshold
+        self.enabled = enabled
+        self._snapshot: Optional[_Snapshot] = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ── Refresh ──
+
+    def refresh(self):
+        """Muat ulang index dari database (blocking)"""
+        snapshot = _Snapshot(self._loader())
+        self._snapshot = snapshot
+
+    def _refresh_background(self):
+        try:
+            self.refresh()
+        except Exception:
+            pass  # index lama tetap dipakai; dicoba lagi di lookup berikutnya
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _current(self) -> Optional[_Snapshot]:
+        """Snapshot saat ini; picu refresh background jika belum ada / sudah basi"""
+        if not self.enabled:
+            return None
+        snapshot = self._snapshot
+        basi = snapshot is None or time.monotonic() - snapshot.loaded_at > self.refresh_interval
+        if basi:
+            with self._lock:
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(
+                        target=self._refresh_background, name="name-index-refresh", daemon=True
+                    ).start()
+        return snapshot
+
+    # ── Lookup ──
+
+    def _cocok_substring(self, snapshot: _Snapshot, query: str) -> List[int]:
+        """Posisi baris yang namanya mengandung query (setara LIKE '%query%')"""
+        # Hanya trigram di dalam token query (tanpa padding) agar query
+        # parsial tetap cocok di tengah kata, mis. 'ahma' di 'rahmat'
+        inner = {t[i:i + 3] for t in query.split() for i in range(len(t) - 2)}
+        if inner:
+            kandidat = set.intersection(*(snapshot.postings.get(g, set()) for g in inner))
+        else:
+            kandidat = range(len(snapshot.norm))
+        return sorted(pos for pos in kandidat if query in snapshot.norm[pos])
+
+    def _cocok_fuzzy(self, snapshot: _Snapshot, query: str, limit: int) -> List[int]:
+        """Posisi baris yang mirip query (toleransi typo), urut dari yang paling mirip"""
+        skor_tri = Counter()
+        for g in _trigrams(query):
+            for pos in snapshot.postings.get(g, ()):
+                skor_tri[pos] += 1
+
+        n_token = len(query.split())
+        hasil = []
+        for pos, _ in skor_tri.most_common(50):
+            tokens = snapshot.norm[pos].split()
+            # Bandingkan dengan potongan nama sepanjang query (nama parsial)
+            windows = [
+                " ".join(tokens[i:i + n_token])
+                for i in range(max(1, len(tokens) - n_token + 1))
+            ]
+            rasio = max(difflib.SequenceMatcher(None, query, w).ratio() for w in windows)
+            if rasio >= self.fuzzy_threshold:
+                hasil.append((rasio, pos))
+        hasil.sort(key=lambda x: -x[0])
+        return [pos for _, pos in hasil[:limit]]
+
+    def search(self, nama: str, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """
+        Cari baris berdasarkan nama: substring dulu, lalu fuzzy jika kosong.
+        Return None jika index belum siap atau tidak ada hasil (fallback ke SQL).
+        """
+        snapshot = self._current()
+        query = normalize_nama(nama or "")
+        if snapshot is None or not query:
+            self.misses += 1
+            return None
+
+        posisi = self._cocok_substring(snapshot, query)
+        if posisi:
+            posisi.sort(key=lambda pos: snapshot.norm[pos])
+        else:
+            posisi = self._cocok_fuzzy(snapshot, query, limit)
+        if not posisi:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return [dict(snapshot.rows[pos]) for pos in posisi[:limit]]
+
+    def resolve(self, nama: str) -> Optional[int]:
+        """
+        Return ID jika nama cocok dengan tepat satu baris: sama persis (setelah normalisasi),
+        atau token query = token awal nama ('budi' → 'Budi Santoso').
+        Substring/fuzzy tidak dipakai di sini ('x tkj 1' bukan 'XII TKJ 1', 'ani' bukan 'Rani'):
+        ID dipakai apa adanya oleh intent_router & response_cache, jadi lebih baik None daripada salah.
+        Typo tetap tertangani lewat search() (saran untuk LLM).
+        None = index belum siap, tidak ditemukan, atau ambigu → pemanggil fallback ke SQL.
+        """
+        snapshot = self._current()
+        query = normalize_nama(nama or "")
+        if snapshot is None or not query:
+            self.misses += 1
+            return None
+
+        kandidat = self._cocok_substring(snapshot, query)
+        posisi = [pos for pos in kandidat if snapshot.norm[pos] == query]
+        if not posisi:
+            n_token = len(query.split())
+            posisi = [pos for pos in kandidat if snapshot.norm[pos].split()[:n_token] == query.split()]
+        ids = {snapshot.rows[pos]["id"] for pos in posisi}
+
+        if len(ids) == 1:
+            self.hits += 1
+            return next(iter(ids))
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "enabled": self.enabled,
+            "entries": len(snapshot.rows) if snapshot else 0,
+            "age_seconds": round(time.monotonic() - snapshot.loaded_at, 1) if snapshot else None,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,200 @@
+# output_cache.py
+# Cache file PDF di folder output/ berdasarkan hash isi (content-addressed)
+#
+# Laporan/surat yang datanya sama (tanggal, daftar siswa alfa, settings
+# sekolah, tanggal cetak, versi template) menghasilkan PDF yang sama; PDF
+# lama dikembalikan langsung tanpa render ulang. Kunci = hash input, bukan
+# hash file, sehingga hit tidak perlu membaca/merender apa pun.
+#
+# Index file (nama, ukuran, mtime, terakhir dipakai) disimpan di memori dan
+# hanya di-scan ulang jika mtime folder berubah (mis. file ditulis worker job
+# lain), jadi /files tidak lagi os.listdir di setiap request. Eviction: file lebih tua
+# dari OUTPUT_MAX_AGE atau yang paling lama tidak dipakai jika total ukuran
+# melebihi OUTPUT_MAX_BYTES. Waktu terakhir dipakai disimpan di atime file
+# (os.utime saat cache hit); mtime tetap waktu file ditulis sehingga
+# Last-Modified di /download stabil.
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+OUTPUT_CACHE_ENABLED = getattr(config, "OUTPUT_CACHE_ENABLED", True)
+OUTPUT_MAX_BYTES = getattr(config, "OUTPUT_MAX_BYTES", 500 * 1024 * 1024)
+OUTPUT_MAX_AGE = getattr(config, "OUTPUT_MAX_AGE", 30 * 24 * 3600)
+
+# Nama file hasil cache: <nama>_<16 hex kunci>.<pdf|json>
+_POLA_KUNCI = re.compile(r"_([0-9a-f]{16}\.(?:pdf|json))$")
+
+
+def kunci(jenis: str, versi: int, *bagian: Any) -> str:
+    """Hash input render: jenis dokumen + versi template + data (urutan key dict tidak berpengaruh)"""
+    isi = json.dumps([jenis, versi, *bagian], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(isi.encode("utf-8")).hexdigest()[:16]
+
+
+class OutputCache:
+    """
+    Index + cache file di satu folder output.
+
+    - folder    : folder output (dibuat otomatis)
+    - max_bytes : total ukuran maksimum; file yang paling lama tidak dipakai dibuang dulu
+    - max_age   : detik sejak terakhir dipakai sebelum file dibuang
+    """
+
+    def __init__(
+        self,
+        folder: str = OUTPUT_DIR,
+        max_bytes: int = OUTPUT_MAX_BYTES,
+        max_age: float = OUTPUT_MAX_AGE,
+        enabled: bool = OUTPUT_CACHE_ENABLED,
+    ):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.enabled = enabled
+        self._file: Dict[str, Dict[str, float]] = {}  # nama → {size, mtime, dipakai}
+        self._kunci: Dict[str, str] = {}                # kunci + ekstensi → nama
+        self._mtime_folder: Optional[int] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    # ── Index ──
+
+    def _stat_folder(self) -> Optional[int]:
+        try:
+            return os.stat(self.folder).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _segarkan(self):
+        """Scan ulang folder hanya jika isinya berubah sejak scan terakhir (dipanggil dengan lock)"""
+        mtime = self._stat_folder()
+        if mtime is not None and mtime == self._mtime_folder:
+            return
+        self._file.clear()
+        self._kunci.clear()
+        if mtime is not None:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if not entry.is_file() or entry.name.endswith(".tmp"):
+                        continue
+                    st = entry.stat()
+                    self._daftarkan(entry.name, st.st_size, st.st_mtime, max(st.st_atime, st.st_mtime))
+        self._mtime_folder = mtime
+
+    def _daftarkan(self, nama: str, size: int, mtime: float, dipakai: float):
+        self._file[nama] = {"size": size, "mtime": mtime, "dipakai": dipakai}
+        m = _POLA_KUNCI.search(nama)
+        if m:
+            self._kunci[m.group(1)] = nama
+
+    def daftar(self) -> List[Dict[str, Any]]:
+        """File di folder output (terbaru dulu) dari index"""
+        with self._lock:
+            self._segarkan()
+            return [
+                {"nama": nama, "size": info["size"], "mtime": info["mtime"]}
+                for nama, info in sorted(self._file.items(), key=lambda kv: kv[1]["mtime"], reverse=True)
+            ]
+
+    # ── Cache ──
+
+    def cari(self, key: str, ekstensi: str = ".pdf") -> Optional[str]:
+        """Path file untuk kunci ini jika masih ada, selain itu None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._segarkan()
+            nama = self._kunci.get(key + ekstensi)
+            path = os.path.join(self.folder, nama) if nama else None
+            if path is None or not os.path.exists(path):
+                self.misses += 1
+                return None
+            # atime = waktu terakhir dipakai (dasar eviction, juga terlihat proses lain);
+            # mtime dibiarkan = waktu ditulis (Last-Modified /download)
+            sekarang = time.time()
+            os.utime(path, (sekarang, self._file[nama]["mtime"]))
+            self._file[nama]["dipakai"] = sekarang
+            self.hits += 1
+            return path
+
+    def tulis(self, nama: str, tulis_ke: Callable[[str], None]) -> str:
+        """
+        Tulis file secara atomik: tulis_ke(path_tmp) lalu os.replace ke nama akhir,
+        sehingga pembaca (/download, cache hit proses lain) tidak pernah melihat file setengah jadi.
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, nama)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            tulis_ke(tmp)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        st = os.stat(path)
+        with self._lock:
+            self._segarkan()
+            self._daftarkan(nama, st.st_size, st.st_mtime, st.st_mtime)
+            self._bersihkan()
+            self._mtime_folder = self._stat_folder()
+        return path
+
+    def _bersihkan(self):
+        """Eviction berdasarkan umur lalu total ukuran (dipanggil dengan lock)"""
+        batas = time.time() - self.max_age
+        urut = sorted(self._file.items(), key=lambda kv: kv[1]["dipakai"])
+        total = sum(info["size"] for _, info in urut)
+        for i, (nama, info) in enumerate(urut):
+            # File terbaru (yang baru ditulis) tidak pernah dibuang
+            if i == len(urut) - 1 or (info["dipakai"] >= batas and total <= self.max_bytes):
+                break
+            try:
+                os.remove(os.path.join(self.folder, nama))
+            except FileNotFoundError:
+                pass
+            except OSError as e:  # mis. sedang diunduh (Windows)
+                logger.warning("Gagal menghapus %s: %s", nama, e)
+                continue
+            total -= info["size"]
+            del self._file[nama]
+            m = _POLA_KUNCI.search(nama)
+            if m and self._kunci.get(m.group(1)) == nama:
+                del self._kunci[m.group(1)]
+            self.evicted += 1
+
+    def bersihkan(self) -> int:
+        """Jalankan eviction sekarang. Return jumlah file yang dihapus."""
+        with self._lock:
+            self._segarkan()
+            sebelum = self.evicted
+            self._bersihkan()
+            self._mtime_folder = self._stat_folder()
+            return self.evicted - sebelum
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._segarkan()
+            return {
+                "files": len(self._file),
+                "bytes": sum(info["size"] for info in self._file.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evicted": self.evicted,
+            }
+
+
+output_cache = OutputCache()
@@ -1,13 +1,29 @@
 # pdf_generator.py
 # Modul untuk generate surat PDF absensi
 
+import json
+import logging
+import multiprocessing
 import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, datetime
 from typing import Dict, Any, List
 from fpdf import FPDF
 
-OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+import config
+from output_cache import OUTPUT_DIR, kunci, output_cache
+
+logger = logging.getLogger(__name__)
+
+# Versi layout per jenis dokumen, ikut dalam kunci cache output.
+# Naikkan jika tampilan PDF berubah agar file lama tidak dipakai lagi.
+VERSI_TEMPLATE = {"surat_peringatan": 1, "laporan_alfa": 1}
+
+# Batch surat peringatan (generate_surat_peringatan_batch)
+PDF_BATCH_WORKERS = getattr(config, "PDF_BATCH_WORKERS", None)
+PDF_BATCH_MIN_PARALEL = getattr(config, "PDF_BATCH_MIN_PARALEL", 20)
 
 NAMA_BULAN = [
     "", "Januari", "Februari", "Maret", "April", "Mei", "Juni",
@@ -15,8 +31,14 @@ NAMA_BULAN = [
 ]
 
 
-def _ensure_output_dir():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+def _simpan(pdf: FPDF, nama_file: str, t0: float) -> str:
+    """Tulis PDF ke folder output (atomik, lewat output_cache) dan log ukuran + waktu pembuatannya"""
+    path = output_cache.tulis(nama_file, pdf.output)
+    logger.info(
+        "📄 PDF %s: %d halaman, %d byte, %.0f ms",
+        os.path.basename(path), pdf.page_no(), os.path.getsize(path), (time.perf_counter() - t0) * 1000,
+    )
+    return path
 
 
 def _format_tanggal(tgl) -> str:
@@ -41,36 +63,83 @@ def _add_info_row(pdf: FPDF, label: str, value: str, value_style: str = ""):
     pdf.cell(0, 7, value or "-", new_x="LMARGIN", new_y="NEXT")
 
 
+# ============================================
+# KOP SURAT (dihitung sekali per isi settings sekolah)
+# ============================================
+
+class Kop:
+    """
+    Kop surat siap gambar: teks dan posisi x (rata tengah) sudah dihitung.
+    Dipakai ulang di setiap halaman dan dokumen dengan settings yang sama,
+    sehingga header() hanya menggambar, tanpa cell() dan pengukuran teks.
+    """
+
+    __slots__ = ("nama", "detail", "x_nama", "x_detail")
+
+    def __init__(self, pdf: FPDF, school_info: Dict[str, str]):
+        info = school_info
+        nama_sekolah = info.get("nama_sekolah", info.get("school_name", "SMK Smart"))
+        alamat = info.get("alamat", info.get("school_address", ""))
+        telepon = info.get("telepon", info.get("school_phone", ""))
+        email = info.get("email", info.get("school_email", ""))
+        detail = alamat
+        if telepon:
+            detail += f"  |  Telp: {telepon}"
+        if email:
+            detail += f"  |  Email: {email}"
+
+        self.nama = nama_sekolah.upper()
+        self.detail = detail or "-"
+        pdf.set_font("Helvetica", "B", 16)
+        self.x_nama = pdf.l_margin + (pdf.epw - pdf.get_string_width(self.nama)) / 2
+        pdf.set_font("Helvetica", "", 9)
+        self.x_detail = pdf.l_margin + (pdf.epw - pdf.get_string_width(self.detail)) / 2
+
+
+_kop_cache: Dict[tuple, Kop] = {}
+
+
+def _kop(pdf: FPDF, school_info: Dict[str, str]) -> Kop:
+    """Kop untuk school_info ini (cache per proses, kunci = isi settings + lebar halaman)"""
+    key = (tuple(sorted(school_info.items())), pdf.l_margin, pdf.epw)
+    kop = _kop_cache.get(key)
+    if kop is None:
+        if len(_kop_cache) >= 16:
+            _kop_cache.clear()
+        kop = _kop_cache[key] = Kop(pdf, school_info)
+    return kop
+
+
 class SuratPDF(FPDF):
     """PDF dengan kop surat sekolah"""
 
-    def __init__(self, school_info: Dict[str, str]):
+    def __init__(self, school_info: Dict[str, str], halaman_per_surat: bool = False):
         super().__init__()
         self.school_info = school_info
+        # PDF gabungan banyak surat: nomor halaman dihitung dari awal surat masing-masing
+        self.halaman_per_surat = halaman_per_surat
+        self.halaman_awal = 1
+        self._kop = None
         self.set_auto_page_break(auto=True, margin=25)
         self.set_margins(15, 14, 15)
 
     def header(self):
-        info = self.school_info
-        nama_sekolah = info.get("nama_sekolah", info.get("school_name", "SMK Smart"))
-        alamat = info.get("alamat", info.get("school_address", ""))
-        telepon = info.get("telepon", info.get("school_phone", ""))
-        email = info.get("email", info.get("school_email", ""))
+        if self._kop is None:
+            self._kop = _kop(self, self.school_info)
+        kop = self._kop
 
-        # Nama sekolah
+        # Nama sekolah (baseline sama dengan cell(0, 7, ..., align="C"))
         self.set_text_color(18, 40, 76)
         self.set_font("Helvetica", "B", 16)
-        self.cell(0, 7, nama_sekolah.upper(), new_x="LMARGIN", new_y="NEXT", align="C")
+        self.text(kop.x_nama, self.y + 3.5 + 0.3 * self.font_size, kop.nama)
+        self.y += 7
 
         # Alamat
         self.set_text_color(80, 80, 80)
         self.set_font("Helvetica", "", 9)
-        detail = alamat
-        if telepon:
-            detail += f"  |  Telp: {telepon}"
-        if email:
-            detail += f"  |  Email: {email}"
-        self.cell(0, 5, detail or "-", new_x="LMARGIN", new_y="NEXT", align="C")
+        self.text(kop.x_detail, self.y + 2.5 + 0.3 * self.font_size, kop.detail)
+        self.y += 5
+        self.x = self.l_margin
 
         self.set_text_color(0, 0, 0)
 
@@ -87,21 +156,21 @@ class SuratPDF(FPDF):
     def footer(self):
         self.set_y(-15)
         self.set_font("Helvetica", "I", 8)
-        self.cell(0, 10, f"Halaman {self.page_no()}/{{nb}}", align="C")
+        if self.halaman_per_surat:
+            self.cell(0, 10, f"Halaman {self.page_no() - self.halaman_awal + 1}", align="C")
+        else:
+            self.cell(0, 10, f"Halaman {self.page_no()}/{{nb}}", align="C")
 
 
-def generate_surat_peringatan(data: Dict[str, Any], school_info: Dict[str, str]) -> str:
-    """Generate surat peringatan alfa untuk satu siswa. Return path file PDF."""
-    _ensure_output_dir()
-
+def _tulis_surat_peringatan(pdf: SuratPDF, data: Dict[str, Any], school_info: Dict[str, str]):
+    """Tulis satu surat peringatan (mulai di halaman baru) ke dokumen pdf"""
     siswa = data["siswa"]
     daftar_alfa = data["daftar_tanggal_alfa"]
     rekap = data["rekap"]
     persen = data["persentase_kehadiran"]
 
-    pdf = SuratPDF(school_info)
-    pdf.alias_nb_pages()
     pdf.add_page()
+    pdf.halaman_awal = pdf.page_no()
 
     hari_ini = _format_tanggal(date.today())
     tahun_ini = date.today().year
@@ -155,9 +224,13 @@ def generate_surat_peringatan(data: Dict[str, Any], school_info: Dict[str, str])
     _add_info_row(pdf, "   Kelas", siswa.get("kelas", "-") or "-")
     pdf.ln(2)
 
+    periode = ""
+    if data.get("periode"):
+        mulai, akhir = data["periode"]
+        periode = f"dalam periode {_format_tanggal(mulai)} s.d. {_format_tanggal(akhir)} "
     pdf.multi_cell(0, 7,
         f"Tercatat tidak hadir tanpa keterangan (Alfa) sebanyak "
-        f"{len(daftar_alfa)} hari pada tanggal-tanggal berikut:"
+        f"{len(daftar_alfa)} hari {periode}pada tanggal-tanggal berikut:"
     )
     pdf.ln(2)
 
@@ -219,19 +292,189 @@ def generate_surat_peringatan(data: Dict[str, Any], school_info: Dict[str, str])
     pdf.set_font("Helvetica", "BU", 11)
     pdf.cell(0, 6, kepala_sekolah, new_x="LMARGIN", new_y="NEXT")
 
-    # Simpan
-    nama_siswa = _safe_filename(siswa.get("nama", "siswa"))
-    nama_file = f"surat_peringatan_{nama_siswa}_{date.today().isoformat()}.pdf"
-    path = os.path.join(OUTPUT_DIR, nama_file)
-    pdf.output(path)
-    return path
+
+def _nama_file_surat(siswa: Dict[str, Any], key: str, dengan_nis: bool = False) -> str:
+    nama = _safe_filename(siswa.get("nama", "siswa"))
+    if dengan_nis:
+        # Batch: nama siswa bisa kembar, NIS membuat nama file unik
+        nama = f"{nama}_{_safe_filename(str(siswa.get('nis', '')))}"
+    return f"surat_peringatan_{nama}_{date.today().isoformat()}_{key}.pdf"
+
+
+def _kunci_surat(data: Dict[str, Any], school_info: Dict[str, str]) -> str:
+    # Tanggal cetak ikut di-hash: tertulis di surat
+    return kunci("surat_peringatan", VERSI_TEMPLATE["surat_peringatan"], data, school_info, date.today())
+
+
+def _render_surat(data: Dict[str, Any], school_info: Dict[str, str], key: str, dengan_nis: bool = False):
+    """Render satu surat ke file. Return (path, jumlah halaman)."""
+    t0 = time.perf_counter()
+    pdf = SuratPDF(school_info)
+    pdf.alias_nb_pages()
+    _tulis_surat_peringatan(pdf, data, school_info)
+    return _simpan(pdf, _nama_file_surat(data["siswa"], key, dengan_nis), t0), pdf.page_no()
+
+
+def generate_surat_peringatan(data: Dict[str, Any], school_info: Dict[str, str]) -> str:
+    """Generate surat peringatan alfa untuk satu siswa. Return path file PDF (dari cache jika input sama)."""
+    key = _kunci_surat(data, school_info)
+    path = output_cache.cari(key)
+    if path:
+        return path
+    return _render_surat(data, school_info, key)[0]
+
+
+# ============================================
+# BATCH SURAT PERINGATAN
+# ============================================
+
+def _entri_manifest(data: Dict[str, Any], file: str, halaman: int, jumlah_halaman: int) -> Dict[str, Any]:
+    siswa = data["siswa"]
+    return {
+        "siswa_id": siswa.get("siswa_id"),
+        "nama": siswa.get("nama"),
+        "nis": siswa.get("nis"),
+        "kelas": siswa.get("kelas"),
+        "total_alfa": len(data["daftar_tanggal_alfa"]),
+        "persentase_kehadiran": data["persentase_kehadiran"],
+        "file": os.path.basename(file),
+        "halaman": halaman,
+        "jumlah_halaman": jumlah_halaman,
+    }
+
+
+def _jumlah_halaman(path: str) -> int:
+    """Jumlah halaman PDF hasil fpdf (dari /Count objek Pages) — untuk surat yang diambil dari cache"""
+    with open(path, "rb") as f:
+        m = re.search(rb"/Count (\d+)[^>]*/Type /Pages\b", f.read())
+    return int(m.group(1)) if m else 1
+
+
+def _render_surat_terpisah(daftar: List[Dict[str, Any]], school_info: Dict[str, str]) -> List[Dict[str, Any]]:
+    """Worker: satu file PDF per siswa; surat yang inputnya sama dengan file lama tidak dirender ulang. Return entri manifest."""
+    entri = []
+    for data in daftar:
+        key = _kunci_surat(data, school_info)
+        path = output_cache.cari(key)
+        if path:
+            halaman = _jumlah_halaman(path)
+        else:
+            path, halaman = _render_surat(data, school_info, key, dengan_nis=True)
+        entri.append(_entri_manifest(data, path, 1, halaman))
+    return entri
+
+
+def _render_surat_gabungan(daftar: List[Dict[str, Any]], school_info: Dict[str, str], nama_file: str) -> List[Dict[str, Any]]:
+    """Semua surat dalam satu PDF (nomor halaman per surat). Return entri manifest."""
+    t0 = time.perf_counter()
+    pdf = SuratPDF(school_info, halaman_per_surat=True)
+    entri = []
+    for data in daftar:
+        _tulis_surat_peringatan(pdf, data, school_info)
+        entri.append(_entri_manifest(data, nama_file, pdf.halaman_awal, pdf.page_no() - pdf.halaman_awal + 1))
+    _simpan(pdf, nama_file, t0)
+    return entri
+
+
+def _bagi(daftar: list, n: int) -> List[list]:
+    """Bagi daftar menjadi n potongan berurutan dengan ukuran hampir sama"""
+    ukuran, sisa = divmod(len(daftar), n)
+    potongan, awal = [], 0
+    for i in range(n):
+        akhir = awal + ukuran + (1 if i < sisa else 0)
+        potongan.append(daftar[awal:akhir])
+        awal = akhir
+    return [p for p in potongan if p]
+
+
+def _batch_dari_cache(key: str) -> Dict[str, Any]:
+    """Hasil batch lama jika manifest dan semua file yang dirujuknya masih ada, selain itu None"""
+    path_manifest = output_cache.cari(key, ".json")
+    if not path_manifest:
+        return None
+    try:
+        with open(path_manifest, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    files = [os.path.join(OUTPUT_DIR, nama) for nama in manifest.get("files", [])]
+    if not all(os.path.exists(f) for f in files):
+        return None  # sebagian file sudah dibuang eviction → render ulang
+    logger.info("📄 Batch surat peringatan dari cache: %s", os.path.basename(path_manifest))
+    return {"file": files[0] if manifest.get("gabung") and files else None, "files": files, "manifest": path_manifest}
+
+
+def generate_surat_peringatan_batch(
+    daftar: List[Dict[str, Any]],
+    school_info: Dict[str, str],
+    gabung: bool = True,
+    workers: int = None,
+) -> Dict[str, Any]:
+    """
+    Generate surat peringatan untuk banyak siswa (data dari get_data_alfa_batch).
+
+    - gabung=True  : satu PDF berisi semua surat (urut kelas, nama)
+    - gabung=False : satu PDF per siswa; dirender paralel di process pool
+    Selalu menulis manifest JSON (siswa → file & halaman).
+    Batch dengan input yang sama (daftar, settings, mode, tanggal cetak) mengembalikan file lama.
+    Return {"file": path PDF gabungan / None, "files": [...], "manifest": path}.
+    """
+    t0 = time.perf_counter()
+    tanggal = date.today().isoformat()
+    key = kunci("surat_peringatan_batch", VERSI_TEMPLATE["surat_peringatan"], daftar, school_info, gabung, tanggal)
+    hasil_lama = _batch_dari_cache(key)
+    if hasil_lama:
+        return hasil_lama
+
+    workers = max(1, min(workers or PDF_BATCH_WORKERS or os.cpu_count() or 1, len(daftar)))
+
+    if gabung:
+        # fpdf tidak bisa menggabungkan dokumen dari proses lain → satu proses
+        nama_file = f"surat_peringatan_batch_{tanggal}_{key}.pdf"
+        entri = _render_surat_gabungan(daftar, school_info, nama_file)
+        files = [os.path.join(OUTPUT_DIR, nama_file)]
+    elif workers == 1 or len(daftar) < PDF_BATCH_MIN_PARALEL:
+        entri = _render_surat_terpisah(daftar, school_info)
+        files = [os.path.join(OUTPUT_DIR, e["file"]) for e in entri]
+    else:
+        # spawn: aman dipanggil dari server multi-thread (fork bisa mewarisi lock yang sedang dipegang)
+        konteks = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=konteks) as pool:
+            hasil = pool.map(_render_surat_terpisah, _bagi(daftar, workers), [school_info] * workers)
+            entri = [e for potongan in hasil for e in potongan]
+        files = [os.path.join(OUTPUT_DIR, e["file"]) for e in entri]
+
+    manifest = {
+        "dibuat": datetime.now().isoformat(timespec="seconds"),
+        "jumlah_surat": len(entri),
+        "gabung": gabung,
+        "files": [os.path.basename(f) for f in files],
+        "surat": entri,
+    }
+
+    def tulis_manifest(path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, default=str)
+
+    path_manifest = output_cache.tulis(f"manifest_surat_peringatan_{tanggal}_{key}.json", tulis_manifest)
+
+    logger.info(
+        "📄 Batch surat peringatan: %d surat, %d file, %d worker, %.0f ms",
+        len(entri), len(files), 1 if gabung else workers, (time.perf_counter() - t0) * 1000,
+    )
+    return {"file": files[0] if gabung else None, "files": files, "manifest": path_manifest}
 
 
 def generate_laporan_alfa(data: Dict[str, Any], school_info: Dict[str, str]) -> str:
     """Generate laporan daftar siswa alfa harian. Return path file PDF."""
-    _ensure_output_dir()
-
     tanggal = data["tanggal"]
+    # Tanggal cetak ikut di-hash: tertulis di tanda tangan laporan
+    key = kunci("laporan_alfa", VERSI_TEMPLATE["laporan_alfa"], data, school_info, date.today())
+    path = output_cache.cari(key)
+    if path:
+        return path
+
+    t0 = time.perf_counter()
     daftar = data["daftar_siswa"]
     total = data["total"]
 
@@ -292,7 +535,4 @@ def generate_laporan_alfa(data: Dict[str, Any], school_info: Dict[str, str]) ->
 
     # Simpan
     tgl_str = tanggal if isinstance(tanggal, str) else tanggal.isoformat()
-    nama_file = f"laporan_alfa_{_safe_filename(tgl_str)}.pdf"
-    path = os.path.join(OUTPUT_DIR, nama_file)
-    pdf.output(path)
-    return path
+    return _simpan(pdf, f"laporan_alfa_{_safe_filename(tgl_str)}_{key}.pdf", t0)
@@ -0,0 +1,510 @@
+# rekap_absensi.py
+# Tabel agregat absensi (per kelas per tanggal & per siswa per bulan)
+#
+# Tabel dibuat oleh migrations/001_rekap_absensi.sql, diisi awal dengan
+# `python rekap_absensi.py --rebuild`, lalu di-refresh inkremental dari
+# baris absensi yang updated_at-nya >= watermark terakhir.
+# Refresh inkremental hanya melihat nilai baru sebuah baris: hard delete dan
+# edit yang memindahkan baris ke tanggal/siswa lain membuat agregat tanggal
+# (atau bulan/siswa) lamanya basi sampai rebuild berikutnya — jadwalkan
+# `python rekap_absensi.py --rebuild` (mis. cron tiap malam) jika itu terjadi.
+# Hitungan selalu dibaca dulu dengan SELECT biasa (consistent read, tanpa lock
+# pada absensi) baru ditulis, agar refresh tidak memblokir input absensi.
+# Fungsi sql_* membangun query laporan yang membaca tabel agregat;
+# dipakai bersama oleh db_functions (sync) dan db_async.
+
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TABEL_HARIAN = "rekap_absensi_kelas_harian"
+TABEL_BULANAN = "rekap_absensi_siswa_bulanan"
+TABEL_STATE = "rekap_absensi_state"
+
+# Baris yang di-commit sedikit terlambat (updated_at < watermark) tetap terbaca
+_WATERMARK_OVERLAP_DETIK = 60
+_CHUNK = 500
+# Refresh sukses terakhir lebih lama dari N × refresh_interval → laporan kembali ke query mentah
+_MAKS_TERTINGGAL = 3
+
+_KOLOM_HITUNG = """
+    COUNT(*) AS total,
+    SUM(status = 'Hadir') AS hadir,
+    SUM(status = 'Izin') AS izin,
+    SUM(status = 'Sakit') AS sakit,
+    SUM(status = 'Alfa') AS alfa
+"""
+_KOLOM_HARIAN = ["kelas_id", "tanggal", "total", "hadir", "izin", "sakit", "alfa"]
+_KOLOM_BULANAN = ["siswa_id", "periode", "kelas_id", "total", "hadir", "izin", "sakit", "alfa"]
+
+
+def _to_date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _awal_bulan(tgl: date) -> date:
+    return tgl.replace(day=1)
+
+
+def _akhir_bulan(tgl: date) -> date:
+    bulan_depan = (tgl.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return bulan_depan - timedelta(days=1)
+
+
+def _pecah_rentang(mulai: date, akhir: date):
+    """
+    Pecah rentang menjadi bulan penuh (dibaca dari tabel bulanan) dan
+    sisa hari di awal/akhir (dibaca dari tabel absensi mentah).
+    Return ((periode_awal, periode_akhir) | None, [(tgl1, tgl2), ...])
+    """
+    awal_penuh = mulai if mulai.day == 1 else _akhir_bulan(mulai) + timedelta(days=1)
+    akhir_penuh = akhir if akhir == _akhir_bulan(akhir) else _awal_bulan(akhir) - timedelta(days=1)
+
+    if awal_penuh > akhir_penuh:
+        return None, [(mulai, akhir)]
+
+    sisa = []
+    if mulai < awal_penuh:
+        sisa.append((mulai, awal_penuh - timedelta(days=1)))
+    if akhir > akhir_penuh:
+        sisa.append((akhir_penuh + timedelta(days=1), akhir))
+    return (awal_penuh, _awal_bulan(akhir_penuh)), sisa
+
+
+def _sumber_siswa_range(mulai: date, akhir: date, kelas_id: Optional[int] = None) -> Tuple[str, list]:
+    """Subquery (siswa_id, kelas_id, total, hadir, izin, sakit, alfa) untuk rentang tanggal"""
+    penuh, sisa = _pecah_rentang(mulai, akhir)
+    bagian, params = [], []
+
+    if penuh:
+        sql = f"""
+            SELECT siswa_id, kelas_id, total, hadir, izin, sakit, alfa
+            FROM {TABEL_BULANAN}
+            WHERE periode BETWEEN %s AND %s
+        """
+        params += [penuh[0], penuh[1]]
+        if kelas_id:
+            sql += " AND kelas_id = %s"
+            params.append(kelas_id)
+        bagian.append(sql)
+
+    for tgl1, tgl2 in sisa:
+        sql = """
+            SELECT siswa_id, kelas_id, 1 AS total,
+                   status = 'Hadir' AS hadir, status = 'Izin' AS izin,
+                   status = 'Sakit' AS sakit, status = 'Alfa' AS alfa
+            FROM absensi
+            WHERE tanggal BETWEEN %s AND %s
+        """
+        params += [tgl1, tgl2]
+        if kelas_id:
+            sql += " AND kelas_id = %s"
+            params.append(kelas_id)
+        bagian.append(sql)
+
+    return " UNION ALL ".join(bagian), params
+
+
+def _filter_kelas(tingkat: Optional[int], jurusan: Optional[str]) -> Tuple[str, list]:
+    sql, params = "", []
+    if tingkat:
+        sql += " AND k.tingkat = %s"
+        params.append(tingkat)
+    if jurusan:
+        sql += " AND k.jurusan = %s"
+        params.append(jurusan)
+    return sql, params
+
+
+# ============================================
+# QUERY LAPORAN (membaca tabel agregat)
+# ============================================
+# Semua fungsi return (sql, params), atau None jika tanggal tidak valid
+# sehingga pemanggil memakai query mentah seperti biasa.
+
+def sql_ringkasan_range(kelas_id: int, tanggal_mulai: str, tanggal_akhir: str):
+    """Pengganti query get_ringkasan_absensi_range"""
+    mulai, akhir = _to_date(tanggal_mulai), _to_date(tanggal_akhir)
+    if not mulai or not akhir:
+        return None
+    return f"""
+        SELECT
+            tanggal,
+            total AS total_record,
+            hadir, izin, sakit, alfa,
+            ROUND(hadir * 100.0 / total, 1) AS persen_hadir
+        FROM {TABEL_HARIAN}
+        WHERE kelas_id = %s
+          AND tanggal BETWEEN %s AND %s
+          AND total > 0
+        ORDER BY tanggal ASC
+    """, [kelas_id, mulai, akhir]
+
+
+def sql_rekap_kelas_range(kelas_id: int, tanggal_mulai: str, tanggal_akhir: str):
+    """Pengganti query get_rekap_absensi_kelas_range"""
+    mulai, akhir = _to_date(tanggal_mulai), _to_date(tanggal_akhir)
+    if not mulai or not akhir or mulai > akhir:
+        return None
+    sumber, params = _sumber_siswa_range(mulai, akhir, kelas_id)
+    return f"""
+        SELECT
+            s.id AS siswa_id,
+            s.nama AS nama_siswa,
+            s.nis,
+            CAST(SUM(x.total) AS SIGNED) AS total_record,
+            CAST(SUM(x.hadir) AS SIGNED) AS hadir,
+            CAST(SUM(x.izin) AS SIGNED)  AS izin,
+            CAST(SUM(x.sakit) AS SIGNED) AS sakit,
+            CAST(SUM(x.alfa) AS SIGNED)  AS alfa,
+            ROUND(SUM(x.hadir) * 100.0 / SUM(x.total), 1) AS persen_hadir
+        FROM ({sumber}) x
+        JOIN siswa s ON x.siswa_id = s.id
+        GROUP BY s.id, s.nama, s.nis
+        HAVING total_record > 0
+        ORDER BY alfa DESC, izin DESC, sakit DESC, s.nama ASC
+    """, params
+
+
+def sql_ranking_kelas(tanggal_mulai: str, tanggal_akhir: str,
+                      tingkat: Optional[int] = None, jurusan: Optional[str] = None):
+    """Pengganti query ranking per kelas di get_laporan_kepsek_range"""
+    mulai, akhir = _to_date(tanggal_mulai), _to_date(tanggal_akhir)
+    if not mulai or not akhir:
+        return None
+    filter_sql, filter_params = _filter_kelas(tingkat, jurusan)
+    return f"""
+        SELECT
+            k.id   AS kelas_id,
+            k.nama AS kelas,
+            CAST(SUM(r.total) AS SIGNED) AS total_record,
+            CAST(SUM(r.hadir) AS SIGNED) AS hadir,
+            CAST(SUM(r.izin) AS SIGNED)  AS izin,
+            CAST(SUM(r.sakit) AS SIGNED) AS sakit,
+            CAST(SUM(r.alfa) AS SIGNED)  AS alfa,
+            ROUND(SUM(r.hadir) * 100.0 / SUM(r.total), 2) AS persen_hadir
+        FROM {TABEL_HARIAN} r
+        JOIN kelas k ON r.kelas_id = k.id
+        WHERE r.tanggal BETWEEN %s AND %s{filter_sql}
+        GROUP BY k.id, k.nama
+        HAVING total_record > 0
+        ORDER BY persen_hadir DESC
+    """, [mulai, akhir] + filter_params
+
+
+def sql_hari_tercatat(tanggal_mulai: str, tanggal_akhir: str):
+    """Jumlah tanggal unik yang punya record absensi"""
+    mulai, akhir = _to_date(tanggal_mulai), _to_date(tanggal_akhir)
+    if not mulai or not akhir:
+        return None
+    return f"""
+        SELECT COUNT(DISTINCT tanggal) AS hari
+        FROM {TABEL_HARIAN}
+        WHERE tanggal BETWEEN %s AND %s AND total > 0
+    """, [mulai, akhir]
+
+
+def sql_siswa_unik(tanggal_mulai: str, tanggal_akhir: str,
+                   tingkat: Optional[int] = None, jurusan: Optional[str] = None):
+    """Jumlah siswa unik yang punya record absensi pada rentang"""
+    mulai, akhir = _to_date(tanggal_mulai), _to_date(tanggal_akhir)
+    if not mulai or not akhir or mulai > akhir:
+        return None
+    sumber, params = _sumber_siswa_range(mulai, akhir)
+    filter_sql, filter_params = _filter_kelas(tingkat, jurusan)
+    return f"""
+        SELECT COUNT(DISTINCT x.siswa_id) AS jml
+        FROM ({sumber}) x
+        JOIN kelas k ON x.kelas_id = k.id
+        WHERE x.total > 0{filter_sql}
+    """, params + filter_params
+
+
+def sql_perbandingan_kelas(tingkat: Optional[int] = None, jurusan: Optional[str] = None):
+    """Pengganti query compare_class_attendance"""
+    filter_sql, filter_params = _filter_kelas(tingkat, jurusan)
+    return f"""
+        SELECT
+            k.id AS kelas_id,
+            k.nama AS kelas,
+            CAST(SUM(r.hadir) AS SIGNED) AS hadir,
+            CAST(SUM(r.total) AS SIGNED) AS total_hari,
+            ROUND(SUM(r.hadir) * 100.0 / SUM(r.total), 1) AS persen_hadir
+        FROM {TABEL_HARIAN} r
+        JOIN kelas k ON r.kelas_id = k.id
+        WHERE 1=1{filter_sql}
+        GROUP BY k.id, k.nama
+        HAVING total_hari > 0
+        ORDER BY persen_hadir DESC
+    """, filter_params
+
+
+def sql_trends(siswa_id: Optional[int] = None, kelas_id: Optional[int] = None, months: int = 6):
+    """Pengganti query bulanan get_attendance_trends (per siswa atau per kelas)"""
+    kolom, nilai = ("siswa_id", siswa_id) if siswa_id else ("kelas_id", kelas_id)
+    return f"""
+        SELECT
+            YEAR(periode) AS tahun,
+            MONTH(periode) AS bulan,
+            CAST(SUM(hadir) AS SIGNED) AS hadir,
+            CAST(SUM(total) AS SIGNED) AS total_hari,
+            ROUND(SUM(hadir) * 100.0 / SUM(total), 1) AS persen_hadir
+        FROM {TABEL_BULANAN}
+        WHERE {kolom} = %s
+        GROUP BY periode
+        HAVING total_hari > 0
+        ORDER BY periode DESC
+        LIMIT %s
+    """, [nilai, months]
+
+
+# ============================================
+# REFRESH TABEL AGREGAT
+# ============================================
+
+class RekapAbsensi:
+    """
+    Pemelihara tabel agregat absensi.
+
+    - connect          : fungsi yang mengembalikan koneksi MySQL (mis. get_db_connection)
+    - refresh_interval : detik antar refresh inkremental di background
+    - enabled          : False = laporan tetap memakai query mentah
+    - on_refresh       : callback(list tanggal | None) setelah data berubah;
+                         None berarti semua tanggal (rebuild)
+    """
+
+    def __init__(
+        self,
+        connect: Callable,
+        refresh_interval: float = 60,
+        enabled: bool = False,
+        on_refresh: Optional[Callable[[Optional[List[date]]], None]] = None,
+    ):
+        self._connect = connect
+        self.refresh_interval = refresh_interval
+        self.enabled = enabled
+        self._on_refresh = on_refresh
+        self._last_ok: Optional[float] = None       # refresh sukses terakhir
+        self._last_refresh: Optional[float] = None  # percobaan refresh terakhir (sukses/gagal)
+        self._basi = False
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    # ── Status ──
+
+    def siap(self) -> bool:
+        """
+        True jika laporan boleh membaca tabel agregat: refresh sukses terakhir
+        belum lebih dari _MAKS_TERTINGGAL × refresh_interval yang lalu.
+        Sekaligus memicu refresh background jika sudah waktunya.
+        """
+        if not self.enabled:
+            return False
+        due = self._last_refresh is None or time.monotonic() - self._last_refresh > self.refresh_interval
+        if due:
+            with self._lock:
+                if not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(
+                        target=self._refresh_background, name="rekap-absensi-refresh", daemon=True
+                    ).start()
+        if self._last_ok is None:
+            return False
+        basi = time.monotonic() - self._last_ok > self.refresh_interval * _MAKS_TERTINGGAL
+        if basi and not self._basi:
+            logger.warning(
+                "Tabel rekap absensi tertinggal %.0f detik; laporan memakai query mentah sampai refresh berhasil",
+                time.monotonic() - self._last_ok,
+            )
+        self._basi = basi
+        return not basi
+
+    def _refresh_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # Tabel belum dimigrasi / DB down / lock → dicoba lagi setelah refresh_interval
+            logger.warning("Refresh tabel rekap absensi gagal: %s", e)
+        finally:
+            with self._lock:
+                self._last_refresh = time.monotonic()
+                self._refreshing = False
+
+    # ── Refresh ──
+    # INSERT ... SELECT FROM absensi di REPEATABLE READ mengambil shared
+    # next-key lock pada baris absensi yang dibaca sehingga input absensi guru
+    # tertahan selama refresh. Hitungan dibaca dulu (consistent read tanpa lock),
+    # baru ditulis ke tabel agregat dengan executemany.
+
+    @staticmethod
+    def _tulis(cursor, tabel: str, kolom: List[str], rows: List[dict]):
+        sql = f"INSERT INTO {tabel} ({', '.join(kolom)}) VALUES ({', '.join(['%s'] * len(kolom))})"
+        for i in range(0, len(rows), _CHUNK):
+            cursor.executemany(sql, [tuple(r[k] for k in kolom) for r in rows[i:i + _CHUNK]])
+
+    def _hitung_ulang_harian(self, cursor, tanggal_list: List[date]):
+        for i in range(0, len(tanggal_list), _CHUNK):
+            chunk = tanggal_list[i:i + _CHUNK]
+            marks = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"""
+                SELECT kelas_id, tanggal, {_KOLOM_HITUNG}
+                FROM absensi
+                WHERE tanggal IN ({marks})
+                GROUP BY kelas_id, tanggal
+            """, chunk)
+            rows = cursor.fetchall()
+            cursor.execute(f"DELETE FROM {TABEL_HARIAN} WHERE tanggal IN ({marks})", chunk)
+            self._tulis(cursor, TABEL_HARIAN, _KOLOM_HARIAN, rows)
+
+    def _hitung_ulang_bulanan(self, cursor, periode: date, siswa_ids: List[int]):
+        akhir = _akhir_bulan(periode)
+        for i in range(0, len(siswa_ids), _CHUNK):
+            chunk = siswa_ids[i:i + _CHUNK]
+            marks = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"""
+                SELECT siswa_id, kelas_id, {_KOLOM_HITUNG}
+                FROM absensi
+                WHERE tanggal BETWEEN %s AND %s AND siswa_id IN ({marks})
+                GROUP BY siswa_id, kelas_id
+            """, [periode, akhir] + chunk)
+            rows = [dict(r, periode=periode) for r in cursor.fetchall()]
+            cursor.execute(
+                f"DELETE FROM {TABEL_BULANAN} WHERE periode = %s AND siswa_id IN ({marks})",
+                [periode] + chunk
+            )
+            self._tulis(cursor, TABEL_BULANAN, _KOLOM_BULANAN, rows)
+
+    def _rebuild(self, cursor):
+        cursor.execute("SELECT COALESCE(MAX(updated_at), NOW()) AS wm FROM absensi")
+        watermark = cursor.fetchone()["wm"]
+
+        cursor.execute(f"""
+            SELECT kelas_id, tanggal, {_KOLOM_HITUNG}
+            FROM absensi
+            GROUP BY kelas_id, tanggal
+        """)
+        harian = cursor.fetchall()
+        cursor.execute(f"""
+            SELECT siswa_id, DATE_SUB(tanggal, INTERVAL DAYOFMONTH(tanggal) - 1 DAY) AS periode,
+                   kelas_id, {_KOLOM_HITUNG}
+            FROM absensi
+            GROUP BY siswa_id, periode, kelas_id
+        """)
+        bulanan = cursor.fetchall()
+
+        cursor.execute(f"DELETE FROM {TABEL_HARIAN}")
+        self._tulis(cursor, TABEL_HARIAN, _KOLOM_HARIAN, harian)
+        cursor.execute(f"DELETE FROM {TABEL_BULANAN}")
+        self._tulis(cursor, TABEL_BULANAN, _KOLOM_BULANAN, bulanan)
+        cursor.execute(f"""
+            REPLACE INTO {TABEL_STATE} (id, watermark, rebuilt_at, refreshed_at)
+            VALUES (1, %s, NOW(), NOW())
+        """, [watermark])
+
+    def _dengan_lock(self, kerja: Callable):
+        """
+        Jalankan kerja(cursor) dalam satu transaksi + advisory lock lintas proses.
+        Return (True, hasil), atau (False, None) jika proses lain sedang refresh.
+        """
+        db = self._connect()
+        cursor = db.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT GET_LOCK('rekap_absensi_refresh', 0) AS ok")
+            if not cursor.fetchone()["ok"]:
+                return False, None
+            try:
+                hasil = kerja(cursor)
+                db.commit()
+                return True, hasil
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK('rekap_absensi_refresh')")
+                cursor.fetchall()
+        finally:
+            cursor.close()
+            db.close()
+
+    def rebuild(self):
+        """
+        Hitung ulang seluruh tabel agregat dari nol. Satu-satunya cara merapikan
+        agregat setelah hard delete atau edit yang memindahkan tanggal/siswa.
+        """
+        jalan, _ = self._dengan_lock(self._rebuild)
+        self._selesai(jalan, None)
+
+    def refresh(self) -> List[date]:
+        """
+        Refresh inkremental dari baris absensi yang berubah sejak watermark.
+        Rebuild otomatis jika belum pernah diisi. Return tanggal yang dihitung ulang.
+        """
+        def kerja(cursor):
+            cursor.execute(f"SELECT watermark FROM {TABEL_STATE} WHERE id = 1")
+            state = cursor.fetchone()
+            if state is None or state["watermark"] is None:
+                self._rebuild(cursor)
+                return None
+
+            cursor.execute(
+                "SELECT siswa_id, tanggal, updated_at FROM absensi "
+                "WHERE updated_at >= %s - INTERVAL %s SECOND",
+                [state["watermark"], _WATERMARK_OVERLAP_DETIK]
+            )
+            rows = cursor.fetchall()
+
+            tanggal_list = sorted({r["tanggal"] for r in rows})
+            per_periode = {}
+            for r in rows:
+                per_periode.setdefault(_awal_bulan(r["tanggal"]), set()).add(r["siswa_id"])
+
+            if tanggal_list:
+                self._hitung_ulang_harian(cursor, tanggal_list)
+            for periode, siswa_ids in per_periode.items():
+                self._hitung_ulang_bulanan(cursor, periode, sorted(siswa_ids))
+
+            watermark = max((r["updated_at"] for r in rows), default=state["watermark"])
+            cursor.execute(
+                f"UPDATE {TABEL_STATE} SET watermark = %s, refreshed_at = NOW() WHERE id = 1",
+                [max(watermark, state["watermark"])]
+            )
+            return tanggal_list
+
+        jalan, hasil = self._dengan_lock(kerja)
+        self._selesai(jalan, hasil)
+        return hasil or []
+
+    def _selesai(self, jalan: bool, tanggal_list: Optional[List[date]]):
+        self._last_refresh = time.monotonic()
+        if not jalan:
+            return  # dicoba lagi setelah refresh_interval
+        self._last_ok = self._last_refresh
+        if self._on_refresh and (tanggal_list is None or tanggal_list):
+            self._on_refresh(tanggal_list)
+
+
+if __name__ == "__main__":
+    import argparse
+    from db_functions import rekap
+
+    parser = argparse.ArgumentParser(description="Refresh tabel agregat absensi")
+    parser.add_argument("--rebuild", action="store_true", help="hitung ulang seluruh tabel dari nol")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        rekap.rebuild()
+        print("✅ Tabel rekap absensi selesai di-rebuild")
+    else:
+        tanggal = rekap.refresh()
+        print(f"✅ Refresh selesai, {len(tanggal)} tanggal dihitung ulang")
@@ -0,0 +1,321 @@
+# response_cache.py
+# Cache jawaban agent untuk pertanyaan yang berulang (exact + semantik)
+#
+# Dua tingkat pencarian:
+#   1. Sebelum LLM dipanggil: pertanyaan yang dinormalisasi persis sama
+#      (model, hari ini, riwayat singkat yang sama) → jawaban langsung dikembalikan.
+#   2. Setelah LLM memilih tool (putaran pertama): entry dengan tool call yang
+#      identik DAN pertanyaan yang mirip (embedding / kemiripan kata) → tool dan
+#      panggilan LLM kedua dilewati.
+# Setiap hit divalidasi terhadap versi data absensi pada scope tool call-nya
+# (rentang tanggal + kelas/siswa). Jika ada baris absensi baru/berubah di scope
+# itu, entry dibuang dan pertanyaan dijawab ulang.
+
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+import tracing
+from tool_cache import _normalize_value, _to_date, rentang_tanggal
+
+RESPONSE_CACHE_ENABLED = getattr(config, "RESPONSE_CACHE_ENABLED", True)
+RESPONSE_CACHE_MAX_ENTRIES = getattr(config, "RESPONSE_CACHE_MAX_ENTRIES", 500)
+RESPONSE_CACHE_TTL = getattr(config, "RESPONSE_CACHE_TTL", 600)
+RESPONSE_CACHE_EMBED_MODEL = getattr(config, "RESPONSE_CACHE_EMBED_MODEL", None)
+RESPONSE_CACHE_MIN_COSINE = getattr(config, "RESPONSE_CACHE_MIN_COSINE", 0.9)
+RESPONSE_CACHE_MIN_JACCARD = getattr(config, "RESPONSE_CACHE_MIN_JACCARD", 0.6)
+
+# Tool dengan efek samping (membuat file PDF) → jawabannya tidak di-cache
+TOOL_TIDAK_DICACHE = {"buat_surat_peringatan_alfa", "buat_surat_peringatan_alfa_batch", "buat_laporan_alfa"}
+
+
+def normalisasi_pertanyaan(teks: str) -> str:
+    """Lowercase, buang tanda baca & spasi berlebih"""
+    return " ".join(re.sub(r"[^\w\s]", " ", teks.casefold()).split())
+
+
+def _hash_riwayat(chat_history: Optional[list]) -> str:
+    """Jawaban bergantung pada konteks percakapan; 4 pesan terakhir ikut jadi kunci"""
+    if not chat_history:
+        return ""
+    isi = "\n".join(f"{m.get('role')}:{m.get('content')}" for m in chat_history[-4:])
+    return hashlib.sha1(isi.encode("utf-8")).hexdigest()
+
+
+def tanda_tool_calls(tool_calls: list) -> tuple:
+    """Bentuk kanonik daftar tool call (nama + argumen dinormalisasi)"""
+    hasil = []
+    for tc in tool_calls:
+        args = tc["function"]["arguments"] or {}
+        normal = tuple(sorted((k, _normalize_value(k, v)) for k, v in args.items()))
+        hasil.append((tc["function"]["name"], normal))
+    return tuple(sorted(hasil, key=repr))
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def _jaccard(a: str, b: str) -> float:
+    sa, sb = set(a.split()), set(b.split())
+    return len(sa & sb) / len(sa | sb) if sa | sb else 0.0
+
+
+class _Entry:
+    __slots__ = ("key", "tanda", "pertanyaan", "embedding", "jawaban", "scope", "versi", "dibuat")
+
+    def __init__(self, key, tanda, pertanyaan, embedding, jawaban, scope, versi):
+        self.key = key
+        self.tanda = tanda
+        self.pertanyaan = pertanyaan
+        self.embedding = embedding
+        self.jawaban = jawaban
+        self.scope = scope
+        self.versi = versi
+        self.dibuat = time.monotonic()
+
+
+class ResponseCache:
+    """
+    Cache jawaban agent.
+
+    - connect        : fungsi koneksi DB (db_functions.get_db_connection) untuk versi data
+    - resolve_kelas  : nama kelas → id (mis. kelas_index.resolve), untuk mempersempit scope
+    - resolve_siswa  : nama siswa → id (mis. siswa_index.resolve)
+    - embed          : teks → vektor (opsional); tanpa ini dipakai kemiripan kata (Jaccard)
+    """
+
+    def __init__(
+        self,
+        connect: Callable,
+        resolve_kelas: Optional[Callable[[str], Optional[int]]] = None,
+        resolve_siswa: Optional[Callable[[str], Optional[int]]] = None,
+        embed: Optional[Callable[[str], List[float]]] = None,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl: float = RESPONSE_CACHE_TTL,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+    ):
+        self._connect = connect
+        self._resolve_kelas = resolve_kelas
+        self._resolve_siswa = resolve_siswa
+        self._embed = embed
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._data: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._per_tanda: Dict[tuple, List[tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits_exact = 0
+        self.hits_semantik = 0
+        self.misses = 0
+        self.stale = 0
+
+    # ── Scope & versi data ──
+
+    def _scope(self, tanda: tuple) -> List[tuple]:
+        """(mulai, akhir, kelas_id, siswa_id) per tool call; None = tidak dibatasi"""
+        scope = []
+        for _, args in tanda:
+            args = dict(args)
+            rentang = rentang_tanggal(args)
+            kelas_id = args.get("kelas_id")
+            if kelas_id is None and args.get("nama_kelas") and self._resolve_kelas:
+                kelas_id = self._resolve_kelas(args["nama_kelas"])
+            siswa_id = args.get("siswa_id")
+            if siswa_id is None and args.get("nama_siswa") and self._resolve_siswa:
+                siswa_id = self._resolve_siswa(args["nama_siswa"])
+            mulai, akhir = rentang if rentang else (None, None)
+            scope.append((mulai, akhir, kelas_id, siswa_id))
+        return sorted(set(scope), key=repr)
+
+    def _versi(self, scope: List[tuple]) -> tuple:
+        """Versi data absensi per scope: (jumlah baris, id terbesar, updated_at terbaru)"""
+        if not scope:
+            return ()
+        db = self._connect()
+        cursor = db.cursor(dictionary=True)
+        try:
+            versi = []
+            for mulai, akhir, kelas_id, siswa_id in scope:
+                where, params = [], []
+                if mulai:
+                    where.append("tanggal BETWEEN %s AND %s")
+                    params += [mulai, akhir]
+                if kelas_id:
+                    where.append("kelas_id = %s")
+                    params.append(kelas_id)
+                if siswa_id:
+                    where.append("siswa_id = %s")
+                    params.append(siswa_id)
+                if where:
+                    cursor.execute(
+                        "SELECT COUNT(*) AS n, MAX(id) AS max_id, MAX(updated_at) AS max_upd "
+                        "FROM absensi WHERE " + " AND ".join(where),
+                        params,
+                    )
+                else:
+                    # Tanpa filter: cukup index-only lookup (COUNT(*) seluruh tabel mahal)
+                    cursor.execute("SELECT MAX(id) AS max_id, MAX(updated_at) AS max_upd FROM absensi")
+                versi.append(tuple(cursor.fetchone().values()))
+            return tuple(versi)
+        finally:
+            cursor.close()
+            db.close()
+
+    def _masih_valid(self, entry: _Entry) -> bool:
+        if time.monotonic() - entry.dibuat > self.ttl:
+            return False
+        with tracing.span("response_cache.versi", scope=len(entry.scope)):
+            return self._versi(entry.scope) == entry.versi
+
+    # ── Lookup ──
+
+    def _buang(self, key: tuple):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            keys = self._per_tanda.get(entry.tanda, [])
+            if key in keys:
+                keys.remove(key)
+            if not keys:
+                self._per_tanda.pop(entry.tanda, None)
+
+    def _validasi(self, entry: _Entry) -> Optional[str]:
+        try:
+            valid = self._masih_valid(entry)
+        except Exception:
+            valid = False  # DB bermasalah → anggap basi, jawab ulang
+        with self._lock:
+            if not valid:
+                self.stale += 1
+                self._buang(entry.key)
+                return None
+            if entry.key in self._data:
+                self._data.move_to_end(entry.key)
+        return entry.jawaban
+
+    def cari(self, pertanyaan: str, chat_history: Optional[list], model: str) -> Optional[str]:
+        """Tingkat 1: pertanyaan persis sama (setelah normalisasi). Return jawaban atau None."""
+        if not self.enabled:
+            return None
+        key = (model, date.today(), _hash_riwayat(chat_history), normalisasi_pertanyaan(pertanyaan))
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None:
+            return None
+        jawaban = self._validasi(entry)
+        if jawaban is not None:
+            with self._lock:
+                self.hits_exact += 1
+        return jawaban
+
+    def cari_dengan_tool(
+        self, pertanyaan: str, chat_history: Optional[list], model: str, tool_calls: list
+    ) -> Optional[str]:
+        """Tingkat 2: tool call identik + pertanyaan mirip. Return jawaban atau None."""
+        if not self.enabled:
+            return None
+        tanda = (model, date.today(), _hash_riwayat(chat_history), tanda_tool_calls(tool_calls))
+        with self._lock:
+            kandidat = [self._data[k] for k in self._per_tanda.get(tanda, []) if k in self._data]
+        if not kandidat:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        normal = normalisasi_pertanyaan(pertanyaan)
+        embedding = self._embedding(normal) if any(e.embedding for e in kandidat) else None
+        terbaik, skor_terbaik = None, 0.0
+        for entry in kandidat:
+            if embedding and entry.embedding:
+                skor, batas = _cosine(embedding, entry.embedding), RESPONSE_CACHE_MIN_COSINE
+            else:
+                skor, batas = _jaccard(normal, entry.pertanyaan), RESPONSE_CACHE_MIN_JACCARD
+            if skor >= batas and skor > skor_terbaik:
+                terbaik, skor_terbaik = entry, skor
+        if terbaik is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        tracing.current_span().set(cache_similarity=round(skor_terbaik, 3))
+        jawaban = self._validasi(terbaik)
+        with self._lock:
+            if jawaban is None:
+                self.misses += 1
+            else:
+                self.hits_semantik += 1
+        return jawaban
+
+    # ── Simpan ──
+
+    def _embedding(self, teks: str) -> Optional[List[float]]:
+        if not self._embed:
+            return None
+        try:
+            with tracing.span("response_cache.embed"):
+                return self._embed(teks)
+        except Exception:
+            return None
+
+    def simpan(
+        self, pertanyaan: str, chat_history: Optional[list], model: str,
+        tool_calls_awal: list, semua_tool_calls: list, jawaban: str,
+    ):
+        """Simpan jawaban beserta versi data scope-nya"""
+        if not self.enabled or not jawaban:
+            return
+        if any(tc["function"]["name"] in TOOL_TIDAK_DICACHE for tc in semua_tool_calls):
+            return
+
+        normal = normalisasi_pertanyaan(pertanyaan)
+        riwayat = _hash_riwayat(chat_history)
+        key = (model, date.today(), riwayat, normal)
+        tanda = (model, date.today(), riwayat, tanda_tool_calls(tool_calls_awal))
+        try:
+            scope = self._scope(tanda_tool_calls(semua_tool_calls))
+            versi = self._versi(scope)
+        except Exception:
+            return
+        entry = _Entry(key, tanda, normal, self._embedding(normal), jawaban, scope, versi)
+
+        with self._lock:
+            self._buang(key)
+            self._data[key] = entry
+            self._per_tanda.setdefault(tanda, []).append(key)
+            while len(self._data) > self.max_entries:
+                self._buang(next(iter(self._data)))
+
+    def invalidate(self, tanggal=None) -> int:
+        """Hapus entry yang scope-nya mencakup tanggal tertentu (None = semua)"""
+        tanggal = _to_date(tanggal)
+        with self._lock:
+            hapus = [
+                key for key, entry in self._data.items()
+                if tanggal is None or any(
+                    mulai is None or mulai <= tanggal <= akhir for mulai, akhir, _, _ in entry.scope
+                )
+            ]
+            for key in hapus:
+                self._buang(key)
+        return len(hapus)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._data),
+                "hits_exact": self.hits_exact,
+                "hits_semantik": self.hits_semantik,
+                "misses": self.misses,
+                "stale": self.stale,
+                "embedding": self._embed is not None,
+            }
@@ -0,0 +1,209 @@
+# session_store.py
+# Sesi percakapan di sisi server (riwayat chat per session_id)
+#
+# Dengan sesi, client cukup mengirim pesan baru + session_id; riwayat diambil
+# dari sini. Riwayat yang dikirim ke agent selalu teks yang sama persis dengan
+# giliran sebelumnya, sehingga prefix prompt stabil (KV cache Ollama terpakai).
+# Penyimpanan: LRU in-memory dengan TTL sejak aktivitas terakhir, opsional
+# disalin ke disk (satu file JSON per sesi) agar bertahan saat server restart.
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import config
+from models.agent import ChatMessage, ChatSession
+
+logger = logging.getLogger(__name__)
+
+SESSION_MAX = getattr(config, "SESSION_MAX", 1000)
+SESSION_TTL = getattr(config, "SESSION_TTL", 8 * 3600)
+SESSION_MAX_PESAN = getattr(config, "SESSION_MAX_PESAN", 100)
+SESSION_DIR = getattr(config, "SESSION_DIR", None)
+
+_ID_VALID = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+
+def id_valid(session_id: Optional[str]) -> bool:
+    """session_id dipakai sebagai nama file → hanya karakter aman"""
+    return bool(session_id) and bool(_ID_VALID.match(session_id)) and session_id not in (".", "..")
+
+
+class SessionStore:
+    """
+    Store sesi thread-safe.
+
+    - max_sessions : sesi in-memory maksimum (LRU; di disk tetap ada jika persist)
+    - ttl          : detik sejak aktivitas terakhir sebelum sesi dihapus
+    - max_pesan    : pesan maksimum per sesi (yang lama dibuang; agent tetap meringkas)
+    - persist_dir  : folder file JSON per sesi; None = hanya in-memory
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = SESSION_MAX,
+        ttl: float = SESSION_TTL,
+        max_pesan: int = SESSION_MAX_PESAN,
+        persist_dir: Optional[str] = SESSION_DIR,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_pesan = max_pesan
+        self.persist_dir = persist_dir
+        self._data: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    # ── Disk ──
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.persist_dir, f"{session_id}.json")
+
+    def _muat(self, session_id: str) -> Optional[ChatSession]:
+        if not self.persist_dir:
+            return None
+        try:
+            with open(self._path(session_id), encoding="utf-8") as f:
+                return ChatSession.model_validate_json(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Sesi %s di disk rusak, diabaikan: %s", session_id, e)
+            return None
+
+    def _tulis(self, session: ChatSession):
+        if not self.persist_dir:
+            return
+        path = self._path(session.session_id)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(session.model_dump_json())
+            os.replace(tmp, path)  # atomik: file lama utuh jika proses mati di tengah
+        except OSError as e:
+            logger.warning("Gagal menyimpan sesi %s: %s", session.session_id, e)
+
+    def _hapus_file(self, session_id: str):
+        if self.persist_dir:
+            try:
+                os.remove(self._path(session_id))
+            except FileNotFoundError:
+                pass
+
+    # ── Akses ──
+
+    def _kedaluwarsa(self, session: ChatSession) -> bool:
+        return (datetime.now() - session.last_activity).total_seconds() > self.ttl
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """Sesi aktif atau None (tidak ada / kedaluwarsa)"""
+        if not id_valid(session_id):
+            return None
+        with self._lock:
+            session = self._data.get(session_id)
+        if session is None:
+            session = self._muat(session_id)
+            if session is not None:
+                with self._lock:
+                    self._simpan_memori(session)
+        if session is None:
+            self.misses += 1
+            return None
+        if self._kedaluwarsa(session):
+            self.hapus(session_id)
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        return session
+
+    def history(self, session_id: str) -> List[Dict[str, str]]:
+        """Riwayat sesi dalam format chat_history agent"""
+        session = self.get(session_id)
+        if session is None:
+            return []
+        with self._lock:
+            return [{"role": m.role, "content": m.content} for m in session.messages]
+
+    def _simpan_memori(self, session: ChatSession):
+        self._data[session.session_id] = session
+        self._data.move_to_end(session.session_id)
+        while len(self._data) > self.max_sessions:
+            self._data.popitem(last=False)
+
+    def mulai(self, session_id: str, history: Optional[List[Dict[str, str]]] = None) -> ChatSession:
+        """Buat sesi baru (opsional diisi riwayat yang dikirim client)"""
+        session = ChatSession(
+            session_id=session_id,
+            messages=[ChatMessage(role=m["role"], content=m["content"]) for m in (history or [])][-self.max_pesan:],
+        )
+        with self._lock:
+            self._simpan_memori(session)
+        self._tulis(session)
+        return session
+
+    def tambah(self, session_id: str, user_message: str, jawaban: str, metadata: Optional[Dict[str, Any]] = None):
+        """Catat satu giliran (pertanyaan + jawaban) ke sesi; sesi dibuat jika belum ada"""
+        if not id_valid(session_id):
+            return
+        session = self.get(session_id) or self.mulai(session_id)
+        with self._lock:
+            session.messages.append(ChatMessage(role="user", content=user_message))
+            session.messages.append(ChatMessage(role="assistant", content=jawaban, metadata=metadata))
+            if len(session.messages) > self.max_pesan:
+                del session.messages[: len(session.messages) - self.max_pesan]
+            session.last_activity = datetime.now()
+            self._simpan_memori(session)
+            salinan = session.model_copy(deep=True) if self.persist_dir else None
+        if salinan is not None:
+            self._tulis(salinan)
+
+    def hapus(self, session_id: str) -> bool:
+        if not id_valid(session_id):
+            return False
+        with self._lock:
+            ada = self._data.pop(session_id, None) is not None
+        if self.persist_dir and os.path.exists(self._path(session_id)):
+            ada = True
+        self._hapus_file(session_id)
+        return ada
+
+    def bersihkan(self) -> int:
+        """Hapus semua sesi kedaluwarsa (memori + disk). Return jumlah yang dihapus."""
+        with self._lock:
+            basi = [sid for sid, s in self._data.items() if self._kedaluwarsa(s)]
+            for sid in basi:
+                del self._data[sid]
+        for sid in basi:
+            self._hapus_file(sid)
+        if self.persist_dir:
+            batas = time.time() - self.ttl
+            for nama in os.listdir(self.persist_dir):
+                path = os.path.join(self.persist_dir, nama)
+                if nama.endswith(".json") and os.path.getmtime(path) < batas:
+                    os.remove(path)
+                    basi.append(nama[:-5])
+        self.expired += len(basi)
+        return len(basi)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "persist": bool(self.persist_dir),
+            }
+
+
+sessions = SessionStore()
@@ -0,0 +1,243 @@
+# tool_cache.py
+# Cache hasil query (tool) dengan TTL berbasis tanggal + LRU eviction
+#
+# Kunci cache = (nama fungsi, argumen yang dinormalisasi).
+# - Rentang yang mencakup hari ini (atau tanpa tanggal) → TTL pendek,
+#   karena absensi hari ini masih terus bertambah.
+# - Rentang yang seluruhnya di masa lalu → TTL panjang (default 1 jam). Koreksi
+#   absensi lama (Alfa → Izin kemarin) tetap terlihat setelah TTL ini walau
+#   tabel rekap (on_refresh) tidak aktif; segera: POST /api/cache/invalidate.
+
+import copy
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import config
+import tracing
+
+
+Rentang = Optional[Tuple[date, date]]
+
+
+def _to_date(value) -> Optional[date]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+
+def _normalize_value(key: str, value):
+    """Samakan variasi argumen dari LLM ('5' vs 5, 'X RPL 1 ' vs 'x rpl 1')"""
+    if isinstance(value, str):
+        value = value.strip()
+        if key.startswith("nama"):
+            return " ".join(value.lower().split())
+        if value.lstrip("-").isdigit():
+            return int(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def rentang_tanggal(args: Dict[str, Any]) -> Rentang:
+    """
+    Tentukan rentang tanggal yang dibaca sebuah query dari argumennya.
+    Return None jika tidak berbatas (tanpa filter tanggal / seluruh riwayat).
+    """
+    today = date.today()
+
+    if "tanggal_mulai" in args or "tanggal_akhir" in args:
+        mulai = _to_date(args.get("tanggal_mulai"))
+        akhir = _to_date(args.get("tanggal_akhir"))
+        if mulai and akhir:
+            return (mulai, akhir)
+        return None
+
+    if "tanggal" in args:
+        # tanggal kosong = default hari ini di db_functions
+        tgl = _to_date(args.get("tanggal")) or today
+        return (tgl, tgl)
+
+    tahun = args.get("tahun")
+    bulan = args.get("bulan")
+    if not tahun:
+        # bulan tanpa tahun / tanpa filter = ikut tahun berjalan
+        return None
+    try:
+        tahun = int(tahun)
+        if bulan:
+            bulan = int(bulan)
+            mulai = date(tahun, bulan, 1)
+            akhir = date(tahun + (bulan == 12), bulan % 12 + 1, 1)
+            return (mulai, date.fromordinal(akhir.toordinal() - 1))
+        return (date(tahun, 1, 1), date(tahun, 12, 31))
+    except (TypeError, ValueError):
+        return None
+
+
+class ToolResultCache:
+    """Cache LRU thread-safe dengan TTL per entry dan counter hit/miss"""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_hari_ini: float = 60,
+        ttl_historis: Optional[float] = 3600,
+    ):
+        self.max_entries = max_entries
+        self.ttl_hari_ini = ttl_hari_ini
+        self.ttl_historis = ttl_historis
+        self._data: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_untuk(self, rentang: Rentang) -> Optional[float]:
+        """TTL (detik) untuk rentang tanggal; None = tidak kedaluwarsa"""
+        if rentang is None or rentang[1] >= date.today():
+            return self.ttl_hari_ini
+        return self.ttl_historis
+
+    def get(self, key: tuple):
+        """Return (ditemukan, nilai)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            value, expires_at, _ = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._data[key]
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return True, copy.deepcopy(value)
+
+    def set(self, key: tuple, value, rentang: Rentang):
+        ttl = self.ttl_untuk(rentang)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = (value, expires_at, rentang)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, fungsi: Optional[str] = None, tanggal=None) -> int:
+        """
+        Hapus entry cache. Filter opsional:
+        - fungsi  : hanya entry milik fungsi ini
+        - tanggal : hanya entry yang rentangnya mencakup tanggal ini
+                    (entry tanpa batas tanggal ikut dihapus)
+        Tanpa filter = kosongkan seluruh cache. Return jumlah entry yang dihapus.
+        """
+        tgl = _to_date(tanggal)
+        with self._lock:
+            hapus = []
+            for key, (_, _, rentang) in self._data.items():
+                if fungsi and key[0] != fungsi:
+                    continue
+                if tgl and rentang is not None and not (rentang[0] <= tgl <= rentang[1]):
+                    continue
+                hapus.append(key)
+            for key in hapus:
+                del self._data[key]
+        return len(hapus)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+tool_cache = ToolResultCache(
+    max_entries=getattr(config, "TOOL_CACHE_MAX_ENTRIES", 1024),
+    ttl_hari_ini=getattr(config, "TOOL_CACHE_TTL_HARI_INI", 60),
+    ttl_historis=getattr(config, "TOOL_CACHE_TTL_HISTORIS", 3600),
+)
+
+TOOL_CACHE_ENABLED = getattr(config, "TOOL_CACHE_ENABLED", True)
+
+
+def _is_error(result) -> bool:
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, list) and result and isinstance(result[0], dict):
+        return "error" in result[0]
+    return result is None
+
+
+def cached_tool(func: Callable) -> Callable:
+    """
+    Decorator cache untuk fungsi query read-only (sync maupun async).
+    Versi sync (db_functions) dan async (db_async) dengan nama sama
+    berbagi entry cache karena hasilnya identik.
+    """
+    signature = inspect.signature(func)
+    nama = func.__name__
+
+    def _key(args, kwargs):
+        """Return (key, argumen_normal) atau (None, None) jika argumen tidak bisa di-cache"""
+        try:
+            bound = signature.bind(*args, **kwargs)
+        except TypeError:
+            return None, None
+        bound.apply_defaults()
+        normal = {k: _normalize_value(k, v) for k, v in bound.arguments.items()}
+        key = (nama, tuple(sorted(normal.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None, None
+        return key, normal
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            key, normal = _key(args, kwargs) if TOOL_CACHE_ENABLED else (None, None)
+            if key is None:
+                return await func(*args, **kwargs)
+            found, value = tool_cache.get(key)
+            if found:
+                return value
+            result = await func(*args, **kwargs)
+            if not _is_error(result):
+                tool_cache.set(key, result, rentang_tanggal(normal))
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key, normal = _key(args, kwargs) if TOOL_CACHE_ENABLED else (None, None)
+        if key is None:
+            return func(*args, **kwargs)
+        found, value = tool_cache.get(key)
+        tracing.current_span().set(cache_hit=found)
+        if found:
+            return value
+        result = func(*args, **kwargs)
+        if not _is_error(result):
+            tool_cache.set(key, result, rentang_tanggal(normal))
+        return result
+    return wrapper
@@ -0,0 +1,124 @@
+# tool_result.py
+# Encoder hasil tool yang ringkas untuk konteks LLM
+#
+# json.dumps(indent=2) mengulang nama kolom di setiap baris plus spasi indentasi,
+# sehingga laporan satu kelas (36 siswa) menghabiskan ribuan token prompt.
+# Format ringkas:
+#   - list of dict  → {"kolom": [...], "baris": [[...], ...], "total": n}
+#   - kolom yang nilainya sama di semua baris dipindah ke "tetap": {kolom: nilai}
+#   - lebih dari TOOL_RESULT_MAX_ROWS baris → dipotong, ditambah "dipotong" dan
+#     "jumlah_per" (hitungan nilai kolom kategori dari SELURUH baris)
+#   - JSON tanpa spasi/indentasi
+# Token sebelum/sesudah diestimasi per tool dan dicatat ke /metrics — hanya untuk
+# request yang payload-nya disampel (LOG_PAYLOAD_SAMPLE), karena pengukurannya
+# sendiri men-serialisasi ulang hasil dengan json.dumps(indent=2).
+
+import json
+import re
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List
+
+import config
+import logging_setup
+import tracing
+
+TOOL_RESULT_FORMAT = getattr(config, "TOOL_RESULT_FORMAT", "compact")   # "compact" | "json"
+TOOL_RESULT_MAX_ROWS = getattr(config, "TOOL_RESULT_MAX_ROWS", 50)
+TOOL_RESULT_UKUR_TOKEN = getattr(config, "TOOL_RESULT_UKUR_TOKEN", True)
+
+# Ditambahkan ke system prompt agar LLM paham format ringkas
+CATATAN_FORMAT = (
+    "Hasil tool berbentuk tabel ringkas: \"kolom\" = nama kolom, \"baris\" = nilai per baris "
+    "sesuai urutan kolom, \"tetap\" = nilai yang sama untuk semua baris, \"total\" = jumlah "
+    "baris sebenarnya, \"dipotong\" = baris yang tidak ditampilkan, \"jumlah_per\" = hitungan "
+    "per nilai dari seluruh baris."
+)
+
+_POLA_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+# Kolom dengan nilai unik sebanyak ini atau kurang dianggap kategori (status, metode, dll.)
+_MAKS_KATEGORI = 8
+
+
+def estimasi_token(teks: str) -> int:
+    """Estimasi kasar jumlah token (kata + tanda baca), cukup untuk membandingkan format"""
+    return len(_POLA_TOKEN.findall(teks))
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return str(value)
+    return str(value)
+
+
+def _tabel(rows: List[Dict[str, Any]], max_rows: int) -> Dict[str, Any]:
+    kolom: List[str] = []
+    for row in rows:
+        for key in row:
+            if key not in kolom:
+                kolom.append(key)
+
+    hasil: Dict[str, Any] = {}
+    tetap = {}
+    for key in kolom:
+        pertama = rows[0].get(key)
+        if not isinstance(pertama, (list, dict)) and all(r.get(key) == pertama for r in rows):
+            tetap[key] = pertama
+    if tetap:
+        hasil["tetap"] = tetap
+        kolom = [k for k in kolom if k not in tetap]
+
+    tampil = rows[:max_rows] if max_rows else rows
+    hasil["kolom"] = kolom
+    hasil["baris"] = [[_ringkas(r.get(k), max_rows) for k in kolom] for r in tampil]
+    hasil["total"] = len(rows)
+
+    if len(tampil) < len(rows):
+        hasil["dipotong"] = len(rows) - len(tampil)
+        jumlah_per = {}
+        for key in kolom:
+            nilai = [r.get(key) for r in rows]
+            if not all(isinstance(v, str) for v in nilai):
+                continue
+            hitung = Counter(nilai)
+            if len(hitung) <= _MAKS_KATEGORI:
+                jumlah_per[key] = dict(hitung.most_common())
+        if jumlah_per:
+            hasil["jumlah_per"] = jumlah_per
+    return hasil
+
+
+def _ringkas(value, max_rows: int):
+    """Ubah struktur hasil tool secara rekursif: list of dict → tabel"""
+    if isinstance(value, dict):
+        return {k: _ringkas(v, max_rows) for k, v in value.items()}
+    if isinstance(value, list):
+        # Satu baris tetap dict biasa; tabel baru hemat mulai dua baris
+        if len(value) > 1 and all(isinstance(v, dict) for v in value):
+            return _tabel(value, max_rows)
+        return [_ringkas(v, max_rows) for v in value]
+    return value
+
+
+def encode(result: Any, tool: str = "") -> str:
+    """Serialisasi hasil tool untuk pesan role 'tool' sesuai TOOL_RESULT_FORMAT"""
+    if TOOL_RESULT_FORMAT == "json":
+        return json.dumps(result, indent=2, default=str, ensure_ascii=False)
+
+    teks = json.dumps(
+        _ringkas(result, TOOL_RESULT_MAX_ROWS),
+        separators=(",", ":"), default=_default, ensure_ascii=False,
+    )
+    if TOOL_RESULT_UKUR_TOKEN and logging_setup.payload_disampel():
+        lama = estimasi_token(json.dumps(result, indent=2, default=str, ensure_ascii=False))
+        baru = estimasi_token(teks)
+        tracing.current_span().set(tokens_json=lama, tokens_compact=baru)
+        tracing.metrics.inc("agent_tool_result_tokens_total", lama, tool=tool, format="json")
+        tracing.metrics.inc("agent_tool_result_tokens_total", baru, tool=tool, format="compact")
+    return teks
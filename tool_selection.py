@@ -0,0 +1,214 @@
+# tool_selection.py
+# Pilih subset schema tool yang relevan per pertanyaan
+#
+# Mengirim ke-22 schema tool (±450 baris JSON) di setiap panggilan Ollama
+# berarti prefill ribuan token per pertanyaan, yang mahal di inferensi CPU.
+# ToolSelector memberi skor setiap tool terhadap pertanyaan (kata kunci +
+# kata di deskripsi/parameter, atau embedding jika model embedding diatur)
+# dan hanya mengirim top-K tool. Jika tidak ada tool yang cukup yakin,
+# seluruh tool tetap dikirim agar akurasi tidak turun.
+#
+# Perbandingan akurasi & waktu prefill subset vs seluruh tool:
+#   python benchmarks/bench_tool_selection.py
+
+import json
+import math
+import re
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+import config
+
+TOOL_SELECTION_ENABLED = getattr(config, "TOOL_SELECTION_ENABLED", True)
+TOOL_SELECTION_TOP_K = getattr(config, "TOOL_SELECTION_TOP_K", 6)
+TOOL_SELECTION_MIN_SKOR = getattr(config, "TOOL_SELECTION_MIN_SKOR", 1.0)
+TOOL_SELECTION_SELALU = getattr(config, "TOOL_SELECTION_SELALU", ["cari_siswa"])
+TOOL_SELECTION_EMBED_MODEL = getattr(config, "TOOL_SELECTION_EMBED_MODEL", None)
+
+# Frasa khas pertanyaan guru per tool (bobot lebih besar dari kata di deskripsi;
+# sebagian deskripsi tool berbahasa Inggris)
+KATA_KUNCI = {
+    "cari_siswa": ["cari", "nis", "bernama"],
+    "get_siswa_by_kelas": ["daftar siswa", "anggota kelas", "siswa kelas", "murid kelas"],
+    "get_absensi_by_siswa": ["absensi siswa", "riwayat absen", "detail absen"],
+    "get_absensi_by_kelas": ["absensi kelas", "absen kelas"],
+    "get_siswa_tidak_hadir": ["tidak hadir", "tidak masuk", "siapa yang alfa", "siapa saja", "bolos"],
+    "get_rekap_absensi": ["rekap absensi siswa", "rekap siswa", "total hadir"],
+    "get_rekap_absensi_bulanan": ["per bulan", "bulanan", "tiap bulan", "setiap bulan"],
+    "get_persentase_kehadiran": ["persentase", "persen", "tingkat kehadiran"],
+    "buat_surat_peringatan_alfa": ["surat", "peringatan", "panggilan orang tua"],
+    "buat_surat_peringatan_alfa_batch": ["surat", "peringatan", "semua siswa", "massal", "sekaligus", "akhir bulan"],
+    "buat_laporan_alfa": ["laporan alfa", "laporan pdf", "cetak", "pdf"],
+    "get_attendance_trends": ["tren", "trend", "perkembangan", "naik turun", "bulan terakhir"],
+    "compare_class_attendance": ["bandingkan", "perbandingan", "semua kelas", "antar kelas", "jurusan"],
+    "get_ringkasan_absensi_harian": ["ringkasan", "harian", "hari ini"],
+    "get_ringkasan_absensi_range": ["ringkasan", "per hari", "grafik", "periode", "minggu ini", "kehadiran kelas"],
+    "get_rekap_absensi_kelas_range": ["rekap kelas", "rekap absensi kelas", "rekap per siswa", "minggu ini", "kehadiran kelas"],
+    "get_top_siswa_absensi": ["top", "paling", "terbanyak", "terbanyak alfa", "paling sering"],
+    "get_analisis_metode_absen": ["metode", "cara absen", "qr", "manual"],
+    "get_anomali_absensi": ["anomali", "mencurigakan", "titip absen", "koordinat", "lokasi", "jarak", "luar sekolah"],
+    "get_statistik_waktu_absen": ["jam", "waktu absen", "terlambat", "telat"],
+    "get_laporan_kepsek_range": ["kepala sekolah", "kepsek", "laporan sekolah", "mingguan"],
+    "get_laporan_guru_harian": ["wali kelas", "guru", "laporan harian", "belum absen"],
+}
+
+# Tool pembuat PDF hanya dipilih jika pertanyaan menyebut salah satu kata ini;
+# kata di deskripsinya (alfa, bulan, siswa) cocok dengan hampir semua pertanyaan rekap
+PEMICU_PDF = ["surat", "pdf", "cetak"]
+_TOOL_PDF = {"buat_surat_peringatan_alfa", "buat_surat_peringatan_alfa_batch", "buat_laporan_alfa"}
+
+_STOPWORD = {
+    "yang", "di", "ke", "dari", "dan", "atau", "untuk", "dengan", "ini", "itu", "apa", "siapa",
+    "berapa", "saja", "tampilkan", "tolong", "bisa", "ada", "pada", "dalam", "jika", "gunakan",
+    "ketika", "user", "kamu", "opsional", "format", "yyyy", "mm", "dd", "misal", "contoh",
+    "id", "nama", "the", "to", "for", "of", "and", "a", "or", "default",
+}
+_AWALAN = ("meng", "mem", "men", "me", "ber", "ke", "per", "pe", "di")
+_AKHIRAN = ("nya", "kan", "an")
+
+
+def _stem(kata: str) -> str:
+    """Stemming ringan Bahasa Indonesia: 'kehadiran' → 'hadir', 'mengambil' → 'ambil'"""
+    for akhiran in _AKHIRAN:
+        if kata.endswith(akhiran) and len(kata) - len(akhiran) >= 4:
+            kata = kata[: -len(akhiran)]
+            break
+    for awalan in _AWALAN:
+        if kata.startswith(awalan) and len(kata) - len(awalan) >= 4:
+            kata = kata[len(awalan):]
+            break
+    return kata
+
+
+def tokenize(teks: str) -> List[str]:
+    return [_stem(k) for k in re.findall(r"[a-z0-9]+", teks.casefold()) if k not in _STOPWORD]
+
+
+def _normal(teks: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", teks.casefold()))
+
+
+def _cocok_frasa(frasa: List[str], normal: str) -> List[str]:
+    """Frasa yang muncul utuh (batas kata) di teks yang sudah dinormalisasi"""
+    return [f for f in frasa if re.search(rf"\b{re.escape(f)}\b", normal)]
+
+
+def _teks_tool(tool: Dict[str, Any]) -> str:
+    fungsi = tool["function"]
+    bagian = [fungsi["name"].replace("_", " "), fungsi.get("description", "")]
+    for nama, prop in fungsi.get("parameters", {}).get("properties", {}).items():
+        bagian += [nama.replace("_", " "), prop.get("description", "")]
+    return " ".join(bagian)
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+class ToolSelector:
+    """
+    Pemilih subset tool.
+
+    - tools     : daftar schema tool lengkap (tools_definition.tools)
+    - top_k     : jumlah tool maksimum yang dikirim
+    - min_skor  : skor tertinggi di bawah ini → kirim seluruh tool (tidak yakin)
+    - selalu    : tool yang selalu ikut (mis. cari_siswa untuk resolve nama)
+    - embed     : teks → vektor (opsional); jika ada, dipakai menggantikan skor kata
+    """
+
+    def __init__(
+        self,
+        tools: List[Dict[str, Any]],
+        top_k: int = TOOL_SELECTION_TOP_K,
+        min_skor: float = TOOL_SELECTION_MIN_SKOR,
+        selalu: Optional[List[str]] = None,
+        embed: Optional[Callable[[str], List[float]]] = None,
+        enabled: bool = TOOL_SELECTION_ENABLED,
+    ):
+        self.tools = tools
+        self.top_k = top_k
+        self.min_skor = min_skor
+        self.selalu = set(TOOL_SELECTION_SELALU if selalu is None else selalu)
+        self.enabled = enabled
+        self._embed = embed
+        self._embedding_tool: Optional[List[List[float]]] = None
+
+        self._nama = [t["function"]["name"] for t in tools]
+        self._dok = [Counter(tokenize(_teks_tool(t))) for t in tools]
+        df = Counter(k for dok in self._dok for k in dok)
+        self._idf = {k: math.log(1 + len(tools) / n) for k, n in df.items()}
+        self._frasa = [[f.casefold() for f in KATA_KUNCI.get(nama, [])] for nama in self._nama]
+        self.dipilih_total = 0
+        self.fallback_total = 0
+
+    # ── Skor ──
+
+    def _skor_kata(self, teks: str) -> List[float]:
+        token = set(tokenize(teks))
+        normal = _normal(teks)
+        skor = []
+        for dok, frasa in zip(self._dok, self._frasa):
+            s = sum(self._idf[k] for k in token if k in dok)
+            s += sum(2.0 + f.count(" ") for f in _cocok_frasa(frasa, normal))
+            skor.append(s)
+        return skor
+
+    def _skor_embedding(self, teks: str) -> Optional[List[float]]:
+        if not self._embed:
+            return None
+        try:
+            if self._embedding_tool is None:
+                self._embedding_tool = [self._embed(_teks_tool(t)) for t in self.tools]
+            vektor = self._embed(teks)
+        except Exception:
+            return None  # model embedding tidak tersedia → skor kata
+        # Skala disamakan dengan skor kata agar min_skor tetap bermakna
+        return [10 * _cosine(vektor, v) for v in self._embedding_tool]
+
+    def skor(self, pertanyaan: str, chat_history: Optional[list] = None) -> Dict[str, float]:
+        """Skor relevansi setiap tool untuk pertanyaan (ditambah pesan user sebelumnya)"""
+        teks = pertanyaan
+        if chat_history:
+            # Pertanyaan lanjutan ("kalau kelas XI?") mewarisi konteks pertanyaan sebelumnya
+            sebelumnya = next((m.get("content", "") for m in reversed(chat_history) if m.get("role") == "user"), "")
+            teks = f"{pertanyaan} {sebelumnya}"
+        nilai = self._skor_embedding(teks) or self._skor_kata(teks)
+        skor = dict(zip(self._nama, nilai))
+        if not _cocok_frasa(PEMICU_PDF, _normal(teks)):
+            for nama in _TOOL_PDF.intersection(skor):
+                skor[nama] = 0.0
+        return skor
+
+    # ── Seleksi ──
+
+    def pilih(self, pertanyaan: str, chat_history: Optional[list] = None) -> List[Dict[str, Any]]:
+        """Return subset schema tool (urutan asli tools_definition dipertahankan)"""
+        if not self.enabled or len(self.tools) <= self.top_k:
+            return self.tools
+        skor = self.skor(pertanyaan, chat_history)
+        terurut = sorted(skor, key=skor.get, reverse=True)
+        if skor[terurut[0]] < self.min_skor:
+            self.fallback_total += 1
+            return self.tools
+
+        nama = {n for n in terurut[: self.top_k] if skor[n] > 0} | self.selalu
+        self.dipilih_total += 1
+        return [t for t in self.tools if t["function"]["name"] in nama]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "top_k": self.top_k,
+            "tools_total": len(self.tools),
+            "dipilih_total": self.dipilih_total,
+            "fallback_total": self.fallback_total,
+            "embedding": self._embed is not None,
+        }
+
+
+def ukuran_prompt(tools: List[Dict[str, Any]]) -> int:
+    """Perkiraan ukuran schema tool dalam karakter JSON (seperti yang dikirim ke Ollama)"""
+    return len(json.dumps(tools, ensure_ascii=False))
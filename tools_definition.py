@@ -107,6 +107,14 @@ tools = [
                         "type": "string",
                         "enum": ["alfa", "sakit", "izin"],
                         "description": "Filter berdasarkan status ketidakhadiran (opsional)"
+                    },
+                    "kelas_id": {
+                        "type": "integer",
+                        "description": "Hanya siswa dari kelas ini (opsional)"
+                    },
+                    "nama_kelas": {
+                        "type": "string",
+                        "description": "Nama kelas, mis. 'X RPL 1' (opsional, alternatif kelas_id)"
                     }
                 }
             }
@@ -221,6 +229,46 @@ tools = [
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "buat_surat_peringatan_alfa_batch",
+            "description": "Membuat surat peringatan PDF sekaligus untuk SEMUA siswa yang alfa minimal sekian hari pada suatu periode (mis. akhir bulan), bisa difilter per kelas atau tingkat. Hasil: satu PDF gabungan (atau satu file per siswa) dan manifest daftar surat. Gunakan buat_surat_peringatan_alfa jika hanya untuk satu siswa.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "nama_kelas": {
+                        "type": "string",
+                        "description": "Nama kelas (opsional). Kosongkan untuk seluruh sekolah"
+                    },
+                    "kelas_id": {
+                        "type": "integer",
+                        "description": "ID kelas (opsional jika nama_kelas diisi)"
+                    },
+                    "tingkat": {
+                        "type": "integer",
+                        "description": "Tingkat kelas 10, 11, atau 12 (opsional)"
+                    },
+                    "tanggal_mulai": {
+                        "type": "string",
+                        "description": "Tanggal awal periode (YYYY-MM-DD). Default: awal bulan ini"
+                    },
+                    "tanggal_akhir": {
+                        "type": "string",
+                        "description": "Tanggal akhir periode (YYYY-MM-DD). Default: hari ini"
+                    },
+                    "min_alfa": {
+                        "type": "integer",
+                        "description": "Jumlah alfa minimum dalam periode agar siswa dibuatkan surat. Default: 3"
+                    },
+                    "gabung": {
+                        "type": "boolean",
+                        "description": "True = satu PDF gabungan (default); False = satu file PDF per siswa"
+                    }
+                }
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
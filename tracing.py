@@ -0,0 +1,390 @@
+# tracing.py
+# Span per fase agent (prompt, panggilan Ollama, tool, SQL, serialisasi) + metrics Prometheus
+#
+# Satu pertanyaan = satu trace. Span disimpan di memori selama trace berjalan
+# lalu diekspor sekaligus saat root span selesai:
+# - TRACE_FILE          : satu baris JSON per span (format mirip OpenTelemetry)
+# - TRACE_OTLP_ENDPOINT : dikirim ke collector OTLP/HTTP (JSON)
+# Keduanya dikerjakan satu background thread lewat queue (seperti logging_setup),
+# sehingga request tidak menunggu I/O disk/jaringan maupun lock file bersama.
+# Durasi span juga diagregasi ke histogram yang dibaca endpoint /metrics di api.py.
+# Di luar trace aktif, span() tidak melakukan apa-apa (tanpa overhead berarti).
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+import config
+
+TRACING_ENABLED = getattr(config, "TRACING_ENABLED", True)
+TRACE_FILE = getattr(config, "TRACE_FILE", None)
+TRACE_OTLP_ENDPOINT = getattr(config, "TRACE_OTLP_ENDPOINT", None)
+TRACE_SERVICE_NAME = getattr(config, "TRACE_SERVICE_NAME", "smartsis-agent")
+
+_span_aktif: ContextVar[Optional["Span"]] = ContextVar("span_aktif", default=None)
+
+
+# ============================================
+# METRICS (histogram durasi span + counter)
+# ============================================
+
+class Metrics:
+    """Agregasi durasi span dan counter dalam format teks Prometheus"""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogram: Dict[str, List[float]] = {}   # span → [count per bucket..., +Inf]
+        self._sum: Dict[str, float] = {}
+        self._errors: Dict[str, int] = {}
+        self._counters: Dict[tuple, float] = {}          # (nama, label) → nilai
+
+    def observe(self, span: str, detik: float, error: bool = False):
+        with self._lock:
+            buckets = self._histogram.setdefault(span, [0] * (len(self.BUCKETS) + 1))
+            for i, batas in enumerate(self.BUCKETS):
+                if detik <= batas:
+                    buckets[i] += 1
+            buckets[-1] += 1
+            self._sum[span] = self._sum.get(span, 0.0) + detik
+            if error:
+                self._errors[span] = self._errors.get(span, 0) + 1
+
+    def inc(self, nama: str, nilai: float = 1, **label):
+        key = (nama, tuple(sorted(label.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + nilai
+
+    def render(self) -> str:
+        def fmt_label(pairs):
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+        baris = [
+            "# HELP agent_span_duration_seconds Durasi span pipeline agent",
+            "# TYPE agent_span_duration_seconds histogram",
+        ]
+        with self._lock:
+            for span in sorted(self._histogram):
+                buckets = self._histogram[span]
+                for batas, n in zip(self.BUCKETS, buckets):
+                    baris.append(f'agent_span_duration_seconds_bucket{{span="{span}",le="{batas}"}} {n}')
+                baris.append(f'agent_span_duration_seconds_bucket{{span="{span}",le="+Inf"}} {buckets[-1]}')
+                baris.append(f'agent_span_duration_seconds_sum{{span="{span}"}} {self._sum[span]:.6f}')
+                baris.append(f'agent_span_duration_seconds_count{{span="{span}"}} {buckets[-1]}')
+
+            baris += ["# HELP agent_span_errors_total Span yang selesai dengan error",
+                      "# TYPE agent_span_errors_total counter"]
+            for span in sorted(self._errors):
+                baris.append(f'agent_span_errors_total{{span="{span}"}} {self._errors[span]}')
+
+            nama_counter = sorted({nama for nama, _ in self._counters})
+            for nama in nama_counter:
+                baris.append(f"# TYPE {nama} counter")
+                for (n, label), nilai in sorted(self._counters.items()):
+                    if n == nama:
+                        baris.append(f"{nama}{fmt_label(label)} {nilai:g}")
+        return "\n".join(baris) + "\n"
+
+
+metrics = Metrics()
+
+
+# ============================================
+# SPAN & TRACE
+# ============================================
+
+class _Trace:
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List["Span"] = []
+        self.lock = threading.Lock()
+
+
+class Span:
+    """Satu fase dengan durasi dan atribut. Dipakai lewat `with trace(...)` / `with span(...)`."""
+
+    def __init__(self, name: str, trace: _Trace, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self._t0 = time.perf_counter()
+        self._token = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000 if self.end_ns is None else self._duration_ms
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, **nilai):
+        """Tambahkan ke atribut numerik (mis. jumlah query / baris)"""
+        for key, v in nilai.items():
+            self.attributes[key] = self.attributes.get(key, 0) + v
+
+    def fail(self, pesan: str):
+        """Tandai span gagal tanpa melempar exception (error yang sudah ditangani)"""
+        self.error = pesan
+
+    def __enter__(self):
+        self._token = _span_aktif.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._duration_ms = (time.perf_counter() - self._t0) * 1000
+        self.end_ns = self.start_ns + int(self._duration_ms * 1_000_000)
+        if exc_type is not None and exc_type is not GeneratorExit and self.error is None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        try:
+            _span_aktif.reset(self._token)
+        except ValueError:
+            _span_aktif.set(None)  # keluar di context berbeda (generator ditutup dari thread lain)
+
+        metrics.observe(self.name, self._duration_ms / 1000, error=self.error is not None)
+        with self.trace.lock:
+            self.trace.spans.append(self)
+        if self.parent_id is None:
+            _export(self.trace)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start_ns / 1e9,
+            "duration_ms": round(self._duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Dipakai di luar trace aktif / saat tracing dimatikan"""
+
+    trace = None
+    duration_ms = 0.0
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, **nilai):
+        pass
+
+    def fail(self, pesan: str):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def trace(name: str, **attributes):
+    """Mulai trace baru (root span) untuk satu run agent"""
+    if not TRACING_ENABLED:
+        return _NOOP
+    return Span(name, _Trace(), None, attributes)
+
+
+def span(name: str, **attributes):
+    """Span anak dari span yang sedang aktif; no-op jika tidak ada trace"""
+    parent = _span_aktif.get()
+    if parent is None:
+        return _NOOP
+    return Span(name, parent.trace, parent, attributes)
+
+
+def current_span():
+    """Span aktif (atau no-op) untuk menambah atribut dari kode terdalam"""
+    return _span_aktif.get() or _NOOP
+
+
+# ============================================
+# CURSOR TERINSTRUMENTASI (waktu SQL & jumlah baris)
+# ============================================
+
+class TracedCursor:
+    """Proxy cursor MySQL: catat waktu execute dan jumlah baris ke span aktif"""
+
+    def __init__(self, cursor, span: Span):
+        self._cursor = cursor
+        self._span = span
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return self._cursor.execute(*args, **kwargs)
+        finally:
+            self._span.add(db_queries=1, db_ms=(time.perf_counter() - t0) * 1000)
+
+    def executemany(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return self._cursor.executemany(*args, **kwargs)
+        finally:
+            self._span.add(db_queries=1, db_ms=(time.perf_counter() - t0) * 1000)
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._span.add(db_rows=len(rows))
+        return rows
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._span.add(db_rows=len(rows))
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._span.add(db_rows=1)
+        return row
+
+
+def trace_cursor(cursor):
+    """Bungkus cursor jika sedang di dalam trace; selain itu kembalikan apa adanya"""
+    aktif = _span_aktif.get()
+    return TracedCursor(cursor, aktif) if aktif is not None else cursor
+
+
+# ============================================
+# EXPORT
+# ============================================
+
+_EXPORT_MAX_BATCH = 100  # trace per tulis file / request OTLP
+
+_export_queue: "queue.Queue" = queue.Queue(maxsize=1000)
+_export_thread: Optional[threading.Thread] = None
+_export_lock = threading.Lock()
+
+
+def _export(trace: _Trace):
+    """Dipanggil di thread request: hanya menaruh span ke queue"""
+    if not (TRACE_FILE or TRACE_OTLP_ENDPOINT):
+        return
+    _mulai_exporter()
+    try:
+        _export_queue.put_nowait([s.to_dict() for s in trace.spans])
+    except queue.Full:
+        pass  # buang trace daripada memblokir request
+
+
+def _mulai_exporter():
+    global _export_thread
+    if _export_thread is None:
+        with _export_lock:
+            if _export_thread is None:
+                _export_thread = threading.Thread(target=_export_worker, name="trace-export", daemon=True)
+                _export_thread.start()
+                atexit.register(_hentikan_exporter)
+
+
+def _hentikan_exporter():
+    """Tulis trace yang masih di queue sebelum proses berhenti"""
+    try:
+        _export_queue.put(None, timeout=1)
+    except queue.Full:
+        return
+    _export_thread.join(timeout=5)
+
+
+def _tulis_file(spans: List[Dict[str, Any]]):
+    baris = "".join(json.dumps(s, default=str, ensure_ascii=False) + "\n" for s in spans)
+    try:
+        folder = os.path.dirname(TRACE_FILE)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(baris)
+    except OSError:
+        pass
+
+
+def _kirim_otlp(spans: List[Dict[str, Any]]):
+    try:
+        req = urllib.request.Request(
+            TRACE_OTLP_ENDPOINT.rstrip("/") + "/v1/traces",
+            data=_otlp_payload(spans),
+            headers={"Content-Type": "application/json"},
+        )
+        urllib.request.urlopen(req, timeout=5).close()
+    except Exception:
+        pass  # collector mati tidak boleh mengganggu agent
+
+
+def _export_worker():
+    """Ambil trace dari queue; trace yang menumpuk digabung jadi satu tulis file / satu request OTLP"""
+    berhenti = False
+    while not berhenti:
+        batch = [_export_queue.get()]
+        while len(batch) < _EXPORT_MAX_BATCH:
+            try:
+                batch.append(_export_queue.get_nowait())
+            except queue.Empty:
+                break
+        if None in batch:
+            berhenti = True
+        spans = [s for trace in batch if trace for s in trace]
+        if not spans:
+            continue
+        if TRACE_FILE:
+            _tulis_file(spans)
+        if TRACE_OTLP_ENDPOINT:
+            _kirim_otlp(spans)
+
+
+def _otlp_value(v):
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def _otlp_payload(spans: List[Dict[str, Any]]) -> bytes:
+    otlp_spans = []
+    for s in spans:
+        start = int(s["start"] * 1e9)
+        item = {
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "name": s["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(start),
+            "endTimeUnixNano": str(start + int(s["duration_ms"] * 1e6)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s["attributes"].items()],
+            "status": {"code": 2, "message": s["error"]} if s["error"] else {"code": 1},
+        }
+        if s["parent_id"]:
+            item["parentSpanId"] = s["parent_id"]
+        otlp_spans.append(item)
+    return json.dumps({"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "tracing"}, "spans": otlp_spans}],
+    }]}).encode("utf-8")